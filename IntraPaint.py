@@ -4,6 +4,8 @@ Assuming you're running the ComfyUI or the Stable Diffusion WebUI API on the sam
 `python IntraPaint.py` should be all you need. For more information on options, run `python IntraPaint.py --help`
 """
 import atexit
+import glob
+import multiprocessing
 import os
 import sys
 
@@ -20,18 +22,6 @@ from PySide6.QtCore import QTranslator, QObject, QEvent
 from PySide6.QtGui import QPixmap
 from PySide6.QtWidgets import QApplication, QSplashScreen, QWidget, QDialog, QLabel, QMenu
 
-from src.ui.modal.image_filter_modal import ImageFilterModal
-from src.ui.modal.image_scale_modal import ImageScaleModal
-from src.ui.modal.login_modal import LoginModal
-from src.ui.modal.new_image_modal import NewImageModal
-from src.ui.modal.resize_canvas_modal import ResizeCanvasModal
-from src.ui.modal.settings_modal import SettingsModal
-from src.ui.panel.layer_ui.layer_panel import LayerPanel
-from src.ui.window.extra_network_window import ExtraNetworkWindow
-from src.ui.window.generator_setup_window import GeneratorSetupWindow
-from src.ui.window.navigation_window import NavigationWindow
-from src.ui.window.main_window import MainWindow
-from src.ui.window.prompt_style_window import PromptStyleWindow
 from src.util.arg_parser import build_arg_parser
 from src.util.visual.geometry_utils import get_scaled_placement
 from src.util.optional_import import check_import
@@ -50,6 +40,9 @@ if not is_pyinstaller_bundle():
     MODE_OPTION_HELP += ('"glid-local": Handle inpainting on the local machine (requires a GPU with ~10GB VRAM).\n'
                          '"mock": No actual inpainting performed, for UI testing only')
 
+# Batch jobs run in worker processes, which need to exit here when running from a bundled executable:
+multiprocessing.freeze_support()
+
 # argument parsing:
 parser = build_arg_parser(include_edit_params=False, include_model_defaults=False)
 parser.add_argument('--mode', type=str, required=False, default='auto', help=MODE_OPTION_HELP)
@@ -68,6 +61,11 @@ parser.add_argument('--server_url', type=str, required=False, default='',
 parser.add_argument('--fast_ngrok_connection', type=str, required=False, default='',
                     help='If true, connection rates will not be limited when using ngrok. This may cause rate '
                          'limiting if running in web mode without a paid account.')
+parser.add_argument('--batch', type=str, required=False, default=None,
+                    help='Path to a batch job JSON file. If provided, the job runs without opening the UI, and '
+                         'IntraPaint exits when it finishes. See src/controller/batch_processor.py for the job format.')
+parser.add_argument('--batch_workers', type=int, required=False, default=None,
+                    help='Number of worker processes to use for batch jobs, overriding the job file.')
 parser.set_defaults(timelapse_mode=False)
 args = parser.parse_args()
 
@@ -96,6 +94,14 @@ def exit_log():
 
 atexit.register(exit_log)
 
+if args.batch is not None:
+    # Batch jobs never open any windows:
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    app = QApplication.instance() or QApplication(sys.argv)
+    # noinspection PyPep8
+    from src.controller.batch_processor import run_batch_job
+    sys.exit(run_batch_job(args.batch, args.batch_workers))
+
 app = QApplication.instance() or QApplication(sys.argv)
 
 if args.dev:
@@ -105,6 +111,20 @@ if args.dev:
     # in dev mode, this will cause an immediate crash whenever one of these invalid windows shows up, making it
     # much easier to fix them.
     print('Enabling invalid window debugging')
+    # These are only needed for the window type checks, so don't slow down normal startup by loading them early:
+    # noinspection PyPep8
+    from src.ui.modal.image_filter_modal import ImageFilterModal
+    from src.ui.modal.image_scale_modal import ImageScaleModal
+    from src.ui.modal.login_modal import LoginModal
+    from src.ui.modal.new_image_modal import NewImageModal
+    from src.ui.modal.resize_canvas_modal import ResizeCanvasModal
+    from src.ui.modal.settings_modal import SettingsModal
+    from src.ui.panel.layer_ui.layer_panel import LayerPanel
+    from src.ui.window.extra_network_window import ExtraNetworkWindow
+    from src.ui.window.generator_setup_window import GeneratorSetupWindow
+    from src.ui.window.navigation_window import NavigationWindow
+    from src.ui.window.main_window import MainWindow
+    from src.ui.window.prompt_style_window import PromptStyleWindow
 
 
     class WindowEventFilter(QObject):
@@ -153,10 +173,8 @@ app.processEvents()
 
 # Load translations:
 translator = QTranslator()
-for root, _, files in os.walk(f'{PROJECT_DIR}/resources/translations'):
-    for file in files:
-        if file.endswith('.qm'):
-            assert translator.load(os.path.join(root, file)), f'Failed to load {file}'
+for translation_path in sorted(glob.glob(f'{PROJECT_DIR}/resources/translations/*.qm')):
+    assert translator.load(translation_path), f'Failed to load {translation_path}'
 app.installTranslator(translator)
 
 # If relevant directories exist, update paths for GLID-3-XL dependencies:
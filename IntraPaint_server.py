@@ -4,10 +4,10 @@ Starts the GLID-3-XL image inpainting server.
 import os.path
 import sys
 
-from src.glid_3_xl.load_models import load_models  # type: ignore
+from src.glid_3_xl.load_models import GlidModelLoader  # type: ignore
 from src.glid_3_xl.ml_utils import get_device  # type: ignore
 from src.util.arg_parser import build_arg_parser
-from colabFiles.server import start_server  # type: ignore
+from colabFiles.server import start_server_with_loader  # type: ignore
 from src.util.optional_import import check_import
 from src.util.shared_constants import PROJECT_DIR
 
@@ -50,9 +50,9 @@ args = parser.parse_args()
 
 device = get_device()
 print('Using device:', device)
-model_data = load_models(device, model_path=args.model_path, bert_path=args.bert_path, kl_path=args.kl_path,
-                         clip_model_name=args.clip_model, steps=args.steps, clip_guidance=args.clip_guidance,
-                         cpu=args.cpu, ddpm=args.ddpm, ddim=args.ddim)
-model_params, model, diffusion, ldm, bert, clip_model, clip_preprocess, normalize = model_data
-app = start_server(device, model_params, model, diffusion, ldm, bert, clip_model, clip_preprocess, normalize)
+# Models load in the background, so the server can answer health checks and queue requests immediately:
+model_loader = GlidModelLoader(device, model_path=args.model_path, bert_path=args.bert_path, kl_path=args.kl_path,
+                               clip_model_name=args.clip_model, steps=args.steps, clip_guidance=args.clip_guidance,
+                               cpu=args.cpu, ddpm=args.ddpm, ddim=args.ddim)
+app = start_server_with_loader(device, model_loader)
 app.run(port=args.port, host='0.0.0.0')
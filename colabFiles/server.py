@@ -1,42 +1,122 @@
 """
 Runs a simple HTTP server that provides access to GLID-3-XL image editing operations.
-"""
 
-from datetime import datetime
-from threading import Thread, Lock
-from typing import Any
+Requests are added to a shared job queue, so several clients can use the same server. Compatible requests with the
+same image size and step count are merged into larger batches when possible.  Generated images are stored unencoded,
+and only encoded when a client requests them.
+"""
+from typing import Any, Optional, Iterator, Callable
 
 import flask  # type: ignore
-from flask import Flask, request, jsonify, make_response, abort, current_app
+from flask import Flask, request, jsonify, make_response, abort, Response, stream_with_context
 from flask_cors import CORS, cross_origin
-from src.util.visual.image_utils import image_to_base64
 from src.util.visual.pil_image_utils import pil_image_from_base64
+from src.glid_3_xl.job_queue import SampleJobQueue, JobPass, SampleJob, DEFAULT_CUTN
+from src.glid_3_xl.load_models import GlidModelLoader  # type: ignore
+from src.glid_3_xl.sample_stream import encode_frame, encode_sample, stream_format, FORMAT_BASE64, \
+    FRAME_TYPE_SAMPLE, FRAME_TYPE_STATUS, FRAME_TYPE_KEEPALIVE
 from src.glid_3_xl.ml_utils import foreach_image_in_sample  # type: ignore
 from src.glid_3_xl.create_sample_function import create_sample_function  # type: ignore
 from src.glid_3_xl.generate_samples import generate_samples  # type: ignore
 
+# Maximum time between /stream frames, so that proxies and tunnels don't close idle connections:
+STREAM_KEEPALIVE_SECONDS = 15.0
+
 
 def start_server(device, model_params, model, diffusion, ldm_model, bert_model, clip_model, clip_preprocess, normalize):
+    """Starts a Flask server to handle inpainting requests from remote UI clients, using already loaded models."""
+    models = (model_params, model, diffusion, ldm_model, bert_model, clip_model, clip_preprocess, normalize)
+    return _create_app(device, lambda: models, lambda: {"ready": True, "components": {}, "error": None})
+
+
+def start_server_with_loader(device, model_loader: GlidModelLoader):
+    """Starts a Flask server to handle inpainting requests from remote UI clients while models load in the background.
+
+    The server answers health checks immediately.  Requests received before loading finishes are queued, and /ready
+    reports loading progress.
     """
-    Starts a Flask server to handle inpainting requests from a remote UI.
+    model_loader.start()
+    return _create_app(device, model_loader.wait, model_loader.status)
 
-    Note that this server can only handle a single client. In the future, using a direct connection would probably
-    be superior, but it's not worth the extra effort right now.
+
+def _create_app(device, get_models: Callable[[], tuple], get_status: Callable[[], dict[str, Any]]):
+    """
+    Creates the Flask server app.
+
+    Each request is assigned a job ID and queued.  Clients open /stream with their job ID to receive new samples and
+    queue position changes as they happen, or poll /sample for the same information.  Jobs can be cancelled with
+    DELETE /job/<job_id>.  Clients that don't send a job ID receive samples from the most recent request.
     """
 
     print("Starting server...")
     app = Flask(__name__)
     CORS(app)
-    context = app.app_context()
-    context.push()
 
-    with context:
-        current_app.lastRequest = None
-        current_app.lastError = None
-        current_app.in_progress = False
-        current_app.thread = None
-        current_app.samples = {}
-        current_app.lock = Lock()
+    def run_batch(job_passes: list[JobPass], batch_size: int) -> None:
+        """Generates one merged batch of samples for all scheduled job passes, waiting for models to load if
+           necessary."""
+        model_params, model, diffusion, ldm_model, bert_model, clip_model, clip_preprocess, normalize = get_models()
+        first_job = job_passes[0].job
+        batch_items: list[tuple[JobPass, int]] = []
+        for job_pass in job_passes:
+            batch_items += [(job_pass, k) for k in range(job_pass.job.batch_size)]
+
+        def item_params(key: str) -> list[Any]:
+            return [job_pass.job.params[key] for job_pass, _ in batch_items]
+
+        sample_fn, _ = create_sample_function(
+            device,
+            model,
+            model_params,
+            bert_model,
+            clip_model,
+            clip_preprocess,
+            ldm_model,
+            diffusion,
+            normalize,
+            edit=item_params('edit'),
+            mask=item_params('mask'),
+            prompt=item_params('prompt'),
+            negative=item_params('negative'),
+            guidance_scale=item_params('guidance_scale'),
+            batch_size=batch_size,
+            width=first_job.width,
+            height=first_job.height,
+            cutn=first_job.cutn,
+            skip_timesteps=first_job.skip_steps)
+
+        def save_sample(_, sample, clip_score=False, preview=False):
+            job_queue.check_cancelled(job_passes)
+
+            def add_image_to_response(k, image):
+                job_pass, item_index = batch_items[k]
+                job_queue.save_sample(job_pass, item_index, image)
+
+            foreach_image_in_sample(sample, batch_size, ldm_model, add_image_to_response, preview=preview)
+
+        generate_samples(device,
+                         ldm_model,
+                         diffusion,
+                         sample_fn,
+                         save_sample,
+                         batch_size,
+                         1,
+                         first_job.width,
+                         first_job.height)
+
+    job_queue = SampleJobQueue(run_batch)
+    job_queue.start()
+
+    def job_summary(job: SampleJob) -> dict[str, Any]:
+        return {
+            'job_id': job.job_id,
+            'status': job.status.value,
+            'queue_position': job_queue.queue_position(job.job_id),
+            'batch_size': job.batch_size,
+            'num_batches': job.num_batches,
+            'completed_batches': job.completed_passes,
+            'elapsed_time': job.elapsed_time
+        }
 
     @app.route("/", methods=["GET"])
     @cross_origin()
@@ -44,7 +124,14 @@ def start_server(device, model_params, model, diffusion, ldm_model, bert_model,
         """Call to check if the server is up."""
         return jsonify(success=True)
 
-    # Start an inpainting request:
+    # Check whether models are loaded and requests can be processed without waiting:
+    @app.route("/ready", methods=["GET"])
+    @cross_origin()
+    def ready_check() -> flask.Response:
+        status = get_status()
+        return make_response(jsonify(status), 200 if status["ready"] else 503)
+
+    # Queue an inpainting request:
     @app.route("/", methods=["POST"])
     @cross_origin()
     def start_inpainting():
@@ -56,11 +143,6 @@ def start_server(device, model_params, model, diffusion, ldm_model, bert_model,
                 return json[key]
             return default_value
 
-        batch_size = requested_or_default('batch_size', 1)
-        num_batches = requested_or_default('num_batches', 1)
-        width = requested_or_default('width', 256)
-        height = requested_or_default('height', 256)
-
         edit = None
         mask = None
         try:
@@ -74,89 +156,92 @@ def start_server(device, model_params, model, diffusion, ldm_model, bert_model,
             print(f"loading mask image failed, {err}")
             abort(make_response({"error": f"loading mask image failed, {err}"}, 400))
 
-        sample_fn = None
+        params = {
+            'edit': edit,
+            'mask': mask,
+            'prompt': requested_or_default("prompt", ""),
+            'negative': requested_or_default("negative", ""),
+            'guidance_scale': requested_or_default("guidanceScale", 5.0)
+        }
         try:
-            sample_fn, clip_score_fn = create_sample_function(
-                device,
-                model,
-                model_params,
-                bert_model,
-                clip_model,
-                clip_preprocess,
-                ldm_model,
-                diffusion,
-                normalize,
-                edit=edit,
-                mask=mask,
-                prompt=requested_or_default("prompt", ""),
-                negative=requested_or_default("negative", ""),
-                guidance_scale=requested_or_default("guidanceScale", 5.0),
-                batch_size=batch_size,
-                width=width,
-                height=height,
-                cutn=requested_or_default("cutn", 16),
-                skip_timesteps=requested_or_default("skipSteps", False))
-        except Exception as err:
-            abort(make_response({"error": f"creating sample function failed, {err}"}, 500))
-
-        def save_sample(i, sample, clip_score=False):
-            with current_app.lock:
-                timestamp = datetime.timestamp(datetime.now())
-                try:
-                    def add_image_to_response(k, image):
-                        name = f'{i * batch_size + k:05}'
-                        current_app.samples[name] = {"image": image_to_base64(image), "timestamp": timestamp}
-
-                    foreach_image_in_sample(sample, batch_size, ldm_model, add_image_to_response)
-                except Exception as save_err:
-                    current_app.lastError = f"sample save error: {save_err}"
-                    print(current_app.lastError)
-
-        def run_thread():
-            with context:
-                generate_samples(device,
-                                 ldm_model,
-                                 diffusion,
-                                 sample_fn,
-                                 save_sample,
-                                 batch_size,
-                                 num_batches,
-                                 width,
-                                 height)
-                with current_app.lock:
-                    current_app.in_progress = False
-
-        # Start image generation thread:
-        with current_app.lock:
-            if current_app.in_progress or current_app.thread and current_app.thread.is_alive():
-                abort(make_response({'error': "Cannot start a new operation, an existing operation is still running"},
-                                    409))
-            current_app.samples = {}
-            current_app.in_progress = True
-            current_app.thread = Thread(target=run_thread)
-            current_app.thread.start()
-
-        return jsonify(success=True)
+            job = job_queue.add_job(params,
+                                    batch_size=int(requested_or_default('batch_size', 1)),
+                                    num_batches=int(requested_or_default('num_batches', 1)),
+                                    width=int(requested_or_default('width', 256)),
+                                    height=int(requested_or_default('height', 256)),
+                                    skip_steps=int(requested_or_default("skipSteps", 0)),
+                                    cutn=int(requested_or_default("cutn", DEFAULT_CUTN)))
+        except ValueError as err:
+            abort(make_response({"error": f"invalid request, {err}"}, 400))
+        return jsonify(success=True, job_id=job.job_id, queue_position=job_queue.queue_position(job.job_id))
 
     # Request updated images:
     @app.route("/sample", methods=["GET"])
     @cross_origin()
-    def list_updated() -> dict[str, dict[Any, Any]]:
-        json = request.get_json(force=True)
-        # Parse (sampleName, timestamp) pairs from request.samples
-        # Check (sampleName, timestamp) pairs from the most recent request. If any missing from the request or have a
-        # newer timestamp, set response.samples[sampleName] = { timestamp, base64Image }
-        response: dict[str, dict[Any, Any]] = {"samples": {}}
-        with current_app.lock:
-            for key, sample in current_app.samples.items():
-                if key not in json["samples"] or json["samples"][key] < sample["timestamp"]:
-                    response["samples"][key] = sample
-            # If any errors were saved for the most recent request, use those to set response.errors
-            if current_app.lastError != "":
-                response["error"] = current_app.lastError
-
-            # Check if the most recent request is finished, use this to set response.in_progress.
-            response["in_progress"] = current_app.in_progress
-        return response
+    def list_updated() -> dict[str, Any]:
+        # Parse (sampleName, timestamp) pairs from request.samples. Any samples that are missing from the request or
+        # have a newer timestamp are returned as response.samples[sampleName] = { timestamp, base64Image }, along
+        # with the job's status and queue position.
+        json = request.get_json(force=True, silent=True) or {}
+        job_id: Optional[str] = json.get("job_id", request.args.get("job_id", None))
+        job = job_queue.get_job(job_id)
+        if job is None:
+            if job_id is not None:
+                abort(make_response({"error": f"job {job_id} not found"}, 404))
+            return {"samples": {}, "in_progress": False}
+        return job_queue.updated_samples(job, json.get("samples", {}),
+                                         lambda sample: encode_sample(sample, FORMAT_BASE64))
+
+    # Stream new and updated images as binary frames until the job finishes:
+    @app.route("/stream", methods=["GET"])
+    @cross_origin()
+    def stream_samples() -> flask.Response:
+        job_id: Optional[str] = request.args.get("job_id", None)
+        job = job_queue.get_job(job_id)
+        if job is None:
+            abort(make_response({"error": f"job {job_id} not found"}, 404))
+        image_format = stream_format(request.args.get("format", None))
+
+        def generate_frames() -> Iterator[bytes]:
+            sent_samples: dict[str, float] = {}
+            last_status: Optional[dict[str, Any]] = None
+            update_count = job_queue.update_count
+            while True:
+                response = job_queue.updated_samples(job, sent_samples)
+                # Only the newest version of each sample is sent, so slow connections skip intermediate images:
+                for name, sample in sorted(response["samples"].items()):
+                    header = {"type": FRAME_TYPE_SAMPLE, "name": name, "timestamp": sample["timestamp"],
+                              "format": image_format}
+                    yield encode_frame(header, encode_sample(sample, image_format))
+                    sent_samples[name] = sample["timestamp"]
+                status = {"type": FRAME_TYPE_STATUS, "status": response["status"],
+                          "in_progress": response["in_progress"], "queue_position": response["queue_position"],
+                          "error": response.get("error", None)}
+                if status != last_status:
+                    last_status = status
+                    yield encode_frame(status)
+                if not response["in_progress"]:
+                    return
+                last_update = update_count
+                update_count = job_queue.wait_for_update(last_update, STREAM_KEEPALIVE_SECONDS)
+                if update_count == last_update:
+                    yield encode_frame({"type": FRAME_TYPE_KEEPALIVE})
+
+        return Response(stream_with_context(generate_frames()), mimetype="application/octet-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+    # List queued and recent jobs:
+    @app.route("/queue", methods=["GET"])
+    @cross_origin()
+    def list_jobs() -> dict[str, Any]:
+        return {"jobs": [job_summary(job) for job in job_queue.list_jobs()]}
+
+    # Cancel a queued or active job:
+    @app.route("/job/<job_id>", methods=["DELETE"])
+    @cross_origin()
+    def cancel_job(job_id: str) -> flask.Response:
+        if not job_queue.cancel_job(job_id):
+            abort(make_response({"error": f"job {job_id} not found or already finished"}, 404))
+        return jsonify(success=True)
 
     return app
@@ -14,6 +14,7 @@ from PySide6.QtCore import QByteArray
 from PySide6.QtGui import QImage
 from requests import Response
 
+from src.api.backend_metadata_cache import BackendMetadataCache
 from src.api.controlnet.controlnet_category_builder import ControlNetCategoryBuilder
 from src.api.controlnet.controlnet_constants import CONTROLNET_MODEL_NONE, PREPROCESSOR_NONE
 from src.api.controlnet.controlnet_preprocessor import ControlNetPreprocessor
@@ -93,8 +94,31 @@ class A1111Webservice(WebService):
         """REST API endpoint constants (Forge WebUI alternates)"""
         SD_MODULES = '/sdapi/v1/sd-modules'
 
-    def __init__(self, url: str) -> None:
-        super().__init__(url)
+    # Endpoints providing rarely-changing metadata that can be saved between sessions:
+    CACHED_ENDPOINTS = (
+        Endpoints.STYLES,
+        Endpoints.SCRIPTS,
+        Endpoints.SCRIPT_INFO,
+        Endpoints.SAMPLERS,
+        Endpoints.UPSCALERS,
+        Endpoints.LATENT_UPSCALE_MODES,
+        Endpoints.HYPERNETWORKS,
+        Endpoints.SD_MODELS,
+        Endpoints.VAE_MODELS,
+        Endpoints.LORA_MODELS,
+        Endpoints.CONTROLNET_VERSION,
+        Endpoints.CONTROLNET_MODELS,
+        Endpoints.CONTROLNET_MODULES,
+        Endpoints.CONTROLNET_CONTROL_TYPES,
+        ForgeEndpoints.SD_MODULES
+    )
+
+    def __init__(self, url: str, metadata_cache: Optional[BackendMetadataCache] = None) -> None:
+        super().__init__(url, endpoint_timeouts={
+            A1111Webservice.Endpoints.STYLES: DEFAULT_TIMEOUT,
+            A1111Webservice.Endpoints.SCRIPTS: DEFAULT_TIMEOUT,
+            A1111Webservice.Endpoints.SCRIPT_INFO: DEFAULT_TIMEOUT
+        }, metadata_cache=metadata_cache, cached_endpoints=A1111Webservice.CACHED_ENDPOINTS)
         self._preprocessor_cache: Optional[list[ControlNetPreprocessor]] = None
 
     # General utility:
@@ -151,9 +175,17 @@ class A1111Webservice(WebService):
         """
         return self.post(A1111Webservice.Endpoints.REFRESH_LORA, body={})
 
-    def progress_check(self) -> ProgressResponseBody:
-        """Checks the progress of an ongoing image operation."""
-        return cast(ProgressResponseBody, self.get(A1111Webservice.Endpoints.PROGRESS, timeout=DEFAULT_TIMEOUT).json())
+    def progress_check(self, skip_current_image: bool = False) -> ProgressResponseBody:
+        """Checks the progress of an ongoing image operation.
+
+        Parameters
+        ----------
+        skip_current_image: bool, default=False
+            If true, the WebUI won't send back a preview of the image being generated.
+        """
+        url_params = {'skip_current_image': 'true'} if skip_current_image else None
+        return cast(ProgressResponseBody, self.get(A1111Webservice.Endpoints.PROGRESS, timeout=DEFAULT_TIMEOUT,
+                                                   url_params=url_params).json())
 
     # Image manipulation:
     def img2img(self, image: QImage, mask: Optional[QImage] = None,
@@ -515,14 +547,23 @@ class A1111Webservice(WebService):
         return cast(list[LoraInfo], self.get(A1111Webservice.Endpoints.LORA_MODELS, timeout=DEFAULT_TIMEOUT).json())
 
     def get_thumbnail(self, file_path: str) -> Optional[QImage]:
-        """Attempts to load one of the extra model thumbnails given a path parameter."""
+        """Attempts to load one of the extra model thumbnails given a path parameter. Returns a null QImage if the
+           server has no thumbnail at that path, or None if the thumbnail couldn't be loaded."""
         try:
             res = self.get(A1111Webservice.Endpoints.EXTRA_NW_THUMB, timeout=DEFAULT_TIMEOUT,
-                           url_params={'filename': file_path})
+                           url_params={'filename': file_path}, throw_on_failure=False)
+            if res.status_code == 404:
+                return QImage()
             if not res.ok:
+                logger.error(f'Failed to load thumbnail "{file_path}": status {res.status_code}')
                 return None
+            if len(res.content) == 0:
+                return QImage()
             image_bytes = QByteArray(res.content)
             image = QImage.fromData(image_bytes)
+            if image.isNull():
+                logger.error(f'Failed to read thumbnail "{file_path}"')
+                return None
             return image
         except (RuntimeError, IOError) as err:
             logger.error(f'Failed to load thumbnail "{file_path}": {err}')
@@ -535,6 +576,11 @@ class A1111Webservice(WebService):
                          timeout=DEFAULT_TIMEOUT,
                          throw_on_failure=False)
 
+    def _on_metadata_changed(self, endpoint: str) -> None:
+        if endpoint == A1111Webservice.Endpoints.CONTROLNET_MODULES:
+            self._preprocessor_cache = None
+        super()._on_metadata_changed(endpoint)
+
     def _handle_auth_error(self):
         login_modal = LoginModal(self.login)
         auth = None
@@ -0,0 +1,144 @@
+"""Persistently caches metadata responses from image generation servers.
+
+Lists of models, samplers, scripts, and node definitions rarely change between sessions, but loading all of them over
+a slow connection can take several seconds. Cached responses are saved next to the main application cache, stored by
+server URL and server version, so that generators can start from saved data and revalidate it in the background.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Optional, TypedDict
+
+from src.util.shared_constants import DATA_DIR
+from src.util.singleton import Singleton
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FILE_PATH = f'{DATA_DIR}/.backend_metadata_cache.json'
+
+# Delay before writing changes, so that several updated responses can be saved together:
+SAVE_DELAY_SECONDS = 0.5
+
+
+class CachedResponse(TypedDict):
+    """A saved response body, with the information needed to check whether it has changed."""
+    body: str
+    etag: Optional[str]
+    hash: str
+
+
+class _ServerEntry(TypedDict):
+    version: Optional[str]
+    responses: dict[str, CachedResponse]
+
+
+def content_hash(body: str) -> str:
+    """Returns the hash used to detect changes to response bodies."""
+    return hashlib.sha256(body.encode('utf-8')).hexdigest()
+
+
+class BackendMetadataCache(metaclass=Singleton):
+    """Saves metadata responses by server URL and server version, discarding them when the server version changes."""
+
+    def __init__(self, json_path: Optional[str] = DEFAULT_FILE_PATH) -> None:
+        """Loads any previously saved responses.
+
+        Parameters
+        ----------
+        json_path: str, optional
+            Path where responses will be saved and read. If None, responses will only be cached in memory.
+        """
+        self._json_path = json_path
+        self._lock = threading.RLock()
+        self._servers: dict[str, _ServerEntry] = {}
+        self._save_timer: Optional[threading.Timer] = None
+        if json_path is not None and os.path.isfile(json_path):
+            try:
+                with open(json_path, encoding='utf-8') as file:
+                    self._servers = json.load(file)
+            except (OSError, json.JSONDecodeError) as err:
+                logger.error(f'Failed to read backend metadata cache at {json_path}, clearing it: {err}')
+                self._servers = {}
+
+    @property
+    def json_path(self) -> Optional[str]:
+        """Returns the path where this cache saves responses, or None if responses are only cached in memory."""
+        return self._json_path
+
+    def get(self, server_url: str, server_version: Optional[str], request_path: str) -> Optional[CachedResponse]:
+        """Returns a cached response, if one was saved for the same server URL, server version, and request path."""
+        with self._lock:
+            server_entry = self._servers.get(server_url, None)
+            if server_entry is None or server_entry['version'] != server_version:
+                return None
+            response = server_entry['responses'].get(request_path, None)
+            return None if response is None else CachedResponse(**response)
+
+    def set(self, server_url: str, server_version: Optional[str], request_path: str, body: str,
+            etag: Optional[str] = None) -> bool:
+        """Saves a response, returning whether it differs from the previously cached response.
+
+        Parameters
+        ----------
+        server_url: str
+            Base URL of the server that sent the response.
+        server_version: str, optional
+            Version string reported by the server. If it doesn't match the version of previously saved responses from
+            the same URL, all of those responses are discarded.
+        request_path: str
+            Endpoint and URL parameters used to request the response.
+        body: str
+            Response body text.
+        etag: str, optional
+            Response ETag header, if the server provided one.
+
+        Returns
+        -------
+        bool
+            True if the response body changed or wasn't previously cached.
+        """
+        body_hash = content_hash(body)
+        with self._lock:
+            server_entry = self._servers.get(server_url, None)
+            if server_entry is None or server_entry['version'] != server_version:
+                server_entry = {'version': server_version, 'responses': {}}
+                self._servers[server_url] = server_entry
+            last_response = server_entry['responses'].get(request_path, None)
+            changed = last_response is None or last_response['hash'] != body_hash
+            if changed or last_response is None or last_response['etag'] != etag:
+                server_entry['responses'][request_path] = {'body': body, 'etag': etag, 'hash': body_hash}
+                self._schedule_save()
+            return changed
+
+    def clear(self, server_url: Optional[str] = None) -> None:
+        """Discards cached responses from one server, or from all servers if no URL is provided."""
+        with self._lock:
+            if server_url is None:
+                self._servers.clear()
+            else:
+                self._servers.pop(server_url, None)
+            self._schedule_save()
+
+    def save(self) -> None:
+        """Immediately writes all cached responses to the cache file, if one is in use."""
+        with self._lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            if self._json_path is None:
+                return
+            temp_path = f'{self._json_path}.tmp'
+            try:
+                with open(temp_path, 'w', encoding='utf-8') as file:
+                    json.dump(self._servers, file)
+                os.replace(temp_path, self._json_path)
+            except OSError as err:
+                logger.error(f'Failed to save backend metadata cache to {self._json_path}: {err}')
+
+    def _schedule_save(self) -> None:
+        if self._json_path is None or self._save_timer is not None:
+            return
+        self._save_timer = threading.Timer(SAVE_DELAY_SECONDS, self.save)
+        self._save_timer.start()
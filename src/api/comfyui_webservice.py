@@ -16,6 +16,7 @@ import websocket
 from PySide6.QtCore import QBuffer, QSize
 from PySide6.QtGui import QImage
 
+from src.api.backend_metadata_cache import BackendMetadataCache
 from src.api.comfyui.basic_upscale_workflow_builder import build_basic_upscaling_workflow
 from src.api.comfyui.comfyui_types import QueueAdditionRequest, QueueAdditionResponse, QueueDeletionRequest, \
     ImageFileReference, PromptExecOutputs, NodeInfoResponse, SystemStatResponse, ImageUploadParams, \
@@ -129,12 +130,27 @@ class ComfyUiWebservice(WebService):
     ComfyUiWebservice provides access to Stable Diffusion through the ComfyUI REST API.
     """
 
-    def __init__(self, url: str) -> None:
-        super().__init__(url)
+    # Endpoints providing rarely-changing metadata that can be saved between sessions:
+    CACHED_ENDPOINTS = (
+        ComfyEndpoints.EMBEDDINGS,
+        ComfyEndpoints.MODELS,
+        ComfyEndpoints.EXTENSIONS,
+        ComfyEndpoints.OBJECT_INFO
+    )
+
+    def __init__(self, url: str, metadata_cache: Optional[BackendMetadataCache] = None) -> None:
+        super().__init__(url, metadata_cache=metadata_cache, cached_endpoints=ComfyUiWebservice.CACHED_ENDPOINTS)
         self._preprocessor_cache: Optional[list[ControlNetPreprocessor]] = None
         self._ksampler_info: Optional[NodeInfoResponse] = None
         self._client_id = str(uuid.uuid4())
 
+    def _on_metadata_changed(self, endpoint: str) -> None:
+        if endpoint == ComfyEndpoints.OBJECT_INFO:
+            self._preprocessor_cache = None
+        elif endpoint == f'{ComfyEndpoints.OBJECT_INFO}/{KSAMPLER_NAME}':
+            self._ksampler_info = None
+        super()._on_metadata_changed(endpoint)
+
     # Loading available options and settings:
 
     def get_sampler_names(self) -> list[str]:
@@ -178,6 +194,10 @@ class ComfyUiWebservice(WebService):
         return cast(SystemStatResponse,
                     self.get(ComfyEndpoints.SYSTEM_STATS, timeout=DEFAULT_TIMEOUT).json())
 
+    def get_server_version(self) -> Optional[str]:
+        """Returns the ComfyUI version reported by the server, if available."""
+        return self.get_system_stats()['system'].get('comfyui_version', None)
+
     def get_models(self, model_type: ComfyModelType) -> list[str]:
         """Returns the list of available models, given a particular model type."""
         endpoint = f'{ComfyEndpoints.MODELS}/{model_type.value}'
@@ -0,0 +1,108 @@
+"""Caches ControlNet preprocessor preview images.
+
+Preprocessor previews are requested repeatedly while ControlNet options are adjusted, and each request sends the entire
+control image to the server. Previews are kept in memory by control image content, preprocessor name, parameter values,
+and preview resolution, so that returning to earlier settings doesn't need another request. Control images larger than
+the preview resolution are scaled down before they're sent, since the preprocessor would discard the extra detail.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional, TypeAlias
+
+from PySide6.QtCore import QSize
+from PySide6.QtGui import QImage
+
+from src.api.controlnet.controlnet_preprocessor import ControlNetPreprocessor
+from src.api.webui.controlnet_webui_constants import PREPROCESSOR_RES_PARAM_KEY
+from src.util.singleton import Singleton
+from src.util.visual.image_utils import image_data_as_numpy_8bit_readonly
+from src.util.visual.pil_image_utils import pil_image_scaling
+
+COMFYUI_RESOLUTION_PARAM_KEY = 'resolution'
+PREVIEW_RESOLUTION_PARAM_KEYS = (PREPROCESSOR_RES_PARAM_KEY, COMFYUI_RESOLUTION_PARAM_KEY)
+
+# Resolution used for preprocessors that don't have a resolution parameter:
+DEFAULT_PREVIEW_RESOLUTION = 512
+MAX_CACHED_PREVIEWS = 32
+
+# Control image hash, preprocessor name, parameter values, preview resolution:
+PreviewKey: TypeAlias = tuple[str, str, tuple[tuple[str, str], ...], int]
+
+
+def image_content_hash(image: QImage, mask: Optional[QImage] = None) -> str:
+    """Returns a hash of control image and mask content, ignoring image format."""
+    hasher = hashlib.sha256()
+    for hashed_image in (image, mask):
+        if hashed_image is None:
+            hasher.update(b'none')
+            continue
+        if hashed_image.format() != QImage.Format.Format_ARGB32_Premultiplied:
+            hashed_image = hashed_image.convertToFormat(QImage.Format.Format_ARGB32_Premultiplied)
+        hasher.update(f'{hashed_image.width()}x{hashed_image.height()}'.encode('utf-8'))
+        hasher.update(image_data_as_numpy_8bit_readonly(hashed_image).tobytes())
+    return hasher.hexdigest()
+
+
+def preview_resolution(preprocessor: ControlNetPreprocessor) -> int:
+    """Returns the resolution a preprocessor will use, or DEFAULT_PREVIEW_RESOLUTION if it doesn't have a resolution
+    parameter."""
+    for parameter in preprocessor.parameters:
+        if parameter.key in PREVIEW_RESOLUTION_PARAM_KEYS and isinstance(parameter.value, (int, float)):
+            return max(1, int(parameter.value))
+    return DEFAULT_PREVIEW_RESOLUTION
+
+
+def preview_key(preprocessor: ControlNetPreprocessor, image: QImage, mask: Optional[QImage]) -> PreviewKey:
+    """Returns the key used to cache a preprocessor preview."""
+    parameter_values = tuple((parameter.key, repr(parameter.value)) for parameter in preprocessor.parameters)
+    return image_content_hash(image, mask), preprocessor.name, parameter_values, preview_resolution(preprocessor)
+
+
+def scale_preview_input(image: QImage, resolution: int) -> QImage:
+    """Scales an image down so that its smaller side matches the preview resolution, preserving aspect ratio. Images
+    that are already small enough are returned unchanged."""
+    smaller_side = min(image.width(), image.height())
+    if smaller_side <= resolution:
+        return image
+    scale = resolution / smaller_side
+    scaled_size = QSize(max(1, round(image.width() * scale)), max(1, round(image.height() * scale)))
+    return pil_image_scaling(image, scaled_size)
+
+
+class ControlNetPreviewCache(metaclass=Singleton):
+    """Keeps recent preprocessor previews in memory, discarding the least recently used first. All methods are
+    thread-safe."""
+
+    def __init__(self, max_size: int = MAX_CACHED_PREVIEWS) -> None:
+        """Initializes an empty cache.
+
+        Parameters
+        ----------
+        max_size: int, default=MAX_CACHED_PREVIEWS
+            Maximum number of preview images to keep.
+        """
+        self._max_size = max_size
+        self._lock = threading.Lock()
+        self._previews: OrderedDict[PreviewKey, QImage] = OrderedDict()
+
+    def get(self, key: PreviewKey) -> Optional[QImage]:
+        """Returns a cached preview image, or None if no preview was cached with the given key."""
+        with self._lock:
+            preview = self._previews.get(key, None)
+            if preview is not None:
+                self._previews.move_to_end(key)
+            return preview
+
+    def set(self, key: PreviewKey, preview: QImage) -> None:
+        """Saves a preview image, discarding the least recently used preview if the cache is full."""
+        with self._lock:
+            self._previews[key] = preview
+            self._previews.move_to_end(key)
+            while len(self._previews) > self._max_size:
+                self._previews.popitem(last=False)
+
+    def clear(self) -> None:
+        """Removes all cached previews."""
+        with self._lock:
+            self._previews.clear()
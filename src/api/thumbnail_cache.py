@@ -0,0 +1,145 @@
+"""Persistently caches preview thumbnails loaded from image generation servers.
+
+Loading LoRA thumbnails requires one request per model, which adds up quickly when hundreds of models are installed.
+Thumbnails are saved as small PNG files, keyed by server URL, model name, and a version string that changes whenever the
+model changes, so that repeated loads don't need to contact the server at all. Models that the server reports have no
+thumbnail are remembered too, but only for a limited time, in case a thumbnail is added later. Failed requests should
+not be cached.
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+from typing import Optional
+
+from PySide6.QtGui import QImage
+
+from src.util.shared_constants import DATA_DIR
+from src.util.singleton import Singleton
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = f'{DATA_DIR}/.thumbnail_cache'
+THUMBNAIL_FORMAT = 'PNG'
+THUMBNAIL_EXTENSION = '.png'
+MISSING_THUMBNAIL_EXTENSION = '.missing'
+
+# How long to wait before checking again for thumbnails that weren't found:
+MISSING_THUMBNAIL_RETRY_SECONDS = 24 * 60 * 60
+
+
+def thumbnail_key(server_url: str, name: str, version: str) -> str:
+    """Returns the key used to store a thumbnail."""
+    return hashlib.sha256('\n'.join((server_url, name, version)).encode('utf-8')).hexdigest()
+
+
+class ThumbnailCache(metaclass=Singleton):
+    """Saves thumbnails by server URL, model name, and model version. All methods are thread-safe.
+
+    Saved thumbnails are read back from disk on each request, callers that need the same thumbnails repeatedly should
+    keep their own references.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = DEFAULT_CACHE_DIR) -> None:
+        """Initializes the cache, creating the cache directory if needed.
+
+        Parameters
+        ----------
+        cache_dir: str, optional
+            Directory where thumbnails will be saved and read. If None, thumbnails will only be cached in memory.
+        """
+        self._cache_dir = cache_dir
+        self._lock = threading.Lock()
+        self._thumbnails: dict[str, Optional[QImage]] = {}
+        if cache_dir is not None:
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+            except OSError as err:
+                logger.error(f'Failed to create thumbnail cache directory {cache_dir}, caching in memory only: {err}')
+                self._cache_dir = None
+
+    @property
+    def cache_dir(self) -> Optional[str]:
+        """Returns the directory where this cache saves thumbnails, or None if thumbnails are only cached in memory."""
+        return self._cache_dir
+
+    def get(self, server_url: str, name: str, version: str) -> Optional[QImage]:
+        """Returns a cached thumbnail, a null QImage if the model is known to have no thumbnail, or None if nothing was
+           cached for the model."""
+        key = thumbnail_key(server_url, name, version)
+        if self._cache_dir is None:
+            with self._lock:
+                if key not in self._thumbnails:
+                    return None
+                thumbnail = self._thumbnails[key]
+                return QImage() if thumbnail is None else thumbnail
+        image_path, missing_path = self._paths(key)
+        if os.path.isfile(image_path):
+            thumbnail = QImage(image_path)
+            if thumbnail.isNull():
+                logger.error(f'Failed to read cached thumbnail {image_path}')
+                return None
+            return thumbnail
+        if os.path.isfile(missing_path) \
+                and time.time() - os.path.getmtime(missing_path) < MISSING_THUMBNAIL_RETRY_SECONDS:
+            return QImage()
+        return None
+
+    def set(self, server_url: str, name: str, version: str, thumbnail: Optional[QImage]) -> None:
+        """Saves a thumbnail, or saves that a model has no thumbnail if thumbnail is None or null. Thumbnails are
+           written to a temporary file first, so concurrent calls never leave partially written thumbnails.
+
+        Parameters
+        ----------
+        server_url: str
+            Base URL of the server that provided the thumbnail.
+        name: str
+            Name of the model the thumbnail represents.
+        version: str
+            String identifying the model version, e.g. a hash of its metadata. Thumbnails saved with a different
+            version string are ignored.
+        thumbnail: QImage, optional
+            Thumbnail image, which should already be scaled to the size where it will be displayed.
+        """
+        if thumbnail is not None and thumbnail.isNull():
+            thumbnail = None
+        key = thumbnail_key(server_url, name, version)
+        if self._cache_dir is None:
+            with self._lock:
+                self._thumbnails[key] = thumbnail
+            return
+        image_path, missing_path = self._paths(key)
+        try:
+            if thumbnail is None:
+                with open(missing_path, 'w', encoding='utf-8'):
+                    pass
+                if os.path.exists(image_path):
+                    os.remove(image_path)
+                return
+            temp_path = f'{image_path}.{threading.get_ident()}.tmp'
+            if not thumbnail.save(temp_path, THUMBNAIL_FORMAT):
+                raise IOError(f'Failed to write {temp_path}')
+            os.replace(temp_path, image_path)
+            if os.path.exists(missing_path):
+                os.remove(missing_path)
+        except OSError as err:
+            logger.error(f'Failed to save thumbnail for {name} from {server_url}: {err}')
+
+    def clear(self) -> None:
+        """Discards all cached thumbnails, deleting saved files."""
+        with self._lock:
+            self._thumbnails.clear()
+            if self._cache_dir is None:
+                return
+            for file_name in os.listdir(self._cache_dir):
+                if file_name.endswith((THUMBNAIL_EXTENSION, MISSING_THUMBNAIL_EXTENSION)):
+                    try:
+                        os.remove(os.path.join(self._cache_dir, file_name))
+                    except OSError as err:
+                        logger.error(f'Failed to remove cached thumbnail {file_name}: {err}')
+
+    def _paths(self, key: str) -> tuple[str, str]:
+        assert self._cache_dir is not None
+        base_path = os.path.join(self._cache_dir, key)
+        return base_path + THUMBNAIL_EXTENSION, base_path + MISSING_THUMBNAIL_EXTENSION
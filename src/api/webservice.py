@@ -1,16 +1,47 @@
 """
 Basic interface for classes used to access HTTP web services. 
 
-Provides basic session management, auth access, and functions for making GET and POST requests.
+Provides basic session management, auth access, and functions for making GET and POST requests. Requests share a
+pooled session, and can be sent concurrently either from asyncio coroutines or through the blocking run_concurrently
+method.
 """
-from typing import Optional, Any
+import asyncio
+import logging
 import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Any, Callable, TypeVar, Hashable, Iterable
+
 import requests
+from requests.adapters import HTTPAdapter
+
+from src.api.backend_metadata_cache import BackendMetadataCache, CachedResponse
+from src.util.tracing import trace_span, CATEGORY_NETWORK
 
+logger = logging.getLogger(__name__)
 
 JSON_DATA_TYPE = 'application/json'
 MULTIPART_FORM_DATA_TYPE = 'multipart/form-data'
 
+DEFAULT_POOL_SIZE = 8
+
+# Once a cached metadata response is confirmed to be current, it's reused without contacting the server until this
+# many seconds pass, or until any POST request is sent:
+METADATA_FRESH_SECONDS = 60.0
+
+KeyT = TypeVar('KeyT', bound=Hashable)
+ResultT = TypeVar('ResultT')
+
+
+# Signals that a server version check hasn't happened yet, or failed:
+_VERSION_UNCHECKED = object()
+_VERSION_UNAVAILABLE = object()
+
+
+class _AuthRequired(Exception):
+    """Raised within concurrent requests when authentication is needed, so that it can be handled by the caller."""
+
 
 class WebService:
     """
@@ -18,16 +49,46 @@ class WebService:
     POST requests.
     """
 
-    def __init__(self, url: str):
+    def __init__(self, url: str, pool_size: int = DEFAULT_POOL_SIZE,
+                 endpoint_timeouts: Optional[dict[str, float]] = None,
+                 metadata_cache: Optional[BackendMetadataCache] = None,
+                 cached_endpoints: Optional[Iterable[str]] = None):
         """__init__.
 
         Parameters
         ----------
         url : str
             Base URL of the webservice.
+        pool_size : int, default=DEFAULT_POOL_SIZE
+            Maximum number of connections kept open to the server, and maximum number of requests sent concurrently.
+        endpoint_timeouts : dict[str, float], optional
+            Default timeout periods in seconds for specific endpoints, used when requests don't provide a timeout.
+        metadata_cache : BackendMetadataCache, optional
+            If provided, GET responses from cached endpoints will be saved in this cache. The first request to each
+            cached endpoint immediately returns any saved response, and checks for changes in the background.
+        cached_endpoints : Iterable[str], optional
+            Endpoints with responses that may be saved in the metadata cache. Endpoints that start with any of these
+            followed by '/' are also cached. Requests with URL parameters are never cached.
         """
         self._server_url = url
         self._session = requests.Session()
+        self._pool_size = max(1, pool_size)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self._pool_size)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+        self._endpoint_timeouts: dict[str, float] = {} if endpoint_timeouts is None else dict(endpoint_timeouts)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self._auth_lock = threading.RLock()
+        self._request_state = threading.local()
+        self._metadata_cache = metadata_cache
+        self._cached_endpoints = set() if cached_endpoints is None else set(cached_endpoints)
+        self._cache_state_lock = threading.Lock()
+        self._version_check_lock = threading.Lock()
+        self._server_version: Any = _VERSION_UNCHECKED
+        self._revalidated_paths: set[str] = set()
+        self._fresh_until: dict[str, float] = {}
+        self._metadata_change_listener: Optional[Callable[[str], None]] = None
         self._auth = None
         self._session_hash = secrets.token_hex(5)
 
@@ -47,6 +108,97 @@ class WebService:
         """
         self._session.auth = auth
 
+    @property
+    def pool_size(self) -> int:
+        """Returns the maximum number of pooled connections and concurrent requests."""
+        return self._pool_size
+
+    def set_endpoint_timeout(self, endpoint: str, timeout: Optional[float]) -> None:
+        """Sets or clears the default timeout period in seconds used for requests to a particular endpoint."""
+        if timeout is None:
+            self._endpoint_timeouts.pop(endpoint, None)
+        else:
+            self._endpoint_timeouts[endpoint] = timeout
+
+    def get_server_version(self) -> Optional[str]:
+        """Returns a string identifying the server's software version, if available. Saved metadata responses are
+           discarded whenever this value changes."""
+        return None
+
+    def set_metadata_change_listener(self, listener: Optional[Callable[[str], None]]) -> None:
+        """Sets a function to call with the endpoint name whenever a background check finds that a saved metadata
+           response has changed. The listener will be called from a background thread."""
+        self._metadata_change_listener = listener
+
+    async def async_get(self, endpoint: str, **kwargs: Any) -> requests.Response:
+        """Sends an HTTP GET request without blocking the event loop. Parameters are the same as in the get method."""
+        return await self.run_async(lambda: self.get(endpoint, **kwargs))
+
+    async def async_post(self, endpoint: str, body: Any, **kwargs: Any) -> requests.Response:
+        """Sends an HTTP POST request without blocking the event loop. Parameters are the same as in the post method."""
+        return await self.run_async(lambda: self.post(endpoint, body, **kwargs))
+
+    async def run_async(self, request_fn: Callable[[], ResultT]) -> ResultT:
+        """Runs a blocking function that uses the webservice on the webservice's request pool, returning its result.
+
+        Authentication errors within request_fn raise an internal exception instead of blocking the pool, and are
+        handled by run_concurrently.
+        """
+        def _run_deferring_auth() -> ResultT:
+            self._request_state.defer_auth = True
+            try:
+                return request_fn()
+            finally:
+                self._request_state.defer_auth = False
+        return await asyncio.get_running_loop().run_in_executor(self._get_executor(), _run_deferring_auth)
+
+    def run_concurrently(self, request_fns: dict[KeyT, Callable[[], ResultT]],
+                         return_exceptions: bool = False) -> dict[KeyT, ResultT | Exception]:
+        """Runs several blocking functions that use the webservice at the same time, waiting for all of them to finish.
+
+        This is the synchronous facade over run_async, for use outside of any running asyncio event loop. If any
+        function needs authentication, the webservice's authentication handler runs once on the calling thread, and
+        those functions are run again afterward.
+
+        Parameters
+        ----------
+        request_fns : dict[KeyT, Callable[[], ResultT]]
+            Functions to run, each stored under a unique key.
+        return_exceptions : bool, default=False
+            If true, exceptions raised by functions are returned as their results instead of being re-raised.
+
+        Returns
+        -------
+        dict[KeyT, ResultT | Exception]
+            Function results, stored under the same keys used to provide each function.
+
+        Raises
+        ------
+        Exception
+            Unless return_exceptions is true, if any of the functions raised an exception, the first exception raised in
+            key order is re-raised after all other functions finish.
+        """
+        keys = list(request_fns.keys())
+
+        async def _gather() -> list[Any]:
+            return await asyncio.gather(*(self.run_async(request_fns[key]) for key in keys), return_exceptions=True)
+
+        results: dict[KeyT, Any] = dict(zip(keys, asyncio.run(_gather())))
+        auth_retry_keys = [key for key in keys if isinstance(results[key], _AuthRequired)]
+        if len(auth_retry_keys) > 0:
+            with self._auth_lock:
+                self._handle_auth_error()
+            for key in auth_retry_keys:
+                try:
+                    results[key] = request_fns[key]()
+                except Exception as err:  # pylint: disable=broad-exception-caught
+                    results[key] = err
+        for key in keys:
+            if isinstance(results[key], BaseException) and (not return_exceptions
+                                                              or not isinstance(results[key], Exception)):
+                raise results[key]
+        return results
+
     def get(self,
             endpoint: str,
             timeout: Optional[int] = None,
@@ -76,6 +228,8 @@ class WebService:
         Response
             The response returned by the webservice.
         """
+        if self._metadata_cache is not None and url_params is None and self._is_cached_endpoint(endpoint):
+            return self._get_with_metadata_cache(endpoint, timeout, headers, fail_on_auth_error, throw_on_failure)
         return self._send(endpoint, 'GET', None, None, timeout, url_params, headers, None,
                           fail_on_auth_error, throw_on_failure)
 
@@ -121,6 +275,9 @@ class WebService:
         """
         if body is None:
             body_format = None
+        if self._metadata_cache is not None:
+            with self._cache_state_lock:
+                self._fresh_until.clear()
         return self._send(endpoint, 'POST', body, body_format, timeout, url_params, headers, files,
                           fail_on_auth_error, throw_on_failure)
 
@@ -129,7 +286,7 @@ class WebService:
               method: str,
               body,
               body_format: Optional[str] = JSON_DATA_TYPE,
-              timeout: Optional[int] = None,
+              timeout: Optional[float] = None,
               url_params: Optional[dict[str, str]] = None,
               headers: Optional[dict[str, str]] = None,
               files: Optional[dict[str, tuple[str, bytes, str]]] = None,
@@ -138,25 +295,31 @@ class WebService:
         address = self._build_address(endpoint, url_params)
         if headers is None:
             headers = {}
+        if timeout is None:
+            timeout = self._endpoint_timeouts.get(endpoint, None)
         try:
-            if method == 'GET':
-                res = self._session.get(address, timeout=timeout, headers=headers)
-            elif method == 'POST':
-                if body_format == JSON_DATA_TYPE:
-                    res = self._session.post(address, timeout=timeout, headers=headers, json=body)
-                elif body_format == MULTIPART_FORM_DATA_TYPE and files is not None:
-                    res = self._session.post(address, timeout=timeout, headers=headers, files=files, data=body)
+            with trace_span('Webservice.request', CATEGORY_NETWORK, {'method': method, 'endpoint': endpoint}):
+                if method == 'GET':
+                    res = self._session.get(address, timeout=timeout, headers=headers)
+                elif method == 'POST':
+                    if body_format == JSON_DATA_TYPE:
+                        res = self._session.post(address, timeout=timeout, headers=headers, json=body)
+                    elif body_format == MULTIPART_FORM_DATA_TYPE and files is not None:
+                        res = self._session.post(address, timeout=timeout, headers=headers, files=files, data=body)
+                    else:
+                        res = self._session.post(address, timeout=timeout, headers=headers, data=body)
                 else:
-                    res = self._session.post(address, timeout=timeout, headers=headers, data=body)
-            else:
-                raise ValueError(f'HTTP method {method} not supported')
+                    raise ValueError(f'HTTP method {method} not supported')
         except (requests.exceptions.RequestException, requests.exceptions.ConnectionError) as err:
             raise RuntimeError(f'Error connecting to {endpoint}: {err}') from err
         if res.status_code == 401:
             if fail_on_auth_error and throw_on_failure:
                 raise RuntimeError(f'HTTP method {method} failed with status 401: unauthorized')
             if not fail_on_auth_error:
-                self._handle_auth_error()
+                if getattr(self._request_state, 'defer_auth', False):
+                    raise _AuthRequired()
+                with self._auth_lock:
+                    self._handle_auth_error()
                 return self._send(endpoint,
                                   method,
                                   body,
@@ -173,9 +336,127 @@ class WebService:
 
     def disconnect(self) -> None:
         """Close the session and clear auth.  Do not use the webservice after calling this."""
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
         self._session.close()
         self._auth = None
 
+    def _is_cached_endpoint(self, endpoint: str) -> bool:
+        if endpoint in self._cached_endpoints:
+            return True
+        return any(endpoint.startswith(f'{cached_endpoint}/') for cached_endpoint in self._cached_endpoints)
+
+    def _get_cache_version(self) -> Any:
+        """Returns the server version used to store cached metadata, or _VERSION_UNAVAILABLE if the version check
+           failed and cached metadata shouldn't be used."""
+        with self._version_check_lock:
+            if self._server_version is _VERSION_UNCHECKED:
+                try:
+                    self._server_version = self.get_server_version()
+                except (RuntimeError, KeyError, ValueError) as err:
+                    logger.error(f'Server version check failed, not using cached metadata: {err}')
+                    self._server_version = _VERSION_UNAVAILABLE
+            return self._server_version
+
+    def _get_with_metadata_cache(self,
+                                 endpoint: str,
+                                 timeout: Optional[float],
+                                 headers: Optional[dict[str, str]],
+                                 fail_on_auth_error: bool,
+                                 throw_on_failure: bool) -> requests.Response:
+        """Sends a GET request to a cached endpoint.
+
+        On the first request to the endpoint, any saved response is returned immediately, and a conditional request
+        checks for changes in the background.  Later requests reuse the saved response if it was confirmed to be current
+        within the last METADATA_FRESH_SECONDS, and otherwise contact the server, using ETags when possible to avoid
+        re-sending unchanged data.
+        """
+        assert self._metadata_cache is not None
+        version = self._get_cache_version()
+        if version is _VERSION_UNAVAILABLE:
+            return self._send(endpoint, 'GET', None, None, timeout, None, headers, None, fail_on_auth_error,
+                              throw_on_failure)
+        cached_response = self._metadata_cache.get(self._server_url, version, endpoint)
+        with self._cache_state_lock:
+            first_request = endpoint not in self._revalidated_paths
+            self._revalidated_paths.add(endpoint)
+            is_fresh = self._fresh_until.get(endpoint, 0.0) > time.monotonic()
+        if is_fresh and cached_response is not None:
+            return self._build_cached_response(endpoint, cached_response)
+        if first_request and cached_response is not None:
+            self._get_executor().submit(self._revalidate_cached_response, endpoint, version, cached_response,
+                                        timeout)
+            return self._build_cached_response(endpoint, cached_response)
+        request_headers = {} if headers is None else dict(headers)
+        if cached_response is not None and cached_response['etag'] is not None:
+            request_headers['If-None-Match'] = cached_response['etag']
+        res = self._send(endpoint, 'GET', None, None, timeout, None, request_headers, None, fail_on_auth_error,
+                         throw_on_failure=False)
+        if res.status_code == 304 and cached_response is not None:
+            self._mark_fresh(endpoint)
+            return self._build_cached_response(endpoint, cached_response)
+        if res.status_code == 200:
+            self._metadata_cache.set(self._server_url, version, endpoint, res.text, res.headers.get('ETag', None))
+            self._mark_fresh(endpoint)
+        elif throw_on_failure:
+            raise RuntimeError(f'{res.status_code}: {res.text}')
+        return res
+
+    def _revalidate_cached_response(self, endpoint: str, version: Optional[str], cached_response: CachedResponse,
+                                    timeout: Optional[float]) -> None:
+        """Checks whether a saved response is still valid, updating it and notifying the change listener if needed."""
+        assert self._metadata_cache is not None
+        headers = {}
+        if cached_response['etag'] is not None:
+            headers['If-None-Match'] = cached_response['etag']
+        try:
+            res = self._send(endpoint, 'GET', None, None, timeout, None, headers, None, fail_on_auth_error=True,
+                             throw_on_failure=False)
+        except RuntimeError as err:
+            logger.error(f'Checking cached {endpoint} response failed: {err}')
+            return
+        if res.status_code == 304:
+            self._mark_fresh(endpoint)
+            return
+        if res.status_code != 200:
+            logger.warning(f'Checking cached {endpoint} response failed with status {res.status_code}')
+            return
+        changed = self._metadata_cache.set(self._server_url, version, endpoint, res.text,
+                                           res.headers.get('ETag', None))
+        self._mark_fresh(endpoint)
+        if changed:
+            self._on_metadata_changed(endpoint)
+
+    def _mark_fresh(self, endpoint: str) -> None:
+        with self._cache_state_lock:
+            self._fresh_until[endpoint] = time.monotonic() + METADATA_FRESH_SECONDS
+
+    def _on_metadata_changed(self, endpoint: str) -> None:
+        """Called from a background thread when a previously returned cached response is found to be outdated.
+           Subclasses that keep their own copies of cached data should clear them here."""
+        listener = self._metadata_change_listener
+        if listener is not None:
+            listener(endpoint)
+
+    def _build_cached_response(self, endpoint: str, cached_response: CachedResponse) -> requests.Response:
+        res = requests.Response()
+        res.status_code = 200
+        res.url = self._build_address(endpoint)
+        res.encoding = 'utf-8'
+        res._content = cached_response['body'].encode('utf-8')  # pylint: disable=protected-access
+        if cached_response['etag'] is not None:
+            res.headers['ETag'] = cached_response['etag']
+        return res
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self._pool_size,
+                                                    thread_name_prefix=f'{self.__class__.__name__}-request')
+            return self._executor
+
     def _handle_auth_error(self):
         raise NotImplementedError('Authentication is not implemented')
 
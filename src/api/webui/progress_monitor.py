@@ -0,0 +1,203 @@
+"""Tracks image generation progress on Stable Diffusion WebUI servers.
+
+A single polling loop is shared by everything that wants progress updates from a particular server, so opening
+several windows or starting overlapping operations doesn't multiply requests sent to the WebUI. The polling interval
+adapts to the reported ETA, and changed preview images are decoded once and passed along to listeners that want them.
+"""
+import logging
+import math
+import time
+from threading import Lock
+from typing import Callable, Optional, TypeAlias
+
+from PySide6.QtCore import QRect, QSize
+from PySide6.QtGui import QImage
+from requests import ReadTimeout
+
+from src.api.a1111_webservice import A1111Webservice
+from src.api.webui.response_formats import ProgressResponseBody
+from src.util.async_task import AsyncTask
+from src.util.visual.image_utils import qimage_from_base64
+
+logger = logging.getLogger(__name__)
+
+# Listeners receive the progress response, and a decoded preview image if one was requested and has changed since the
+# last update:
+ProgressListener: TypeAlias = Callable[[ProgressResponseBody, Optional[QImage]], None]
+
+MIN_POLL_INTERVAL_SECONDS = 0.25
+MAX_POLL_INTERVAL_SECONDS = 2.0
+IDLE_POLL_INTERVAL_SECONDS = 0.5
+MAX_RETRY_INTERVAL_SECONDS = 60.0
+MAX_ERROR_COUNT = 10
+
+# When step counts aren't available, aim to check progress this many times over the remaining ETA:
+DEFAULT_UPDATES_PER_ETA = 20
+
+# Maximum allowed difference between expected and actual aspect ratios when splitting preview grids:
+GRID_ASPECT_RATIO_TOLERANCE = 0.05
+
+
+def next_poll_interval(status: Optional[ProgressResponseBody], error_count: int = 0) -> float:
+    """Returns the time to wait in seconds before checking progress again, based on the last progress response.
+
+    While a job is active, progress is checked about once per sampling step, limited to the range
+    [MIN_POLL_INTERVAL_SECONDS, MAX_POLL_INTERVAL_SECONDS]. Errors increase the interval exponentially up to
+    MAX_RETRY_INTERVAL_SECONDS.
+    """
+    if error_count > 0:
+        return min(MIN_POLL_INTERVAL_SECONDS * pow(2, error_count), MAX_RETRY_INTERVAL_SECONDS)
+    if status is None or status.get('progress', 0.0) <= 0.0 or status.get('eta_relative', 0.0) <= 0.0:
+        return IDLE_POLL_INTERVAL_SECONDS
+    eta = status['eta_relative']
+    state = status.get('state', None)
+    remaining_updates = DEFAULT_UPDATES_PER_ETA
+    if state is not None and state.get('sampling_steps', 0) > 0:
+        steps = state['sampling_steps']
+        job_count = max(1, state.get('job_count', 1))
+        job_no = max(0, state.get('job_no', 0))
+        remaining_steps = (job_count - job_no) * steps - state.get('sampling_step', 0)
+        if remaining_steps > 0:
+            remaining_updates = remaining_steps
+    return min(max(eta / remaining_updates, MIN_POLL_INTERVAL_SECONDS), MAX_POLL_INTERVAL_SECONDS)
+
+
+def split_preview_grid(preview: QImage, batch_size: int, image_size: QSize) -> list[QImage]:
+    """Splits a WebUI progress preview into individual batch image previews.
+
+    When the WebUI's "show progress grid" option is enabled, previews of all images in the current batch are combined
+    into a grid, using the WebUI's default grid layout. If the preview doesn't match the expected grid layout, it's
+    assumed to be a preview of the first image only.
+    """
+    if batch_size > 1 and not preview.isNull() and not image_size.isEmpty():
+        rows = max(1, min(round(math.sqrt(batch_size)), batch_size))
+        columns = math.ceil(batch_size / rows)
+        cell_width = preview.width() // columns
+        cell_height = preview.height() // rows
+        if cell_width > 0 and cell_height > 0:
+            expected_ratio = image_size.width() / image_size.height()
+            cell_ratio = cell_width / cell_height
+            if abs(cell_ratio - expected_ratio) / expected_ratio <= GRID_ASPECT_RATIO_TOLERANCE:
+                return [preview.copy(QRect((i % columns) * cell_width, (i // columns) * cell_height,
+                                           cell_width, cell_height)) for i in range(batch_size)]
+    return [preview]
+
+
+class WebUIProgressMonitor:
+    """Polls generation progress from a WebUI server while any listeners are registered."""
+
+    _monitors: dict[str, 'WebUIProgressMonitor'] = {}
+    _monitor_lock = Lock()
+
+    @staticmethod
+    def for_webservice(webservice: A1111Webservice) -> 'WebUIProgressMonitor':
+        """Returns the shared progress monitor for a webservice's server URL, creating it if necessary."""
+        with WebUIProgressMonitor._monitor_lock:
+            monitor = WebUIProgressMonitor._monitors.get(webservice.server_url, None)
+            if monitor is None:
+                monitor = WebUIProgressMonitor(webservice)
+                WebUIProgressMonitor._monitors[webservice.server_url] = monitor
+            else:
+                monitor.webservice = webservice
+            return monitor
+
+    def __init__(self, webservice: A1111Webservice) -> None:
+        self._webservice = webservice
+        self._lock = Lock()
+        self._listeners: list[tuple[ProgressListener, bool]] = []
+        self._poll_task: Optional[AsyncTask] = None
+        self._last_preview_str: Optional[str] = None
+
+    @property
+    def webservice(self) -> A1111Webservice:
+        """Returns the webservice used to check progress."""
+        return self._webservice
+
+    @webservice.setter
+    def webservice(self, webservice: A1111Webservice) -> None:
+        assert webservice.server_url == self._webservice.server_url, 'Progress monitors may not change server URLs'
+        self._webservice = webservice
+
+    @property
+    def listener_count(self) -> int:
+        """Returns the number of registered progress listeners."""
+        with self._lock:
+            return len(self._listeners)
+
+    @property
+    def is_polling(self) -> bool:
+        """Returns whether the monitor is currently polling the server for progress updates."""
+        with self._lock:
+            return self._poll_task is not None
+
+    def add_listener(self, listener: ProgressListener, include_previews: bool = False) -> None:
+        """Registers a function to receive progress updates, starting progress polling if it isn't already active.
+
+        Parameters
+        ----------
+        listener: ProgressListener
+            Function to call on every progress update. Listeners are called from a background thread.
+        include_previews: bool, default=False
+            If true, preview images will be requested from the WebUI and passed to the listener when they change.
+            Otherwise, the listener will always receive None in place of a preview image.
+        """
+        with self._lock:
+            self._listeners.append((listener, include_previews))
+            if self._poll_task is not None:
+                return
+            self._poll_task = AsyncTask(self._poll_progress)
+            self._last_preview_str = None
+            poll_task = self._poll_task
+        poll_task.start()
+
+    def remove_listener(self, listener: ProgressListener) -> None:
+        """Unregisters a progress listener. Polling stops after the last listener is removed."""
+        with self._lock:
+            self._listeners = [entry for entry in self._listeners if entry[0] != listener]
+
+    def _poll_progress(self) -> None:
+        error_count = 0
+        status: Optional[ProgressResponseBody] = None
+        while True:
+            time.sleep(next_poll_interval(status, error_count))
+            with self._lock:
+                if len(self._listeners) == 0:
+                    self._poll_task = None
+                    return
+                listeners = list(self._listeners)
+            include_previews = any(wants_previews for _, wants_previews in listeners)
+            try:
+                status = self._webservice.progress_check(skip_current_image=not include_previews)
+                error_count = 0
+            except ReadTimeout:
+                error_count += 1
+                continue
+            except RuntimeError as err:
+                error_count += 1
+                logger.error(f'Progress check error {error_count}: {err}')
+                if error_count > MAX_ERROR_COUNT:
+                    logger.error('Progress checks failed, reached max retries.')
+                    with self._lock:
+                        self._listeners.clear()
+                        self._poll_task = None
+                    return
+                continue
+            preview = self._decode_preview(status) if include_previews else None
+            for listener, wants_previews in listeners:
+                try:
+                    listener(status, preview if wants_previews else None)
+                except (RuntimeError, KeyError, ValueError) as err:
+                    logger.error(f'Progress listener failed: {err}')
+
+    def _decode_preview(self, status: ProgressResponseBody) -> Optional[QImage]:
+        """Decodes the status preview image, if present and changed since the last update."""
+        preview_str = status.get('current_image', None)
+        if preview_str is None or preview_str == self._last_preview_str:
+            return None
+        self._last_preview_str = preview_str
+        try:
+            preview = qimage_from_base64(preview_str)
+        except ValueError as err:
+            logger.error(f'Failed to decode progress preview: {err}')
+            return None
+        return None if preview.isNull() else preview
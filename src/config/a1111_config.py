@@ -1,13 +1,18 @@
 """Provides access to configurable options for the Automatic1111 or Forge Stable Diffusion WebUI."""
 import logging
+from typing import Any, cast, TYPE_CHECKING
 
 from PySide6.QtWidgets import QApplication
 
-from src.api.a1111_webservice import A1111Webservice
+from src.api.webui.response_formats import ModelInfo, VaeInfo
 from src.config.config import Config
 from src.util.shared_constants import PROJECT_DIR
 from src.util.singleton import Singleton
 
+if TYPE_CHECKING:
+    # Only needed for type hints, importing the webservice at runtime loads the full HTTP client stack:
+    from src.api.a1111_webservice import A1111Webservice
+
 CONFIG_DEFINITIONS = f'{PROJECT_DIR}/resources/config/a1111_setting_definitions.json'
 logger = logging.getLogger(__name__)
 
@@ -30,15 +35,29 @@ class A1111Config(Config, metaclass=Singleton):
     def __init__(self) -> None:
         super().__init__(CONFIG_DEFINITIONS, None, A1111Config)
 
-    def load_all(self, webservice: A1111Webservice) -> None:
+    def load_all(self, webservice: 'A1111Webservice') -> None:
         """Populate options and load values from the remote webservice."""
-        models = list(map(lambda m: m['title'], webservice.get_models()))
-        vae_options = list(map(lambda v: v['model_name'], webservice.get_vae()))
+        self.apply_all(A1111Config.request_all(webservice))
+
+    @staticmethod
+    def request_all(webservice: 'A1111Webservice') -> dict[str, Any]:
+        """Requests all option lists and values from the remote webservice without changing any config values, so that
+           slow requests can run on any thread. Pass the returned data to apply_all to update the config."""
+        return webservice.run_concurrently({
+            'models': webservice.get_models,
+            'vae': webservice.get_vae,
+            'settings': webservice.get_config
+        })
+
+    def apply_all(self, api_data: dict[str, Any]) -> None:
+        """Populate options and load values from data returned by request_all."""
+        models = list(map(lambda m: m['title'], cast(list[ModelInfo], api_data['models'])))
+        vae_options = list(map(lambda v: v['model_name'], cast(list[VaeInfo], api_data['vae'])))
         vae_options.insert(0, 'Automatic')
         vae_options.insert(0, 'None')
         self.update_options(A1111Config.SD_MODEL_CHECKPOINT, models)
         self.update_options(A1111Config.SD_VAE, vae_options)
-        settings = webservice.get_config()
+        settings = cast(dict[str, Any], api_data['settings'])
         missing = {}
         for key, value in settings.items():
             if not hasattr(A1111Config, key.upper()):
@@ -77,7 +96,7 @@ class A1111Config(Config, metaclass=Singleton):
         for key, value in missing.items():
             logger.debug(f'NOT USED: {key}={value}')
 
-    def save_all(self, webservice: A1111Webservice) -> None:
+    def save_all(self, webservice: 'A1111Webservice') -> None:
         """Sends all settings back to the webui."""
         settings = {}
         for category in self.get_categories():
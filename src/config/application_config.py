@@ -71,6 +71,8 @@ class AppConfig(Config, metaclass=Singleton):
     ALWAYS_INIT_METADATA_ON_SAVE: str
     ALWAYS_UPDATE_METADATA_ON_SAVE: str
     ANIMATE_OUTLINES: str
+    AUTOSAVE_INTERVAL: str
+    BACKGROUND_TASK_THREADS: str
     BERT_MODEL_PATH: str
     BRUSH_FAVORITES: str
     CLIP_MODEL_NAME: str
@@ -90,11 +92,13 @@ class AppConfig(Config, metaclass=Singleton):
     MIN_EDIT_SIZE: str
     MIN_GENERATION_SIZE: str
     OPENGL_ACCELERATION: str
+    PERFORMANCE_TRACING: str
     PIL_DOWNSCALE_MODE: str
     PIL_UPSCALE_MODE: str
     SAVED_COLORS: str
     SELECTION_COLOR: str
     SELECTION_SCREEN_ZOOMS_TO_CHANGED: str
+    SHOW_FRAME_TIMING: str
     SHOW_OPTIONS_FULL_RESOLUTION: str
     SHOW_SELECTIONS_IN_GENERATION_OPTIONS: str
     SHOW_TOOL_CONTROL_HINTS: str
@@ -14,9 +14,9 @@ import os.path
 import threading
 from inspect import signature
 from threading import Lock
-from typing import Optional, Any, Callable
+from typing import Optional, Any, Callable, TypeAlias
 
-from PySide6.QtCore import QSize, QTimer, Qt
+from PySide6.QtCore import QSize, Qt
 from PySide6.QtGui import QKeySequence, QColor
 from PySide6.QtWidgets import QApplication
 
@@ -48,6 +48,12 @@ INVALID_OPTION_KEY_ERROR = _tr('Tried to track fixed options for key "{key}", wh
 INVALID_KEYCODE_ERROR = _tr('Tried to get key code "{key}", found "{code_string}"')
 DUPLICATE_KEY_ERROR = _tr('Tried to add duplicate config entry for key "{key}"')
 
+# Delay before writing changes to JSON, so that rapid changes (e.g. from slider drags) are saved together:
+SAVE_DELAY_SECONDS = 0.1
+
+# Connected callbacks, stored with the number of parameters they accept:
+_ConnectedCallback: TypeAlias = tuple[Callable[..., None], int]
+
 
 class Config:
     """A shared resource to set inpainting configuration and to provide default values.
@@ -79,12 +85,13 @@ class Config:
             Child class where definition keys should be written as properties when first initialized.
         """
         self._entries: dict[str, ConfigEntry] = {}
-        self._connected: dict[str, dict[Any, Callable[..., None]]] = {}
+        self._connected: dict[str, dict[Any, _ConnectedCallback]] = {}
         self._option_connected: dict[str, dict[Any, Callable[[ParamTypeList], None]]] = {}
+        self._change_counts: dict[str, int] = {}
         self._json_path = saved_value_path
         self._lock = Lock()
-        self._save_timer = QTimer()
-        self._save_timer.setSingleShot(True)
+        self._write_lock = Lock()
+        self._save_timer: Optional[threading.Timer] = None
 
         if not os.path.isfile(definition_path):
             raise RuntimeError(MISSING_DEF_ERROR.format(definition_path=definition_path))
@@ -364,26 +371,16 @@ class Config:
         # Update existing value:
         with self._lock:
             value_changed = self._entries[key].set_value(value, add_missing_options, inner_key)
-        if not value_changed:
-            return
-        # Schedule save to JSON file:
-        if save_change:
-            with self._lock:
-                if not self._save_timer.isActive():
-                    if threading.current_thread() is not threading.main_thread():
-                        self._write_to_json()  # Timers can't be started from other threads.
-                    else:
-                        def write_change() -> None:
-                            """Copy changes to the file and disconnect the timer."""
-                            self._write_to_json()
-                            self._save_timer.timeout.disconnect(write_change)
-
-                        self._save_timer.timeout.connect(write_change)
-                        self._save_timer.start(10)
+            if not value_changed:
+                return
+            self._change_counts[key] += 1
+            change_count = self._change_counts[key]
+            # Schedule save to JSON file:
+            if save_change:
+                self._schedule_save()
         # Pass change to connected callback functions:
         callbacks = [*self._connected[key].items()]  # <- So callbacks can disconnect or replace themselves
-        for source, callback in callbacks:
-            num_args = len(signature(callback).parameters)
+        for source, (callback, num_args) in callbacks:
             try:
                 if num_args == 0 and inner_key is None:
                     callback()
@@ -397,7 +394,7 @@ class Config:
                     self.disconnect(source, key)
                 else:
                     raise err
-            if self.get(key, inner_key) != value:
+            if self._change_counts[key] != change_count:  # A callback changed the value again, stop propagating.
                 break
 
     def connect(self,
@@ -428,14 +425,14 @@ class Config:
             raise RuntimeError(f'callback function connected to {key} value takes {num_args} '
                                'parameters, expected 0-2')
         if inner_key is None:
-            self._connected[key][connected_object] = on_change_fn
+            self._connected[key][connected_object] = (on_change_fn, num_args)
         else:
             def wrapper_fn(value: Any, changed_inner_key: str) -> None:
                 """Call connected function only if the inner key changes."""
                 if changed_inner_key == inner_key:
                     on_change_fn(value)
 
-            self._connected[key][connected_object] = wrapper_fn
+            self._connected[key][connected_object] = (wrapper_fn, 2)
 
     def connect_to_option_changes(self,
                                   connected_object: Any,
@@ -628,18 +625,43 @@ class Config:
                             save_json)
         self._entries[key] = entry
         self._connected[key] = {}
+        self._change_counts[key] = 0
         if options is not None:
             self._option_connected[key] = {}
 
+    def save(self) -> None:
+        """Immediately writes all saved values to the JSON file, cancelling any scheduled save."""
+        self._write_to_json()
+
+    def _schedule_save(self) -> None:
+        """Schedules a background write to the JSON file, unless one is already pending. Must be called while holding
+           the lock."""
+        if self._json_path is None or self._save_timer is not None:
+            return
+        self._save_timer = threading.Timer(SAVE_DELAY_SECONDS, self._write_to_json)
+        self._save_timer.start()
+
     def _write_to_json(self) -> None:
+        """Writes saved values to a temporary file, then replaces the JSON file with it, so that the JSON file is never
+           left partially written."""
         if self._json_path is None:
             return
-        converted_dict: dict[str, Any] = {}
-        with self._lock:
-            for entry in self._entries.values():
-                entry.save_to_json_dict(converted_dict)
-            with open(self._json_path, 'w', encoding='utf-8') as file:
-                json.dump(converted_dict, file, ensure_ascii=False, indent=4)
+        with self._write_lock:
+            converted_dict: dict[str, Any] = {}
+            with self._lock:
+                if self._save_timer is not None:
+                    self._save_timer.cancel()
+                    self._save_timer = None
+                for entry in self._entries.values():
+                    entry.save_to_json_dict(converted_dict)
+                json_text = json.dumps(converted_dict, ensure_ascii=False, indent=4)
+            temp_path = f'{self._json_path}.tmp'
+            try:
+                with open(temp_path, 'w', encoding='utf-8') as file:
+                    file.write(json_text)
+                os.replace(temp_path, self._json_path)
+            except OSError as err:
+                logger.error(f'Failed to save config to {self._json_path}: {err}')
 
     def _read_from_json(self) -> None:
         if self._json_path is None:
@@ -11,8 +11,8 @@ Initialization:
 - Build the main application menu structure, and configure when all menu options should be enabled.
 - Load application themes, styles, and other display options.
 - Create the ToolController and ToolPanel, connecting appropriate signals.
-- Prepare all available ImageGenerator options, applying an appropriate one based on availability and command line
-  arguments.
+- Register all available ImageGenerator options, loading an appropriate one based on availability and command line
+  arguments. Generator modules are only imported once they are needed.
 
 Image generator management:
 - Manage the set of available image generators.
@@ -50,19 +50,17 @@ from PIL import Image, UnidentifiedImageError, ExifTags
 from PIL.ExifTags import IFD
 from PySide6.QtCore import QSize
 from PySide6.QtGui import QImage, Qt, QIcon
-from PySide6.QtWidgets import QApplication, QMessageBox, QWidget
+from PySide6.QtWidgets import QApplication, QMessageBox, QWidget, QFileDialog
 
 from src.config.application_config import AppConfig
 from src.config.cache import Cache
 from src.config.key_config import KeyConfig
-from src.controller.image_generation.glid3_webservice_generator import Glid3WebserviceGenerator, DEFAULT_GLID_URL
-from src.controller.image_generation.glid3_xl_generator import Glid3XLGenerator
+from src.controller.image_generation.generator_registry import GENERATOR_DESCRIPTORS, GENERATOR_WINDOW_ORDER, \
+    GENERATION_MODE_SD_WEBUI, GENERATION_MODE_COMFYUI, GENERATION_MODE_LOCAL_GLID, GENERATION_MODE_WEB_GLID, \
+    GENERATION_MODE_NONE, GENERATION_MODE_TEST, GENERATION_MODE_AUTO, DEFAULT_WEBUI_URL, DEFAULT_COMFYUI_URL, \
+    DEFAULT_GLID_URL, MENU_STABLE_DIFFUSION
 from src.controller.image_generation.image_generator import ImageGenerator
 from src.controller.image_generation.null_generator import NullGenerator
-from src.controller.image_generation.sd_comfyui_generator import SDComfyUIGenerator, DEFAULT_COMFYUI_URL
-from src.controller.image_generation.sd_generator import MENU_STABLE_DIFFUSION
-from src.controller.image_generation.sd_webui_generator import SDWebUIGenerator, DEFAULT_WEBUI_URL
-from src.controller.image_generation.test_generator import TestGenerator
 from src.controller.tool_controller import ToolController
 from src.hotkey_filter import HotkeyFilter
 from src.image.filter.blur import BlurFilter
@@ -79,6 +77,7 @@ from src.image.layers.layer_group import LayerGroup
 from src.image.layers.text_layer import TextLayer
 from src.image.layers.transform_group import TransformGroup
 from src.image.layers.transform_layer import TransformLayer
+from src.image.autosave_journal import AutosaveJournal, journal_exists, recover_journal
 from src.image.open_raster import save_ora_image, read_ora_image, ORA_FILE_EXTENSION
 from src.tools.base_tool import BaseTool
 from src.tools.generation_area_tool import GenerationAreaTool
@@ -108,6 +107,7 @@ from src.util.optional_import import optional_import
 from src.util.pyinstaller import is_pyinstaller_bundle
 from src.util.qtexcepthook import QtExceptHook
 from src.util.shared_constants import PROJECT_DIR, PIL_SCALING_MODES
+from src.util.tracing import Tracer
 from src.util.visual.display_size import get_screen_size
 from src.util.visual.image_format_utils import save_image_with_metadata, save_image, load_image, \
     IMAGE_FORMATS_SUPPORTING_METADATA, IMAGE_FORMATS_SUPPORTING_ALPHA, IMAGE_FORMATS_SUPPORTING_PARTIAL_ALPHA, \
@@ -135,14 +135,6 @@ TOOL_PANEL_LAYER_TAB = _tr('Layers')
 TOOL_PANEL_COLOR_TAB = _tr('Color')
 TOOL_PANEL_NAV_TAB = _tr('Navigation')
 
-GENERATION_MODE_SD_WEBUI = 'stable-diffusion-webui'
-GENERATION_MODE_COMFYUI = 'comfyui'
-GENERATION_MODE_LOCAL_GLID = 'glid-local'
-GENERATION_MODE_WEB_GLID = 'glid-api'
-GENERATION_MODE_NONE = 'none'
-GENERATION_MODE_TEST = 'mock'
-GENERATION_MODE_AUTO = 'auto'
-
 MENU_FILE = _tr('File')
 MENU_EDIT = _tr('Edit')
 MENU_IMAGE = _tr('Image')
@@ -184,6 +176,13 @@ RELOAD_ERROR_MESSAGE_INVALID_FILE = _tr('Image path "{file_path}" is not a valid
 RELOAD_ERROR_MESSAGE_NO_IMAGE = _tr('Enter an image path or click "Open Image" first.')
 RELOAD_CONFIRMATION_TITLE = _tr('Reload image?')
 RELOAD_CONFIRMATION_MESSAGE = _tr('This will discard all unsaved changes.')
+RECOVERY_CONFIRMATION_TITLE = _tr('Recover unsaved changes?')
+RECOVERY_CONFIRMATION_MESSAGE = _tr('IntraPaint did not close normally last time. Restore the image from the autosave'
+                                    ' journal?')
+TRACE_EXPORT_TITLE = _tr('Export performance trace')
+TRACE_EXPORT_ERROR_TITLE = _tr('No performance trace data')
+TRACE_EXPORT_ERROR_MESSAGE = _tr('No timing data has been recorded. Enable "Record performance traces" in the Developer'
+                                 ' settings, use IntraPaint for a while, then try again.')
 METADATA_UPDATE_TITLE = _tr('Metadata updated')
 METADATA_UPDATE_MESSAGE = _tr('On save, current image generation parameters will be stored within the image')
 LOAD_LAYER_ERROR_TITLE = _tr('Opening layers failed')
@@ -254,6 +253,10 @@ class AppController(MenuBuilder):
 
         self._metadata: Optional[dict[str, Any]] = None
         self._exif: Optional[Image.Exif] = None
+        self._autosave_journal = AutosaveJournal(self._image_stack)
+        tracer = Tracer()
+        tracer.set_enabled(config.get(AppConfig.PERFORMANCE_TRACING))
+        config.connect(tracer, AppConfig.PERFORMANCE_TRACING, tracer.set_enabled)
 
         # Initialize main window:
         self._window = MainWindow(self._image_stack)
@@ -469,49 +472,46 @@ class AppController(MenuBuilder):
         self._generator_tab.hide()
         self._generator_tab.setIcon(QIcon(ICON_PATH_GEN_TAB))
 
-        # Prepare image generator options, and select one based on availability and command line arguments.
+        # Register image generator options, and select one based on availability and command line arguments. Only
+        # the generators that actually get checked or loaded are imported here.
+        self._generator_args = args
         self._null_generator = NullGenerator(self._window, self._image_stack)
-        self._sd_webui_generator = SDWebUIGenerator(self._window, self._image_stack, args)
-        self._sd_comfyui_generator = SDComfyUIGenerator(self._window, self._image_stack, args)
-        if not is_pyinstaller_bundle():
-            self._glid_generator = Glid3XLGenerator(self._window, self._image_stack, args)
-        self._glid_web_generator = Glid3WebserviceGenerator(self._window, self._image_stack, args)
-        self._test_generator = TestGenerator(self._window, self._image_stack)
+        self._generators: dict[str, ImageGenerator] = {GENERATION_MODE_NONE: self._null_generator}
 
         mode = args.mode
         match mode:
             case _ if mode == GENERATION_MODE_NONE:
                 self.load_image_generator(self._null_generator)
             case _ if mode == GENERATION_MODE_SD_WEBUI:
-                self.load_image_generator(self._sd_webui_generator)
+                self.load_image_generator(self._get_generator(GENERATION_MODE_SD_WEBUI))
             case _ if mode == GENERATION_MODE_COMFYUI:
-                self.load_image_generator(self._sd_comfyui_generator)
+                self.load_image_generator(self._get_generator(GENERATION_MODE_COMFYUI))
             case _ if mode == GENERATION_MODE_WEB_GLID and not is_pyinstaller_bundle():
-                self.load_image_generator(self._glid_web_generator)
+                self.load_image_generator(self._get_generator(GENERATION_MODE_WEB_GLID))
             case _ if mode == GENERATION_MODE_LOCAL_GLID and not is_pyinstaller_bundle():
-                self.load_image_generator(self._glid_generator)
+                self.load_image_generator(self._get_generator(GENERATION_MODE_LOCAL_GLID))
             case _ if mode == GENERATION_MODE_TEST:
-                self.load_image_generator(self._test_generator)
+                self.load_image_generator(self._get_generator(GENERATION_MODE_TEST))
             case _:
                 if mode != GENERATION_MODE_AUTO:
                     logger.error(f'Unexpected mode {mode}, defaulting to mode=auto')
                 server_url = args.server_url
                 if server_url == DEFAULT_WEBUI_URL:
-                    self.load_image_generator(self._sd_webui_generator)
+                    self.load_image_generator(self._get_generator(GENERATION_MODE_SD_WEBUI))
                 elif server_url == DEFAULT_COMFYUI_URL:
-                    self.load_image_generator(self._sd_comfyui_generator)
+                    self.load_image_generator(self._get_generator(GENERATION_MODE_COMFYUI))
                 elif server_url == DEFAULT_GLID_URL:
-                    self.load_image_generator(self._glid_web_generator)
-                if self._sd_webui_generator.is_available():
-                    self.load_image_generator(self._sd_webui_generator)
-                elif self._sd_comfyui_generator.is_available():
-                    self.load_image_generator(self._sd_comfyui_generator)
-                elif self._glid_web_generator.is_available():
-                    self.load_image_generator(self._glid_generator)
+                    self.load_image_generator(self._get_generator(GENERATION_MODE_WEB_GLID))
+                if self._get_generator(GENERATION_MODE_SD_WEBUI).is_available():
+                    self.load_image_generator(self._get_generator(GENERATION_MODE_SD_WEBUI))
+                elif self._get_generator(GENERATION_MODE_COMFYUI).is_available():
+                    self.load_image_generator(self._get_generator(GENERATION_MODE_COMFYUI))
+                elif self._get_generator(GENERATION_MODE_WEB_GLID).is_available():
+                    self.load_image_generator(self._get_generator(GENERATION_MODE_LOCAL_GLID))
                 elif args.dev:
-                    self.load_image_generator(self._test_generator)
-                elif not is_pyinstaller_bundle() and self._glid_generator.is_available():
-                    self.load_image_generator(self._glid_generator)
+                    self.load_image_generator(self._get_generator(GENERATION_MODE_TEST))
+                elif not is_pyinstaller_bundle() and self._get_generator(GENERATION_MODE_LOCAL_GLID).is_available():
+                    self.load_image_generator(self._get_generator(GENERATION_MODE_LOCAL_GLID))
                 else:
                     logger.info('No valid generator detected, starting with null generator enabled.')
                     self.load_image_generator(self._null_generator)
@@ -535,12 +535,24 @@ class AppController(MenuBuilder):
             QtExceptHook().enable()
         self._window.show()
         self._update_enabled_actions()
+        if self._autosave_journal.acquire_lock() and journal_exists(self._autosave_journal.journal_path) \
+                and request_confirmation(self._window, RECOVERY_CONFIRMATION_TITLE, RECOVERY_CONFIRMATION_MESSAGE):
+            recover_journal(self._image_stack, self._autosave_journal.journal_path)
 
         # Discard anything saved to the undo stack during the setup process:
         UndoStack().clear()
 
         AppStateTracker.set_app_state(APP_STATE_EDITING if self._image_stack.has_image else APP_STATE_NO_IMAGE)
+        self._autosave_journal.start()
         app.exec()
+        self._autosave_journal.stop()
+
+    def _get_generator(self, mode: str) -> ImageGenerator:
+        """Returns the image generator for a generation mode, importing and creating it on first use."""
+        if mode not in self._generators:
+            descriptor = GENERATOR_DESCRIPTORS[mode]
+            self._generators[mode] = descriptor.create(self._window, self._image_stack, self._generator_args)
+        return self._generators[mode]
 
     def load_image_generator(self, generator: ImageGenerator) -> None:
         """Load an image generator, updating controls and settings."""
@@ -1294,14 +1306,13 @@ class AppController(MenuBuilder):
         assert self._generator is not None
         if self._generator_window is None:
             self._generator_window = GeneratorSetupWindow()
-            self._generator_window.add_generator(self._sd_webui_generator)
-            self._generator_window.add_generator(self._sd_comfyui_generator)
-            if not is_pyinstaller_bundle():
-                self._generator_window.add_generator(self._glid_generator)
-            self._generator_window.add_generator(self._glid_web_generator)
-            if '--dev' in sys.argv or self._generator == self._test_generator:
-                self._generator_window.add_generator(self._test_generator)
-            self._generator_window.add_generator(self._null_generator)
+            for mode in GENERATOR_WINDOW_ORDER:
+                if mode not in GENERATOR_DESCRIPTORS:
+                    continue
+                if mode == GENERATION_MODE_TEST and '--dev' not in sys.argv \
+                        and self._generator != self._generators.get(GENERATION_MODE_TEST, None):
+                    continue
+                self._generator_window.add_generator(self._get_generator(mode))
             self._generator_window.activate_signal.connect(self.load_image_generator)
         self._generator_window.mark_active_generator(self._generator)
         self._set_alt_window_fractional_bounds(self._generator_window)
@@ -1491,6 +1502,20 @@ class AppController(MenuBuilder):
         """Open the IntraPaint documentation index in a browser window."""
         webbrowser.open(HELP_INDEX_LINK)
 
+    @menu_action(MENU_HELP, 'export_performance_trace_shortcut', 601)
+    def export_performance_trace(self) -> None:
+        """Save recorded performance tracing data in the Chrome trace format."""
+        tracer = Tracer()
+        if len(tracer.spans()) == 0:
+            show_error_dialog(self._window, TRACE_EXPORT_ERROR_TITLE, TRACE_EXPORT_ERROR_MESSAGE)
+            return
+        file_path, _ = QFileDialog.getSaveFileName(self._window, TRACE_EXPORT_TITLE, 'intrapaint_trace.json',
+                                                   'JSON (*.json)')
+        if file_path == '':
+            return
+        span_count = tracer.save_chrome_trace(file_path)
+        logger.info(f'Saved {span_count} performance trace spans to {file_path}')
+
     # Internal/protected:
 
     def _set_alt_window_fractional_bounds(self, alt_window: QWidget, preferred_scale: float = 0.8) -> None:
@@ -0,0 +1,503 @@
+"""
+Runs headless batch jobs that apply the same list of editing operations to many images.
+
+Batch jobs are defined in JSON files, and started with `python IntraPaint.py --batch job.json`:
+
+{
+    "inputs": ["photos/*.png", "drawing.ora"],
+    "output_dir": "processed",
+    "workers": 4,
+    "settings": {"prompt": "watercolor painting", "edit_mode": "Inpaint", "generation_size": "512x512"},
+    "operations": [
+        {"type": "scale", "width": 1024, "height": 1024, "mode": "lanczos"},
+        {"type": "select", "x": 128, "y": 128, "width": 512, "height": 512},
+        {"type": "filter", "filter": "blur", "parameters": ["Gaussian", 4.0]},
+        {"type": "inpaint", "backend": "comfyui", "url": "http://localhost:8188"},
+        {"type": "crop_to_selection"},
+        {"type": "export", "format": "png", "suffix": "_processed"}
+    ]
+}
+
+Relative paths are resolved from the directory containing the job file. "settings" holds Cache values used by image
+generation, and are never saved back to the cache file.  Documents are split between worker processes, each with its
+own offscreen QApplication, and a timing report is written to the output directory when the job finishes.
+
+Supported operations:
+- filter: Apply an image filter. "filter" is one of the keys in BATCH_FILTERS, "parameters" is an optional list of
+  filter parameter values (missing values use filter defaults), "selection_only" (default: true if anything is
+  selected) and "active_layer_only" (default: false) control which content changes.
+- scale: Scale all layers to "width" and "height", or by "factor". "mode" is an optional PIL resampling mode name.
+- resize_canvas: Change the image size to "width" and "height" without scaling, moving content by "x_offset" and
+  "y_offset".
+- select: Update the selection. Use "x", "y", "width", and "height" to select a rectangle, "mask" to load a selection
+  mask image where all non-transparent pixels are selected, "all" to select everything, or "clear" to clear the
+  selection. Use "invert" to invert the result.
+- crop_to_selection: Crop the image to the selected area.
+- inpaint: Edit the image through a running Stable Diffusion WebUI ("backend": "webui") or ComfyUI ("backend":
+  "comfyui") instance at "url". The image generation area covers the selection unless "x", "y", "width", and "height"
+  are provided.
+- export: Save the image to the output directory as "format" (default: "png"), adding an optional "suffix" to the
+  input file name.
+"""
+import glob
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Generator, Optional
+
+from PIL import Image
+from PySide6.QtCore import QPoint, QRect, QSize, Qt
+from PySide6.QtGui import QImage, QPainter
+from PySide6.QtWidgets import QApplication
+
+from src.api.a1111_webservice import A1111Webservice
+from src.api.comfyui_webservice import ComfyUiWebservice, AsyncTaskStatus
+from src.config.application_config import AppConfig
+from src.config.cache import Cache
+from src.image.filter.blur import BlurFilter, MODE_GAUSSIAN
+from src.image.filter.brightness_contrast import BrightnessContrastFilter
+from src.image.filter.filter import ImageFilter
+from src.image.filter.posterize import PosterizeFilter
+from src.image.filter.rgb_color_balance import RGBColorBalanceFilter
+from src.image.filter.sharpen import SharpenFilter
+from src.image.layers.image_stack import ImageStack
+from src.image.layers.image_stack_utils import scale_all_layers, crop_image_stack_to_bounds
+from src.image.open_raster import read_ora_image, save_ora_image, ORA_FILE_EXTENSION
+from src.undo_stack import UndoStack
+from src.util.shared_constants import EDIT_MODE_INPAINT, PIL_SCALING_MODES
+from src.util.visual.image_format_utils import load_image
+from src.util.visual.image_utils import image_content_bounds
+from src.util.visual.pil_image_utils import pil_image_scaling
+
+logger = logging.getLogger(__name__)
+
+OPERATION_FILTER = 'filter'
+OPERATION_SCALE = 'scale'
+OPERATION_RESIZE_CANVAS = 'resize_canvas'
+OPERATION_SELECT = 'select'
+OPERATION_CROP_TO_SELECTION = 'crop_to_selection'
+OPERATION_INPAINT = 'inpaint'
+OPERATION_EXPORT = 'export'
+
+# Time spent loading each document is reported as if it was another operation:
+OPERATION_LOAD = 'load'
+
+BACKEND_WEBUI = 'webui'
+BACKEND_COMFYUI = 'comfyui'
+
+BATCH_FILTERS: dict[str, type[ImageFilter]] = {
+    'blur': BlurFilter,
+    'brightness_contrast': BrightnessContrastFilter,
+    'posterize': PosterizeFilter,
+    'rgb_color_balance': RGBColorBalanceFilter,
+    'sharpen': SharpenFilter
+}
+
+DEFAULT_EXPORT_FORMAT = 'png'
+REPORT_FILE_NAME = 'batch_report.json'
+COMFYUI_POLL_INTERVAL = 0.5
+DEFAULT_GENERATION_TIMEOUT = 600.0
+
+
+@dataclass
+class BatchJob:
+    """A set of input documents, and the operations to apply to each of them.
+
+    BatchJob.inputs:
+        Input file paths, with any glob patterns already expanded.
+    BatchJob.settings:
+        Cache values to use while processing, by cache key.
+    BatchJob.workers:
+        Number of worker processes. If one or fewer, documents are processed on the calling thread.
+    """
+    inputs: list[str]
+    output_dir: str
+    operations: list[dict[str, Any]]
+    settings: dict[str, Any] = field(default_factory=dict)
+    workers: int = 1
+
+
+@dataclass
+class DocumentResult:
+    """Timing and output data for one processed document.
+
+    DocumentResult.operation_times:
+        (operation type, seconds) pairs, in the order the operations ran.
+    DocumentResult.error:
+        Error message if processing failed, otherwise None. Operations after the failure are skipped.
+    """
+    input_path: str
+    output_paths: list[str] = field(default_factory=list)
+    operation_times: list[tuple[str, float]] = field(default_factory=list)
+    total_time: float = 0.0
+    error: Optional[str] = None
+
+
+@dataclass
+class BatchReport:
+    """Results and throughput for an entire batch job."""
+    results: list[DocumentResult]
+    workers: int
+    elapsed_time: float
+
+    @property
+    def failure_count(self) -> int:
+        """Returns the number of documents that could not be processed."""
+        return sum(1 for result in self.results if result.error is not None)
+
+    @property
+    def documents_per_second(self) -> float:
+        """Returns the number of documents processed per second."""
+        return 0.0 if self.elapsed_time <= 0 else len(self.results) / self.elapsed_time
+
+    def operation_totals(self) -> dict[str, tuple[int, float]]:
+        """Returns the number of times each operation type ran and the total time it took, by operation type."""
+        totals: dict[str, tuple[int, float]] = {}
+        for result in self.results:
+            for operation_type, seconds in result.operation_times:
+                count, total = totals.get(operation_type, (0, 0.0))
+                totals[operation_type] = (count + 1, total + seconds)
+        return totals
+
+    def summary(self) -> str:
+        """Returns a human-readable summary of job throughput and timing."""
+        lines = [f'Processed {len(self.results)} documents ({self.failure_count} failed) in {self.elapsed_time:.2f}s'
+                 f' with {self.workers} worker(s): {self.documents_per_second:.2f} documents/s']
+        for operation_type, (count, total) in self.operation_totals().items():
+            lines.append(f'  {operation_type}: {count} runs, {total / count:.3f}s average, {total:.3f}s total')
+        for result in self.results:
+            if result.error is not None:
+                lines.append(f'  FAILED {result.input_path}: {result.error}')
+        return '\n'.join(lines)
+
+    def to_dict(self) -> dict[str, Any]:
+        """Returns report data in a JSON-serializable format."""
+        return {
+            'documents': len(self.results),
+            'failed': self.failure_count,
+            'workers': self.workers,
+            'elapsed_time': self.elapsed_time,
+            'documents_per_second': self.documents_per_second,
+            'operations': {operation_type: {'count': count, 'total_time': total}
+                           for operation_type, (count, total) in self.operation_totals().items()},
+            'results': [{
+                'input': result.input_path,
+                'outputs': result.output_paths,
+                'operation_times': result.operation_times,
+                'total_time': result.total_time,
+                'error': result.error
+            } for result in self.results]
+        }
+
+
+def load_batch_job(job_path: str) -> BatchJob:
+    """Reads a batch job definition from a JSON file, expanding input patterns and resolving relative paths."""
+    with open(job_path, encoding='utf-8') as file:
+        job_data = json.load(file)
+    if not isinstance(job_data, dict):
+        raise ValueError(f'Expected a JSON object in {job_path}')
+    job_dir = os.path.dirname(os.path.abspath(job_path))
+
+    def _resolve(path: str) -> str:
+        return path if os.path.isabs(path) else os.path.join(job_dir, path)
+
+    inputs: list[str] = []
+    for pattern in job_data.get('inputs', []):
+        matches = sorted(glob.glob(_resolve(pattern)))
+        if len(matches) == 0:
+            logger.warning(f'Batch input "{pattern}" did not match any files')
+        inputs += [path for path in matches if path not in inputs]
+    if len(inputs) == 0:
+        raise ValueError(f'No input files found for {job_path}')
+    operations = job_data.get('operations', [])
+    for operation in operations:
+        if not isinstance(operation, dict) or 'type' not in operation:
+            raise ValueError(f'Invalid batch operation {operation}, expected an object with a "type" value')
+        if operation['type'] == OPERATION_SELECT and 'mask' in operation:
+            operation['mask'] = _resolve(operation['mask'])
+    return BatchJob(inputs,
+                    _resolve(job_data.get('output_dir', '.')),
+                    operations,
+                    dict(job_data.get('settings', {})),
+                    int(job_data.get('workers', os.cpu_count() or 1)))
+
+
+def apply_settings(settings: dict[str, Any]) -> None:
+    """Updates cache values without saving them, converting "WIDTHxHEIGHT" strings to QSize when needed."""
+    cache = Cache()
+    for key, value in settings.items():
+        if isinstance(cache.get(key), QSize) and isinstance(value, str):
+            value = QSize(*(int(n) for n in value.split('x')))
+        cache.set(key, value, save_change=False)
+
+
+def _rect_from_operation(operation: dict[str, Any]) -> Optional[QRect]:
+    if not all(key in operation for key in ('x', 'y', 'width', 'height')):
+        return None
+    return QRect(int(operation['x']), int(operation['y']), int(operation['width']), int(operation['height']))
+
+
+def _selection_bounds(image_stack: ImageStack) -> QRect:
+    selection_layer = image_stack.selection_layer
+    selection_pos = selection_layer.position
+    return image_content_bounds(selection_layer.image_bits_readonly).translated(selection_pos.x(), selection_pos.y())
+
+
+def _apply_filter(image_stack: ImageStack, operation: dict[str, Any]) -> None:
+    filter_name = operation.get('filter', '')
+    if filter_name not in BATCH_FILTERS:
+        raise ValueError(f'Unknown filter "{filter_name}", expected one of {list(BATCH_FILTERS.keys())}')
+    image_filter = BATCH_FILTERS[filter_name](image_stack)
+    parameter_values = [parameter.default_value for parameter in image_filter.get_parameters()]
+    for i, value in enumerate(operation.get('parameters', [])):
+        parameter_values[i] = value
+    image_filter.selection_only = bool(operation.get('selection_only', not image_stack.selection_layer.empty))
+    image_filter.active_layer_only = bool(operation.get('active_layer_only', False))
+    image_filter.apply_filter_immediately(parameter_values)
+
+
+def _scale(image_stack: ImageStack, operation: dict[str, Any]) -> None:
+    if 'factor' in operation:
+        width = round(image_stack.width * float(operation['factor']))
+        height = round(image_stack.height * float(operation['factor']))
+    else:
+        width = int(operation['width'])
+        height = int(operation['height'])
+    if 'mode' in operation:
+        scale_mode: Optional[Image.Resampling] = Image.Resampling[str(operation['mode']).upper()]
+    else:
+        scale_mode = PIL_SCALING_MODES.get(Cache().get(Cache.SCALING_MODE), None)
+    scale_all_layers(image_stack, width, height, scale_mode)
+
+
+def _select(image_stack: ImageStack, operation: dict[str, Any]) -> None:
+    selection_layer = image_stack.selection_layer
+    bounds = _rect_from_operation(operation)
+    if operation.get('all', False):
+        selection_layer.select_all()
+    elif operation.get('clear', False):
+        selection_layer.clear(False)
+    elif 'mask' in operation:
+        mask = QImage(operation['mask'])
+        if mask.isNull():
+            raise ValueError(f'Failed to load selection mask {operation["mask"]}')
+        with selection_layer.borrow_image() as selection_image:
+            selection_image.fill(0)
+            painter = QPainter(selection_image)
+            painter.drawImage(QRect(QPoint(), selection_image.size()), mask)
+            painter.end()
+    elif bounds is not None:
+        bounds.translate(-selection_layer.position.x(), -selection_layer.position.y())
+        with selection_layer.borrow_image() as selection_image:
+            selection_image.fill(0)
+            painter = QPainter(selection_image)
+            painter.fillRect(bounds, Qt.GlobalColor.red)
+            painter.end()
+    if operation.get('invert', False):
+        selection_layer.invert_selection()
+
+
+def _crop_to_selection(image_stack: ImageStack) -> None:
+    selection_bounds = _selection_bounds(image_stack)
+    if selection_bounds.isEmpty():
+        raise ValueError('Cannot crop to selection, nothing is selected')
+    crop_image_stack_to_bounds(image_stack, selection_bounds)
+
+
+def _wait_for_comfyui_images(webservice: ComfyUiWebservice, queue_info: dict[str, Any],
+                             timeout: float) -> list[QImage]:
+    if 'error' in queue_info:
+        raise RuntimeError(str(queue_info['error']))
+    end_time = time.time() + timeout
+    while time.time() < end_time:
+        progress = webservice.check_queue_entry(queue_info['prompt_id'], queue_info['number'])
+        if progress['status'] == AsyncTaskStatus.FINISHED:
+            return webservice.download_images(progress['outputs']['images'])
+        if progress['status'] in (AsyncTaskStatus.FAILED, AsyncTaskStatus.NOT_FOUND):
+            raise RuntimeError(f'ComfyUI task {queue_info["prompt_id"]} failed with status {progress["status"].name}')
+        time.sleep(COMFYUI_POLL_INTERVAL)
+    webservice.interrupt(queue_info['prompt_id'])
+    raise RuntimeError(f'ComfyUI task {queue_info["prompt_id"]} did not finish within {timeout} seconds')
+
+
+def _inpaint(image_stack: ImageStack, operation: dict[str, Any]) -> None:
+    cache = Cache()
+    backend = operation.get('backend', BACKEND_WEBUI)
+    if backend not in (BACKEND_WEBUI, BACKEND_COMFYUI):
+        raise ValueError(f'Unknown image generation backend "{backend}"')
+    url = operation['url']
+    gen_area = _rect_from_operation(operation)
+    if gen_area is None:
+        gen_area = _selection_bounds(image_stack)
+    if not gen_area.isEmpty():
+        image_stack.generation_area = gen_area
+    inpainting = cache.get(Cache.EDIT_MODE) == EDIT_MODE_INPAINT
+    selection_layer = image_stack.selection_layer
+    if inpainting and selection_layer.generation_area_is_empty():
+        raise ValueError('Cannot inpaint, nothing is selected within the image generation area')
+    inpainting = inpainting and not selection_layer.generation_area_fully_selected()
+
+    generation_size = cache.get(Cache.GENERATION_SIZE)
+    source_image = image_stack.qimage_generation_area_content()
+    if source_image.size() != generation_size:
+        source_image = pil_image_scaling(source_image, generation_size)
+    mask = selection_layer.mask_image if inpainting else None
+    if mask is not None and mask.size() != generation_size:
+        mask = pil_image_scaling(mask, generation_size)
+
+    if backend == BACKEND_WEBUI:
+        images = A1111Webservice(url).img2img(source_image, mask)['images']
+    else:
+        webservice = ComfyUiWebservice(url)
+        if mask is not None:
+            blur_radius = AppConfig().get(AppConfig.MASK_BLUR)
+            if blur_radius > 0:
+                mask = BlurFilter.blur(mask, MODE_GAUSSIAN, blur_radius)
+            # ComfyUI expects inverted masks:
+            mask.invertPixels(QImage.InvertMode.InvertRgba)
+            queue_info = webservice.inpaint(source_image, mask, {})
+        else:
+            queue_info = webservice.img2img(source_image, {})
+        images = _wait_for_comfyui_images(webservice, dict(queue_info),
+                                          float(operation.get('timeout', DEFAULT_GENERATION_TIMEOUT)))
+    if len(images) == 0:
+        raise RuntimeError(f'No images returned from {url}')
+    image = images[0].convertToFormat(QImage.Format.Format_ARGB32_Premultiplied)
+    if inpainting:
+        inpaint_mask = selection_layer.mask_image
+        painter = QPainter(image)
+        painter.setCompositionMode(QPainter.CompositionMode.CompositionMode_DestinationIn)
+        painter.drawImage(QRect(QPoint(), image.size()), inpaint_mask)
+        painter.end()
+    image_stack.set_generation_area_content(image)
+
+
+def _export(image_stack: ImageStack, operation: dict[str, Any], input_path: str, output_dir: str,
+            ora_metadata: str) -> str:
+    file_format = str(operation.get('format', DEFAULT_EXPORT_FORMAT)).lower().lstrip('.')
+    name = os.path.splitext(os.path.basename(input_path))[0]
+    output_path = os.path.join(output_dir, f'{name}{operation.get("suffix", "")}.{file_format}')
+    if os.path.abspath(output_path) == os.path.abspath(input_path):
+        raise ValueError(f'Export would overwrite input file {input_path}')
+    os.makedirs(output_dir, exist_ok=True)
+    if f'.{file_format}' == ORA_FILE_EXTENSION:
+        save_ora_image(image_stack, output_path, ora_metadata)
+    elif not image_stack.qimage().save(output_path):
+        raise IOError(f'Failed to save {output_path}')
+    return output_path
+
+
+def process_document(input_path: str, job: BatchJob) -> DocumentResult:
+    """Loads a document, applies all job operations, and returns timing and output data. Errors are recorded in the
+       result instead of being raised."""
+    result = DocumentResult(input_path)
+    start_time = time.perf_counter()
+    config = AppConfig()
+    image_stack = ImageStack(config.get(AppConfig.DEFAULT_IMAGE_SIZE), Cache().get(Cache.EDIT_SIZE),
+                             config.get(AppConfig.MIN_EDIT_SIZE), config.get(AppConfig.MAX_EDIT_SIZE))
+    operation_type = OPERATION_LOAD
+    try:
+        ora_metadata = ''
+        if input_path.lower().endswith(ORA_FILE_EXTENSION):
+            ora_metadata = read_ora_image(image_stack, input_path) or ''
+        else:
+            image = load_image(input_path)[0]
+            image_stack.load_image(image.convertToFormat(QImage.Format.Format_ARGB32_Premultiplied))
+        result.operation_times.append((operation_type, time.perf_counter() - start_time))
+        for operation in job.operations:
+            operation_type = operation['type']
+            operation_start = time.perf_counter()
+            if operation_type == OPERATION_FILTER:
+                _apply_filter(image_stack, operation)
+            elif operation_type == OPERATION_SCALE:
+                _scale(image_stack, operation)
+            elif operation_type == OPERATION_RESIZE_CANVAS:
+                image_stack.resize_canvas(QSize(int(operation['width']), int(operation['height'])),
+                                          int(operation.get('x_offset', 0)), int(operation.get('y_offset', 0)))
+            elif operation_type == OPERATION_SELECT:
+                _select(image_stack, operation)
+            elif operation_type == OPERATION_CROP_TO_SELECTION:
+                _crop_to_selection(image_stack)
+            elif operation_type == OPERATION_INPAINT:
+                _inpaint(image_stack, operation)
+            elif operation_type == OPERATION_EXPORT:
+                result.output_paths.append(_export(image_stack, operation, input_path, job.output_dir, ora_metadata))
+            else:
+                raise ValueError(f'Unknown batch operation "{operation_type}"')
+            result.operation_times.append((operation_type, time.perf_counter() - operation_start))
+    except Exception as err:  # pylint: disable=broad-exception-caught
+        logger.exception(f'Batch {operation_type} operation failed for {input_path}')
+        result.error = f'{operation_type}: {err}'
+    finally:
+        # Batch jobs never undo anything, so don't hold onto previous image data:
+        UndoStack().clear()
+    result.total_time = time.perf_counter() - start_time
+    return result
+
+
+def _init_worker(app_config_path: Optional[str], cache_path: Optional[str], settings: dict[str, Any]) -> None:
+    """Sets up shared resources in a new worker process."""
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    _ = QApplication.instance() or QApplication(sys.argv[:1])
+    AppConfig(app_config_path)
+    Cache(cache_path)
+    apply_settings(settings)
+
+
+@contextmanager
+def _worker_main_module() -> Generator[None, None, None]:
+    """Makes new worker processes import this module as their main module. Otherwise, they would re-run the script
+       that started the batch job, including all of its UI setup."""
+    main_module = sys.modules['__main__']
+    sys.modules['__main__'] = sys.modules[__name__]
+    try:
+        yield
+    finally:
+        sys.modules['__main__'] = main_module
+
+
+def run_batch(job: BatchJob) -> BatchReport:
+    """Processes all documents in a batch job, returning the job report. If using more than one worker, each worker
+       process loads the same config and cache files as the current process."""
+    worker_count = max(1, min(job.workers, len(job.inputs)))
+    start_time = time.perf_counter()
+    results: list[DocumentResult] = []
+    if worker_count == 1:
+        apply_settings(job.settings)
+        for input_path in job.inputs:
+            results.append(process_document(input_path, job))
+            logger.info(f'Finished {input_path} ({len(results)}/{len(job.inputs)})')
+    else:
+        # Qt isn't safe to use after forking, so workers always start from a fresh interpreter:
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=worker_count, mp_context=context, initializer=_init_worker,
+                                 initargs=(AppConfig().json_path, Cache().json_path, job.settings)) as executor:
+            with _worker_main_module():
+                futures = [executor.submit(process_document, input_path, job) for input_path in job.inputs]
+            for future in as_completed(futures):
+                results.append(future.result())
+                logger.info(f'Finished {results[-1].input_path} ({len(results)}/{len(job.inputs)})')
+        results.sort(key=lambda document_result: job.inputs.index(document_result.input_path))
+    return BatchReport(results, worker_count, time.perf_counter() - start_time)
+
+
+def run_batch_job(job_path: str, workers: Optional[int] = None) -> int:
+    """Runs a batch job file, printing a timing summary and saving a full report in the output directory.  Returns
+       an exit code, zero only if every document was processed successfully."""
+    job = load_batch_job(job_path)
+    if workers is not None:
+        job.workers = workers
+    report = run_batch(job)
+    os.makedirs(job.output_dir, exist_ok=True)
+    report_path = os.path.join(job.output_dir, REPORT_FILE_NAME)
+    with open(report_path, 'w', encoding='utf-8') as file:
+        json.dump(report.to_dict(), file, indent=2)
+    print(report.summary())
+    print(f'Saved batch report to {report_path}')
+    return 0 if report.failure_count == 0 else 1
@@ -0,0 +1,99 @@
+"""Lightweight descriptions of available image generators.
+
+Image generator modules pull in web clients, ControlNet support, and optional GLID-3-XL dependencies, which adds a lot
+of startup time. Only the selected generator needs to be loaded when IntraPaint starts, so generators are registered
+here by module and class name, and only imported when they are first used. Keep imports in this module to a minimum.
+"""
+import importlib
+import logging
+import sys
+from argparse import Namespace
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from src.util.pyinstaller import is_pyinstaller_bundle
+
+logger = logging.getLogger(__name__)
+
+GENERATION_MODE_SD_WEBUI = 'stable-diffusion-webui'
+GENERATION_MODE_COMFYUI = 'comfyui'
+GENERATION_MODE_LOCAL_GLID = 'glid-local'
+GENERATION_MODE_WEB_GLID = 'glid-api'
+GENERATION_MODE_NONE = 'none'
+GENERATION_MODE_TEST = 'mock'
+GENERATION_MODE_AUTO = 'auto'
+
+DEFAULT_WEBUI_URL = 'http://localhost:7860'
+DEFAULT_COMFYUI_URL = 'http://localhost:8188'
+DEFAULT_GLID_URL = 'http://localhost:5555'
+
+MENU_STABLE_DIFFUSION = 'Stable Diffusion'
+
+
+@dataclass(frozen=True)
+class GeneratorDescriptor:
+    """Describes how to load and create an image generator without importing it.
+
+    GeneratorDescriptor.module_name:
+        Full name of the module that defines the generator class.
+    GeneratorDescriptor.class_name:
+        Name of the ImageGenerator subclass within that module.
+    GeneratorDescriptor.uses_args:
+        Whether the generator's __init__ function expects command line arguments after the window and image stack.
+    """
+    module_name: str
+    class_name: str
+    uses_args: bool = True
+
+    @property
+    def is_loaded(self) -> bool:
+        """Returns whether the generator module was already imported."""
+        return self.module_name in sys.modules
+
+    def load_class(self) -> type:
+        """Imports and returns the generator class."""
+        module = importlib.import_module(self.module_name)
+        return getattr(module, self.class_name)
+
+    def create(self, window: Optional[Any], image_stack: Any, args: Namespace) -> Any:
+        """Imports the generator class and creates a new generator instance.
+
+        Parameters
+        ----------
+        window: MainWindow, optional
+            Main window the generator will use for its menus and dialogs.
+        image_stack: ImageStack
+            Image stack the generator will edit.
+        args: Namespace
+            Command line arguments, passed to generators that accept them.
+        Returns
+        -------
+        ImageGenerator
+            The new generator instance.
+        """
+        logger.info(f'Loading image generator {self.module_name}.{self.class_name}')
+        generator_class = self.load_class()
+        if self.uses_args:
+            return generator_class(window, image_stack, args)
+        return generator_class(window, image_stack)
+
+
+GENERATOR_DESCRIPTORS: dict[str, GeneratorDescriptor] = {
+    GENERATION_MODE_SD_WEBUI: GeneratorDescriptor('src.controller.image_generation.sd_webui_generator',
+                                                  'SDWebUIGenerator'),
+    GENERATION_MODE_COMFYUI: GeneratorDescriptor('src.controller.image_generation.sd_comfyui_generator',
+                                                 'SDComfyUIGenerator'),
+    GENERATION_MODE_WEB_GLID: GeneratorDescriptor('src.controller.image_generation.glid3_webservice_generator',
+                                                  'Glid3WebserviceGenerator'),
+    GENERATION_MODE_TEST: GeneratorDescriptor('src.controller.image_generation.test_generator', 'TestGenerator',
+                                              uses_args=False),
+    GENERATION_MODE_NONE: GeneratorDescriptor('src.controller.image_generation.null_generator', 'NullGenerator',
+                                              uses_args=False)
+}
+if not is_pyinstaller_bundle():
+    GENERATOR_DESCRIPTORS[GENERATION_MODE_LOCAL_GLID] = GeneratorDescriptor(
+        'src.controller.image_generation.glid3_xl_generator', 'Glid3XLGenerator')
+
+# Order used when listing generators in the generator selection window:
+GENERATOR_WINDOW_ORDER = (GENERATION_MODE_SD_WEBUI, GENERATION_MODE_COMFYUI, GENERATION_MODE_LOCAL_GLID,
+                          GENERATION_MODE_WEB_GLID, GENERATION_MODE_TEST, GENERATION_MODE_NONE)
@@ -1,16 +1,20 @@
 """Generate images using GLID-3-XL running on a web server."""
+import logging
+import time
 from argparse import Namespace
 from typing import Optional, Any
 
 import requests
 from PySide6.QtCore import Signal, QThread, QSize
-from PySide6.QtGui import QImage
+from PySide6.QtGui import QImage, QImageReader
 from PySide6.QtWidgets import QApplication, QInputDialog
 
 from src.config.application_config import AppConfig
 from src.config.cache import Cache
 from src.controller.image_generation.glid3_xl_generator import GLID_PREVIEW_IMAGE, GLID_GENERATOR_DESCRIPTION
 from src.controller.image_generation.image_generator import ImageGenerator
+from src.glid_3_xl.sample_stream import FrameReader, FORMAT_PNG, FORMAT_WEBP, FRAME_TYPE_SAMPLE, \
+    FRAME_TYPE_STATUS
 from src.image.layers.image_stack import ImageStack
 from src.ui.modal.settings_modal import SettingsModal
 from src.ui.panel.generators.generator_panel import GeneratorPanel
@@ -18,9 +22,11 @@ from src.ui.panel.generators.glid_panel import GlidPanel
 from src.ui.window.main_window import MainWindow
 from src.util.shared_constants import EDIT_MODE_INPAINT, URL_REQUEST_MESSAGE, URL_REQUEST_RETRY_MESSAGE, \
     URL_REQUEST_TITLE
-from src.util.visual.image_utils import image_to_base64, qimage_from_base64
+from src.util.visual.image_utils import image_to_base64, qimage_from_base64, qimage_from_bytes
 from src.util.visual.text_drawing_utils import rich_text_code_block
 
+logger = logging.getLogger(__name__)
+
 # The QCoreApplication.translate context for strings in this file
 TR_ID = 'controller.image_generation.glid3_webservice_generator'
 
@@ -30,7 +36,6 @@ def _tr(*args):
     return QApplication.translate(TR_ID, *args)
 
 
-DEFAULT_GLID_URL = 'http://localhost:5555'
 GLID_CONFIG_CATEGORY = QApplication.translate('application_config', 'GLID-3-XL')
 GLID_WEB_GENERATOR_NAME = _tr('GLID-3-XL image generation server')
 GLID_WEB_GENERATOR_SETUP = _tr("""
@@ -171,6 +176,10 @@ GLID_COLAB_SETUP = _tr("""
 </ol>""")
 NO_SERVER_ERROR = _tr('No GLID-3-XL server address was provided.')
 CONNECTION_ERROR = _tr('Could not find a valid GLID-3-XL server at "{server_address}"')
+QUEUE_POSITION_STATUS = _tr('Waiting for {count} other request(s) on the GLID-3-XL server')
+
+# The server sends keepalive frames at least every 15 seconds while streaming samples:
+STREAM_READ_TIMEOUT_SECONDS = 60
 
 
 class Glid3WebserviceGenerator(ImageGenerator):
@@ -296,22 +305,82 @@ class Glid3WebserviceGenerator(ImageGenerator):
             'height': source_image.height()
         }
 
-        def error_check(server_response: requests.Response, context_str: str):
-            """Make sure network errors throw exceptions with useful error messages."""
-            if server_response.status_code != 200:
-                if server_response.content and ('application/json' in server_response.headers['content-type']) \
-                        and server_response.json() and 'error' in server_response.json():
-                    raise RuntimeError(f'{server_response.status_code} response to {context_str}: '
-                                       f'{server_response.json()["error"]}')
-                print(f'RESPONSE: {server_response.content}')
-                raise RuntimeError(f'{server_response.status_code} response to {context_str}: unknown error')
-
+        start_time = time.perf_counter()
         res = requests.post(self._server_url, json=body, timeout=30)
-        error_check(res, 'New inpainting request')
+        _error_check(res, 'New inpainting request')
+        # Servers that queue requests return a job ID used to check on this request specifically:
+        job_id: Optional[str] = res.json().get('job_id', None)
+        samples: dict[str, float] = {}
+        if job_id is None or not self._stream_samples(job_id, samples, status_signal):
+            self._poll_samples(job_id, samples, status_signal)
+        logger.info(f'Loaded {len(samples)} GLID-3-XL image(s) in {time.perf_counter() - start_time:.2f} seconds')
+
+    def _stream_samples(self, job_id: str, samples: dict[str, float], status_signal: Signal) -> bool:
+        """Loads samples from the server's /stream endpoint as they are generated.
+
+        Parameters
+        ----------
+        job_id : str
+            ID of the server job to stream.
+        samples : dict[str, float]
+            Timestamps of loaded samples, by sample name. Streamed samples are added as they are loaded.
+        status_signal : Signal[str]
+            Signal to emit when the job's queue position changes.
 
-        # POST to server_url, check response
-        # If invalid or error response, throw Exception
-        samples: dict[str, Any] = {}
+        Returns
+        -------
+        bool
+            True if the job finished, False if the server doesn't support streaming or the connection failed before
+            the job finished.
+        """
+        supported_formats = {bytes(supported_format.data()).decode().lower()
+                             for supported_format in QImageReader.supportedImageFormats()}
+        image_format = FORMAT_WEBP if FORMAT_WEBP in supported_formats else FORMAT_PNG
+        reader = FrameReader()
+        last_queue_position: Optional[int] = None
+        try:
+            with requests.get(f'{self._server_url}/stream', params={'job_id': job_id, 'format': image_format},
+                              stream=True, timeout=(30, STREAM_READ_TIMEOUT_SECONDS)) as res:
+                if res.status_code == 404:
+                    return False
+                _error_check(res, 'sample stream request')
+                for chunk in res.iter_content(chunk_size=None):
+                    for header, payload in reader.feed(chunk):
+                        if header['type'] == FRAME_TYPE_SAMPLE:
+                            try:
+                                sample_image = qimage_from_bytes(payload, header['format'])
+                            except ValueError as err:
+                                print(f'Warning: {err}')
+                                continue
+                            self._cache_generated_image(sample_image, int(header['name']))
+                            samples[header['name']] = header['timestamp']
+                        elif header['type'] == FRAME_TYPE_STATUS:
+                            queue_position = header['queue_position']
+                            if queue_position != last_queue_position:
+                                last_queue_position = queue_position
+                                if queue_position is not None and queue_position > 0:
+                                    status_signal.emit(QUEUE_POSITION_STATUS.format(count=queue_position))
+                            if not header['in_progress']:
+                                if header['error'] is not None:
+                                    raise RuntimeError(f'GLID-3-XL server error: {header["error"]}')
+                                return True
+        except requests.exceptions.RequestException as err:
+            print(f'Sample streaming failed, checking for samples periodically instead: {err}')
+        return False
+
+    def _poll_samples(self, job_id: Optional[str], samples: dict[str, float], status_signal: Signal) -> None:
+        """Periodically requests new samples from the server's /sample endpoint until the job finishes.
+
+        Parameters
+        ----------
+        job_id : str, optional
+            ID of the server job to check. If None, the server's most recent job is used.
+        samples : dict[str, float]
+            Timestamps of previously loaded samples, by sample name.
+        status_signal : Signal[str]
+            Signal to emit when the job's queue position changes.
+        """
+        last_queue_position: Optional[int] = None
         in_progress = True
         error_count = 0
         max_errors = 10
@@ -324,12 +393,14 @@ class Glid3WebserviceGenerator(ImageGenerator):
 
         while in_progress:
             sleep_time = min(min_refresh * pow(2, error_count), max_refresh)
-            # print(f"Checking for response in {sleep_time//1000} ms...")
             QThread.usleep(sleep_time)
             # GET server_url/sample, sending previous samples:
             try:
-                res = requests.get(f'{self._server_url}/sample', json={'samples': samples}, timeout=30)
-                error_check(res, 'sample update request')
+                sample_request: dict[str, Any] = {'samples': samples}
+                if job_id is not None:
+                    sample_request['job_id'] = job_id
+                res = requests.get(f'{self._server_url}/sample', json=sample_request, timeout=30)
+                _error_check(res, 'sample update request')
             except requests.exceptions.RequestException as err:
                 error_count += 1
                 print(f'Error {error_count}: {err}')
@@ -343,6 +414,11 @@ class Glid3WebserviceGenerator(ImageGenerator):
             json_body = res.json()
             if 'samples' not in json_body:
                 continue
+            queue_position = json_body.get('queue_position', None)
+            if queue_position != last_queue_position:
+                last_queue_position = queue_position
+                if queue_position is not None and queue_position > 0:
+                    status_signal.emit(QUEUE_POSITION_STATUS.format(count=queue_position))
             for sample_name in json_body['samples'].keys():
                 try:
                     sample_image = qimage_from_base64(json_body['samples'][sample_name]['image'])
@@ -353,3 +429,14 @@ class Glid3WebserviceGenerator(ImageGenerator):
                     error_count += 1
                     continue
             in_progress = json_body['in_progress']
+
+
+def _error_check(server_response: requests.Response, context_str: str):
+    """Make sure network errors throw exceptions with useful error messages."""
+    if server_response.status_code != 200:
+        if server_response.content and ('application/json' in server_response.headers['content-type']) \
+                and server_response.json() and 'error' in server_response.json():
+            raise RuntimeError(f'{server_response.status_code} response to {context_str}: '
+                               f'{server_response.json()["error"]}')
+        print(f'RESPONSE: {server_response.content}')
+        raise RuntimeError(f'{server_response.status_code} response to {context_str}: unknown error')
@@ -2,6 +2,7 @@
 import logging
 import os
 import sys
+import time
 from argparse import Namespace
 from typing import Optional, Any
 
@@ -336,6 +337,7 @@ class Glid3XLGenerator(ImageGenerator):
 
         batch_size = Cache().get(Cache.BATCH_SIZE)
         batch_count = Cache().get(Cache.BATCH_COUNT)
+        start_time = time.perf_counter()
         device = get_device()
         sample_fn, unused_clip_score_fn = create_sample_function(
             device,
@@ -365,13 +367,14 @@ class Glid3XLGenerator(ImageGenerator):
             ddim=self._ddim)
 
         # noinspection PyUnusedLocal
-        def save_sample(i, sample, unused_clip_score=False) -> None:
+        def save_sample(i, sample, unused_clip_score=False, preview=False) -> None:
             """Extract generated samples and repackage into the appropriate structure."""
             foreach_image_in_sample(
                 sample,
                 batch_size,
                 self._ldm,
-                lambda k, img: self._cache_generated_image(pil_image_to_qimage(img), (i * batch_size) + k))
+                lambda k, img: self._cache_generated_image(pil_image_to_qimage(img), (i * batch_size) + k),
+                preview=preview)
 
         generate_samples(
             device,
@@ -383,3 +386,5 @@ class Glid3XLGenerator(ImageGenerator):
             batch_count,
             source_image.width,
             source_image.height)
+        logger.info(f'Generated {batch_size * batch_count} GLID-3-XL image(s) in {time.perf_counter() - start_time:.2f}'
+                    ' seconds')
@@ -49,6 +49,7 @@ class ImageGenerator(MenuBuilder):
         self._image_stack = image_stack
         self._generated_images: list[QImage] = []
         self._generating = False
+        self._selector_option_count = 0
 
         class _SignalObject(QObject):
             status_signal = Signal(str)
@@ -145,6 +146,7 @@ class ImageGenerator(MenuBuilder):
         assert self._window is not None
         cache = Cache()
         self._generated_images.clear()
+        self._selector_option_count = 0
         self._generating = True
 
         source_selection = self._image_stack.qimage_generation_area_content()
@@ -253,6 +255,20 @@ class ImageGenerator(MenuBuilder):
         image = self._generated_images[index]
         if not image.isNull():
             self._window.load_sample_preview(image, index)
+            self._selector_option_count = max(self._selector_option_count, index + 1)
+
+    def _load_preview_image(self, image: QImage, index: int) -> None:
+        """Shows an intermediate image in the generated image selector, unless the final image at that index has
+           already been loaded. Safe to call outside the main thread."""
+
+        def _load_preview() -> None:
+            if not self._generating or index > self._selector_option_count:
+                return
+            if index < len(self._generated_images) and not self._generated_images[index].isNull():
+                return
+            self._window.load_sample_preview(image, index)
+            self._selector_option_count = max(self._selector_option_count, index + 1)
+        QTimer.singleShot(0, self._window, _load_preview)
 
     def _cache_generated_image(self, image: QImage, index: int) -> None:
         while len(self._generated_images) < index:
@@ -9,6 +9,7 @@ from PySide6.QtWidgets import QApplication
 from requests import ReadTimeout
 
 from src.api.a1111_webservice import AuthError
+from src.api.backend_metadata_cache import BackendMetadataCache
 from src.api.comfyui.comfyui_types import ImageFileReference
 from src.api.comfyui.nodes.ultimate_upscale_node import ULTIMATE_UPSCALE_NODE_NAME
 from src.api.comfyui_webservice import ComfyUiWebservice, ComfyModelType, AsyncTaskProgress, AsyncTaskStatus
@@ -149,7 +150,6 @@ TASK_STATUS_QUEUED = _tr('Waiting, position {queue_number} in queue.')
 TASK_STATUS_GENERATING = _tr('Generating...')
 TASK_STATUS_BATCH_NUMBER = _tr('Batch {batch_num} of {num_batches}:')
 
-DEFAULT_COMFYUI_URL = 'http://localhost:8188'
 
 MAX_ERROR_COUNT = 10
 MIN_RETRY_US = 300000
@@ -172,11 +172,12 @@ class SDComfyUIGenerator(SDGenerator):
     def __init__(self, window: MainWindow, image_stack: ImageStack, args: Namespace) -> None:
         super().__init__(window, image_stack, args, Cache.SD_COMFYUI_SERVER_URL, ControlKeyType.COMFYUI)
         self._image_stack = image_stack
-        self._webservice: Optional[ComfyUiWebservice] = ComfyUiWebservice(self.server_url)
+        self._webservice: Optional[ComfyUiWebservice] = ComfyUiWebservice(self.server_url, BackendMetadataCache())
         self._gen_extras_tab = ComfyUIExtrasTab()
         self._active_task_id = ''
         self._active_task_number = 0
         self._last_cancelled_id = ''
+        self._ultimate_upscale_node_available = False
 
     def get_display_name(self) -> str:
         """Returns a display name identifying the generator."""
@@ -206,7 +207,7 @@ class SDComfyUIGenerator(SDGenerator):
                 return self._webservice
             self._webservice.disconnect()
             self._webservice = None
-        self._webservice = ComfyUiWebservice(url)
+        self._webservice = ComfyUiWebservice(url, BackendMetadataCache())
         return self._webservice
 
     def interrogate(self) -> None:
@@ -294,23 +295,35 @@ class SDComfyUIGenerator(SDGenerator):
 
     def ultimate_upscale_script_available(self) -> bool:
         """Return whether the Stable Diffusion API will support the 'Ultimate SD Upscale' script."""
-        assert self._webservice is not None
-        try:
-            return self._webservice.is_node_available(ULTIMATE_UPSCALE_NODE_NAME)
-        except (RuntimeError, KeyError) as err:
-            logger.error(f'Checking for {ULTIMATE_UPSCALE_NODE_NAME} node failed: {err}')
-            return False
+        return self._ultimate_upscale_node_available
 
-    def cache_generator_specific_data(self) -> None:
-        """When activating the generator, after the webservice is connected, this method should be implemented to
-           load and cache any generator-specific API data."""
-        cache = Cache()
+    def load_generator_specific_data(self) -> dict[str, Any]:
+        """Requests ComfyUI model options, schedulers, and node availability. This makes blocking network requests
+           without changing any cached data, so it can run on any thread."""
         assert self._webservice is not None
+        webservice = self._webservice
+        return webservice.run_concurrently({
+            ComfyModelType.CONFIG: lambda: webservice.get_models(ComfyModelType.CONFIG),
+            ComfyModelType.HYPERNETWORKS: lambda: webservice.get_models(ComfyModelType.HYPERNETWORKS),
+            Cache.SCHEDULER: webservice.get_scheduler_names,
+            ULTIMATE_UPSCALE_NODE_NAME: lambda: webservice.is_node_available(ULTIMATE_UPSCALE_NODE_NAME)
+        }, return_exceptions=True)
+
+    def apply_generator_specific_data(self, api_data: dict[str, Any]) -> None:
+        """Copies data returned by load_generator_specific_data into the cache."""
+        cache = Cache()
+        node_available = api_data[ULTIMATE_UPSCALE_NODE_NAME]
+        if isinstance(node_available, Exception):
+            logger.error(f'Checking for {ULTIMATE_UPSCALE_NODE_NAME} node failed: {node_available}')
+            node_available = False
+        self._ultimate_upscale_node_available = bool(node_available)
         for model_type, cache_key in ((ComfyModelType.CONFIG, Cache.COMFYUI_MODEL_CONFIG),
                                       (ComfyModelType.HYPERNETWORKS, Cache.HYPERNETWORK_MODELS)):
             cache_data_type = cache.get_data_type(cache_key)
             try:
-                model_list = self._webservice.get_models(model_type)
+                model_list = api_data[model_type]
+                if isinstance(model_list, Exception):
+                    raise model_list
                 model_list.sort()
                 if cache_data_type == TYPE_LIST:
                     cache.set(cache_key, model_list)
@@ -332,7 +345,10 @@ class SDComfyUIGenerator(SDGenerator):
                     assert cache_data_type == TYPE_STR
                     cache.restore_default_options(cache_key)
         try:
-            cache.update_options(Cache.SCHEDULER, self._webservice.get_scheduler_names())
+            scheduler_names = api_data[Cache.SCHEDULER]
+            if isinstance(scheduler_names, Exception):
+                raise scheduler_names
+            cache.update_options(Cache.SCHEDULER, scheduler_names)
         except (RuntimeError, KeyError) as err:
             logger.error(f'Loading scheduler options failed: {err}')
             cache.restore_default_options(Cache.SCHEDULER)
@@ -350,7 +366,7 @@ class SDComfyUIGenerator(SDGenerator):
 
     def load_lora_thumbnail(self, lora_info: Optional[dict[str, str]]) -> Optional[QImage]:
         """Attempt to load a LoRA model thumbnail image from the API."""
-        return None  # ComfyUI doesn't provide LoRA thumbnails.
+        return QImage()  # ComfyUI doesn't provide LoRA thumbnails.
 
     def load_preprocessor_preview(self, preprocessor: ControlNetPreprocessor,
                                   image: QImage, mask: Optional[QImage],
@@ -395,7 +411,7 @@ class SDComfyUIGenerator(SDGenerator):
     def is_available(self) -> bool:
         """Returns whether the generator is supported on the current system."""
         if self._webservice is None:
-            self._webservice = ComfyUiWebservice(self._server_url)
+            self._webservice = ComfyUiWebservice(self._server_url, BackendMetadataCache())
         try:
             # Use the system status endpoint to check for ComfyUI:
             system_status = self._webservice.get_system_stats()
@@ -654,26 +670,30 @@ class SDComfyUIGenerator(SDGenerator):
             status_signal.emit({'seed': str(seed)})
 
     def upscale_image(self, image: QImage, new_size: QSize, status_signal: Signal, image_signal: Signal) -> None:
-        assert self._webservice is not None
-        queue_info = self._webservice.upscale(self._image_stack.qimage(), new_size.width(),
-                                              new_size.height())
-        if 'error' in queue_info:
-            raise RuntimeError(str(queue_info['error']))
-        assert 'number' in queue_info
-        assert 'prompt_id' in queue_info
-        self._active_task_number = queue_info['number']
-        self._active_task_id = queue_info['prompt_id']
+        webservice = self._webservice
+        assert webservice is not None
 
-        # Check progress in a loop until it finishes or something goes wrong:
-        final_status = self._repeated_progress_check(self._active_task_id, self._active_task_number, 0,
-                                                     1, status_signal)
-        if 'outputs' not in final_status:
-            raise RuntimeError(GENERATE_ERROR_TITLE)
-        image_data = self._webservice.download_images(final_status['outputs']['images'])
-        assert len(image_data) > 0
-        upscaled_image = image_data[0]
-        if upscaled_image.size() != new_size:
-            # Apply final scaling, necessary if width and height scale don't exactly match, or if using an
-            # upscaling model with a fixed scale:
-            upscaled_image = pil_image_scaling(upscaled_image, new_size)
-        image_signal.emit(upscaled_image)
+        def _upscale_chunk(chunk: QImage, chunk_size: QSize, chunk_index: int, chunk_count: int) -> QImage:
+            queue_info = webservice.upscale(chunk, chunk_size.width(), chunk_size.height())
+            if 'error' in queue_info:
+                raise RuntimeError(str(queue_info['error']))
+            assert 'number' in queue_info
+            assert 'prompt_id' in queue_info
+            self._active_task_number = queue_info['number']
+            self._active_task_id = queue_info['prompt_id']
+
+            # Check progress in a loop until it finishes or something goes wrong:
+            final_status = self._repeated_progress_check(self._active_task_id, self._active_task_number, chunk_index,
+                                                         chunk_count, status_signal)
+            if 'outputs' not in final_status:
+                raise RuntimeError(GENERATE_ERROR_TITLE)
+            image_data = webservice.download_images(final_status['outputs']['images'])
+            assert len(image_data) > 0
+            upscaled_chunk = image_data[0]
+            if upscaled_chunk.size() != chunk_size:
+                # Apply final scaling, necessary if width and height scale don't exactly match, or if using an
+                # upscaling model with a fixed scale:
+                upscaled_chunk = pil_image_scaling(upscaled_chunk, chunk_size)
+            return upscaled_chunk
+
+        image_signal.emit(self._upscale_in_chunks(image, new_size, _upscale_chunk))
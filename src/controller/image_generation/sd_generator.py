@@ -1,22 +1,31 @@
 """Shared base for generators that provide Stable Diffusion image generation with possible ControlNet and upscaling
    support."""
+import json
 import logging
 from argparse import Namespace
+from concurrent.futures import ThreadPoolExecutor
+from copy import deepcopy
 from json import JSONDecodeError
-from typing import Optional, cast, Any
+from typing import Optional, cast, Any, Callable
 
-from PySide6.QtCore import Signal, QSize
+import requests
+from PySide6.QtCore import Signal, QSize, QTimer
 from PySide6.QtGui import QImage, QIcon
 from PySide6.QtWidgets import QInputDialog, QApplication
 
 from src.api.a1111_webservice import AuthError
+from src.api.backend_metadata_cache import content_hash
 from src.api.controlnet.controlnet_constants import ControlTypeDef, CONTROLNET_REUSE_IMAGE_CODE, CONTROLNET_MODEL_NONE
 from src.api.controlnet.controlnet_model import ControlNetModel
 from src.api.controlnet.controlnet_preprocessor import ControlNetPreprocessor
+from src.api.controlnet.controlnet_preview_cache import ControlNetPreviewCache, PreviewKey, preview_key, \
+    scale_preview_input, preview_resolution
 from src.api.controlnet.controlnet_unit import ControlKeyType, ControlNetUnit
+from src.api.thumbnail_cache import ThumbnailCache
 from src.api.webservice import WebService
 from src.config.cache import Cache
 from src.config.key_config import KeyConfig
+from src.controller.image_generation.generator_registry import MENU_STABLE_DIFFUSION
 from src.controller.image_generation.image_generator import ImageGenerator
 from src.image.layers.image_stack import ImageStack
 from src.image.layers.image_stack_utils import scale_all_layers
@@ -24,7 +33,7 @@ from src.ui.layout.draggable_tabs.tab import Tab
 from src.ui.modal.modal_utils import show_error_dialog
 from src.ui.panel.controlnet_panel import TabbedControlNetPanel, CONTROLNET_TITLE
 from src.ui.panel.generators.stable_diffusion_panel import StableDiffusionPanel
-from src.ui.window.extra_network_window import ExtraNetworkWindow
+from src.ui.window.extra_network_window import ExtraNetworkWindow, LORA_KEY_NAME, scale_thumbnail
 from src.ui.window.main_window import MainWindow
 from src.undo_stack import UndoStack
 from src.util.application_state import AppStateTracker, APP_STATE_LOADING, APP_STATE_EDITING
@@ -34,6 +43,8 @@ from src.util.parameter import TYPE_LIST, TYPE_STR, TYPE_FLOAT, TYPE_DICT
 from src.util.shared_constants import PROJECT_DIR, \
     URL_REQUEST_MESSAGE, URL_REQUEST_RETRY_MESSAGE, \
     URL_REQUEST_TITLE, PIL_SCALING_MODES, UPSCALED_LAYER_NAME, UPSCALE_ERROR_TITLE, UPSCALE_OPTION_NONE
+from src.util.task_scheduler import PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND
+from src.util.visual.tiled_image_scaling import chunked_image_scaling
 
 logger = logging.getLogger(__name__)
 
@@ -166,13 +177,24 @@ GETTING_SD_MODELS = _tr("""
 
 ERROR_TITLE_PREPROCESSOR_PREVIEW_FAILED = _tr('ControlNet preview failed')
 ERROR_MESSAGE_PREPROCESSOR_PREVIEW_FAILED = _tr('Loading ControlNet preprocessor preview failed: {err}')
+UPSCALE_CHUNK_STATUS = _tr('Upscaling section {chunk_num} of {chunk_count}')
 
 SD_PREVIEW_IMAGE = f'{PROJECT_DIR}/resources/generator_preview/stable-diffusion.png'
 STABLE_DIFFUSION_CONFIG_CATEGORY = QApplication.translate('config.application_config', 'Stable Diffusion')
 ICON_PATH_CONTROLNET_TAB = f'{PROJECT_DIR}/resources/icons/tabs/hex.svg'
-MENU_STABLE_DIFFUSION = 'Stable Diffusion'
 
 
+# Delay before reloading API data after a background check finds outdated saved metadata:
+API_DATA_REFRESH_DELAY_MS = 500
+API_DATA_REFRESH_TASK_KEY = 'SDGenerator.refresh_api_data'
+API_DATA_OPTION_LISTS = 'option_lists'
+API_DATA_GENERATOR = 'generator'
+API_DATA_CONTROLNET = 'controlnet'
+CONTROLNET_PREVIEW_TASK_KEY = 'SDGenerator.controlnet_preprocessor_preview'
+LORA_THUMBNAIL_TASK_KEY = 'SDGenerator.load_lora_thumbnails'
+# Maximum number of LoRA thumbnails requested from the server at once:
+LORA_THUMBNAIL_THREADS = 4
+
 LCM_SAMPLER = 'LCM'
 LCM_LORA_1_5 = 'lcm-lora-sdv1-5'
 LCM_LORA_XL = 'lcm-lora-sdxl'
@@ -213,9 +235,16 @@ class SDGenerator(ImageGenerator):
         self._preview = QImage(SD_PREVIEW_IMAGE)
         self._controlnet_tab: Optional[Tab] = None
         self._controlnet_panel: Optional[TabbedControlNetPanel] = None
+        self._preview_request_key: Optional[PreviewKey] = None
         self._controlnet_key_type = controlnet_key_type
         self._show_extended_controlnet_options = show_extended_controlnet_options
 
+        # Several saved responses may be found to be outdated at once, so wait briefly before reloading API data:
+        self._api_data_refresh_timer = QTimer()
+        self._api_data_refresh_timer.setSingleShot(True)
+        self._api_data_refresh_timer.setInterval(API_DATA_REFRESH_DELAY_MS)
+        self._api_data_refresh_timer.timeout.connect(self._refresh_api_data)
+
     @property
     def server_url(self) -> str:
         """Return the Stable Diffusion server URL."""
@@ -284,11 +313,20 @@ class SDGenerator(ImageGenerator):
         """Return whether the Stable Diffusion API will support the 'Ultimate SD Upscale' script."""
         raise NotImplementedError()
 
-    def cache_generator_specific_data(self) -> None:
-        """When activating the generator, after the webservice is connected, this method should be implemented to
-           load and cache any generator-specific API data."""
+    def load_generator_specific_data(self) -> dict[str, Any]:
+        """After the webservice is connected, this method should be implemented to request any generator-specific API
+           data. Implementations may make blocking network requests, but must not change cached data, so that API data
+           can be refreshed on a background thread."""
         raise NotImplementedError()
 
+    def apply_generator_specific_data(self, api_data: dict[str, Any]) -> None:
+        """Copies data returned by load_generator_specific_data into the cache. Only called on the UI thread."""
+        raise NotImplementedError()
+
+    def cache_generator_specific_data(self) -> None:
+        """Loads and caches any generator-specific API data."""
+        self.apply_generator_specific_data(self.load_generator_specific_data())
+
     def clear_cached_generator_data(self) -> None:
         """Clear any cached data specific to this image generator."""
         raise NotImplementedError()
@@ -298,7 +336,8 @@ class SDGenerator(ImageGenerator):
         raise NotImplementedError()
 
     def load_lora_thumbnail(self, lora_info: Optional[dict[str, str]]) -> Optional[QImage]:
-        """Attempt to load a LoRA model thumbnail image from the API."""
+        """Attempt to load a LoRA model thumbnail image from the API. Returns a null QImage if the server reports that
+           the model has no thumbnail, or None if the thumbnail couldn't be loaded."""
         raise NotImplementedError()
 
     def load_preprocessor_preview(self, preprocessor: ControlNetPreprocessor,
@@ -312,6 +351,39 @@ class SDGenerator(ImageGenerator):
         """Upscales an image using cached upscaling settings."""
         raise NotImplementedError()
 
+    @staticmethod
+    def _upscale_in_chunks(image: QImage, new_size: QSize,
+                           upscale_chunk: Callable[[QImage, QSize, int, int], QImage]) -> QImage:
+        """Upscales an image in overlapping chunks, so that neither IntraPaint nor the server needs to handle the entire
+        upscaled image in a single request. Stable Diffusion upscaling handles its own tiling, so it always uses a single
+        request.
+
+        Parameters
+        ----------
+        image: QImage
+            Image to upscale.
+        new_size: QSize
+            Final upscaled image size.
+        upscale_chunk: Callable[[QImage, QSize, int, int], QImage]
+            Function that upscales a single chunk, given the chunk image, chunk size, chunk index, and chunk count.
+        Returns
+        -------
+        QImage
+            The upscaled image.
+        """
+        cache = Cache()
+        if cache.get(Cache.SD_UPSCALING_AVAILABLE) and cache.get(Cache.USE_STABLE_DIFFUSION_UPSCALING):
+            return upscale_chunk(image, new_size, 0, 1)
+        chunk_progress = [0, 1]
+
+        def _track_progress(chunk_index: int, chunk_count: int) -> None:
+            chunk_progress[0] = chunk_index
+            chunk_progress[1] = chunk_count
+
+        return chunked_image_scaling(image, new_size,
+                                     lambda chunk, chunk_size: upscale_chunk(chunk, chunk_size, *chunk_progress),
+                                     progress_callback=_track_progress)
+
     def get_gen_area_image(self, init_image: Optional[QImage] = None) -> QImage:
         """Gets the contents of the image generation area, handling any necessary preprocessing."""
         if init_image is not None:
@@ -352,100 +424,10 @@ class SDGenerator(ImageGenerator):
 
             # If a login is required and none is defined in the environment, the webservice will automatically request
             # one during the following setup process:
-            cache = Cache()
-
-            sampler_names = self.get_diffusion_sampler_names()
-            upscale_methods = self.get_upscale_method_names()
-            sd_models = self.get_diffusion_model_names()
-            lora_models = self.get_lora_model_info()
-            for api_data, cache_key in ((sampler_names, Cache.SAMPLING_METHOD),
-                                        (upscale_methods, Cache.GENERATOR_SCALING_MODES),
-                                        (sd_models, Cache.SD_MODEL),
-                                        (lora_models, Cache.LORA_MODELS)):
-                cache_data_type = cache.get_data_type(cache_key)
-                try:
-                    if isinstance(api_data, dict):
-                        cache.set(cache_key, api_data)
-                        continue
-                    assert isinstance(api_data, list)
-
-                    # Sort API values.  Sampling method isn't sorted because the default order is somewhat helpful
-                    # in figuring out which ones are actually useful, and because otherwise that might make DDIM
-                    # the default option. We definitely don't want that, DDIM is outdated and unlikely to actually be
-                    # the best option in most situations.
-                    if cache_key != Cache.SAMPLING_METHOD and len(api_data) > 0 and isinstance(api_data[0], str):
-                        api_data.sort(key=lambda value: str(value).lower())
-                    if cache_data_type == TYPE_LIST:
-                        cache.set(cache_key, api_data)
-                    else:
-                        assert cache_data_type == TYPE_STR
-                        # Combine default options with dynamic options. This is so we can support having default
-                        # options like "any"/"none"/"auto" when appropriate.
-                        cache.restore_default_options(cache_key)
-                        option_list = cast(list, cache.get_options(cache_key))
-                        for option in api_data:
-                            if option not in option_list:
-                                option_list.append(option)
-                        cache.update_options(cache_key, option_list)
-
-                except (RuntimeError, KeyError) as err:
-                    logger.error(f'Caching "{cache_key}" {cache_data_type} data failed: {err}')
-                    if cache_data_type == TYPE_LIST:
-                        cache.set(cache_key, [])
-                    else:
-                        assert cache_data_type == TYPE_STR
-                        cache.restore_default_options(cache_key)
-            self.cache_generator_specific_data()
-
-            controlnet_model_list: list[str] = []
-            controlnet_preprocessor_list: list[ControlNetPreprocessor] = []
-
-            # Build ControlNet tab, if available through the API:
-            if self._controlnet_tab is None:
-                try:
-                    controlnet_model_list = self.get_controlnet_models()
-                    controlnet_preprocessor_list = self.get_controlnet_preprocessors()
-                    control_types = self.get_controlnet_types()
-                    control_keys = self.get_controlnet_unit_cache_keys()
-                    if len(controlnet_preprocessor_list) > 0 and len(control_types) > 0:
-                        controlnet_panel = TabbedControlNetPanel(controlnet_preprocessor_list,
-                                                                 controlnet_model_list,
-                                                                 control_types,
-                                                                 control_keys,
-                                                                 self._show_extended_controlnet_options)
-                        self._controlnet_tab = Tab(CONTROLNET_TITLE, controlnet_panel, KeyConfig.SELECT_CONTROLNET_TAB,
-                                                   parent=self.menu_window)
-                        self._controlnet_tab.hide()
-                        self._controlnet_tab.setIcon(QIcon(ICON_PATH_CONTROLNET_TAB))
-                        controlnet_panel.request_preview.connect(self.controlnet_preprocessor_preview)
-                        self._controlnet_panel = controlnet_panel
-                except (KeyError, RuntimeError) as err:
-                    logger.error(f'Loading ControlNet failed. {err.__class__}: {err}')
-
-            # Determine and cache Stable Diffusion upscaling capabilities:
-            ultimate_sd_upscale_found = self.ultimate_upscale_script_available()
-            tile_models = [model_name for model_name in controlnet_model_list if 'tile' in model_name.lower()]
-            tile_preprocessors = [preprocessor for preprocessor in controlnet_preprocessor_list
-                                  if 'tile' in preprocessor.name.lower()]
-            tiled_upscaling_available = len(tile_models) > 0 and len(tile_preprocessors) > 0
-            if tiled_upscaling_available:
-                tile_models.append(CONTROLNET_MODEL_NONE)
-            cache.set(Cache.SD_UPSCALING_AVAILABLE, ultimate_sd_upscale_found or tiled_upscaling_available)
-            cache.set(Cache.ULTIMATE_UPSCALE_SCRIPT_AVAILABLE, ultimate_sd_upscale_found)
-            cache.set(Cache.SD_UPSCALING_CONTROLNET_TILE_MODELS, tile_models)
-            cache.set(Cache.SD_UPSCALING_CONTROLNET_TILE_PREPROCESSORS,
-                      [preprocessor.serialize() for preprocessor in tile_preprocessors])
-
-            if tiled_upscaling_available:
-                try:
-                    upscale_tile_control_unit = ControlNetUnit.deserialize(
-                        cache.get(Cache.SD_UPSCALING_CONTROLNET_TILE_SETTINGS), self._controlnet_key_type)
-                    cache.set(Cache.SD_UPSCALING_CONTROLNET_TILE_SETTINGS, upscale_tile_control_unit.serialize())
-                except (KeyError, RuntimeError, JSONDecodeError):
-                    upscale_tile_control_unit = ControlNetUnit(self._controlnet_key_type)
-                    upscale_tile_control_unit.model = ControlNetModel(tile_models[0])
-                    upscale_tile_control_unit.preprocessor = tile_preprocessors[0]
-                    cache.set(Cache.SD_UPSCALING_CONTROLNET_TILE_SETTINGS, upscale_tile_control_unit.serialize())
+            webservice = self.get_webservice()
+            assert webservice is not None
+            webservice.set_metadata_change_listener(self._on_api_metadata_changed)
+            self._apply_api_data(self._load_api_data(webservice))
 
             assert self._window is not None
             self._window.cancel_generation.connect(self.cancel_generation)
@@ -454,6 +436,175 @@ class SDGenerator(ImageGenerator):
         except AuthError:
             return False
 
+    def _load_api_data(self, webservice: WebService) -> dict[str, Any]:
+        """Requests option lists, generator-specific data, and ControlNet data. This makes blocking network requests
+           without changing any cached data, so it can run on any thread. Pass the returned data to _apply_api_data to
+           update the cache."""
+        api_data: dict[str, Any] = {
+            API_DATA_OPTION_LISTS: webservice.run_concurrently({
+                Cache.SAMPLING_METHOD: self.get_diffusion_sampler_names,
+                Cache.GENERATOR_SCALING_MODES: self.get_upscale_method_names,
+                Cache.SD_MODEL: self.get_diffusion_model_names,
+                Cache.LORA_MODELS: self.get_lora_model_info
+            }),
+            API_DATA_GENERATOR: self.load_generator_specific_data()
+        }
+        try:
+            api_data[API_DATA_CONTROLNET] = webservice.run_concurrently({
+                'models': self.get_controlnet_models,
+                'preprocessors': self.get_controlnet_preprocessors,
+                'types': self.get_controlnet_types
+            })
+        except (KeyError, RuntimeError) as err:
+            logger.error(f'Loading ControlNet failed. {err.__class__}: {err}')
+            api_data[API_DATA_CONTROLNET] = None
+        return api_data
+
+    def _apply_api_data(self, api_data: dict[str, Any]) -> None:
+        """Copies data returned by _load_api_data into the cache, and builds or rebuilds the ControlNet tab. Only call
+           this on the UI thread."""
+        self._cache_api_option_lists(api_data[API_DATA_OPTION_LISTS])
+        self.apply_generator_specific_data(api_data[API_DATA_GENERATOR])
+        controlnet_model_list: list[str] = []
+        controlnet_preprocessor_list: list[ControlNetPreprocessor] = []
+        controlnet_data = api_data[API_DATA_CONTROLNET]
+        if controlnet_data is not None:
+            controlnet_model_list = cast(list[str], controlnet_data['models'])
+            controlnet_preprocessor_list = cast(list[ControlNetPreprocessor], controlnet_data['preprocessors'])
+            control_types = cast(dict[str, ControlTypeDef], controlnet_data['types'])
+            self._build_controlnet_tab(controlnet_model_list, controlnet_preprocessor_list, control_types)
+        self._cache_upscaling_options(controlnet_model_list, controlnet_preprocessor_list)
+
+    def _build_controlnet_tab(self, controlnet_model_list: list[str],
+                              controlnet_preprocessor_list: list[ControlNetPreprocessor],
+                              control_types: dict[str, ControlTypeDef]) -> None:
+        """Creates the ControlNet tab, or replaces its panel if the tab already exists."""
+        if len(controlnet_preprocessor_list) == 0 or len(control_types) == 0:
+            return
+        try:
+            controlnet_panel = TabbedControlNetPanel(controlnet_preprocessor_list,
+                                                     controlnet_model_list,
+                                                     control_types,
+                                                     self.get_controlnet_unit_cache_keys(),
+                                                     self._show_extended_controlnet_options)
+        except (KeyError, RuntimeError) as err:
+            logger.error(f'Loading ControlNet failed. {err.__class__}: {err}')
+            return
+        controlnet_panel.request_preview.connect(self.controlnet_preprocessor_preview)
+        if self._controlnet_tab is None:
+            self._controlnet_tab = Tab(CONTROLNET_TITLE, controlnet_panel, KeyConfig.SELECT_CONTROLNET_TAB,
+                                       parent=self.menu_window)
+            self._controlnet_tab.hide()
+            self._controlnet_tab.setIcon(QIcon(ICON_PATH_CONTROLNET_TAB))
+        else:
+            last_panel = self._controlnet_panel
+            self._controlnet_tab.content_widget = controlnet_panel
+            if last_panel is not None:
+                last_panel.setParent(None)
+                last_panel.deleteLater()
+        self._controlnet_panel = controlnet_panel
+
+    def _cache_upscaling_options(self, controlnet_model_list: list[str],
+                                 controlnet_preprocessor_list: list[ControlNetPreprocessor]) -> None:
+        """Determine and cache Stable Diffusion upscaling capabilities."""
+        cache = Cache()
+        ultimate_sd_upscale_found = self.ultimate_upscale_script_available()
+        tile_models = [model_name for model_name in controlnet_model_list if 'tile' in model_name.lower()]
+        tile_preprocessors = [preprocessor for preprocessor in controlnet_preprocessor_list
+                              if 'tile' in preprocessor.name.lower()]
+        tiled_upscaling_available = len(tile_models) > 0 and len(tile_preprocessors) > 0
+        if tiled_upscaling_available:
+            tile_models.append(CONTROLNET_MODEL_NONE)
+        cache.set(Cache.SD_UPSCALING_AVAILABLE, ultimate_sd_upscale_found or tiled_upscaling_available)
+        cache.set(Cache.ULTIMATE_UPSCALE_SCRIPT_AVAILABLE, ultimate_sd_upscale_found)
+        cache.set(Cache.SD_UPSCALING_CONTROLNET_TILE_MODELS, tile_models)
+        cache.set(Cache.SD_UPSCALING_CONTROLNET_TILE_PREPROCESSORS,
+                  [preprocessor.serialize() for preprocessor in tile_preprocessors])
+
+        if tiled_upscaling_available:
+            try:
+                upscale_tile_control_unit = ControlNetUnit.deserialize(
+                    cache.get(Cache.SD_UPSCALING_CONTROLNET_TILE_SETTINGS), self._controlnet_key_type)
+                cache.set(Cache.SD_UPSCALING_CONTROLNET_TILE_SETTINGS, upscale_tile_control_unit.serialize())
+            except (KeyError, RuntimeError, JSONDecodeError):
+                upscale_tile_control_unit = ControlNetUnit(self._controlnet_key_type)
+                upscale_tile_control_unit.model = ControlNetModel(tile_models[0])
+                upscale_tile_control_unit.preprocessor = tile_preprocessors[0]
+                cache.set(Cache.SD_UPSCALING_CONTROLNET_TILE_SETTINGS, upscale_tile_control_unit.serialize())
+
+    def _cache_api_option_lists(self, api_data_lists: dict[str, Any]) -> None:
+        """Copies option lists shared by all Stable Diffusion generators into the cache."""
+        cache = Cache()
+        for cache_key, api_data in api_data_lists.items():
+            cache_data_type = cache.get_data_type(cache_key)
+            try:
+                if isinstance(api_data, dict):
+                    cache.set(cache_key, api_data)
+                    continue
+                assert isinstance(api_data, list)
+
+                # Sort API values.  Sampling method isn't sorted because the default order is somewhat helpful
+                # in figuring out which ones are actually useful, and because otherwise that might make DDIM
+                # the default option. We definitely don't want that, DDIM is outdated and unlikely to actually be
+                # the best option in most situations.
+                if cache_key != Cache.SAMPLING_METHOD and len(api_data) > 0 and isinstance(api_data[0], str):
+                    api_data.sort(key=lambda value: str(value).lower())
+                if cache_data_type == TYPE_LIST:
+                    cache.set(cache_key, api_data)
+                else:
+                    assert cache_data_type == TYPE_STR
+                    # Combine default options with dynamic options. This is so we can support having default
+                    # options like "any"/"none"/"auto" when appropriate.
+                    cache.restore_default_options(cache_key)
+                    option_list = cast(list, cache.get_options(cache_key))
+                    for option in api_data:
+                        if option not in option_list:
+                            option_list.append(option)
+                    cache.update_options(cache_key, option_list)
+
+            except (RuntimeError, KeyError) as err:
+                logger.error(f'Caching "{cache_key}" {cache_data_type} data failed: {err}')
+                if cache_data_type == TYPE_LIST:
+                    cache.set(cache_key, [])
+                else:
+                    assert cache_data_type == TYPE_STR
+                    cache.restore_default_options(cache_key)
+
+    def _on_api_metadata_changed(self, _endpoint: str) -> None:
+        """Schedules cached API data to reload after the webservice finds that saved metadata was out of date. Called
+           from a background thread."""
+        QTimer.singleShot(0, self._api_data_refresh_timer, self._api_data_refresh_timer.start)
+
+    def _refresh_api_data(self) -> None:
+        """Reloads option lists, generator-specific data, and ControlNet data after saved API metadata changes. Requests
+           run in the background, and results are applied back on the UI thread."""
+        webservice = self.get_webservice()
+        if not self._connected or webservice is None:
+            return
+
+        class _ApiDataTask(AsyncTask):
+            data_loaded = Signal(dict)
+
+            def signals(self) -> list[Signal]:
+                return [self.data_loaded]
+
+        def _load(data_loaded: Signal) -> None:
+            try:
+                data_loaded.emit(self._load_api_data(webservice))
+            except AuthError:
+                logger.error('Refreshing API data failed: authentication is required.')
+            except (KeyError, RuntimeError, requests.exceptions.RequestException) as err:
+                logger.error(f'Refreshing API data failed: {err}')
+
+        def _apply(api_data: dict[str, Any]) -> None:
+            if refresh_task.cancelled or not self._connected or webservice is not self.get_webservice():
+                return
+            self._apply_api_data(api_data)
+
+        refresh_task = _ApiDataTask(_load, priority=PRIORITY_BACKGROUND, key=API_DATA_REFRESH_TASK_KEY)
+        refresh_task.data_loaded.connect(_apply)
+        refresh_task.start()
+
     def disconnect_or_disable(self) -> None:
         """Closes any connections, unloads models, or otherwise turns off this generator."""
         cache = Cache()
@@ -492,17 +643,47 @@ class SDGenerator(ImageGenerator):
             self._controlnet_tab.deleteLater()
             self._controlnet_tab = None
             self._controlnet_panel = None
+        self._preview_request_key = None
+        ControlNetPreviewCache().clear()
         assert self._window is not None
         self._window.cancel_generation.disconnect(self.cancel_generation)
         self.clear_menus()
 
-    def controlnet_preprocessor_preview(self, preprocessor: ControlNetPreprocessor, image_str: str) -> None:
-        """Generates a ControlNet preprocessor preview, displaying it in a new window."""
+    def controlnet_preprocessor_preview(self, preprocessor: ControlNetPreprocessor, image_str: str,
+                                        automatic: bool = False) -> None:
+        """Generates a ControlNet preprocessor preview, displaying it in the ControlNet panel.
+
+        Previews are cached by control image, preprocessor, parameters, and resolution, and a request that matches the
+        one already in progress is ignored. Other earlier requests are cancelled.
+
+        Parameters
+        ----------
+        preprocessor: ControlNetPreprocessor
+            Preprocessor to preview, with parameter values set.
+        image_str: str
+            Control image path, or CONTROLNET_REUSE_IMAGE_CODE to use the generation area content.
+        automatic: bool, default=False
+            Whether the request was made automatically after preprocessor parameters changed. Automatic previews
+            don't block the UI with a loading state, and failures are logged without showing an error dialog.
+        """
         if image_str == CONTROLNET_REUSE_IMAGE_CODE:
             image = self.get_gen_area_image()
         else:
             image = QImage(image_str)
+        if image.isNull():
+            logger.error(f'Skipping preprocessor preview, failed to load control image "{image_str}"')
+            return
         mask = self.get_gen_area_mask()
+        preprocessor = deepcopy(preprocessor)
+        request_key = preview_key(preprocessor, image, mask)
+        cached_preview = ControlNetPreviewCache().get(request_key)
+        if cached_preview is not None:
+            assert self._controlnet_panel is not None
+            self._controlnet_panel.set_preview(cached_preview)
+            return
+        if request_key == self._preview_request_key:
+            return
+        self._preview_request_key = request_key
 
         class _AsyncPreviewTask(AsyncTask):
             status_signal = Signal(dict)
@@ -514,27 +695,42 @@ class SDGenerator(ImageGenerator):
 
         def _get_preview(status_signal: Signal, error_signal: Signal, preview_signal: Signal) -> None:
             try:
-                self.load_preprocessor_preview(preprocessor, image, mask, status_signal, preview_signal)
+                resolution = preview_resolution(preprocessor)
+                scaled_image = scale_preview_input(image, resolution)
+                scaled_mask = None if mask is None else scale_preview_input(mask, resolution)
+                self.load_preprocessor_preview(preprocessor, scaled_image, scaled_mask, status_signal, preview_signal)
             except Exception as err:
                 error_signal.emit(err)
 
+        def _finish_request() -> None:
+            if self._preview_request_key == request_key:
+                self._preview_request_key = None
+            if not automatic:
+                AppStateTracker.set_app_state(APP_STATE_EDITING)
+
         def _apply_status_update(status_dict: dict) -> None:
-            if 'progress' in status_dict:
+            if 'progress' in status_dict and not preview_task.cancelled and not automatic:
                 self._window.set_loading_message(status_dict['progress'])
 
         def _handle_error(error: Exception) -> None:
-            AppStateTracker.set_app_state(APP_STATE_EDITING)
-            show_error_dialog(self._window, ERROR_TITLE_PREPROCESSOR_PREVIEW_FAILED,
-                              ERROR_MESSAGE_PREPROCESSOR_PREVIEW_FAILED.format(err=error))
+            _finish_request()
+            if preview_task.cancelled:
+                return
+            logger.error(f'Preprocessor preview failed: {error}')
+            if not automatic:
+                show_error_dialog(self._window, ERROR_TITLE_PREPROCESSOR_PREVIEW_FAILED,
+                                  ERROR_MESSAGE_PREPROCESSOR_PREVIEW_FAILED.format(err=error))
 
         def _load_preview(preview_image: QImage) -> None:
-            AppStateTracker.set_app_state(APP_STATE_EDITING)
-            print(f'LOADED PREVIEW: {preview_image}')
-            assert self._controlnet_panel is not None
+            ControlNetPreviewCache().set(request_key, preview_image)
+            _finish_request()
+            if preview_task.cancelled or self._controlnet_panel is None:
+                return
             self._controlnet_panel.set_preview(preview_image)
 
-        AppStateTracker.set_app_state(APP_STATE_LOADING)
-        preview_task = _AsyncPreviewTask(_get_preview)
+        if not automatic:
+            AppStateTracker.set_app_state(APP_STATE_LOADING)
+        preview_task = _AsyncPreviewTask(_get_preview, priority=PRIORITY_INTERACTIVE, key=CONTROLNET_PREVIEW_TASK_KEY)
         preview_task.status_signal.connect(_apply_status_update)
         preview_task.error_signal.connect(_handle_error)
         preview_task.preview_ready.connect(_load_preview)
@@ -580,7 +776,7 @@ class SDGenerator(ImageGenerator):
                 logger.error(f'unexpected error during upscale attempt: {err}')
                 error_signal.emit(err)
 
-        task = _UpscaleTask(_upscale, True)
+        task = _UpscaleTask(_upscale, True, priority=PRIORITY_BACKGROUND)
 
         def _apply_status_update(status_dict: dict) -> None:
             if 'progress' in status_dict:
@@ -633,47 +829,75 @@ class SDGenerator(ImageGenerator):
     @menu_action(MENU_STABLE_DIFFUSION, 'lora_shortcut', 201, [APP_STATE_EDITING],
                  condition_check=_check_lora_available)
     def show_lora_window(self) -> None:
-        """Show the Lora model selection window."""
+        """Show the Lora model selection window, loading any missing thumbnails while it is open."""
         cache = Cache()
         loras = cache.get(Cache.LORA_MODELS).copy()
         if self._lora_images is None:
             self._lora_images = {}
-            AppStateTracker.set_app_state(APP_STATE_LOADING)
+        lora_window = ExtraNetworkWindow(loras, self._lora_images)
+        missing = [lora for lora in loras if lora[LORA_KEY_NAME] not in self._lora_images]
+        if len(missing) == 0:
+            lora_window.exec()
+            return
+
+        class _ThumbnailTask(AsyncTask):
+            thumbnail_ready = Signal(str, QImage)
+            thumbnail_failed = Signal(str)
 
-            class _LoadingTask(AsyncTask):
-                status = Signal(str)
+            def signals(self) -> list[Signal]:
+                return [self.thumbnail_ready, self.thumbnail_failed]
+
+        def _load_thumbnails(thumbnail_signal: Signal, failure_signal: Signal) -> None:
+            def _load(lora: dict[str, str]) -> None:
+                if task.cancelled:
+                    return
+                thumbnail = self.load_cached_lora_thumbnail(lora)
+                if thumbnail is None:
+                    failure_signal.emit(lora[LORA_KEY_NAME])
+                else:
+                    thumbnail_signal.emit(lora[LORA_KEY_NAME], thumbnail)
 
-                def signals(self) -> list[Signal]:
-                    return [self.status]
+            with ThreadPoolExecutor(max_workers=LORA_THUMBNAIL_THREADS) as executor:
+                for future in [executor.submit(_load, lora) for lora in missing]:
+                    future.result()
 
-            def _load_and_open(status_signal: Signal) -> None:
-                if self._lora_images is None:
-                    self._lora_images = {}
-                for i, lora in enumerate(loras):
-                    assert isinstance(lora, dict), f'expected dict, found {type(lora)}'
-                    status_signal.emit(f'Loading thumbnail {i + 1}/{len(loras)}')
-                    thumbnail = self.load_lora_thumbnail(lora)
-                    if thumbnail is not None and not thumbnail.isNull():
-                        self._lora_images[lora['name']] = thumbnail
+        task = _ThumbnailTask(_load_thumbnails, key=LORA_THUMBNAIL_TASK_KEY)
 
-            task = _LoadingTask(_load_and_open)
+        def _apply_thumbnail(lora_name: str, thumbnail: QImage) -> None:
+            if self._lora_images is not None:
+                self._lora_images[lora_name] = None if thumbnail.isNull() else thumbnail
+            lora_window.set_thumbnail(lora_name, thumbnail)
 
-            def _resume_and_show() -> None:
-                AppStateTracker.set_app_state(APP_STATE_EDITING)
-                assert self._lora_images is not None
-                assert self._window is not None
-                task.status.disconnect(self._window.set_loading_message)
-                task.finish_signal.disconnect(_resume_and_show)
-                delayed_lora_window = ExtraNetworkWindow(loras, self._lora_images)
-                delayed_lora_window.exec()
+        def _show_failed_thumbnail(lora_name: str) -> None:
+            # Not saved in self._lora_images, so loading is tried again the next time the window opens:
+            lora_window.set_thumbnail(lora_name, None)
 
-            assert self._window is not None
-            task.status.connect(self._window.set_loading_message)
-            task.finish_signal.connect(_resume_and_show)
-            task.start()
-        else:
-            lora_window = ExtraNetworkWindow(loras, self._lora_images)
-            lora_window.exec()
+        task.thumbnail_ready.connect(_apply_thumbnail)
+        task.thumbnail_failed.connect(_show_failed_thumbnail)
+        task.start()
+        lora_window.exec()
+        task.cancel()
+
+    def load_cached_lora_thumbnail(self, lora_info: dict[str, str]) -> Optional[QImage]:
+        """Loads a LoRA model thumbnail scaled for the LoRA window, using the persistent thumbnail cache to avoid
+           repeated requests. Returns a null QImage if the model has no thumbnail, or None if loading failed. Models
+           are only cached as having no thumbnail if the server reports that, not after failed requests. Thread-safe,
+           as long as load_lora_thumbnail is."""
+        thumbnail_cache = ThumbnailCache()
+        lora_name = lora_info[LORA_KEY_NAME]
+        version = content_hash(json.dumps(lora_info, sort_keys=True, default=str))
+        thumbnail = thumbnail_cache.get(self._server_url, lora_name, version)
+        if thumbnail is not None:
+            return thumbnail
+        thumbnail = self.load_lora_thumbnail(lora_info)
+        if thumbnail is None:
+            return None
+        if thumbnail.isNull():
+            thumbnail_cache.set(self._server_url, lora_name, version, None)
+            return thumbnail
+        thumbnail = scale_thumbnail(thumbnail)
+        thumbnail_cache.set(self._server_url, lora_name, version, thumbnail)
+        return thumbnail
 
     @menu_action(MENU_STABLE_DIFFUSION, 'lcm_mode_shortcut', 210, condition_check=_check_lcm_mode_available)
     def set_lcm_mode(self) -> None:
@@ -2,24 +2,28 @@
 import logging
 import os
 from argparse import Namespace
-from typing import Optional, Any, cast
+from typing import Optional, Any, cast, Callable
 
-from PySide6.QtCore import Signal, QSize, QThread
+from PySide6.QtCore import Signal, QSize, QTimer, Qt
 from PySide6.QtGui import QImage
 from PySide6.QtWidgets import QApplication
 from requests import ReadTimeout
 
 from src.api.a1111_webservice import A1111Webservice, AuthError, ULTIMATE_UPSCALE_SCRIPT
+from src.api.backend_metadata_cache import BackendMetadataCache
 from src.api.controlnet.controlnet_constants import ControlTypeDef
 from src.api.controlnet.controlnet_preprocessor import ControlNetPreprocessor
 from src.api.controlnet.controlnet_unit import ControlKeyType
 from src.api.webservice import WebService
+from src.api.webui.progress_monitor import WebUIProgressMonitor, split_preview_grid
+from src.api.webui.response_formats import ProgressResponseBody, ModelInfo, PromptStyleData
+from src.api.webui.script_info_types import ScriptResponseData
 from src.config.a1111_config import A1111Config
 from src.config.application_config import AppConfig
 from src.config.cache import Cache
 from src.controller.image_generation.sd_generator import SD_BASE_DESCRIPTION, STABLE_DIFFUSION_CONFIG_CATEGORY, \
     SDGenerator, INSTALLATION_STABILITY_MATRIX, GETTING_SD_MODELS, IMAGE_PREVIEW_STABILITY_MATRIX_PACKAGES, \
-    MENU_STABLE_DIFFUSION
+    MENU_STABLE_DIFFUSION, UPSCALE_CHUNK_STATUS
 from src.image.layers.image_stack import ImageStack
 from src.ui.modal.modal_utils import show_error_dialog
 from src.ui.modal.settings_modal import SettingsModal
@@ -190,7 +194,6 @@ SD_WEBUI_GENERATOR_SETUP = SD_WEBUI_GENERATOR_SETUP_OPTIONS + SD_WEBUI_GENERATOR
 
 SD_PREVIEW_IMAGE = f'{PROJECT_DIR}/resources/generator_preview/stable-diffusion.png'
 ICON_PATH_CONTROLNET_TAB = f'{PROJECT_DIR}/resources/icons/tabs/hex.svg'
-DEFAULT_WEBUI_URL = 'http://localhost:7860'
 AUTH_ERROR_DETAIL_KEY = 'detail'
 STYLE_ERROR_TITLE = _tr('Updating prompt styles failed')
 
@@ -201,11 +204,6 @@ ERROR_MESSAGE_SETTINGS_LOAD_FAILED = _tr('The connection to the Stable Diffusion
 ERROR_MESSAGE_SETTINGS_SAVE_FAILED = _tr('The connection to the Stable Diffusion WebUI image generator was lost. '
                                          'Any changes to connected generator settings were not saved.')
 
-MAX_ERROR_COUNT = 10
-MIN_RETRY_US = 300000
-MAX_RETRY_US = 60000000
-
-
 def _check_prompt_styles_available(_) -> bool:
     cache = Cache()
     return len(cache.get(Cache.STYLES)) > 0
@@ -221,7 +219,7 @@ class SDWebUIGenerator(SDGenerator):
 
     def __init__(self, window: MainWindow, image_stack: ImageStack, args: Namespace) -> None:
         super().__init__(window, image_stack, args, Cache.SD_WEBUI_SERVER_URL, ControlKeyType.WEBUI, True)
-        self._webservice: Optional[A1111Webservice] = A1111Webservice(self.server_url)
+        self._webservice: Optional[A1111Webservice] = A1111Webservice(self.server_url, BackendMetadataCache())
         self._gen_extras_tab = WebUIExtrasTab()
         self._active_task_id = 0
 
@@ -253,7 +251,7 @@ class SDWebUIGenerator(SDGenerator):
                 return self._webservice
             self._webservice.disconnect()
             self._webservice = None
-        self._webservice = A1111Webservice(url)
+        self._webservice = A1111Webservice(url, BackendMetadataCache())
         return self._webservice
 
     def get_controlnet_preprocessors(self) -> list[ControlNetPreprocessor]:
@@ -331,11 +329,33 @@ class SDWebUIGenerator(SDGenerator):
         script_list = Cache().get(Cache.SCRIPTS_IMG2IMG)
         return ULTIMATE_UPSCALE_SCRIPT in script_list
 
-    def cache_generator_specific_data(self) -> None:
-        """When activating the generator, after the webservice is connected, this method should be implemented to
-           load and cache any generator-specific API data."""
+    def load_generator_specific_data(self) -> dict[str, Any]:
+        """Requests WebUI models, scripts, styles, and settings. This makes blocking network requests without changing
+           any cached data, so it can run on any thread."""
         assert self._webservice is not None
+        webservice = self._webservice
+        api_data: dict[str, Any] = webservice.run_concurrently({
+            'models': webservice.get_models,
+            'scripts': webservice.get_scripts,
+            'styles': webservice.get_styles
+        }, return_exceptions=True)
+        try:
+            api_data['config'] = A1111Config.request_all(webservice)
+        except (RuntimeError, KeyError) as err:
+            api_data['config'] = err
+        return api_data
+
+    def apply_generator_specific_data(self, api_data: dict[str, Any]) -> None:
+        """Copies data returned by load_generator_specific_data into the cache, and connects cached model and CLIP
+           skip values to the WebUI's settings."""
         cache = Cache()
+
+        def _api_result(key: str) -> Any:
+            result = api_data[key]
+            if isinstance(result, Exception):
+                raise result
+            return result
+
         try:
             # Synchronize local config options with remote WebUI settings:
             for cross_config_key in (Cache.SD_MODEL, Cache.CLIP_SKIP):
@@ -345,9 +365,9 @@ class SDWebUIGenerator(SDGenerator):
                     pass  # No previous connection to remove, which isn't a problem here.
 
             webui_config = A1111Config()
-            webui_config.load_all(self._webservice)
+            webui_config.apply_all(_api_result('config'))
             current_model_title = webui_config.get(A1111Config.SD_MODEL_CHECKPOINT)
-            model_options = self._webservice.get_models()
+            model_options = cast(list[ModelInfo], _api_result('models'))
             for model in model_options:
                 if model['title'] == current_model_title:
                     cache.set(Cache.SD_MODEL, model['model_name'])
@@ -399,7 +419,7 @@ class SDWebUIGenerator(SDGenerator):
         except (RuntimeError, KeyError) as err:
             logger.error(f'Loading WebUI model connection failed: {err}')
         try:
-            scripts = self._webservice.get_scripts()
+            scripts = cast(ScriptResponseData, _api_result('scripts'))
             if 'txt2img' in scripts:
                 cache.set(Cache.SCRIPTS_TXT2IMG, scripts['txt2img'])
             if 'img2img' in scripts:
@@ -407,7 +427,7 @@ class SDWebUIGenerator(SDGenerator):
         except (KeyError, RuntimeError) as err:
             logger.error(f'error loading scripts from {self._server_url}: {err}')
         try:
-            styles = self._webservice.get_styles()
+            styles = cast(list[PromptStyleData], _api_result('styles'))
             cache.set(Cache.STYLES, styles)
         except (KeyError, RuntimeError) as err:
             logger.error(f'error loading prompt styles from {self._server_url}: {err}')
@@ -419,15 +439,17 @@ class SDWebUIGenerator(SDGenerator):
             cache.set(list_key, [])
 
     def load_lora_thumbnail(self, lora_info: Optional[dict[str, str]]) -> Optional[QImage]:
-        """Attempt to load a LoRA model thumbnail image from the API."""
+        """Attempt to load a LoRA model thumbnail image from the API. Returns a null QImage if the model has no
+           thumbnail, or None if loading failed."""
         if lora_info is None:
             return None
+        path = lora_info.get('path', '')
+        if '.' not in path:
+            return QImage()
         try:
             assert self._webservice is not None
-            path = lora_info['path']
-            path = path[:path.rindex('.')] + '.png'
-            return self._webservice.get_thumbnail(path)
-        except (KeyError, RuntimeError) as err:
+            return self._webservice.get_thumbnail(path[:path.rindex('.')] + '.png')
+        except RuntimeError as err:
             logger.error(f'error loading LoRA thumbnail from {self._server_url}: {err}')
             return None
 
@@ -443,7 +465,7 @@ class SDWebUIGenerator(SDGenerator):
     def is_available(self) -> bool:
         """Returns whether the generator is supported on the current system."""
         if self._webservice is None:
-            self._webservice = A1111Webservice(self._server_url)
+            self._webservice = A1111Webservice(self._server_url, BackendMetadataCache())
         try:
             # Login automatically if username/password are defined as env variables.
             if 'SD_UNAME' in os.environ and 'SD_PASS' in os.environ:
@@ -603,76 +625,63 @@ class SDWebUIGenerator(SDGenerator):
             self._control_panel.add_extras_tab(self._gen_extras_tab)
         return self._control_panel
 
-    def _async_progress_check(self, external_status_signal: Optional[Signal] = None):
+    def _async_progress_check(self, external_status_signal: Optional[Signal] = None,
+                              show_previews: bool = False) -> Callable[[], None]:
+        """Forwards progress updates from the shared progress monitor until the active operation finishes, returning a
+           function that stops the updates early."""
         webservice = self._webservice
         assert webservice is not None
+        monitor = WebUIProgressMonitor.for_webservice(webservice)
         self._active_task_id += 1
-        generator = self
-
-        class _ProgressTask(AsyncTask):
-            status_signal = Signal(dict)
+        task_id = self._active_task_id
+        max_progress = 0
+
+        def _stop() -> None:
+            monitor.remove_listener(_progress_listener)
+
+        def _progress_listener(status: ProgressResponseBody, preview: Optional[QImage]) -> None:
+            nonlocal max_progress
+            progress_percent = int(status['progress'] * 100)
+            if progress_percent < max_progress or progress_percent >= 100 or self._active_task_id != task_id:
+                _stop()
+                return
+            if preview is not None:
+                self._show_progress_preview(preview, status)
+            if progress_percent <= 1:
+                return
+            status_text = f'{progress_percent}%'
+            max_progress = progress_percent
+            if 'eta_relative' in status and status['eta_relative'] != 0 and 0 < progress_percent < 100:
+                eta_sec = status['eta_relative']
+                minutes = round(eta_sec // 60)
+                seconds = round(eta_sec % 60)
+                if minutes > 0:
+                    seconds_str = str(seconds)
+                    if len(seconds_str) == 1:
+                        seconds_str = '0' + seconds_str
+                    status_text = f'{status_text} ETA: {minutes}:{seconds_str}'
+                else:
+                    status_text = f'{status_text} ETA: {seconds}s'
+            status_update = {'progress': status_text}
+            if external_status_signal is not None:
+                external_status_signal.emit(status_update)
+            else:
+                QTimer.singleShot(0, self._window, lambda: self._apply_status_update(status_update))
 
-            def __init__(self, task_id: int) -> None:
-                super().__init__(self._check_progress)
-                self._id = task_id
-                self.should_stop = False
+        monitor.add_listener(_progress_listener, show_previews)
+        return _stop
 
-            def signals(self) -> list[Signal]:
-                return [external_status_signal if external_status_signal is not None else self.status_signal]
-
-            def _check_progress(self, status_signal) -> None:
-                error_count = 0
-                max_progress = 0
-                while not self.should_stop:
-                    sleep_time = min(MIN_RETRY_US * pow(2, error_count), MAX_RETRY_US)
-                    thread = QThread.currentThread()
-                    assert thread is not None
-                    thread.usleep(sleep_time)
-                    try:
-                        assert webservice is not None
-                        status = webservice.progress_check()
-                        progress_percent = int(status['progress'] * 100)
-                        if (progress_percent < max_progress or progress_percent >= 100
-                                or generator._active_task_id != self._id):
-                            break
-                        if progress_percent <= 1:
-                            continue
-                        status_text = f'{progress_percent}%'
-                        max_progress = progress_percent
-                        if 'eta_relative' in status and status['eta_relative'] != 0 \
-                                and 0 < progress_percent < 100:
-                            eta_sec = status['eta_relative']
-                            minutes = round(eta_sec // 60)
-                            seconds = round(eta_sec % 60)
-                            if minutes > 0:
-                                seconds_str = str(seconds)
-                                if len(seconds_str) == 1:
-                                    seconds_str = '0' + seconds_str
-                                status_text = f'{status_text} ETA: {minutes}:{seconds_str}'
-                            else:
-                                status_text = f'{status_text} ETA: {seconds}s'
-                        status_signal.emit({'progress': status_text})
-                    except ReadTimeout:
-                        error_count += 1
-                    except RuntimeError as err:
-                        error_count += 1
-                        logger.error(f'Error {error_count}: {err}')
-                        if error_count > MAX_ERROR_COUNT:
-                            logger.error('Inpainting failed, reached max retries.')
-                            break
-                        continue
-
-        task = _ProgressTask(self._active_task_id)
-        assert self._window is not None
-        if external_status_signal is None:
-            task.status_signal.connect(self._apply_status_update)
-
-            def _finish():
-                task.status_signal.disconnect(self._apply_status_update)
-                task.finish_signal.disconnect(_finish)
-
-            task.finish_signal.connect(_finish)
-        task.start()
+    def _show_progress_preview(self, preview: QImage, status: ProgressResponseBody) -> None:
+        """Splits a progress preview into individual image previews, and loads them into the image selector."""
+        cache = Cache()
+        batch_size = cache.get(Cache.BATCH_SIZE)
+        generation_size = cache.get(Cache.GENERATION_SIZE)
+        first_index = max(0, status['state'].get('job_no', 0)) * batch_size
+        for i, image_preview in enumerate(split_preview_grid(preview, batch_size, generation_size)):
+            if image_preview.size() != generation_size:
+                image_preview = image_preview.scaled(generation_size, Qt.AspectRatioMode.IgnoreAspectRatio,
+                                                     Qt.TransformationMode.SmoothTransformation)
+            self._load_preview_image(image_preview, first_index + i)
 
     def cancel_generation(self) -> None:
         """Cancels image generation, if in-progress"""
@@ -711,12 +720,15 @@ class SDWebUIGenerator(SDGenerator):
             init_data = self._webservice.progress_check()
             if init_data['current_image'] is not None:
                 raise RuntimeError(ERROR_MESSAGE_EXISTING_OPERATION)
-            self._async_progress_check(status_signal)
-            if edit_mode == EDIT_MODE_TXT2IMG:
-                image_response = self._webservice.txt2img(control_image=source_image)
-            else:
-                assert source_image is not None
-                image_response = self._webservice.img2img(source_image, mask=mask_image)
+            stop_progress_check = self._async_progress_check(status_signal, show_previews=True)
+            try:
+                if edit_mode == EDIT_MODE_TXT2IMG:
+                    image_response = self._webservice.txt2img(control_image=source_image)
+                else:
+                    assert source_image is not None
+                    image_response = self._webservice.img2img(source_image, mask=mask_image)
+            finally:
+                stop_progress_check()
             image_data = image_response['images']
             info = image_response['info']
             for i, response_image in enumerate(image_data):
@@ -741,14 +753,20 @@ class SDWebUIGenerator(SDGenerator):
 
     def upscale_image(self, image: QImage, new_size: QSize, status_signal: Signal, image_signal: Signal) -> None:
         """Upscales an image using cached upscaling settings."""
-        assert self._webservice is not None
-        image_response = self._webservice.upscale(self._image_stack.qimage(), new_size.width(),
-                                                  new_size.height())
-        images = image_response['images']
-        info = image_response['info']
-        if info is not None:
-            logger.debug(f'Upscaling result info: {info}')
-        image_signal.emit(images[-1])
+        webservice = self._webservice
+        assert webservice is not None
+
+        def _upscale_chunk(chunk: QImage, chunk_size: QSize, chunk_index: int, chunk_count: int) -> QImage:
+            if chunk_count > 1:
+                status_signal.emit({'progress': UPSCALE_CHUNK_STATUS.format(chunk_num=chunk_index + 1,
+                                                                            chunk_count=chunk_count)})
+            image_response = webservice.upscale(chunk, chunk_size.width(), chunk_size.height())
+            info = image_response['info']
+            if info is not None:
+                logger.debug(f'Upscaling result info: {info}')
+            return image_response['images'][-1]
+
+        image_signal.emit(self._upscale_in_chunks(image, new_size, _upscale_chunk))
 
     @menu_action(MENU_STABLE_DIFFUSION, 'prompt_style_shortcut', 200, [APP_STATE_EDITING],
                  condition_check=_check_prompt_styles_available)
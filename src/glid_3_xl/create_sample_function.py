@@ -13,10 +13,10 @@ from PIL import Image, ImageOps
 # noinspection PyPackageRequirements
 from torchvision import transforms
 # noinspection PyPep8Naming,PyPackageRequirements
-from torchvision.transforms import functional as TF
-# noinspection PyPep8Naming,PyPackageRequirements
 from torch.nn import functional as F
 from src.glid_3_xl.encoders.modules import MakeCutouts
+from src.glid_3_xl.latent_cache import LatentCache
+from src.glid_3_xl.text_embedding_cache import TextEmbeddingCache
 
 
 # noinspection PyUnusedLocal
@@ -51,48 +51,77 @@ def create_sample_function(
         ddim=False):
     """
     Creates a function that will generate a set of sample images, along with an accompanying clip ranking function.
+
+    The prompt, negative, guidance_scale, edit, and mask parameters may each be either a single value used for the
+    entire batch, or a list with one value per batch item.  This allows requests with compatible sizes and step counts
+    to be merged into a single batch.  Each unique prompt is encoded only once, and text embeddings are cached between
+    calls.  The CLIP model is only used if the model uses CLIP embeddings, CLIP guidance is enabled, or the returned
+    clip ranking function is called, so it may be loaded lazily.
     """
-    # bert context
-    text_emb = bert_model.encode([prompt] * batch_size).to(device).float()
-    text_blank = bert_model.encode([negative] * batch_size).to(device).float()
+    def _batch_values(value, name):
+        if isinstance(value, (list, tuple)):
+            if len(value) != batch_size:
+                raise ValueError(f'Expected {batch_size} {name} values, found {len(value)}')
+            return list(value)
+        return [value] * batch_size
+
+    prompts = _batch_values(prompt, 'prompt')
+    negatives = _batch_values(negative, 'negative')
+    guidance_scales = torch.tensor(_batch_values(guidance_scale, 'guidance_scale'), device=device,
+                                   dtype=torch.float).view(-1, 1, 1, 1)
+
+    embedding_cache = TextEmbeddingCache()
+
+    def _bert_encode(texts):
+        return bert_model.encode(texts).to(device).float().detach()
+
+    def _clip_encode(texts):
+        return clip_model.encode_text(clip.tokenize(texts, truncate=True).to(device)).detach()
 
-    text = clip.tokenize([prompt] * batch_size, truncate=True).to(device)
-    text_clip_blank = clip.tokenize([negative] * batch_size, truncate=True).to(device)
+    # bert context, encoding prompts and negatives together so each encoder runs at most once:
+    bert_embeddings = embedding_cache.encode('bert', bert_model, prompts + negatives, _bert_encode)
+    text_emb = torch.cat(bert_embeddings[:batch_size], dim=0)
+    text_blank = torch.cat(bert_embeddings[batch_size:], dim=0)
 
     # clip context
-    text_emb_clip = clip_model.encode_text(text)
-    text_emb_clip_blank = clip_model.encode_text(text_clip_blank)
+    text_emb_clip = None
+    text_emb_clip_blank = None
+    if model_params['clip_embed_dim'] or clip_guidance:
+        clip_embeddings = embedding_cache.encode('clip', clip_model, prompts + negatives, _clip_encode)
+        text_emb_clip = torch.cat(clip_embeddings[:batch_size], dim=0)
+        text_emb_clip_blank = torch.cat(clip_embeddings[batch_size:], dim=0)
     if clip_guidance and not clip_guidance_scale:
         clip_guidance_scale = 150
 
-    make_cutouts = MakeCutouts(clip_model.visual.input_resolution, cutn)
-
-    text_emb_norm = text_emb_clip[0] / text_emb_clip[0].norm(dim=-1, keepdim=True)
+    make_cutouts = MakeCutouts(clip_model.visual.input_resolution, cutn) if clip_guidance else None
 
     image_embed = None
 
-    # image context
-    if edit:
+    def _encode_latent(pil_image):
+        image_tensor = transforms.ToTensor()(pil_image).unsqueeze(0).to(device)
+        return ldm_model.encode(2 * image_tensor - 1).sample().detach()
+
+    def _encode_edit(item_edit, item_mask):
+        """Encodes one edited image and mask as a masked latent image.  Edit image latents are cached, so repeated
+           requests using the same image skip the autoencoder."""
         input_image = torch.zeros(1, 4, height // 8, width // 8, device=device)
         input_image_pil = None
         np_image = None
-        if isinstance(edit, Image.Image):
+        if isinstance(item_edit, Image.Image):
             input_image = torch.zeros(1, 4, height // 8, width // 8, device=device)
-            input_image_pil = edit
-        elif isinstance(edit, str) and edit.endswith('.npy'):
-            with open(edit, 'rb') as f:
+            input_image_pil = item_edit
+        elif isinstance(item_edit, str) and item_edit.endswith('.npy'):
+            with open(item_edit, 'rb') as f:
                 np_image = np.load(f)
                 np_image = torch.from_numpy(np_image).unsqueeze(0).to(device)
                 input_image = torch.zeros(1, 4, height // 8, width // 8, device=device)
-        elif isinstance(edit, str):
+        elif isinstance(item_edit, str):
             w = edit_width if edit_width else width
             h = edit_height if edit_height else height
-            input_image_pil = Image.open(fetch(edit)).convert('RGB')
+            input_image_pil = Image.open(fetch(item_edit)).convert('RGB')
             input_image_pil = ImageOps.fit(input_image_pil, (w, h))
         if input_image_pil is not None:
-            np_image = transforms.ToTensor()(input_image_pil).unsqueeze(0).to(device)
-            np_image = 2 * np_image - 1
-            np_image = ldm_model.encode(np_image).sample()
+            np_image = LatentCache().encode(ldm_model, input_image_pil, _encode_latent)
 
         y = edit_y // 8
         x = edit_x // 8
@@ -114,26 +143,34 @@ def create_sample_function(
 
         input_image[0, :, y_in_min:y_in_max, x_in_min:x_in_max] = np_image[:, :, y_out_min:y_out_max,
                                                                                  x_out_min:x_out_max]
-        input_image_pil = ldm_model.decode(input_image)
-        input_image_pil = TF.to_pil_image(input_image_pil.squeeze(0).add(1).div(2).clamp(0, 1))
         input_image *= 0.18215
 
-        if isinstance(mask, Image.Image):
-            mask_image = mask.convert('L').point(lambda p: 255 if p < 1 else 0)
-            mask_image.save('mask.png')
+        if isinstance(item_mask, Image.Image):
+            mask_image = item_mask.convert('L').point(lambda p: 255 if p < 1 else 0)
             mask_image = mask_image.resize((width // 8, height // 8), Image.Resampling.LANCZOS)
-            mask = transforms.ToTensor()(mask_image).unsqueeze(0).to(device)
-        elif isinstance(edit, str):
-            mask_image = Image.open(fetch(mask)).convert('L')
+            item_mask = transforms.ToTensor()(mask_image).unsqueeze(0).to(device)
+        elif isinstance(item_edit, str):
+            mask_image = Image.open(fetch(item_mask)).convert('L')
             mask_image = mask_image.resize((width // 8, height // 8), Image.Resampling.LANCZOS)
-            mask = transforms.ToTensor()(mask_image).unsqueeze(0).to(device)
+            item_mask = transforms.ToTensor()(mask_image).unsqueeze(0).to(device)
         else:
-            raise ValueError(f'Expected PIL image or image path for mask, found {mask}')
-        mask1 = mask > 0.5
+            raise ValueError(f'Expected PIL image or image path for mask, found {item_mask}')
+        mask1 = item_mask > 0.5
         mask1 = mask1.float()
         input_image *= mask1
+        return input_image
 
-        image_embed = torch.cat(batch_size * 2 * [input_image], dim=0).float()
+    # image context
+    if edit:
+        # Identical edit/mask pairs are shared between batch items, so only encode each pair once:
+        encoded_edits = {}
+        input_images = []
+        for item_edit, item_mask in zip(_batch_values(edit, 'edit'), _batch_values(mask, 'mask')):
+            edit_key = (id(item_edit), id(item_mask))
+            if edit_key not in encoded_edits:
+                encoded_edits[edit_key] = _encode_edit(item_edit, item_mask)
+            input_images.append(encoded_edits[edit_key])
+        image_embed = torch.cat(input_images * 2, dim=0).float()
     elif model_params['image_condition']:
         # using inpaint model but no image is provided
         image_embed = torch.zeros(batch_size * 2, 4, height // 8, width // 8, device=device)
@@ -153,7 +190,7 @@ def create_sample_function(
         model_out = model(combined, ts, **kwargs)
         eps, rest = model_out[:, :3], model_out[:, 3:]
         cond_eps, uncond_eps = torch.split(eps, len(eps) // 2, dim=0)
-        half_eps = uncond_eps + guidance_scale * (cond_eps - uncond_eps)
+        half_eps = uncond_eps + guidance_scales * (cond_eps - uncond_eps)
         eps = torch.cat([half_eps, half_eps], dim=0)
         return torch.cat([eps, rest], dim=1)
 
@@ -224,6 +261,8 @@ def create_sample_function(
     # noinspection PyShadowingNames
     def clip_score_fn(image):
         """Provides a CLIP score ranking image closeness to text"""
+        prompt_emb = embedding_cache.encode('clip', clip_model, prompts[:1], _clip_encode)[0]
+        text_emb_norm = prompt_emb[0] / prompt_emb[0].norm(dim=-1, keepdim=True)
         image_emb = clip_model.encode_image(clip_preprocess(image).unsqueeze(0).to(device))
         image_emb_norm = image_emb / image_emb.norm(dim=-1, keepdim=True)
         similarity = torch.nn.functional.cosine_similarity(image_emb_norm, text_emb_norm, dim=-1)
@@ -20,7 +20,11 @@ def generate_samples(
         height=256,
         init_image=None,
         clip_score_fn=None):
-    """Given a sample generation function and a sample save function, start generating image samples."""
+    """Given a sample generation function and a sample save function, start generating image samples.
+
+    save_sample is called with (batch_index, sample, clip_score_fn=None, preview=False). Every fifth intermediate sample
+    is passed with preview=True, so that it can be converted into a progress preview without a full autoencoder decode.
+    """
     if init_image:
         init = Image.open(init_image).convert('RGB')
         init = init.resize((int(width), int(height)), Image.Resampling.LANCZOS)
@@ -35,6 +39,6 @@ def generate_samples(
             sample = None
             for j, sample in enumerate(samples):
                 if j % 5 == 0 and j != diffusion.num_timesteps - 1:
-                    save_sample(i, sample)
+                    save_sample(i, sample, preview=True)
             if sample is not None:
                 save_sample(i, sample, clip_score_fn)
@@ -0,0 +1,349 @@
+"""
+Queues GLID-3-XL image generation requests from multiple clients, merging compatible requests into shared batches.
+
+Each request becomes a job, split into passes of job.batch_size images.  Whenever the GPU is free, the queue takes the
+oldest unfinished job, then fills the rest of the batch with passes from any queued jobs that share the same image size,
+step count, and CLIP guidance cutout count.  This module does not depend on torch, so that queue behavior can be tested
+without loading any models.
+"""
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from enum import StrEnum
+from typing import Any, Callable, Optional
+
+# Maximum number of images generated together when merging job passes:
+MAX_MERGED_BATCH_SIZE = 8
+
+# Finished, failed, or cancelled jobs kept so that clients can still load their samples:
+MAX_STORED_JOBS = 32
+
+# Default number of cutouts used for CLIP guidance:
+DEFAULT_CUTN = 16
+
+
+class JobStatus(StrEnum):
+    """Sample generation job states."""
+    QUEUED = 'queued'
+    ACTIVE = 'active'
+    FINISHED = 'finished'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+
+
+class BatchCancelled(Exception):
+    """Raised while generating a batch to stop generation early after all jobs in the batch are cancelled."""
+
+
+@dataclass
+class SampleJob:
+    """A single client request for generated images.
+
+    SampleJob.params:
+        Per-item job parameters used when creating sample functions.  The queue does not read these.  Parameters that
+        apply to an entire merged batch are stored as separate fields, and included in the merge key.
+    SampleJob.created_at, SampleJob.started_at, SampleJob.finished_at:
+        Times when the job was added, when its first pass started, and when it finished, failed, or was cancelled, as
+        returned by time.time().
+    SampleJob.samples:
+        Maps sample names to dicts with unencoded 'image' objects and 'timestamp' floats.  Each saved image gets a new
+        dict, so encoded copies of an image may be cached in its sample dict.
+    """
+    job_id: str
+    params: dict[str, Any]
+    batch_size: int
+    num_batches: int
+    width: int
+    height: int
+    skip_steps: int
+    cutn: int
+    status: JobStatus = JobStatus.QUEUED
+    error: Optional[str] = None
+    next_pass: int = 0
+    completed_passes: int = 0
+    samples: dict[str, dict[str, Any]] = field(default_factory=dict)
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def merge_key(self) -> tuple[int, int, int, int]:
+        """Jobs may be merged into the same batch only if they have the same merge key. This must include every job
+           property that is shared by the entire batch."""
+        return self.width, self.height, self.skip_steps, self.cutn
+
+    @property
+    def is_done(self) -> bool:
+        """Returns whether the job will not generate any more samples."""
+        return self.status in (JobStatus.FINISHED, JobStatus.FAILED, JobStatus.CANCELLED)
+
+    @property
+    def has_pending_passes(self) -> bool:
+        """Returns whether the job has passes that have not been started."""
+        return not self.is_done and self.next_pass < self.num_batches
+
+    @property
+    def in_progress(self) -> bool:
+        """Returns whether the job is queued or active."""
+        return not self.is_done
+
+    @property
+    def elapsed_time(self) -> float:
+        """Returns the time in seconds from when the job was added until it finished, or until now if the job is
+           still in progress."""
+        end_time = self.finished_at if self.finished_at is not None else time.time()
+        return end_time - self.created_at
+
+
+@dataclass
+class JobPass:
+    """One pass of job.batch_size samples from a job, scheduled as part of a batch.
+
+    JobPass.first_index:
+        Index of this pass's first item within the merged batch.
+    """
+    job: SampleJob
+    pass_index: int
+    first_index: int
+
+    def sample_name(self, item_index: int) -> str:
+        """Returns the name used to store a sample generated for one of the pass's batch items."""
+        return f'{self.pass_index * self.job.batch_size + item_index:05}'
+
+
+class SampleJobQueue:
+    """Runs queued sample generation jobs one batch at a time on a worker thread."""
+
+    def __init__(self, run_batch: Callable[[list[JobPass], int], None],
+                 max_batch_size: int = MAX_MERGED_BATCH_SIZE) -> None:
+        """
+        Parameters
+        ----------
+        run_batch: Callable[[list[JobPass], int], None]
+            Function that generates samples for a list of job passes, with the total batch size as the second
+            parameter. Generated samples should be passed to save_sample. Exceptions raised by this function mark all
+            jobs in the batch as failed.
+        max_batch_size: int, default=MAX_MERGED_BATCH_SIZE
+            Maximum number of images to merge into a single batch. Single passes with a larger batch size are not
+            merged with anything.
+        """
+        self._run_batch = run_batch
+        self._max_batch_size = max_batch_size
+        self._jobs: dict[str, SampleJob] = {}
+        self._condition = threading.Condition()
+        self._latest_job_id: Optional[str] = None
+        self._update_count = 0
+        self._worker: Optional[threading.Thread] = None
+        self._stopped = False
+
+    def start(self) -> None:
+        """Starts processing queued jobs on the worker thread."""
+        with self._condition:
+            if self._worker is not None:
+                return
+            self._stopped = False
+            self._worker = threading.Thread(target=self._process_jobs, daemon=True)
+            self._worker.start()
+
+    def stop(self) -> None:
+        """Stops the worker thread after any active batch finishes."""
+        with self._condition:
+            self._stopped = True
+            worker = self._worker
+            self._worker = None
+            self._condition.notify_all()
+        if worker is not None and worker is not threading.current_thread():
+            worker.join()
+
+    def add_job(self, params: dict[str, Any], batch_size: int, num_batches: int, width: int, height: int,
+                skip_steps: int, cutn: int = DEFAULT_CUTN) -> SampleJob:
+        """Adds a new job to the end of the queue, and returns it."""
+        if batch_size < 1 or num_batches < 1:
+            raise ValueError(f'Invalid batch_size={batch_size}, num_batches={num_batches}')
+        job = SampleJob(str(uuid.uuid4()), params, batch_size, num_batches, width, height, skip_steps, cutn)
+        with self._condition:
+            self._jobs[job.job_id] = job
+            self._latest_job_id = job.job_id
+            self._prune_stored_jobs()
+            self._condition.notify_all()
+        return job
+
+    def get_job(self, job_id: Optional[str] = None) -> Optional[SampleJob]:
+        """Returns a job by ID, or the most recently added job if no ID is provided."""
+        with self._condition:
+            if job_id is None:
+                job_id = self._latest_job_id
+            return None if job_id is None else self._jobs.get(job_id, None)
+
+    def list_jobs(self) -> list[SampleJob]:
+        """Returns all stored jobs, in the order they were added."""
+        with self._condition:
+            return list(self._jobs.values())
+
+    def cancel_job(self, job_id: str) -> bool:
+        """Cancels a job, returning whether a queued or active job with the given ID was found."""
+        with self._condition:
+            job = self._jobs.get(job_id, None)
+            if job is None or job.is_done:
+                return False
+            job.status = JobStatus.CANCELLED
+            job.finished_at = time.time()
+            self._notify_updated()
+            return True
+
+    def queue_position(self, job_id: str) -> Optional[int]:
+        """Returns the number of unfinished jobs ahead of a job in the queue, or None if the job is not in progress.
+           Active jobs always have position zero."""
+        with self._condition:
+            job = self._jobs.get(job_id, None)
+            if job is None or job.is_done:
+                return None
+            if job.status == JobStatus.ACTIVE:
+                return 0
+            position = 0
+            for queued_job in self._jobs.values():
+                if queued_job is job:
+                    return position
+                if queued_job.in_progress:
+                    position += 1
+            return None
+
+    @property
+    def update_count(self) -> int:
+        """Returns a counter that increases whenever a sample is saved or any job's status changes."""
+        with self._condition:
+            return self._update_count
+
+    def wait_for_update(self, last_update: int, timeout: Optional[float] = None) -> int:
+        """Blocks until update_count differs from last_update or the timeout expires, then returns update_count."""
+        with self._condition:
+            self._condition.wait_for(lambda: self._update_count != last_update or self._stopped, timeout)
+            return self._update_count
+
+    def save_sample(self, job_pass: JobPass, item_index: int, image: Any) -> None:
+        """Saves a generated sample for one item in a job pass, unless the job was cancelled.  Images are stored
+           as-is, so that encoding them doesn't hold up generation or other requests."""
+        with self._condition:
+            if job_pass.job.status == JobStatus.CANCELLED:
+                return
+            job_pass.job.samples[job_pass.sample_name(item_index)] = {
+                'image': image,
+                'timestamp': datetime.timestamp(datetime.now())
+            }
+            self._notify_updated()
+
+    def check_cancelled(self, job_passes: list[JobPass]) -> None:
+        """Raises BatchCancelled if every job in a batch has been cancelled."""
+        with self._condition:
+            if all(job_pass.job.status == JobStatus.CANCELLED for job_pass in job_passes):
+                raise BatchCancelled()
+
+    def updated_samples(self, job: SampleJob, known_samples: dict[str, float],
+                        encode_image: Optional[Callable[[dict[str, Any]], Any]] = None) -> dict[str, Any]:
+        """Returns a /sample endpoint response with all job samples that are missing from or newer than
+           known_samples, along with the job's status, error, and queue position.
+
+        Parameters
+        ----------
+        job: SampleJob
+            Job to check for updates.
+        known_samples: dict[str, float]
+            Timestamps of samples that the client already has, by sample name.
+        encode_image: Callable[[dict[str, Any]], Any], optional
+            If provided, each returned sample's 'image' is replaced with the result of calling this function on the
+            stored sample dict.  Encoding happens after the queue lock is released.
+        """
+        response: dict[str, Any] = {'samples': {}, 'job_id': job.job_id}
+        with self._condition:
+            for name, sample in job.samples.items():
+                if name not in known_samples or known_samples[name] < sample['timestamp']:
+                    response['samples'][name] = sample
+            if job.error is not None:
+                response['error'] = job.error
+            response['status'] = job.status.value
+            response['in_progress'] = job.in_progress
+            response['queue_position'] = self.queue_position(job.job_id)
+            response['elapsed_time'] = job.elapsed_time
+        if encode_image is not None:
+            response['samples'] = {name: {'image': encode_image(sample), 'timestamp': sample['timestamp']}
+                                   for name, sample in response['samples'].items()}
+        return response
+
+    def _take_next_batch(self) -> tuple[list[JobPass], int]:
+        """Selects passes for the next batch, marking their jobs as active. Must be called while holding the lock."""
+        first_job = next((job for job in self._jobs.values() if job.has_pending_passes), None)
+        if first_job is None:
+            return [], 0
+        job_passes: list[JobPass] = []
+        batch_size = 0
+        for job in self._jobs.values():
+            if job.merge_key != first_job.merge_key:
+                continue
+            while job.has_pending_passes and (batch_size == 0
+                                              or batch_size + job.batch_size <= self._max_batch_size):
+                job_passes.append(JobPass(job, job.next_pass, batch_size))
+                job.next_pass += 1
+                job.status = JobStatus.ACTIVE
+                if job.started_at is None:
+                    job.started_at = time.time()
+                batch_size += job.batch_size
+            if batch_size >= self._max_batch_size:
+                break
+        self._notify_updated()
+        return job_passes, batch_size
+
+    def _process_jobs(self) -> None:
+        while True:
+            with self._condition:
+                job_passes, batch_size = self._take_next_batch()
+                while len(job_passes) == 0 and not self._stopped:
+                    self._condition.wait()
+                    job_passes, batch_size = self._take_next_batch()
+                if self._stopped:
+                    for job_pass in job_passes:
+                        job_pass.job.next_pass -= 1
+                    return
+            error: Optional[str] = None
+            try:
+                self._run_batch(job_passes, batch_size)
+            except BatchCancelled:
+                pass
+            except Exception as err:  # pylint: disable=broad-exception-caught
+                error = f'sample generation error: {err}'
+                print(error)
+            with self._condition:
+                for job_pass in job_passes:
+                    job = job_pass.job
+                    if job.is_done:
+                        continue
+                    if error is not None:
+                        job.status = JobStatus.FAILED
+                        job.error = error
+                    else:
+                        job.completed_passes += 1
+                        if job.completed_passes >= job.num_batches:
+                            job.status = JobStatus.FINISHED
+                        elif job.next_pass == job.completed_passes:
+                            job.status = JobStatus.QUEUED
+                    if job.is_done:
+                        job.finished_at = time.time()
+                        assert job.started_at is not None
+                        print(f'Job {job.job_id} {job.status.value} in {job.elapsed_time:.2f} seconds'
+                              f' ({job.started_at - job.created_at:.2f} seconds queued)')
+                self._prune_stored_jobs()
+                self._notify_updated()
+
+    def _notify_updated(self) -> None:
+        """Wakes threads waiting for job updates. Must be called while holding the lock."""
+        self._update_count += 1
+        self._condition.notify_all()
+
+    def _prune_stored_jobs(self) -> None:
+        """Removes the oldest finished jobs once more than MAX_STORED_JOBS jobs are stored."""
+        excess_count = len(self._jobs) - MAX_STORED_JOBS
+        if excess_count <= 0:
+            return
+        for job_id in [job.job_id for job in self._jobs.values() if job.is_done][:excess_count]:
+            del self._jobs[job_id]
@@ -0,0 +1,41 @@
+"""
+Caches GLID-3-XL latent encodings of edited images.
+
+Inpainting repeatedly on the same canvas sends the same edit image with each request, and encoding it with the latent
+diffusion autoencoder is one of the more expensive setup steps.  Latents are stored by autoencoder model and by a
+digest of the image data, in least-recently-used order.  Like the job queue, this module does not depend on torch.
+"""
+import hashlib
+from typing import Any, Callable
+
+from PIL import Image
+
+from src.glid_3_xl.model_output_cache import ModelOutputCache
+from src.util.singleton import Singleton
+
+# Maximum number of cached latent images:
+MAX_CACHED_LATENTS = 32
+
+
+def image_digest(image: Image.Image) -> str:
+    """Returns a digest identifying an image's mode, size, and pixel data."""
+    image_hash = hashlib.sha256(f'{image.mode}:{image.width}x{image.height}:'.encode('utf-8'))
+    image_hash.update(image.tobytes())
+    return image_hash.hexdigest()
+
+
+class LatentCache(ModelOutputCache, metaclass=Singleton):
+    """Stores latent image encodings by autoencoder model and image digest."""
+
+    def __init__(self, max_size: int = MAX_CACHED_LATENTS) -> None:
+        super().__init__(max_size)
+
+    def encode(self, model: Any, image: Image.Image, encode_fn: Callable[[Image.Image], Any]) -> Any:
+        """Returns the cached latent encoding of an image, calling encode_fn to encode it if it isn't cached yet."""
+        key = image_digest(image)
+        cached = self._lookup(model, [key])
+        if key in cached:
+            return cached[key]
+        latent = encode_fn(image)
+        self._store(model, {key: latent})
+        return latent
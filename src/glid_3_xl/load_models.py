@@ -1,8 +1,15 @@
 """
 Loads the ML models that make up GLID-3-XL.
+
+Checkpoints are memory-mapped when possible, and independent models are loaded concurrently on background threads, so
+startup time is mostly bounded by the largest model instead of the sum of all of them.  The CLIP model is only loaded
+immediately if the primary model uses CLIP embeddings or CLIP guidance is enabled; otherwise it is loaded on first use.
 """
 import gc
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Any, Callable, Optional
 
 # noinspection PyPackageRequirements
 import torch
@@ -13,6 +20,238 @@ import clip
 from src.glid_3_xl.guided_diffusion.script_util import create_model_and_diffusion, model_and_diffusion_defaults
 from src.glid_3_xl.encoders.modules import BERTEmbedder
 
+COMPONENT_MODEL = 'model'
+COMPONENT_VAE = 'vae'
+COMPONENT_BERT = 'bert'
+COMPONENT_CLIP = 'clip'
+
+STATUS_DEFERRED = 'deferred'
+STATUS_LOADING = 'loading'
+STATUS_READY = 'ready'
+STATUS_FAILED = 'failed'
+
+
+def _load_checkpoint(path: str) -> Any:
+    """Loads a checkpoint onto the CPU, memory-mapping its tensors instead of reading them into memory if possible."""
+    if path.endswith('.safetensors'):
+        # noinspection PyPackageRequirements
+        from safetensors.torch import load_file  # pylint: disable=import-outside-toplevel
+        return load_file(path, device='cpu')
+    try:
+        return torch.load(path, map_location='cpu', mmap=True)
+    except (TypeError, RuntimeError):
+        # Older torch versions don't support mmap, and checkpoints saved in the legacy format can't be memory-mapped:
+        return torch.load(path, map_location='cpu')
+
+
+def _set_requires_grad(model, value):
+    for param in model.parameters():
+        param.requires_grad = value
+
+
+class _DeferredComponent:
+    """Stands in for a model component that is loaded the first time it is used."""
+
+    def __init__(self, load_fn: Callable[[], Any]) -> None:
+        self._load_fn = load_fn
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._load_fn(), name)
+
+    def __call__(self, *args, **kwargs) -> Any:
+        return self._load_fn()(*args, **kwargs)
+
+
+# noinspection SpellCheckingInspection
+class GlidModelLoader:
+    """Loads all GLID-3-XL models concurrently in the background."""
+
+    def __init__(self,
+                 device,
+                 model_path='inpaint.pt',
+                 bert_path='bert.pt',
+                 kl_path='kl-f8.pt',
+                 clip_model_name='ViT-L/14',
+                 steps=None,
+                 clip_guidance=False,
+                 cpu=False,
+                 ddpm=False,
+                 ddim=False):
+        """Checks model paths, without loading anything until start() is called.  Parameters match load_models."""
+        for path, description in ((model_path, 'GLID-3-XL model'), (kl_path, 'VAE model'), (bert_path, 'BERT model')):
+            if not os.path.isfile(path):
+                raise RuntimeError(f'Invalid {description} path {path}')
+        if kl_path.endswith('.safetensors'):
+            # The VAE checkpoint is a complete pickled model, and this package has no autoencoder module definition to
+            # load weights into:
+            raise RuntimeError(f'Invalid VAE model path {kl_path}: .safetensors files only contain model weights, use '
+                               'a full VAE model checkpoint (e.g. kl-f8.pt) instead')
+        self._device = device
+        self._model_path = model_path
+        self._bert_path = bert_path
+        self._kl_path = kl_path
+        self._clip_model_name = clip_model_name
+        self._steps = steps
+        self._clip_guidance = clip_guidance
+        self._cpu = cpu
+        self._ddpm = ddpm
+        self._ddim = ddim
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._futures: dict[str, Future] = {}
+        self._models: Optional[tuple] = None
+
+    def start(self) -> None:
+        """Starts loading all required models on background threads."""
+        with self._lock:
+            if self._executor is not None:
+                return
+            self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='glid_model_loader')
+            self._futures[COMPONENT_MODEL] = self._executor.submit(self._load_primary_model)
+            self._futures[COMPONENT_VAE] = self._executor.submit(self._load_vae)
+            self._futures[COMPONENT_BERT] = self._executor.submit(self._load_bert)
+            if self._clip_guidance:
+                self._futures[COMPONENT_CLIP] = self._executor.submit(self._load_clip)
+
+    @property
+    def is_ready(self) -> bool:
+        """Returns whether all required models have finished loading successfully."""
+        return self.status()['ready']
+
+    def status(self) -> dict[str, Any]:
+        """Returns the loading status of each model component, and the first loading error if any occurred."""
+        components: dict[str, str] = {}
+        error: Optional[str] = None
+        with self._lock:
+            futures = dict(self._futures)
+        for name in (COMPONENT_MODEL, COMPONENT_VAE, COMPONENT_BERT, COMPONENT_CLIP):
+            future = futures.get(name, None)
+            if future is None:
+                components[name] = STATUS_DEFERRED if name == COMPONENT_CLIP else STATUS_LOADING
+            elif not future.done():
+                components[name] = STATUS_LOADING
+            elif future.exception() is not None:
+                components[name] = STATUS_FAILED
+                if error is None:
+                    error = f'{name} loading failed: {future.exception()}'
+            else:
+                components[name] = STATUS_READY
+        ready = all(status in (STATUS_READY, STATUS_DEFERRED) for status in components.values())
+        return {'ready': ready, 'components': components, 'error': error}
+
+    def wait(self):
+        """Blocks until all required models are loaded, then returns them in the same format as load_models. Raises
+           any error that occurred while loading."""
+        if self._models is not None:
+            return self._models
+        self.start()
+        with self._lock:
+            futures = dict(self._futures)
+        model_params, model, diffusion = futures[COMPONENT_MODEL].result()
+        ldm = futures[COMPONENT_VAE].result()
+        bert = futures[COMPONENT_BERT].result()
+        with self._lock:
+            # The primary model may have started loading CLIP:
+            futures = dict(self._futures)
+        if COMPONENT_CLIP in futures:
+            clip_model, clip_preprocess = futures[COMPONENT_CLIP].result()
+        else:
+            clip_model = _DeferredComponent(lambda: self._request_clip().result()[0])
+            clip_preprocess = _DeferredComponent(lambda: self._request_clip().result()[1])
+        gc.collect()
+        normalize = transforms.Normalize(mean=[0.48145466, 0.4578275, 0.40821073],
+                                         std=[0.26862954, 0.26130258, 0.27577711])
+        self._models = (model_params, model, diffusion, ldm, bert, clip_model, clip_preprocess, normalize)
+        return self._models
+
+    def _request_clip(self) -> Future:
+        """Starts loading the CLIP model if it isn't already loading, returning its future."""
+        with self._lock:
+            assert self._executor is not None
+            if COMPONENT_CLIP not in self._futures:
+                self._futures[COMPONENT_CLIP] = self._executor.submit(self._load_clip)
+            return self._futures[COMPONENT_CLIP]
+
+    def _load_primary_model(self):
+        model_state_dict = _load_checkpoint(self._model_path)
+
+        model_params = {
+            'attention_resolutions': '32,16,8',
+            'class_cond': False,
+            'diffusion_steps': 1000,
+            'rescale_timesteps': True,
+            'timestep_respacing': '27',  # Modify this value to decrease the number of
+            # timesteps.
+            'image_size': 32,
+            'learn_sigma': False,
+            'noise_schedule': 'linear',
+            'num_channels': 320,
+            'num_heads': 8,
+            'num_res_blocks': 2,
+            'resblock_updown': False,
+            'use_fp16': False,
+            'use_scale_shift_norm': False,
+            'clip_embed_dim': 768 if 'clip_proj.weight' in model_state_dict else None,
+            'image_condition': bool(model_state_dict['input_blocks.0.0.weight'].shape[1] == 8),
+            'super_res_condition': bool('external_block.0.0.weight' in model_state_dict)
+        }
+        if model_params['clip_embed_dim']:
+            # CLIP text embeddings are needed for every request, so start loading CLIP immediately:
+            self._request_clip()
+
+        if self._ddpm:
+            model_params['timestep_respacing'] = 1000
+        if self._ddim:
+            if self._steps:
+                model_params['timestep_respacing'] = 'ddim' + str(self._steps)
+            else:
+                model_params['timestep_respacing'] = 'ddim50'
+        elif self._steps:
+            model_params['timestep_respacing'] = str(self._steps)
+
+        model_config = model_and_diffusion_defaults()
+        model_config.update(model_params)
+
+        if self._cpu:
+            model_config['use_fp16'] = False
+
+        model, diffusion = create_model_and_diffusion(**model_config)
+        model.load_state_dict(model_state_dict, strict=False)
+        del model_state_dict
+        model.requires_grad_(self._clip_guidance).eval().to(self._device)
+
+        if model_config['use_fp16']:
+            model.convert_to_fp16()
+        else:
+            model.convert_to_fp32()
+        print(f'loaded and configured primary model from {self._model_path}')
+        return model_params, model, diffusion
+
+    def _load_vae(self):
+        ldm = _load_checkpoint(self._kl_path)
+        ldm.to(self._device)
+        ldm.eval()
+        ldm.requires_grad_(self._clip_guidance)
+        _set_requires_grad(ldm, self._clip_guidance)
+        print(f'loaded and configured latent diffusion VAE model from {self._kl_path}')
+        return ldm
+
+    def _load_bert(self):
+        bert = BERTEmbedder(1280, 32)
+        bert.load_state_dict(_load_checkpoint(self._bert_path))
+        bert.to(self._device)
+        bert.half().eval()
+        _set_requires_grad(bert, False)
+        print(f'loaded and configured BERT model from {self._bert_path}')
+        return bert
+
+    def _load_clip(self):
+        print(f'loading clip model {self._clip_model_name}')
+        clip_model, clip_preprocess = clip.load(self._clip_model_name, device=self._device, jit=False)
+        clip_model.eval().requires_grad_(False)
+        print(f'loaded and configured CLIP model from {self._clip_model_name}')
+        return clip_model, clip_preprocess
+
 
 # noinspection SpellCheckingInspection
 def load_models(device,
@@ -25,96 +264,8 @@ def load_models(device,
                 cpu=False,
                 ddpm=False,
                 ddim=False):
-    """Loads all ML models and associated variables."""
-
-    if not os.path.isfile(model_path):
-        raise RuntimeError(f'Invalid GLID-3-XL model path {model_path}')
-    model_state_dict = torch.load(model_path, map_location='cpu')
-
-    model_params = {
-        'attention_resolutions': '32,16,8',
-        'class_cond': False,
-        'diffusion_steps': 1000,
-        'rescale_timesteps': True,
-        'timestep_respacing': '27',  # Modify this value to decrease the number of
-        # timesteps.
-        'image_size': 32,
-        'learn_sigma': False,
-        'noise_schedule': 'linear',
-        'num_channels': 320,
-        'num_heads': 8,
-        'num_res_blocks': 2,
-        'resblock_updown': False,
-        'use_fp16': False,
-        'use_scale_shift_norm': False,
-        'clip_embed_dim': 768 if 'clip_proj.weight' in model_state_dict else None,
-        'image_condition': bool(model_state_dict['input_blocks.0.0.weight'].shape[1] == 8),
-        'super_res_condition': bool('external_block.0.0.weight' in model_state_dict)
-    }
-
-    if ddpm:
-        model_params['timestep_respacing'] = 1000
-    if ddim:
-        if steps:
-            model_params['timestep_respacing'] = 'ddim' + str(steps)
-        else:
-            model_params['timestep_respacing'] = 'ddim50'
-    elif steps:
-        model_params['timestep_respacing'] = str(steps)
-
-    model_config = model_and_diffusion_defaults()
-    model_config.update(model_params)
-
-    if cpu:
-        model_config['use_fp16'] = False
-
-    # Load models
-    model, diffusion = create_model_and_diffusion(**model_config)
-    model.load_state_dict(model_state_dict, strict=False)
-    model.requires_grad_(clip_guidance).eval().to(device)
-
-    if model_config['use_fp16']:
-        model.convert_to_fp16()
-    else:
-        model.convert_to_fp32()
-
-    # noinspection PyShadowingNames
-    def _set_requires_grad(model, value):
-        for param in model.parameters():
-            param.requires_grad = value
-
-    print(f'loaded and configured primary model from {model_path}')
-    gc.collect()
-
-    # vae
-    if not os.path.isfile(kl_path):
-        raise RuntimeError(f'Invalid VAE model path {kl_path}')
-    ldm = torch.load(kl_path, map_location='cpu')
-    ldm.to(device)
-    ldm.eval()
-    ldm.requires_grad_(clip_guidance)
-    _set_requires_grad(ldm, clip_guidance)
-    print(f'loaded and configured latent diffusion VAE model from {kl_path}')
-    gc.collect()
-
-    if not os.path.isfile(bert_path):
-        raise RuntimeError(f'Invalid BERT model path {bert_path}')
-    bert = BERTEmbedder(1280, 32)
-    sd = torch.load(bert_path, map_location='cpu')
-    bert.load_state_dict(sd)
-    bert.to(device)
-    bert.half().eval()
-    _set_requires_grad(bert, False)
-    print(f'loaded and configured BERT model from {bert_path}')
-    gc.collect()
-
-    # clip
-    print(f'loading clip model {clip_model_name}')
-    clip_model, clip_preprocess = clip.load(clip_model_name, device=device, jit=False)
-    clip_model.eval().requires_grad_(False)
-    print(f'loaded and configured CLIP model from {clip_model_name}')
-    gc.collect()
-
-    normalize = transforms.Normalize(mean=[0.48145466, 0.4578275, 0.40821073],
-                                     std=[0.26862954, 0.26130258, 0.27577711])
-    return model_params, model, diffusion, ldm, bert, clip_model, clip_preprocess, normalize
+    """Loads all ML models and associated variables, loading independent models concurrently."""
+    loader = GlidModelLoader(device, model_path, bert_path, kl_path, clip_model_name, steps, clip_guidance, cpu,
+                             ddpm, ddim)
+    loader.start()
+    return loader.wait()
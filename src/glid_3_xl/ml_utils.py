@@ -7,6 +7,16 @@ import torch
 # noinspection PyPep8Naming,PyPackageRequirements
 from torchvision.transforms import functional as TF
 import numpy as np
+from PIL import Image
+
+# Approximate linear projection from scaled kl-f8 latent channels to RGB values in the range [-1, 1], used to create
+# progress previews without running the autoencoder's decoder:
+LATENT_RGB_FACTORS = [
+    [0.3512, 0.2297, 0.3227],
+    [0.3250, 0.4974, 0.2350],
+    [-0.2829, 0.1762, 0.2721],
+    [-0.2120, -0.2616, -0.7177]
+]
 
 
 def get_device(use_cpu=False):
@@ -25,23 +35,37 @@ def image_from_numpy_data(numpy_data, ldm_model):
     return TF.to_pil_image(numpy_data.squeeze(0).add(1).div(2).clamp(0, 1))
 
 
+def preview_image_from_numpy_data(numpy_data):
+    """Quickly approximates a PIL image from numpy image data, at full size but with 1/8 of the full resolution."""
+    factors = torch.tensor(LATENT_RGB_FACTORS, device=numpy_data.device, dtype=numpy_data.dtype)
+    rgb_data = torch.einsum('chw,cr->rhw', numpy_data, factors)
+    preview = TF.to_pil_image(rgb_data.add(1).div(2).clamp(0, 1).float().cpu())
+    return preview.resize((preview.width * 8, preview.height * 8), Image.Resampling.BILINEAR)
+
+
 def foreach_in_sample(sample, batch_size, action):
     """Runs a function for each numpy image data object in a sample"""
     for k, image_data in enumerate(sample['pred_xstart'][:batch_size]):
         action(k, image_data)
 
 
-def foreach_image_in_sample(sample, batch_size, ldm_model, action):
-    """Runs a function for each PIL image extracted from a sample"""
+def foreach_image_in_sample(sample, batch_size, ldm_model, action, preview=False):
+    """Runs a function for each PIL image extracted from a sample, using fast approximate images if preview=True."""
     def _convert_param(k, numpy_data):
-        action(k, image_from_numpy_data(numpy_data, ldm_model))
+        if preview:
+            action(k, preview_image_from_numpy_data(numpy_data))
+        else:
+            action(k, image_from_numpy_data(numpy_data, ldm_model))
     foreach_in_sample(sample, batch_size, _convert_param)
 
 
 # noinspection PyUnusedLocal
 def get_save_fn(prefix, batch_size, ldm_model, unused_clip_model, unused_clip_preprocess, unused_device):
     """Creates and returns a function that saves sample data to disk."""
-    def _save_sample(i, sample, clip_score_fn=None):
+    def _save_sample(i, sample, clip_score_fn=None, preview=False):
+        if preview:  # Only final samples are written to disk.
+            return
+
         def _save_image(k, numpy_data):
             npy_filename = f'output_npy/{prefix}{i * batch_size + k:05}.npy'
             with open(npy_filename, 'wb') as outfile:
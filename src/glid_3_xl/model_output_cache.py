@@ -0,0 +1,58 @@
+"""
+Provides a least-recently-used cache for values computed by GLID-3-XL models.
+
+Values are stored by model object and key.  A model's values are discarded when that model is garbage collected, so new
+models that reuse its ID never receive outdated values.  Like the job queue, this module does not depend on torch.
+"""
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Hashable, Iterable
+
+
+class ModelOutputCache:
+    """Stores model outputs by (model ID, key), discarding the least recently used ones when full."""
+
+    def __init__(self, max_size: int) -> None:
+        self._max_size = max_size
+        self._lock = threading.Lock()
+        self._values: OrderedDict[tuple[int, Hashable], Any] = OrderedDict()
+        self._tracked_models: set[int] = set()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._values)
+
+    def clear(self) -> None:
+        """Discards all cached values."""
+        with self._lock:
+            self._values.clear()
+
+    def _lookup(self, model: Any, keys: Iterable[Hashable]) -> dict[Hashable, Any]:
+        """Returns all cached values for a model that match the given keys, marking them as recently used."""
+        model_id = id(model)
+        found: dict[Hashable, Any] = {}
+        with self._lock:
+            if model_id not in self._tracked_models:
+                self._tracked_models.add(model_id)
+                weakref.finalize(model, self._forget_model, model_id)
+            for key in keys:
+                if (model_id, key) in self._values:
+                    self._values.move_to_end((model_id, key))
+                    found[key] = self._values[(model_id, key)]
+        return found
+
+    def _store(self, model: Any, values: dict[Hashable, Any]) -> None:
+        """Saves values computed by a model, discarding the least recently used values if the cache is full."""
+        model_id = id(model)
+        with self._lock:
+            for key, value in values.items():
+                self._values[(model_id, key)] = value
+            while len(self._values) > self._max_size:
+                self._values.popitem(last=False)
+
+    def _forget_model(self, model_id: int) -> None:
+        with self._lock:
+            self._tracked_models.discard(model_id)
+            for key in [key for key in self._values if key[0] == model_id]:
+                del self._values[key]
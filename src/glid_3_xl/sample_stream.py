@@ -0,0 +1,94 @@
+"""
+Encodes and decodes the binary frame stream used to push GLID-3-XL samples to clients as they are generated.
+
+Each frame is a four-byte big-endian header length, a UTF-8 JSON header, and an optional binary payload whose length
+is given by the header's 'size' value.  Sample frames carry encoded PNG or WebP image data, so streamed images avoid
+the size overhead of base64 encoding.  Like the job queue, this module does not depend on torch.
+"""
+import base64
+import io
+import json
+import struct
+from typing import Any, Optional
+
+from PIL import features
+
+FORMAT_PNG = 'png'
+FORMAT_WEBP = 'webp'
+FORMAT_BASE64 = 'base64'
+STREAM_FORMATS = (FORMAT_PNG, FORMAT_WEBP)
+
+FRAME_TYPE_SAMPLE = 'sample'
+FRAME_TYPE_STATUS = 'status'
+FRAME_TYPE_KEEPALIVE = 'keepalive'
+
+WEBP_QUALITY = 90
+
+_HEADER_LENGTH = struct.Struct('>I')
+
+
+def stream_format(requested_format: Optional[str]) -> str:
+    """Returns the image format to use for streamed samples, falling back to PNG if the requested format is
+       unknown or not supported."""
+    if requested_format == FORMAT_WEBP and features.check('webp'):
+        return FORMAT_WEBP
+    return FORMAT_PNG
+
+
+def encode_frame(header: dict[str, Any], payload: bytes = b'') -> bytes:
+    """Returns a single stream frame, adding the payload size to the header."""
+    header_bytes = json.dumps({**header, 'size': len(payload)}).encode('utf-8')
+    return _HEADER_LENGTH.pack(len(header_bytes)) + header_bytes + payload
+
+
+def encode_sample(sample: dict[str, Any], image_format: str) -> bytes | str:
+    """Encodes a saved sample's PIL image, caching the result in the sample dict.
+
+    Parameters
+    ----------
+    sample: dict[str, Any]
+        Sample dict saved by the job queue, containing the unencoded 'image'.
+    image_format: str
+        One of STREAM_FORMATS, or FORMAT_BASE64 for base64-encoded PNG data.
+
+    Returns
+    -------
+    bytes | str
+        Encoded image bytes, or a string if image_format is FORMAT_BASE64.
+    """
+    encoded = sample.setdefault('encoded', {})
+    if image_format not in encoded:
+        if image_format == FORMAT_BASE64:
+            encoded[image_format] = base64.b64encode(encode_sample(sample, FORMAT_PNG)).decode('utf-8')
+        else:
+            buffer = io.BytesIO()
+            if image_format == FORMAT_WEBP:
+                sample['image'].save(buffer, format='WEBP', quality=WEBP_QUALITY)
+            else:
+                sample['image'].save(buffer, format='PNG')
+            encoded[image_format] = buffer.getvalue()
+    return encoded[image_format]
+
+
+class FrameReader:
+    """Incrementally parses stream frames from arbitrarily-sized chunks of response data."""
+
+    def __init__(self) -> None:
+        self._buffer = bytearray()
+
+    def feed(self, chunk: bytes) -> list[tuple[dict[str, Any], bytes]]:
+        """Adds data to the stream, returning the (header, payload) pairs of all frames completed by the new data."""
+        self._buffer += chunk
+        frames: list[tuple[dict[str, Any], bytes]] = []
+        while len(self._buffer) >= _HEADER_LENGTH.size:
+            header_length = _HEADER_LENGTH.unpack_from(self._buffer)[0]
+            header_end = _HEADER_LENGTH.size + header_length
+            if len(self._buffer) < header_end:
+                break
+            header = json.loads(self._buffer[_HEADER_LENGTH.size:header_end].decode('utf-8'))
+            frame_end = header_end + int(header.get('size', 0))
+            if len(self._buffer) < frame_end:
+                break
+            frames.append((header, bytes(self._buffer[header_end:frame_end])))
+            del self._buffer[:frame_end]
+        return frames
@@ -0,0 +1,64 @@
+"""
+Caches GLID-3-XL text encoder outputs, so that repeated prompts don't need to be encoded again.
+
+Prompts usually stay the same while masks and edited images change, but the BERT and CLIP text encoders would otherwise
+run for both the prompt and the negative prompt on every generation.  Embeddings are stored by encoder model and text,
+in least-recently-used order.  Like the job queue, this module does not depend on torch.
+"""
+from typing import Any, Callable
+
+from src.glid_3_xl.model_output_cache import ModelOutputCache
+from src.util.singleton import Singleton
+
+# Maximum number of cached embeddings, across all encoders:
+MAX_CACHED_EMBEDDINGS = 256
+
+
+def _copy_slice(batch: Any, index: int) -> Any:
+    """Returns a copy of a length one slice from a batched result. Tensor and array slices are views that would keep the
+    entire batch in memory for as long as the slice is cached."""
+    batch_slice = batch[index:index + 1]
+    if hasattr(batch_slice, 'clone'):
+        return batch_slice.clone()
+    if hasattr(batch_slice, 'copy'):
+        return batch_slice.copy()
+    return batch_slice
+
+
+class TextEmbeddingCache(ModelOutputCache, metaclass=Singleton):
+    """Stores text embeddings by encoder model, encoder name, and text."""
+
+    def __init__(self, max_size: int = MAX_CACHED_EMBEDDINGS) -> None:
+        super().__init__(max_size)
+
+    def encode(self, encoder_name: str, model: Any, texts: list[str],
+               encode_fn: Callable[[list[str]], Any]) -> list[Any]:
+        """Returns embeddings for a list of texts, encoding each unique text that isn't already cached exactly once.
+
+        Parameters
+        ----------
+        encoder_name: str
+            Name identifying the encoding method, used to keep embeddings from different encoders that share a model
+            separate.
+        model: Any
+            Encoder model object.  Cached embeddings are only reused with the same model object.
+        texts: list[str]
+            Texts to encode. Duplicates are allowed, and share the same embedding object.
+        encode_fn: Callable[[list[str]], Any]
+            Function that encodes a list of texts with the model, returning a batched result that can be sliced along
+            its first dimension.
+
+        Returns
+        -------
+        list[Any]
+            One embedding for each text, each a copied slice of length one from an encode_fn result.
+        """
+        embeddings = {key[1]: value for key, value
+                      in self._lookup(model, [(encoder_name, text) for text in texts]).items()}
+        missing_texts = list(dict.fromkeys(text for text in texts if text not in embeddings))
+        if len(missing_texts) > 0:
+            encoded = encode_fn(missing_texts)
+            for i, text in enumerate(missing_texts):
+                embeddings[text] = _copy_slice(encoded, i)
+            self._store(model, {(encoder_name, text): embeddings[text] for text in missing_texts})
+        return [embeddings[text] for text in texts]
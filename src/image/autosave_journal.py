@@ -0,0 +1,525 @@
+"""Journals edited image changes in the background, so that unsaved work can be recovered after a crash.
+
+While editing, the AutosaveJournal periodically checks which layers changed since the last check using each layer's
+content_change_timestamp, and passes implicitly-shared copies of their images to a worker thread.  The worker splits
+each image into tiles, and appends the tiles that changed since they were last written to an append-only journal file,
+along with a small record describing the layer structure whenever it changes.  Writes are rate-limited, so autosaving
+doesn't compete with the application for disk bandwidth, and the journal is compacted once most of it is outdated.
+
+If the application exits normally, the journal is deleted.  A journal found at startup means that the last session
+didn't exit cleanly, and recover_journal can rebuild its layer stack.  Each journal is claimed with a lock file while in
+use, so a second running instance neither replaces nor recovers the first instance's journal, and just runs without
+autosave instead.  Locks left by a crashed process are taken over automatically.
+
+Each journal record is a four-byte big-endian header length, a UTF-8 JSON header, and an optional payload whose length
+is given by the header's 'size' value.  Tile payloads are zlib-compressed ARGB32_Premultiplied pixel data.
+"""
+import hashlib
+import json
+import logging
+import os
+import struct
+import threading
+import time
+import zlib
+from typing import Any, Optional
+
+import numpy as np
+from PySide6.QtCore import QObject, QRect, QSize, QTimer, QLockFile
+from PySide6.QtGui import QImage, QTransform
+
+from src.config.application_config import AppConfig
+from src.image.composite_mode import CompositeMode
+from src.image.layers.image_layer import ImageLayer
+from src.image.layers.image_stack import ImageStack
+from src.image.layers.layer import Layer
+from src.image.layers.layer_group import LayerGroup
+from src.image.layers.transform_layer import TransformLayer
+from src.util.shared_constants import DATA_DIR
+from src.util.visual.image_utils import create_transparent_image, image_data_as_numpy_8bit, \
+    image_data_as_numpy_8bit_readonly
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOURNAL_PATH = f'{DATA_DIR}/.autosave_journal'
+JOURNAL_VERSION = 1
+
+# Size of the image tiles written to the journal:
+JOURNAL_TILE_SIZE = 256
+
+# Maximum rate at which the journal is written, including compaction:
+MAX_WRITE_BYTES_PER_SECOND = 8 * 1024 * 1024
+
+# The journal is rewritten with only the latest data once its size is more than COMPACT_RATIO times the size of the
+# latest data, unless it's smaller than MIN_COMPACT_SIZE:
+COMPACT_RATIO = 3
+MIN_COMPACT_SIZE = 16 * 1024 * 1024
+
+RECORD_TYPE_JOURNAL = 'journal'
+RECORD_TYPE_STRUCTURE = 'structure'
+RECORD_TYPE_TILE = 'tile'
+
+LAYER_KIND_IMAGE = 'image'
+LAYER_KIND_GROUP = 'group'
+
+_HEADER_LENGTH = struct.Struct('>I')
+
+
+def encode_record(header: dict[str, Any], payload: bytes = b'') -> bytes:
+    """Returns a single journal record, adding the payload size to the header."""
+    header_bytes = json.dumps({**header, 'size': len(payload)}).encode('utf-8')
+    return _HEADER_LENGTH.pack(len(header_bytes)) + header_bytes + payload
+
+
+def read_records(journal_path: str) -> list[tuple[dict[str, Any], bytes]]:
+    """Reads all complete (header, payload) records from a journal file. An incomplete final record, left by a write
+       that was interrupted by a crash, is ignored."""
+    with open(journal_path, 'rb') as file:
+        data = file.read()
+    records: list[tuple[dict[str, Any], bytes]] = []
+    offset = 0
+    while offset + _HEADER_LENGTH.size <= len(data):
+        header_end = offset + _HEADER_LENGTH.size + _HEADER_LENGTH.unpack_from(data, offset)[0]
+        if header_end > len(data):
+            break
+        try:
+            header = json.loads(data[offset + _HEADER_LENGTH.size:header_end].decode('utf-8'))
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            break
+        record_end = header_end + int(header.get('size', 0))
+        if record_end > len(data):
+            break
+        records.append((header, data[header_end:record_end]))
+        offset = record_end
+    return records
+
+
+def journal_exists(journal_path: str = DEFAULT_JOURNAL_PATH) -> bool:
+    """Returns whether a journal left by a session that didn't exit normally exists."""
+    return os.path.isfile(journal_path) and os.path.getsize(journal_path) > 0
+
+
+def _transform_list(transform: QTransform) -> list[float]:
+    return [transform.m11(), transform.m12(), transform.m13(),
+            transform.m21(), transform.m22(), transform.m23(),
+            transform.m31(), transform.m32(), transform.m33()]
+
+
+def _layer_structure(layer: Layer, images: dict[int, QImage]) -> dict[str, Any]:
+    """Returns a JSON-serializable description of a layer and its children, adding layer images by layer ID."""
+    layer_data: dict[str, Any] = {
+        'id': layer.id,
+        'name': layer.name,
+        'visible': layer.visible,
+        'opacity': layer.opacity,
+        'mode': layer.composition_mode.openraster_composite_mode(),
+        'locked': layer.locked
+    }
+    if isinstance(layer, LayerGroup):
+        layer_data['kind'] = LAYER_KIND_GROUP
+        layer_data['isolate'] = layer.isolate
+        layer_data['children'] = [_layer_structure(child, images) for child in layer.child_layers]
+    else:
+        image = layer.get_qimage()
+        if image.format() != QImage.Format.Format_ARGB32_Premultiplied:
+            image = image.convertToFormat(QImage.Format.Format_ARGB32_Premultiplied)
+        else:
+            # Implicitly shared, so the layer image is only copied if it changes before the worker is done with it:
+            image = QImage(image)
+        images[layer.id] = image
+        layer_data['kind'] = LAYER_KIND_IMAGE
+        layer_data['width'] = image.width()
+        layer_data['height'] = image.height()
+        layer_data['alpha_locked'] = isinstance(layer, ImageLayer) and layer.alpha_locked
+        if isinstance(layer, TransformLayer):
+            layer_data['transform'] = _transform_list(layer.transform)
+    return layer_data
+
+
+def _layer_change_key(layer: Layer) -> tuple[Any, ...]:
+    """Returns a value that changes whenever anything journaled about a layer changes, without reading layer images.
+    Image changes are found through content_change_timestamp, other properties are checked directly because changing
+    them doesn't always update the timestamp."""
+    parent = layer.layer_parent
+    change_key: tuple[Any, ...] = (layer.id, None if parent is None else parent.id, layer.content_change_timestamp,
+                                   layer.name, layer.get_visible(), layer.opacity, layer.composition_mode, layer.locked)
+    if isinstance(layer, LayerGroup):
+        return change_key + (layer.isolate,)
+    change_key += (layer.size,)
+    if isinstance(layer, ImageLayer):
+        change_key += (layer.alpha_locked,)
+    if isinstance(layer, TransformLayer):
+        change_key += (_transform_list(layer.transform),)
+    return change_key
+
+
+def _image_layer_sizes(layer_data: dict[str, Any], sizes: Optional[dict[int, QSize]] = None) -> dict[int, QSize]:
+    """Returns the size of every image layer in a layer structure, by layer ID."""
+    if sizes is None:
+        sizes = {}
+    if layer_data['kind'] == LAYER_KIND_GROUP:
+        for child in layer_data['children']:
+            _image_layer_sizes(child, sizes)
+    else:
+        sizes[layer_data['id']] = QSize(layer_data['width'], layer_data['height'])
+    return sizes
+
+
+def _tile_bounds(size: QSize) -> list[tuple[int, int, QRect]]:
+    """Returns (tile_x, tile_y, bounds) for all journal tiles in an image of the given size."""
+    tiles = []
+    for tile_y in range((size.height() + JOURNAL_TILE_SIZE - 1) // JOURNAL_TILE_SIZE):
+        for tile_x in range((size.width() + JOURNAL_TILE_SIZE - 1) // JOURNAL_TILE_SIZE):
+            bounds = QRect(tile_x * JOURNAL_TILE_SIZE, tile_y * JOURNAL_TILE_SIZE, JOURNAL_TILE_SIZE, JOURNAL_TILE_SIZE)
+            tiles.append((tile_x, tile_y, bounds.intersected(QRect(0, 0, size.width(), size.height()))))
+    return tiles
+
+
+class AutosaveJournal(QObject):
+    """Writes layer changes to the journal file on a background thread."""
+
+    def __init__(self, image_stack: ImageStack, journal_path: str = DEFAULT_JOURNAL_PATH,
+                 max_write_bytes_per_second: int = MAX_WRITE_BYTES_PER_SECOND) -> None:
+        super().__init__()
+        self._image_stack = image_stack
+        self._journal_path = journal_path
+        self._lock_file = QLockFile(f'{journal_path}.lock')
+        # The lock is held for the whole session, so it's only stale if the process holding it is gone:
+        self._lock_file.setStaleLockTime(0)
+        self._max_write_rate = max_write_bytes_per_second
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self.check_for_changes)
+        self._last_change_timestamps: dict[int, float] = {}
+        self._last_sizes: dict[int, QSize] = {}
+        self._last_change_key: Optional[tuple[Any, ...]] = None
+
+        # Worker thread state:
+        self._condition = threading.Condition()
+        self._worker: Optional[threading.Thread] = None
+        self._stopped = False
+        self._pending_structure: Optional[dict[str, Any]] = None
+        self._pending_images: dict[int, QImage] = {}
+        self._busy = False
+
+        # Journal file state, only accessed by the worker:
+        self._file: Optional[Any] = None
+        self._file_size = 0
+        self._written_structure: Optional[dict[str, Any]] = None
+        self._written_sizes: dict[int, QSize] = {}
+        self._tile_hashes: dict[tuple[int, int, int], bytes] = {}
+        self._tile_records: dict[tuple[int, int, int], tuple[int, int]] = {}
+        self._next_write_time = 0.0
+
+        AppConfig().connect(self, AppConfig.AUTOSAVE_INTERVAL, lambda _: self._update_timer())
+
+    @property
+    def journal_path(self) -> str:
+        """Returns the path where the journal is written."""
+        return self._journal_path
+
+    def acquire_lock(self) -> bool:
+        """Claims the journal for this process, returning False if another running instance is using it. The journal
+           should only be checked for recovery after the lock is acquired."""
+        if self._lock_file.isLocked():
+            return True
+        return self._lock_file.tryLock(0)
+
+    def start(self) -> None:
+        """Starts a new journal, replacing any existing journal file, and starts checking for changes. If another
+           running instance holds the journal lock, journaling is skipped."""
+        if not self.acquire_lock():
+            logger.warning(f'Autosave journal {self._journal_path} is in use by another instance, autosave is disabled')
+            return
+        with self._condition:
+            if self._worker is not None:
+                return
+            self._stopped = False
+            self._worker = threading.Thread(target=self._write_changes, daemon=True)
+            self._worker.start()
+        self._last_change_timestamps.clear()
+        self._last_sizes.clear()
+        self._last_change_key = None
+        self._update_timer()
+
+    def stop(self, delete_journal: bool = True) -> None:
+        """Stops journaling, discarding any unwritten changes and deleting the journal unless delete_journal=False.
+           The journal lock is released, and a journal owned by another instance is never deleted."""
+        self._timer.stop()
+        with self._condition:
+            self._stopped = True
+            worker = self._worker
+            self._worker = None
+            self._condition.notify_all()
+        if worker is not None:
+            worker.join()
+        if not self._lock_file.isLocked():
+            return
+        if delete_journal and os.path.isfile(self._journal_path):
+            try:
+                os.remove(self._journal_path)
+            except OSError as err:
+                logger.error(f'Failed to remove autosave journal {self._journal_path}: {err}')
+        self._lock_file.unlock()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Checks for changes immediately, then blocks until all changes are written. Returns False if the timeout
+           expired first."""
+        self.check_for_changes()
+        with self._condition:
+            return self._condition.wait_for(lambda: self._stopped or (self._pending_structure is None
+                                                                      and not self._busy), timeout)
+
+    def check_for_changes(self) -> None:
+        """Passes the current layer structure and any changed layer images to the worker thread."""
+        if self._worker is None or not self._image_stack.has_image:
+            return
+        change_key = (self._image_stack.width, self._image_stack.height, self._image_stack.active_layer_id,
+                      tuple(_layer_change_key(layer) for layer in self._image_stack.layers))
+        if change_key == self._last_change_key:
+            return
+        self._last_change_key = change_key
+        images: dict[int, QImage] = {}
+        structure = {
+            'type': RECORD_TYPE_STRUCTURE,
+            'width': self._image_stack.width,
+            'height': self._image_stack.height,
+            'active_layer_id': self._image_stack.active_layer_id,
+            'root': _layer_structure(self._image_stack.layer_stack, images)
+        }
+        changed_images: dict[int, QImage] = {}
+        for layer in self._image_stack.layers:
+            if layer.id not in images:
+                continue
+            image = images[layer.id]
+            if layer.content_change_timestamp != self._last_change_timestamps.get(layer.id, None) \
+                    or image.size() != self._last_sizes.get(layer.id, None):
+                changed_images[layer.id] = image
+                self._last_change_timestamps[layer.id] = layer.content_change_timestamp
+                self._last_sizes[layer.id] = image.size()
+        for layer_id in list(self._last_sizes.keys()):
+            if layer_id not in images:
+                del self._last_sizes[layer_id]
+                del self._last_change_timestamps[layer_id]
+        with self._condition:
+            self._pending_structure = structure
+            self._pending_images.update(changed_images)
+            self._condition.notify_all()
+
+    def _update_timer(self) -> None:
+        interval = float(AppConfig().get(AppConfig.AUTOSAVE_INTERVAL))
+        if interval <= 0 or self._worker is None:
+            self._timer.stop()
+        else:
+            self._timer.start(int(interval * 1000))
+
+    # Worker thread functions:
+
+    def _write_changes(self) -> None:
+        try:
+            self._file = open(self._journal_path, 'wb')  # pylint: disable=consider-using-with
+            self._file_size = 0
+            self._written_structure = None
+            self._written_sizes.clear()
+            self._tile_hashes.clear()
+            self._tile_records.clear()
+            self._write(encode_record({'type': RECORD_TYPE_JOURNAL, 'version': JOURNAL_VERSION}))
+            while True:
+                with self._condition:
+                    self._busy = False
+                    self._condition.notify_all()
+                    self._condition.wait_for(lambda: self._stopped or self._pending_structure is not None)
+                    if self._stopped:
+                        return
+                    structure = self._pending_structure
+                    images = self._pending_images
+                    self._pending_structure = None
+                    self._pending_images = {}
+                    self._busy = True
+                assert structure is not None
+                self._write_structure(structure)
+                for layer_id, image in images.items():
+                    if layer_id in self._written_sizes and not self._write_tiles(layer_id, image):
+                        return
+                self._file.flush()
+                if self._file_size > max(MIN_COMPACT_SIZE, COMPACT_RATIO * self._live_size()):
+                    self._compact()
+        except OSError as err:
+            logger.error(f'Autosave journal writing failed: {err}')
+        finally:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            with self._condition:
+                self._busy = False
+                self._condition.notify_all()
+
+    def _write_structure(self, structure: dict[str, Any]) -> None:
+        if structure == self._written_structure:
+            return
+        sizes = _image_layer_sizes(structure['root'])
+        for tile_key in list(self._tile_hashes.keys()):
+            layer_id = tile_key[0]
+            if layer_id not in sizes or sizes[layer_id] != self._written_sizes.get(layer_id, None):
+                # Replaying the structure record clears resized layers, so all of their tiles need to be written again:
+                del self._tile_hashes[tile_key]
+                self._tile_records.pop(tile_key, None)
+        self._written_sizes = sizes
+        self._written_structure = structure
+        self._write(encode_record(structure))
+
+    def _write_tiles(self, layer_id: int, image: QImage) -> bool:
+        """Writes all changed tiles in a layer image, returning False if journaling stopped before they were
+           written."""
+        if image.size() != self._written_sizes[layer_id]:
+            return True  # Outdated, the next update will have the new image.
+        np_image = image_data_as_numpy_8bit_readonly(image)
+        for tile_x, tile_y, bounds in _tile_bounds(image.size()):
+            tile_key = (layer_id, tile_x, tile_y)
+            np_tile = np.ascontiguousarray(np_image[bounds.y():bounds.y() + bounds.height(),
+                                                    bounds.x():bounds.x() + bounds.width()])
+            tile_hash = hashlib.blake2b(np_tile.data, digest_size=16).digest()
+            if self._tile_hashes.get(tile_key, None) == tile_hash:
+                continue
+            if tile_key not in self._tile_hashes and not np_tile[:, :, 3].any():
+                # Restored layers start out transparent, so new transparent tiles don't need to be written:
+                self._tile_hashes[tile_key] = tile_hash
+                continue
+            header = {'type': RECORD_TYPE_TILE, 'layer_id': layer_id, 'x': bounds.x(), 'y': bounds.y(),
+                      'w': bounds.width(), 'h': bounds.height()}
+            record = encode_record(header, zlib.compress(np_tile.data, 1))
+            if not self._throttle(len(record)):
+                return False
+            self._tile_records[tile_key] = (self._file_size, len(record))
+            self._write(record)
+            self._tile_hashes[tile_key] = tile_hash
+        return True
+
+    def _live_size(self) -> int:
+        return sum(length for _, length in self._tile_records.values())
+
+    def _compact(self) -> None:
+        """Rewrites the journal with only the latest structure and tiles."""
+        assert self._file is not None and self._written_structure is not None
+        self._file.flush()
+        temp_path = f'{self._journal_path}.tmp'
+        new_records: dict[tuple[int, int, int], tuple[int, int]] = {}
+        try:
+            with open(self._journal_path, 'rb') as old_file, open(temp_path, 'wb') as new_file:
+                new_size = 0
+                for record in (encode_record({'type': RECORD_TYPE_JOURNAL, 'version': JOURNAL_VERSION}),
+                               encode_record(self._written_structure)):
+                    new_file.write(record)
+                    new_size += len(record)
+                for tile_key, (offset, length) in self._tile_records.items():
+                    if not self._throttle(length):
+                        return
+                    old_file.seek(offset)
+                    new_file.write(old_file.read(length))
+                    new_records[tile_key] = (new_size, length)
+                    new_size += length
+            self._file.close()
+            os.replace(temp_path, self._journal_path)
+        finally:
+            if os.path.exists(temp_path):
+                try:
+                    os.remove(temp_path)
+                except OSError as err:
+                    logger.error(f'Failed to remove incomplete autosave journal {temp_path}: {err}')
+        self._file = open(self._journal_path, 'ab')  # pylint: disable=consider-using-with
+        self._file_size = new_size
+        self._tile_records = new_records
+        logger.debug(f'Compacted autosave journal to {new_size} bytes')
+
+    def _throttle(self, byte_count: int) -> bool:
+        """Waits until byte_count bytes can be written without exceeding the maximum write rate, returning False if
+           journaling stopped while waiting."""
+        now = time.monotonic()
+        delay = self._next_write_time - now
+        if delay > 0:
+            with self._condition:
+                if self._condition.wait_for(lambda: self._stopped, delay):
+                    return False
+        self._next_write_time = max(now, self._next_write_time) + byte_count / self._max_write_rate
+        return not self._stopped
+
+    def _write(self, record: bytes) -> None:
+        assert self._file is not None
+        self._file.write(record)
+        self._file_size += len(record)
+
+
+def _build_layer(layer_data: dict[str, Any], images: dict[int, QImage],
+                 layers_by_id: dict[int, Layer]) -> Layer:
+    layer: Layer
+    if layer_data['kind'] == LAYER_KIND_GROUP:
+        layer = LayerGroup(layer_data['name'])
+        layer.set_isolate(bool(layer_data['isolate']))
+        for child_data in layer_data['children']:
+            layer.insert_layer(_build_layer(child_data, images, layers_by_id), layer.count)
+    else:
+        image_layer = ImageLayer(images[layer_data['id']], layer_data['name'])
+        if layer_data['alpha_locked']:
+            image_layer.set_alpha_locked(True)
+        if 'transform' in layer_data:
+            image_layer.set_transform(QTransform(*layer_data['transform']))
+        layer = image_layer
+    layer.set_visible(bool(layer_data['visible']))
+    layer.set_opacity(float(layer_data['opacity']))
+    try:
+        layer.set_composition_mode(CompositeMode.from_ora_name(layer_data['mode']))
+    except ValueError:
+        logger.error(f'Unrecognized composite mode {layer_data["mode"]} in autosave journal ignored')
+    layer.set_locked(bool(layer_data['locked']))
+    layers_by_id[layer_data['id']] = layer
+    return layer
+
+
+def read_journal(journal_path: str = DEFAULT_JOURNAL_PATH) -> Optional[tuple[LayerGroup, QSize, Optional[Layer]]]:
+    """Rebuilds a layer stack from a journal file.
+
+    Returns
+    -------
+    Optional[tuple[LayerGroup, QSize, Optional[Layer]]]
+        The restored layer stack, image size, and active layer, in the format expected by
+        ImageStack.load_layer_stack, or None if the journal contains no image.
+    """
+    structure: Optional[dict[str, Any]] = None
+    images: dict[int, QImage] = {}
+    for header, payload in read_records(journal_path):
+        if header['type'] == RECORD_TYPE_STRUCTURE:
+            structure = header
+            for layer_id, size in _image_layer_sizes(structure['root']).items():
+                if layer_id not in images or images[layer_id].size() != size:
+                    images[layer_id] = create_transparent_image(size)
+        elif header['type'] == RECORD_TYPE_TILE and header['layer_id'] in images:
+            image = images[header['layer_id']]
+            bounds = QRect(header['x'], header['y'], header['w'], header['h'])
+            if not QRect(0, 0, image.width(), image.height()).contains(bounds):
+                continue
+            np_tile = np.frombuffer(zlib.decompress(payload), dtype=np.uint8).reshape((bounds.height(),
+                                                                                        bounds.width(), 4))
+            np_image = image_data_as_numpy_8bit(image)
+            np_image[bounds.y():bounds.y() + bounds.height(), bounds.x():bounds.x() + bounds.width()] = np_tile
+    if structure is None:
+        return None
+    layers_by_id: dict[int, Layer] = {}
+    layer_stack = _build_layer(structure['root'], images, layers_by_id)
+    assert isinstance(layer_stack, LayerGroup)
+    active_layer = layers_by_id.get(structure['active_layer_id'], None)
+    return layer_stack, QSize(structure['width'], structure['height']), active_layer
+
+
+def recover_journal(image_stack: ImageStack, journal_path: str = DEFAULT_JOURNAL_PATH) -> bool:
+    """Loads the layer stack saved in a journal file into the image stack, returning whether recovery succeeded."""
+    try:
+        journal_data = read_journal(journal_path)
+    except (OSError, KeyError, ValueError, zlib.error) as err:
+        logger.error(f'Failed to read autosave journal {journal_path}: {err}')
+        return False
+    if journal_data is None:
+        return False
+    layer_stack, image_size, active_layer = journal_data
+    if active_layer is layer_stack:
+        active_layer = None
+    image_stack.load_layer_stack(layer_stack, image_size, active_layer)
+    return True
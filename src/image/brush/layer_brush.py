@@ -1,5 +1,6 @@
 """Interface for performing drawing operations on an image layer."""
-from typing import Optional
+from dataclasses import dataclass
+from typing import Optional, Sequence
 
 from PySide6.QtGui import QColor, QImage
 
@@ -11,6 +12,25 @@ from src.util.shared_constants import (ERROR_MESSAGE_LAYER_NONE, ERROR_MESSAGE_L
 from src.util.visual.image_utils import image_is_fully_transparent
 
 
+@dataclass
+class StrokePoint:
+    """A single brush stroke input, in layer image coordinates.
+
+    StrokePoint.x, StrokePoint.y:
+        Input position, with sub-pixel precision.
+    StrokePoint.pressure, StrokePoint.x_tilt, StrokePoint.y_tilt:
+        Tablet inputs, or None if not available.
+    StrokePoint.timestamp_ms:
+        Time the input was received, in milliseconds.
+    """
+    x: float
+    y: float
+    pressure: Optional[float] = None
+    x_tilt: Optional[float] = None
+    y_tilt: Optional[float] = None
+    timestamp_ms: int = 0
+
+
 class LayerBrush:
     """Draws content to an image layer."""
 
@@ -93,6 +113,13 @@ class LayerBrush:
     def stroke_to(self, x: float, y: float, pressure: Optional[float], x_tilt: Optional[float],
                   y_tilt: Optional[float]) -> None:
         """Continue a brush stroke with optional tablet inputs."""
+        self.stroke_points([StrokePoint(x, y, pressure, x_tilt, y_tilt)])
+
+    def stroke_points(self, points: Sequence[StrokePoint]) -> None:
+        """Continue a brush stroke through several inputs at once, such as all tablet inputs received within a single
+           frame."""
+        if len(points) == 0:
+            return
         error_message: Optional[str] = None
         if self._layer is None:
             error_message = ERROR_MESSAGE_LAYER_NONE
@@ -110,7 +137,7 @@ class LayerBrush:
             return
         if not self._drawing:
             self.start_stroke()
-        self._draw(x, y, pressure, x_tilt, y_tilt)
+        self._draw_points(points)
 
     def end_stroke(self) -> None:
         """Finishes a brush stroke, copying it back to the layer."""
@@ -135,3 +162,9 @@ class LayerBrush:
               y_tilt: Optional[float]) -> None:
         """Use active settings to use the brush with the given inputs."""
         raise NotImplementedError()
+
+    def _draw_points(self, points: Sequence[StrokePoint]) -> None:
+        """Draws a sequence of inputs. Brushes that can handle several inputs more efficiently than one at a time
+           should override this."""
+        for point in points:
+            self._draw(point.x, point.y, point.pressure, point.x_tilt, point.y_tilt)
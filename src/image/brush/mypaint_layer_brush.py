@@ -2,15 +2,15 @@
 Performs drawing operations on an image layer using the MyPaint brush engine.
 """
 import math
-from typing import Optional
+from typing import Optional, Sequence
 
 from PySide6.QtCore import QRect
 from PySide6.QtGui import QColor, QImage
 
-from src.image.brush.layer_brush import LayerBrush
+from src.image.brush.layer_brush import LayerBrush, StrokePoint
 from src.image.layers.image_layer import ImageLayer
 from src.image.mypaint.mypaint_brush import MyPaintBrush
-from src.image.mypaint.mypaint_layer_surface import MyPaintLayerSurface
+from src.image.mypaint.mypaint_layer_surface import MyPaintLayerSurface, DEFAULT_DTIME
 from src.image.mypaint.mypaint_scene_tile import MyPaintSceneTile
 
 
@@ -24,6 +24,7 @@ class MyPaintLayerBrush(LayerBrush):
         self._last_stroke_bounds = QRect()
         self._last_stroke_tiles: set[MyPaintSceneTile] = set()
         self._last_eraser_value: Optional[float] = None
+        self._last_timestamp_ms = 0
         super()._set_brush_color(self._mp_surface.brush.color)
         if layer is not None:
             self.connect_to_layer(layer)
@@ -54,6 +55,7 @@ class MyPaintLayerBrush(LayerBrush):
         super().start_stroke()
         self._last_stroke_tiles.clear()
         self._last_stroke_bounds = QRect()
+        self._last_timestamp_ms = 0
         self._mp_surface.start_stroke()
 
     def end_stroke(self) -> None:
@@ -99,3 +101,20 @@ class MyPaintLayerBrush(LayerBrush):
             self._mp_surface.stroke_to(x, y, pressure, x_tilt, y_tilt)
         else:
             self._mp_surface.basic_stroke_to(x, y)
+
+    def _draw_points(self, points: Sequence[StrokePoint]) -> None:
+        """Draws a sequence of inputs within a single MyPaint surface operation, passing the time between input
+           timestamps so that speed-dependent brush settings work."""
+        surface_inputs = []
+        for point in points:
+            # Inputs without timestamps, the first input in a stroke, and inputs sharing a timestamp with the previous
+            # input use the default time step:
+            dtime = DEFAULT_DTIME
+            if point.timestamp_ms > self._last_timestamp_ms > 0:
+                dtime = (point.timestamp_ms - self._last_timestamp_ms) / 1000
+            if point.timestamp_ms > 0:
+                self._last_timestamp_ms = point.timestamp_ms
+            surface_inputs.append((point.x, point.y, 1.0 if point.pressure is None else point.pressure,
+                                   0.0 if point.x_tilt is None else point.x_tilt,
+                                   0.0 if point.y_tilt is None else point.y_tilt, dtime))
+        self._mp_surface.stroke_to_points(surface_inputs)
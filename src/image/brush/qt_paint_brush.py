@@ -12,6 +12,7 @@ from src.image.brush.layer_brush import LayerBrush
 from src.image.layers.image_layer import ImageLayer
 from src.image.layers.selection_layer import SelectionLayer
 from src.util.math_utils import clamp
+from src.util.tracing import traced, CATEGORY_INPUT
 from src.util.visual.image_utils import create_transparent_image, image_data_as_numpy_8bit, numpy_bounds_index, \
     NpUInt8Array
 
@@ -292,6 +293,7 @@ class QtPaintBrush(LayerBrush):
             layer_painter.setCompositionMode(QPainter.CompositionMode.CompositionMode_DestinationOut)
         layer_painter.drawImage(bounds, segment_image, bounds)
 
+    @traced(category=CATEGORY_INPUT)
     def _draw_buffered_events(self) -> None:
         self._buffer_timer.stop()
         if len(self._input_buffer) == 0:
@@ -1,19 +1,34 @@
 """
 Brush implementing smudge tool operations.
+
+Smudging works by repeatedly sampling image content under the brush, then drawing that sample over the next brush
+position. Brush positions ("dabs") are placed at even intervals along the stroke, spaced by a fraction of the brush
+size. Dab masks are cached, and sampling and blending are done with NumPy directly on the layer image data, so costs
+grow with stroke length and brush area instead of requiring new images and painters for every pixel of the stroke.
 """
+from functools import lru_cache
 from typing import Optional
 
-from PySide6.QtCore import Qt, QPoint, QPointF, QTimer, QRect
-from PySide6.QtGui import QPainter, QImage, QColor
+import numpy as np
+from PySide6.QtCore import Qt, QPoint, QPointF, QTimer, QRect, QSize
+from PySide6.QtGui import QPainter, QColor
 
 from src.image.brush.layer_brush import LayerBrush
 from src.image.brush.qt_paint_brush import QtPaintBrush
 from src.image.layers.image_layer import ImageLayer
 from src.util.math_utils import clamp
-from src.util.visual.image_utils import create_transparent_image, image_data_as_numpy_8bit
+from src.util.tracing import traced, CATEGORY_INPUT
+from src.util.visual.image_utils import create_transparent_image, image_data_as_numpy_8bit, NpAnyArray
 
 PAINT_BUFFER_DELAY_MS = 50
 
+# Distance between dabs, as a fraction of the brush size:
+DAB_SPACING_FRACTION = 0.1
+
+# Opacity and hardness vary continuously with tablet pressure, so they're rounded to keep the mask cache useful:
+DAB_MASK_PRECISION = 2
+DAB_MASK_CACHE_SIZE = 64
+
 
 class SmudgeBrush(LayerBrush):
     """Draws content to an image layer using basic Qt drawing operations."""
@@ -23,8 +38,9 @@ class SmudgeBrush(LayerBrush):
         super().__init__(layer)
         self._opacity = 1.0
         self._hardness = 1.0
-        self._last_point: Optional[QPoint] = None
-        self._last_point_img = QImage()
+        self._last_point: Optional[QPointF] = None
+        self._distance_to_next_dab = 0.0
+        self._last_sample: Optional[NpAnyArray] = None
         self._input_buffer: list['_SmudgePoint'] = []
         self._buffer_timer = QTimer()
         self._buffer_timer.setInterval(PAINT_BUFFER_DELAY_MS)
@@ -92,7 +108,7 @@ class SmudgeBrush(LayerBrush):
     def start_stroke(self) -> None:
         """Clear tracked stroke data before starting a new stroke."""
         self._last_point = None
-        self._last_point_img = QImage()
+        self._last_sample = None
         layer = self.layer
         assert layer is not None
         super().start_stroke()
@@ -103,46 +119,7 @@ class SmudgeBrush(LayerBrush):
         self._last_point = None
         self._draw_buffered_events()
 
-    @staticmethod
-    def _sample_smudge_point(smudge_point: '_SmudgePoint', layer_image: QImage, antialiasing=False) -> QImage:
-        """Sample a point from the image, to be drawn over the next smudge point.
-
-        Parameters:
-        -----------
-        smudge_point: _SmudgePoint
-            Data from one smudge tool input event, storing location, brush size, opacity, and hardness.
-        layer_image: QImage
-            The ARGB32_Premultiplied layer image.
-
-        Returns:
-        --------
-        A new ARGB32_Premultiplied QImage containing the image content sampled from the layer.
-        """
-        intersect_bounds = smudge_point.rect.intersected(QRect(QPoint(), layer_image.size()))
-        if intersect_bounds.isEmpty():
-            return QImage()  # Mouse input was outside the image bounds, ignore it
-
-        # Draw the brush mask: A black circle with diameter equal to the brush size, highest opacity set to the
-        # smudge point opacity, and edges faded out based on hardness:
-        smudge_mask = smudge_point.draw_mask(antialiasing)
-
-        # Convert to numpy array. If the brush doesn't fully intersect with the image, clear the parts of the brush
-        # mask that do not intersect and restrict the array to the parts that do intersect.
-        np_smudge_mask = image_data_as_numpy_8bit(smudge_mask)
-        mask_intersect_bounds = intersect_bounds.translated(-smudge_point.rect.x(), -smudge_point.rect.y())
-        if intersect_bounds.size() != smudge_mask.size():
-            np_smudge_mask[:mask_intersect_bounds.y(), :, :] = 0
-            np_smudge_mask[mask_intersect_bounds.y() + mask_intersect_bounds.height():, :, :] = 0
-            np_smudge_mask[:, :mask_intersect_bounds.x(), :] = 0
-            np_smudge_mask[:, mask_intersect_bounds.x() + mask_intersect_bounds.width():, :] = 0
-
-        painter = QPainter(smudge_mask)
-        painter.setCompositionMode(QPainter.CompositionMode.CompositionMode_SourceIn)
-        painter.drawImage(mask_intersect_bounds, layer_image, intersect_bounds)
-        painter.end()
-
-        return smudge_mask
-
+    @traced(category=CATEGORY_INPUT)
     def _draw_buffered_events(self) -> None:
         self._buffer_timer.stop()
         if len(self._input_buffer) == 0:
@@ -151,37 +128,40 @@ class SmudgeBrush(LayerBrush):
         if layer is None:
             return
         change_bounds = QRect()
+        last_sample_size = None if self._last_sample is None else QSize(self._last_sample.shape[1],
+                                                                        self._last_sample.shape[0])
         for smudge_point in self._input_buffer:
             change_bounds = change_bounds.united(smudge_point.rect)
+            if last_sample_size is not None:
+                # With pressure-controlled size, the previous sample drawn here may be larger than the current dab:
+                sample_bounds = QRect(QPoint(), last_sample_size)
+                sample_bounds.moveCenter(smudge_point.rect.center())
+                change_bounds = change_bounds.united(sample_bounds)
+            last_sample_size = smudge_point.rect.size()
         change_bounds = change_bounds.intersected(layer.bounds)
         with layer.borrow_image(change_bounds) as layer_image:
-            img_painter = QPainter(layer_image)
-            assert isinstance(layer_image, QImage)
+            assert layer_image is not None
+            np_image = image_data_as_numpy_8bit(layer_image)
+            image_bounds = QRect(QPoint(), layer_image.size())
+            input_mask = self.input_mask
+            if input_mask is None:
+                np_mask_alpha = None
+                paint_area = image_bounds
+            else:
+                np_mask_alpha = image_data_as_numpy_8bit(input_mask)[:, :, 3]
+                paint_area = image_bounds.intersected(QRect(QPoint(), input_mask.size()))
             for smudge_point in self._input_buffer:
-                if not self._last_point_img.isNull():  # Draw the image from the last smudge point to the current one:
-                    paint_bounds = QRect(QPoint(), self._last_point_img.size())
+                if self._last_sample is not None:  # Draw the sample from the last smudge point to the current one:
+                    paint_bounds = QRect(0, 0, self._last_sample.shape[1], self._last_sample.shape[0])
                     paint_bounds.moveCenter(smudge_point.rect.center())
-                    mask_image = self.input_mask
-                    if mask_image is not None:
-                        source_bounds = paint_bounds.intersected(QRect(QPoint(), mask_image.size()))
-                        if source_bounds.isEmpty():
-                            continue
-                        destination_bounds = source_bounds.translated(-paint_bounds.x(), -paint_bounds.y())
-                        point_img_painter = QPainter(self._last_point_img)
-                        point_img_painter.setCompositionMode(QPainter.CompositionMode.CompositionMode_DestinationIn)
-                        point_img_painter.drawImage(destination_bounds, mask_image, source_bounds)
-                        point_img_painter.end()
-                    img_painter.drawImage(paint_bounds, self._last_point_img)
+                    _draw_sample(np_image, paint_area, self._last_sample, paint_bounds, np_mask_alpha)
                 # Save the image from the current smudge point to draw on the next one:
-                self._last_point_img = self._sample_smudge_point(smudge_point, layer_image, self.antialiasing)
-            img_painter.end()
+                self._last_sample = _sample_image(np_image, image_bounds, smudge_point, self.antialiasing)
             self._input_buffer.clear()
 
     def _draw(self, x: float, y: float, pressure: Optional[float], x_tilt: Optional[float],
               y_tilt: Optional[float]) -> None:
         """Use active settings to draw with the brush using the given inputs."""
-        if self._last_point is not None and self._last_point.x() == round(x) and self._last_point.y() == round(y):
-            return
         layer = self.layer
         assert layer is not None
         size = self.brush_size
@@ -194,25 +174,23 @@ class SmudgeBrush(LayerBrush):
                 opacity *= pressure
             if self._pressure_hardness:
                 hardness *= pressure
+        spacing = max(size * DAB_SPACING_FRACTION, 1.0)
         if self._last_point is None:
             self._input_buffer.append(_SmudgePoint(x, y, size, opacity, hardness))
+            self._distance_to_next_dab = spacing
         else:
-            x0 = round(self._last_point.x())
-            y0 = round(self._last_point.y())
-            x1 = round(x)
-            y1 = round(y)
-            dx = x1 - x0
-            dy = y1 - y0
-            if dx < 2 and dy < 2:
-                self._input_buffer.append(_SmudgePoint(x, y, size, opacity, hardness))
-            else:
-                step_count = max(abs(dx), abs(dy))
-                x_step = dx / step_count
-                y_step = dy / step_count
-                for i in range(1, step_count, 1):
-                    xi = round(x0 + x_step * i)
-                    yi = round(y0 + y_step * i)
-                    self._input_buffer.append(_SmudgePoint(xi, yi, size, opacity, hardness))
+            x0 = self._last_point.x()
+            y0 = self._last_point.y()
+            dx = x - x0
+            dy = y - y0
+            length = (dx * dx + dy * dy) ** 0.5
+            distance = self._distance_to_next_dab
+            while distance <= length:
+                fraction = distance / length
+                self._input_buffer.append(_SmudgePoint(x0 + dx * fraction, y0 + dy * fraction, size, opacity,
+                                                       hardness))
+                distance += spacing
+            self._distance_to_next_dab = distance - length
         self._last_point = QPointF(x, y)
         if not self._buffer_timer.isActive():
             self._buffer_timer.start()
@@ -227,13 +205,66 @@ class _SmudgePoint:
         self.opacity = opacity
         self.hardness = hardness
 
-    def draw_mask(self, antialiasing: bool = False) -> QImage:
-        """Creates a mask image for this input point."""
-        image = create_transparent_image(self.rect.size())
-        painter = QPainter(image)
-        painter.setRenderHint(QPainter.RenderHint.Antialiasing, antialiasing)
-        image_center = QPointF(self.rect.width() / 2, self.rect.height() / 2)
-        QtPaintBrush.paint_segment(painter, self.rect.width(), self.opacity, self.hardness,
-                                   QColor(Qt.GlobalColor.black), image_center, None)
-        painter.end()
-        return image
+    def mask(self, antialiasing: bool = False) -> NpAnyArray:
+        """Returns the cached brush mask for this input point, as a read-only array of alpha fractions."""
+        return _dab_mask(self.rect.width(), round(self.opacity, DAB_MASK_PRECISION),
+                         round(self.hardness, DAB_MASK_PRECISION), antialiasing)
+
+
+@lru_cache(maxsize=DAB_MASK_CACHE_SIZE)
+def _dab_mask(size: int, opacity: float, hardness: float, antialiasing: bool) -> NpAnyArray:
+    """Draws a brush mask: a circle with diameter equal to the brush size, highest opacity set to the smudge point
+       opacity, and edges faded out based on hardness. Returns a (size, size, 1) array of alpha fractions."""
+    image = create_transparent_image(QRect(0, 0, size, size).size())
+    painter = QPainter(image)
+    painter.setRenderHint(QPainter.RenderHint.Antialiasing, antialiasing)
+    QtPaintBrush.paint_segment(painter, size, opacity, hardness, QColor(Qt.GlobalColor.black),
+                               QPointF(size / 2, size / 2), None)
+    painter.end()
+    mask = image_data_as_numpy_8bit(image)[:, :, 3:].astype(np.float32) / 255
+    mask.flags.writeable = False
+    return mask
+
+
+def _intersection_slices(bounds: QRect, image_bounds: QRect) -> Optional[tuple[tuple[slice, slice],
+                                                                            tuple[slice, slice]]]:
+    """Returns image and local array slices for the part of a rectangle within the image bounds, or None if they
+       don't intersect."""
+    intersect = bounds.intersected(image_bounds)
+    if intersect.isEmpty():
+        return None
+    image_slices = (slice(intersect.y(), intersect.y() + intersect.height()),
+                    slice(intersect.x(), intersect.x() + intersect.width()))
+    local_x = intersect.x() - bounds.x()
+    local_y = intersect.y() - bounds.y()
+    local_slices = (slice(local_y, local_y + intersect.height()), slice(local_x, local_x + intersect.width()))
+    return image_slices, local_slices
+
+
+def _sample_image(np_image: NpAnyArray, image_bounds: QRect, smudge_point: _SmudgePoint,
+                  antialiasing: bool) -> Optional[NpAnyArray]:
+    """Samples premultiplied image content under a smudge point's mask, returning None if the point is outside the
+       image."""
+    slices = _intersection_slices(smudge_point.rect, image_bounds)
+    if slices is None:
+        return None  # Mouse input was outside the image bounds, ignore it
+    image_slices, local_slices = slices
+    mask = smudge_point.mask(antialiasing)
+    sample = np.zeros((smudge_point.rect.height(), smudge_point.rect.width(), 4), dtype=np.float32)
+    sample[local_slices] = np_image[image_slices] * mask[local_slices]
+    return sample
+
+
+def _draw_sample(np_image: NpAnyArray, image_bounds: QRect, sample: NpAnyArray, paint_bounds: QRect,
+                 np_mask_alpha: Optional[NpAnyArray]) -> None:
+    """Draws a premultiplied sample over the image, restricted to the input mask if one is provided."""
+    slices = _intersection_slices(paint_bounds, image_bounds)
+    if slices is None:
+        return
+    image_slices, local_slices = slices
+    source = sample[local_slices]
+    if np_mask_alpha is not None:
+        source = source * (np_mask_alpha[image_slices][:, :, np.newaxis] / 255)
+    destination = np_image[image_slices]
+    blended = source + destination * (1.0 - source[:, :, 3:] / 255)
+    destination[:] = np.clip(np.rint(blended), 0, 255)
@@ -13,13 +13,13 @@ from src.image.layers.layer import Layer
 from src.image.layers.layer_group import LayerGroup
 from src.image.layers.text_layer import TextLayer
 from src.image.layers.transform_layer import TransformLayer
-from src.ui.modal.image_filter_modal import ImageFilterModal
+from src.ui.modal.image_filter_modal import ImageFilterModal, FilterPreview
 from src.undo_stack import UndoStack
 from src.util.application_state import APP_STATE_EDITING, AppStateTracker
 from src.util.async_task import AsyncTask
 from src.util.parameter import Parameter
 from src.util.shared_constants import PROJECT_DIR
-from src.util.visual.image_utils import get_transparency_tile_pixmap, image_content_bounds, image_data_as_numpy_8bit, \
+from src.util.visual.image_utils import get_transparency_tile_brush, image_content_bounds, image_data_as_numpy_8bit, \
     numpy_bounds_index
 
 # The `QCoreApplication.translate` context for strings in this file
@@ -81,7 +81,7 @@ class ImageFilter:
         modal = ImageFilterModal(self.get_name(),
                                  self.get_modal_description(),
                                  self.get_parameters(),
-                                 self.get_preview_image,
+                                 self.get_filter_preview,
                                  self.apply_filter,
                                  self.selection_only,
                                  self.active_layer_only)
@@ -181,17 +181,20 @@ class ImageFilter:
             painter.end()
         return True
 
-    def get_preview_image(self, filter_param_values: list[Any]) -> QImage:
+    def get_filter_preview(self, filter_param_values: list[Any]) -> FilterPreview:
         """
-        Generate a preview of how the filter will be applied with given parameter values.
+        Prepares a preview of how the filter will be applied with given parameter values. This copies all layer images
+        the preview needs, so it must be called on the UI thread. The returned preview can then be filtered on a worker
+        thread, and rendered back on the UI thread.
+
         Parameters
         ----------
             filter_param_values: list
                 Parameter values to use, fitting the definitions the filter provides through get_parameters.
         Returns
         -------
-            QImage:
-                The new preview image, possibly downscaled to avoid excess image processing time.
+            FilterPreview:
+                The unfiltered preview.
         """
         bounds = self._image_stack.layer_stack.bounds
         preview_bounds = QRect(bounds)
@@ -213,35 +216,31 @@ class ImageFilter:
         preview_bounds.setY(max(bounds.y(), preview_bounds.y() - round(change_size.height() * 0.1)))
         preview_bounds.setHeight(min(bounds.y() + bounds.height() - preview_bounds.y(),
                                      round(change_size.height() * 1.2)))
-        if preview_bounds.isEmpty():
-            return QImage()
-
-        preview_transform = QTransform.fromTranslate(-preview_bounds.x(), -preview_bounds.y())
-        preview_image = QImage(preview_bounds.size(), QImage.Format.Format_ARGB32_Premultiplied)
-        background_painter = QPainter(preview_image)
-        transparency_pattern = get_transparency_tile_pixmap()
-        background_painter.drawTiledPixmap(0, 0, preview_image.width(), preview_image.height(), transparency_pattern)
-        background_painter.end()
-
-        def apply_filter(layer: Layer, layer_image: QImage) -> QImage:
-            """Apply the filter to each layer image as an intermediate step."""
-            self._filter_layer_image(filter_param_values, layer.id, layer_image)
-            return layer_image
-
-        self._image_stack.render(base_image=preview_image, transform=preview_transform, image_adjuster=apply_filter)
-        return preview_image
+        layer_images: dict[int, QImage] = {}
+        if not preview_bounds.isEmpty():
+            for layer in self._image_stack.image_layers:
+                if layer.visible and layer.transformed_bounds.intersects(preview_bounds):
+                    layer_images[layer.id] = layer.image
+        return _ImageFilterPreview(self, filter_param_values, preview_bounds, layer_images)
 
-    def apply_filter(self, filter_param_values: list[Any]) -> None:
+    def get_preview_image(self, filter_param_values: list[Any]) -> QImage:
         """
-        Applies the filter to the image stack, running filter operations in another thread to prevent hanging.
-
+        Generate a preview of how the filter will be applied with given parameter values, entirely on the UI thread.
         Parameters
         ----------
             filter_param_values: list
                 Parameter values to use, fitting the definitions the filter provides through get_parameters.
+        Returns
+        -------
+            QImage:
+                The new preview image, possibly downscaled to avoid excess image processing time.
         """
-        updated_layer_images: dict[int, QImage] = {}
+        preview = self.get_filter_preview(filter_param_values)
+        preview.filter_layer_images()
+        return preview.render()
 
+    def get_affected_text_layers(self) -> list[TextLayer]:
+        """Returns unlocked text layers that need to be converted to image layers before the filter can apply."""
         changed_text_layers: list[TextLayer] = []
         changed_parent_group: Optional[LayerGroup] = None
         if self._filter_active_layer_only:
@@ -256,7 +255,88 @@ class ImageFilter:
             for child_layer in changed_parent_group.recursive_child_layers:
                 if isinstance(child_layer, TextLayer) and not child_layer.locked and not child_layer.parent_locked:
                     changed_text_layers.append(child_layer)
+        return changed_text_layers
 
+    def filter_layer_images(self, filter_param_values: list[Any]) -> dict[int, QImage]:
+        """
+        Creates filtered copies of all layer images the filter affects, without changing the image stack. This does
+        not interact with the UI, so it is safe to call from a worker thread.
+
+        Parameters
+        ----------
+            filter_param_values: list
+                Parameter values to use, fitting the definitions the filter provides through get_parameters.
+        Returns
+        -------
+            dict[int, QImage]:
+                Filtered layer images, by layer id.
+        """
+        layer_images: dict[int, QImage] = {}
+        if self._filter_selection_only:
+            selection_bounds = self._image_stack.selection_layer.get_content_bounds()
+            selection_pos = self._image_stack.selection_layer.position
+            selection_bounds.translate(-selection_pos.x(), -selection_pos.y())
+        else:
+            selection_bounds = None
+        for layer in self._image_stack.image_layers:
+            if selection_bounds is not None and not selection_bounds.intersects(layer.transformed_bounds):
+                continue
+            layer_image = layer.image
+            image_changed = self._filter_layer_image(filter_param_values, layer.id, layer_image)
+            if image_changed:
+                layer_images[layer.id] = layer_image
+        return layer_images
+
+    def apply_filter_immediately(self, filter_param_values: list[Any]) -> None:
+        """
+        Applies the filter to the image stack on the current thread, converting affected text layers to image layers
+        without asking for confirmation. Used when editing without the UI.
+
+        Parameters
+        ----------
+            filter_param_values: list
+                Parameter values to use, fitting the definitions the filter provides through get_parameters.
+        """
+        self.validate_parameter_values(filter_param_values)
+        for text_layer in self.get_affected_text_layers():
+            self._image_stack.replace_text_layer_with_image(text_layer)
+        self._commit_filtered_images(self.filter_layer_images(filter_param_values))
+
+    def _commit_filtered_images(self, updated_layer_images: dict[int, QImage]) -> None:
+        """Replaces layer images with filtered copies, as a single undoable action."""
+        if len(updated_layer_images) == 0:
+            return
+        source_images: dict[int, QImage] = {}
+        for layer_id in updated_layer_images:
+            layer = self._image_stack.get_layer_by_id(layer_id)
+            assert layer is not None
+            source_images[layer_id] = layer.image
+
+        def _apply_filters():
+            for updated_id, image in updated_layer_images.items():
+                updated_layer = self._image_stack.get_layer_by_id(updated_id)
+                if isinstance(updated_layer, (ImageLayer, LayerGroup)):
+                    updated_layer.set_image(image)
+
+        def _undo_filters():
+            for updated_id, image in source_images.items():
+                updated_layer = self._image_stack.get_layer_by_id(updated_id)
+                if isinstance(updated_layer, (ImageLayer, LayerGroup)):
+                    updated_layer.set_image(image)
+
+        UndoStack().commit_action(_apply_filters, _undo_filters, 'ImageFilter.apply_filters')
+
+    def apply_filter(self, filter_param_values: list[Any]) -> None:
+        """
+        Applies the filter to the image stack, running filter operations in another thread to prevent hanging.
+
+        Parameters
+        ----------
+            filter_param_values: list
+                Parameter values to use, fitting the definitions the filter provides through get_parameters.
+        """
+        updated_layer_images: dict[int, QImage] = {}
+        changed_text_layers = self.get_affected_text_layers()
         text_layer_names = [layer.name for layer in changed_text_layers]
         if len(changed_text_layers) > 0 and not TextLayer.confirm_or_cancel_render_to_image(text_layer_names,
                                                                                             ACTION_NAME_FILTER):
@@ -265,49 +345,47 @@ class ImageFilter:
             self._image_stack.replace_text_layer_with_image(text_layer)
 
         def _filter_images() -> None:
-            layer_images: dict[int, QImage] = {}
-            if self._filter_selection_only:
-                selection_bounds = self._image_stack.selection_layer.get_content_bounds()
-                selection_pos = self._image_stack.selection_layer.position
-                selection_bounds.translate(-selection_pos.x(), -selection_pos.y())
-            else:
-                selection_bounds = None
-            for layer in self._image_stack.image_layers:
-                if selection_bounds is not None and not selection_bounds.intersects(layer.transformed_bounds):
-                    continue
-                layer_image = layer.image
-                image_changed = self._filter_layer_image(filter_param_values, layer.id, layer_image)
-                if image_changed:
-                    layer_images[layer.id] = layer_image
-            for layer_id, image in layer_images.items():
-                updated_layer_images[layer_id] = image
+            updated_layer_images.update(self.filter_layer_images(filter_param_values))
 
         task = AsyncTask(_filter_images, True)
 
         def _finish() -> None:
             AppStateTracker.set_app_state(APP_STATE_EDITING)
             task.finish_signal.disconnect(_finish)
-            if len(updated_layer_images) == 0:
-                return
-            source_images: dict[int, QImage] = {}
-            for layer_id in updated_layer_images:
-                layer = self._image_stack.get_layer_by_id(layer_id)
-                assert layer is not None
-                source_images[layer_id] = layer.image
-
-            def _apply_filters():
-                for updated_id, image in updated_layer_images.items():
-                    updated_layer = self._image_stack.get_layer_by_id(updated_id)
-                    if isinstance(updated_layer, (ImageLayer, LayerGroup)):
-                        updated_layer.set_image(image)
-
-            def _undo_filters():
-                for updated_id, image in source_images.items():
-                    updated_layer = self._image_stack.get_layer_by_id(updated_id)
-                    if isinstance(updated_layer, (ImageLayer, LayerGroup)):
-                        updated_layer.set_image(image)
-
-            UndoStack().commit_action(_apply_filters, _undo_filters, 'ImageFilter.apply_filters')
+            self._commit_filtered_images(updated_layer_images)
 
         task.finish_signal.connect(_finish)
         task.start()
+
+
+class _ImageFilterPreview(FilterPreview):
+    """Filter preview using layer images copied from the image stack."""
+
+    def __init__(self, image_filter: ImageFilter, filter_param_values: list[Any], bounds: QRect,
+                 layer_images: dict[int, QImage]) -> None:
+        self._image_filter = image_filter
+        self._filter_param_values = filter_param_values
+        self._bounds = bounds
+        self._layer_images = layer_images
+
+    def filter_layer_images(self) -> None:
+        """Applies the filter to the copied layer images. Called from a worker thread."""
+        for layer_id, layer_image in self._layer_images.items():
+            self._image_filter._filter_layer_image(self._filter_param_values, layer_id, layer_image)
+
+    def render(self) -> QImage:
+        """Draws the preview image using the filtered layer images. Called on the UI thread."""
+        if self._bounds.isEmpty():
+            return QImage()
+        preview_image = QImage(self._bounds.size(), QImage.Format.Format_ARGB32_Premultiplied)
+        background_painter = QPainter(preview_image)
+        background_painter.fillRect(preview_image.rect(), get_transparency_tile_brush())
+        background_painter.end()
+
+        def _use_filtered_image(layer: Layer, layer_image: QImage) -> QImage:
+            return self._layer_images.get(layer.id, layer_image)
+
+        preview_transform = QTransform.fromTranslate(-self._bounds.x(), -self._bounds.y())
+        self._image_filter._image_stack.render(base_image=preview_image, transform=preview_transform,
+                                               image_adjuster=_use_filtered_image)
+        return preview_image
@@ -1,7 +1,7 @@
 """Manages an edited image layer."""
 from collections.abc import Generator
 from contextlib import contextmanager
-from typing import Optional, Any
+from typing import Callable, Optional, Any
 
 import numpy as np
 from PIL import Image
@@ -12,7 +12,8 @@ from PySide6.QtWidgets import QApplication
 from src.image.composite_mode import CompositeMode
 from src.image.layers.transform_layer import TransformLayer
 from src.ui.modal.modal_utils import show_error_dialog
-from src.undo_stack import UndoStack
+from src.undo_stack import UndoStack, TransactionChange, UndoTransaction
+from src.util.tracing import trace_span, CATEGORY_IMAGE
 from src.util.visual.image_utils import image_content_bounds, create_transparent_image, image_data_as_numpy_8bit, \
     numpy_intersect, numpy_bounds_index, numpy_source_over_composition
 
@@ -31,6 +32,9 @@ CROP_LAYER_ERROR_MESSAGE_ALREADY_CONTENT_CROPPED = _tr('Layer is already cropped
 CROP_LAYER_ERROR_MESSAGE_SELECTION_EMPTY = _tr('No layer content is selected.')
 CROP_LAYER_ERROR_MESSAGE_SELECTION_FULL = _tr('Selection contains the entire layer.')
 
+# Size of the image tiles copied to record layer changes during undo transactions:
+UNDO_TILE_SIZE = 128
+
 
 class ImageLayer(TransformLayer):
     """Represents an edited image layer."""
@@ -152,45 +156,85 @@ class ImageLayer(TransformLayer):
 
     @contextmanager
     def borrow_image(self, change_bounds: Optional[QRect] = None) -> Generator[Optional[QImage], None, None]:
-        """Provides direct access to the image for editing, automatically marking it as changed when complete."""
+        """Provides direct access to the image for editing, automatically marking it as changed when complete.
+
+        If an undo transaction is open, changed tiles are copied the first time they're borrowed, and the change is
+        committed when the transaction ends. Otherwise, the change is committed immediately.
+        """
         assert not self.locked and not self.parent_locked, 'Tried to change image in a locked layer'
         if change_bounds is None or change_bounds.isEmpty():
             change_bounds = self.bounds
         if not self.bounds.contains(change_bounds):
             raise ValueError(f'Change bounds {change_bounds} not within layer bounds {self.bounds}')
-        initial_image = self.image
+        with trace_span('ImageLayer.borrow_image', CATEGORY_IMAGE):
+            # Only alpha locking needs the previous image content when handling changes:
+            initial_image = self.image if self._alpha_locked else self._image
+            transaction = UndoStack().active_transaction
+            if transaction is not None:
+                tile_changes = self._transaction_tile_changes(transaction)
+                tile_changes.snapshot(change_bounds, transaction)
+                initial_bounds_content = None
+            else:
+                tile_changes = None
+                initial_bounds_content = self._image.copy(change_bounds)
         try:
             yield self._image
         finally:
-            self.invalidate_pixmap()
-            self._handle_content_change(self._image, initial_image, change_bounds)
-            if change_bounds is None:
-                change_bounds = self.bounds
-            initial_bounds_content = initial_image if change_bounds == self.bounds \
-                else initial_image.copy(change_bounds)
-            updated_content = self._image.copy(change_bounds)
-
-            def _apply_change(content: QImage, bounds: QRect) -> None:
-                init_image = QImage(self._image.size(), QImage.Format.Format_ARGB32_Premultiplied)
-                np_init_img = numpy_bounds_index(image_data_as_numpy_8bit(init_image), bounds)
-                np_layer_image = numpy_bounds_index(image_data_as_numpy_8bit(self._image), bounds)
-                np_content = image_data_as_numpy_8bit(content)
-                np.copyto(np_init_img, np_layer_image)
-                np.copyto(np_layer_image, np_content)
+            with trace_span('ImageLayer.borrow_image.commit', CATEGORY_IMAGE):
                 self.invalidate_pixmap()
-                self._handle_content_change(self._image, init_image, bounds)
-                self.signal_content_changed(bounds)
+                self._handle_content_change(self._image, initial_image, change_bounds)
+                if transaction is not None:
+                    assert tile_changes is not None
+                    tile_changes.add_dirty_bounds(change_bounds)
+                    transaction.record_change()
+                else:
+                    assert initial_bounds_content is not None
+                    updated_content = self._image.copy(change_bounds)
 
-            def _apply(c: QImage = updated_content, b: QRect = change_bounds) -> None:
-                _apply_change(c, b)
+                    def _apply(c: QImage = updated_content, b: QRect = change_bounds) -> None:
+                        self._replace_content([(c, b)], b)
+
+                    def _undo(c: QImage = initial_bounds_content, b: QRect = change_bounds) -> None:
+                        self._replace_content([(c, b)], b)
+
+                    UndoStack().commit_action(_apply, _undo, 'ImageLayer.borrow_image', skip_initial_call=True)
 
-            def _undo(c: QImage = initial_bounds_content, b: QRect = change_bounds) -> None:
-                _apply_change(c, b)
                 self.signal_content_changed(change_bounds)
 
-            UndoStack().commit_action(_apply, _undo, 'ImageLayer.borrow_image', skip_initial_call=True)
+    def _transaction_tile_changes(self, transaction: UndoTransaction) -> '_ImageTileChanges':
+        """Returns the object tracking changes to this layer within an undo transaction."""
+        tile_changes = transaction.change(self, lambda: _ImageTileChanges(self))
+        if tile_changes.image_size != self._image.size():
+            # Tiles from before a size change can't be mixed with later tiles:
+            transaction.finish_changes()
+            tile_changes = transaction.change(self, lambda: _ImageTileChanges(self))
+        return tile_changes
+
+    def _replace_content(self, content: list[tuple[QImage, QRect]], change_bounds: QRect) -> None:
+        """Copies image regions into the layer image, then handles the change.
 
-            self.signal_content_changed(change_bounds)
+        Parameters
+        ----------
+        content: list[tuple[QImage, QRect]]
+            Images to insert, paired with the local bounds they'll replace. Image sizes must match their bounds.
+        change_bounds: QRect
+            Local bounds containing all inserted regions.
+        """
+        if self._alpha_locked:
+            init_image = QImage(self._image.size(), QImage.Format.Format_ARGB32_Premultiplied)
+            np_init_img = image_data_as_numpy_8bit(init_image)
+        else:
+            init_image = self._image
+            np_init_img = None
+        np_image = image_data_as_numpy_8bit(self._image)
+        for region_content, bounds in content:
+            np_layer_region = numpy_bounds_index(np_image, bounds)
+            if np_init_img is not None:
+                np.copyto(numpy_bounds_index(np_init_img, bounds), np_layer_region)
+            np.copyto(np_layer_region, image_data_as_numpy_8bit(region_content))
+        self.invalidate_pixmap()
+        self._handle_content_change(self._image, init_image, change_bounds)
+        self.signal_content_changed(change_bounds)
 
     def adjust_local_bounds(self, relative_bounds: QRect, register_to_undo_history: bool = True) -> None:
         """Changes local image bounds, cropping or extending the layer image.
@@ -420,3 +464,58 @@ class ImageLayerState:
         self.image = image
         self.locked = locked
         self.alpha_locked = alpha_locked
+
+
+class _ImageTileChanges(TransactionChange):
+    """Records changes to an image layer during an undo transaction, copying each changed tile once before its first
+       change."""
+
+    def __init__(self, layer: ImageLayer) -> None:
+        self._layer = layer
+        self.image_size = layer.get_qimage().size()
+        self._tiles: dict[tuple[int, int], tuple[QImage, QRect]] = {}
+        self._dirty_bounds = QRect()
+
+    def snapshot(self, bounds: QRect, transaction: UndoTransaction) -> None:
+        """Copies all tiles within the bounds that haven't been copied yet."""
+        image = self._layer.get_qimage()
+        image_bounds = QRect(QPoint(), image.size())
+        byte_count = 0
+        tile_count = 0
+        for tile_y in range(bounds.top() // UNDO_TILE_SIZE, bounds.bottom() // UNDO_TILE_SIZE + 1):
+            for tile_x in range(bounds.left() // UNDO_TILE_SIZE, bounds.right() // UNDO_TILE_SIZE + 1):
+                if (tile_x, tile_y) in self._tiles:
+                    continue
+                tile_bounds = QRect(tile_x * UNDO_TILE_SIZE, tile_y * UNDO_TILE_SIZE, UNDO_TILE_SIZE,
+                                    UNDO_TILE_SIZE).intersected(image_bounds)
+                tile = image.copy(tile_bounds)
+                self._tiles[(tile_x, tile_y)] = (tile, tile_bounds)
+                byte_count += tile.sizeInBytes()
+                tile_count += 1
+        if tile_count > 0:
+            transaction.record_snapshot(tile_count, byte_count)
+
+    def add_dirty_bounds(self, bounds: QRect) -> None:
+        """Marks an area within the copied tiles as changed."""
+        self._dirty_bounds = bounds if self._dirty_bounds.isEmpty() else self._dirty_bounds.united(bounds)
+
+    def finish(self) -> Optional[tuple[Callable[[], None], Callable[[], None]]]:
+        """Returns functions that restore the copied tiles, or re-apply changes to them. Changed tile content isn't
+           copied until the first time the change is undone."""
+        if self._dirty_bounds.isEmpty():
+            return None
+        layer = self._layer
+        dirty_bounds = self._dirty_bounds
+        initial_tiles = list(self._tiles.values())
+        changed_tiles: list[tuple[QImage, QRect]] = []
+
+        def _undo() -> None:
+            if len(changed_tiles) == 0:
+                image = layer.get_qimage()
+                changed_tiles.extend((image.copy(bounds), bounds) for _, bounds in initial_tiles)
+            layer._replace_content(initial_tiles, dirty_bounds)  # pylint: disable=protected-access
+
+        def _redo() -> None:
+            layer._replace_content(changed_tiles, dirty_bounds)  # pylint: disable=protected-access
+
+        return _undo, _redo
@@ -21,7 +21,7 @@ from src.image.layers.transform_layer import TransformLayer
 from src.ui.modal.modal_utils import show_error_dialog, show_warning_dialog
 from src.undo_stack import UndoStack
 from src.util.visual.image_utils import image_content_bounds
-from src.util.visual.pil_image_utils import pil_image_scaling
+from src.util.visual.tiled_image_scaling import tiled_image_scaling
 
 # The `QCoreApplication.translate` context for strings in this file
 TR_ID = 'image.layers.image_stack_utils'
@@ -136,7 +136,7 @@ def crop_layer_to_selection(image_stack: ImageStack, layer: Optional[Layer] = No
 
 def scale_all_layers(image_stack: ImageStack, width: int, height: int,
                      image_scale_mode: Optional[Image.Resampling] = None) -> None:
-    """Scale all layer content by applying PIL scaling or adjusting layer transformations."""
+    """Scale all layer content by applying tiled PIL scaling or adjusting layer transformations."""
     initial_size = image_stack.size
     if width == initial_size.width() and height == initial_size.height():
         return
@@ -160,7 +160,7 @@ def scale_all_layers(image_stack: ImageStack, width: int, height: int,
                     new_size = QSize(width, height)
                 else:
                     new_size = QSize(round(image.width() * x_scale), round(image.height() * y_scale))
-                layer.image = pil_image_scaling(image, new_size, image_scale_mode)
+                layer.image = tiled_image_scaling(image, new_size, image_scale_mode)
             else:
                 layer.transform = layer.transform * scale_transform
         new_size = QSize(width, height)
@@ -189,7 +189,7 @@ def image_stack_color_at_point(image_stack: ImageStack, image_point: QPoint) ->
 def top_layer_at_point(image_stack: ImageStack, image_coordinates: QPoint) -> Optional[ImageLayer | TextLayer]:
     """Return the topmost image or text layer that contains non-transparent pixels at the given coordinates, or the
        topmost with transparent pixels if none are non-transparent at that point."""
-    all_layers = [layer for layer in image_stack.layer_stack.recursive_child_layers
+    all_layers = [layer for layer in image_stack.layer_stack.layers_at_point(image_coordinates)
                   if isinstance(layer, (ImageLayer, TextLayer))]
     top_transparent: Optional[ImageLayer | TextLayer] = None
     for layer in all_layers:
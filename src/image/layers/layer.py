@@ -11,6 +11,7 @@ from src.config.application_config import AppConfig
 from src.image.composite_mode import CompositeMode
 from src.undo_stack import UndoStack, _UndoAction, _UndoGroup
 from src.util.cached_data import CachedData
+from src.util.tracing import trace_span, CATEGORY_RENDER
 from src.util.visual.geometry_utils import map_rect_precise
 from src.util.visual.image_utils import (create_transparent_image, NpAnyArray, image_data_as_numpy_8bit_readonly,
                                          image_is_fully_transparent)
@@ -303,11 +304,12 @@ class Layer(QObject):
     def pixmap(self) -> QPixmap:
         """Returns the layer's pixmap content."""
         if not self._pixmap.valid:
-            image = self.get_qimage()
-            if not image.isNull():
-                self._pixmap.data = QPixmap.fromImage(image)
-            else:
-                self._pixmap.data = QPixmap()
+            with trace_span('Layer.pixmap', CATEGORY_RENDER):
+                image = self.get_qimage()
+                if not image.isNull():
+                    self._pixmap.data = QPixmap.fromImage(image)
+                else:
+                    self._pixmap.data = QPixmap()
         return self._pixmap.data
 
     @property
@@ -8,12 +8,14 @@ from PySide6.QtGui import QPainter, QImage, QTransform
 from src.image.composite_mode import CompositeMode
 from src.image.layers.image_layer import ImageLayer, ImageLayerState
 from src.image.layers.layer import Layer, LayerParent
+from src.image.layers.layer_spatial_index import LayerSpatialIndex
 from src.image.layers.text_layer import TextLayer
 from src.image.layers.transform_layer import TransformLayer
 from src.undo_stack import UndoStack
 from src.util.application_state import APP_STATE_NO_IMAGE, APP_STATE_EDITING, AppStateTracker
 from src.util.cached_data import CachedData
 from src.util.signals_blocked import signals_blocked
+from src.util.tracing import traced, CATEGORY_RENDER
 from src.util.validation import assert_valid_index
 from src.util.visual.geometry_utils import map_rect_precise
 from src.util.visual.image_utils import create_transparent_image, image_data_as_numpy_8bit
@@ -37,7 +39,16 @@ class LayerGroup(Layer, LayerParent):
         self._image_cache = CachedData(None)
         self._layers: list[Layer] = []
         self._bounds = QRect()
+        # Child geometry and layer order are cached, so that hit-tests and bounds checks don't need to walk the
+        # layer tree every time:
+        self._child_index: LayerSpatialIndex[Layer] = LayerSpatialIndex()
+        self._child_index_valid = True
+        self._bounds_valid = True
+        self._flattened_layers: Optional[list[Layer]] = None
+        self._child_order: Optional[dict[Layer, int]] = None
         self._isolate = False
+        self._render_deferred = False
+        self._render_pending = False
         self._render_timer = QTimer()
         self._render_timer.setSingleShot(True)
         self._render_timer.setInterval(RENDER_DELAY_MS)
@@ -61,23 +72,52 @@ class LayerGroup(Layer, LayerParent):
         return len(self._layers)
 
     def _get_local_bounds(self) -> QRect:
+        if self._bounds_valid:
+            return QRect(self._bounds)
+        self._validate_child_index()
         bounds = None
         for child in self._layers:
-            if isinstance(child, TransformLayer):
-                child_bounds = child.transformed_bounds
-            else:
-                child_bounds = child.bounds
+            child_bounds = self._child_index.bounds(child)
+            assert child_bounds is not None
             if bounds is None:
                 bounds = child_bounds
             else:
                 bounds = bounds.united(child_bounds)
         if bounds is None:
             return QRect()
+        self._bounds = QRect(bounds)
+        self._bounds_valid = True
         if self.size != bounds.size():
             self.set_size(bounds.size())
-        self._bounds = QRect(bounds)
         return bounds
 
+    @staticmethod
+    def _get_child_bounds(child: Layer) -> QRect:
+        if isinstance(child, TransformLayer):
+            return child.transformed_bounds
+        return child.bounds
+
+    def _validate_child_index(self) -> None:
+        if self._child_index_valid:
+            return
+        self._child_index.clear()
+        for child in self._layers:
+            self._child_index.set_bounds(child, self._get_child_bounds(child))
+        self._child_index_valid = True
+
+    def _invalidate_geometry(self) -> None:
+        """Discards cached child bounds, so they're reloaded on next use."""
+        self._child_index_valid = False
+        self._bounds_valid = False
+
+    def _invalidate_layer_order(self) -> None:
+        """Discards the cached flattened child list and child order, here and in all parent groups."""
+        group: Optional[LayerParent] = self
+        while isinstance(group, LayerGroup):
+            group._flattened_layers = None
+            group._child_order = None
+            group = group.layer_parent
+
     def flip_horizontal(self) -> None:
         """Flip the group horizontally."""
         if self.locked:
@@ -131,17 +171,41 @@ class LayerGroup(Layer, LayerParent):
 
     @property
     def recursive_child_layers(self) -> list[Layer]:
-        """Returns all child layers or children of child layers, recursively."""
-        flattened_stack = []
-
-        def _unpack_layers(layer_stack: LayerGroup):
-            for idx in range(layer_stack.count):
-                child_layer = layer_stack.get_layer_by_index(idx)
+        """Returns all child layers or children of child layers, recursively, from top to bottom."""
+        if self._flattened_layers is None:
+            flattened_stack = []
+            for child_layer in self._layers:
                 flattened_stack.append(child_layer)
                 if isinstance(child_layer, LayerGroup):
-                    _unpack_layers(child_layer)
-        _unpack_layers(self)
-        return flattened_stack
+                    flattened_stack += child_layer.recursive_child_layers
+            self._flattened_layers = flattened_stack
+        return [*self._flattened_layers]
+
+    def layers_at_point(self, image_point: QPoint) -> list[Layer]:
+        """Returns all non-group layers within this group that have transformed bounds containing a point, from top
+           to bottom. This only checks bounding boxes, not pixel content or visibility."""
+        self._validate_child_index()
+        return self._find_layers(self._child_index.items_at(image_point), lambda group: group.layers_at_point(
+            image_point))
+
+    def layers_in_bounds(self, image_bounds: QRect) -> list[Layer]:
+        """Returns all non-group layers within this group that have transformed bounds intersecting a rectangle,
+           from top to bottom. This only checks bounding boxes, not pixel content or visibility."""
+        self._validate_child_index()
+        return self._find_layers(self._child_index.items_intersecting(image_bounds),
+                                 lambda group: group.layers_in_bounds(image_bounds))
+
+    def _find_layers(self, matching_children: set[Layer],
+                     search_group: Callable[['LayerGroup'], list[Layer]]) -> list[Layer]:
+        if self._child_order is None:
+            self._child_order = {child: i for i, child in enumerate(self._layers)}
+        found_layers: list[Layer] = []
+        for child in sorted(matching_children, key=self._child_order.__getitem__):
+            if isinstance(child, LayerGroup):
+                found_layers += search_group(child)
+            else:
+                found_layers.append(child)
+        return found_layers
 
     def copy(self) -> 'LayerGroup':
         """Returns a copy of this layer, and all the layers within it."""
@@ -201,6 +265,7 @@ class LayerGroup(Layer, LayerParent):
         self._image_cache.data = image
         return image
 
+    @traced(category=CATEGORY_RENDER)
     def render(self, base_image: QImage, transform: Optional[QTransform] = None,
                image_bounds: Optional[QRect] = None, z_max: Optional[int] = None,
                image_adjuster: Optional[Callable[['Layer', QImage], QImage]] = None,
@@ -377,6 +442,9 @@ class LayerGroup(Layer, LayerParent):
         index = self.get_layer_index(layer)
         assert index is not None
         self._layers.pop(index)
+        self._invalidate_layer_order()
+        self._child_index.remove(layer)
+        self._bounds_valid = False
         layer.layer_parent = None
         if layer.visible:
             self._trigger_render()
@@ -411,6 +479,9 @@ class LayerGroup(Layer, LayerParent):
         layer.size_changed.connect(self._layer_bounds_change_slot)
         self._layers.insert(index, layer)
         layer.layer_parent = self
+        self._invalidate_layer_order()
+        if self._child_index_valid:
+            self._child_index.set_bounds(layer, layer_bounds)
         if len(self._layers) == 1 and AppStateTracker.app_state() == APP_STATE_NO_IMAGE:
             AppStateTracker.set_app_state(APP_STATE_EDITING)
         if layer.visible and not empty_image:
@@ -433,6 +504,7 @@ class LayerGroup(Layer, LayerParent):
             return
         self._layers.remove(layer)
         self._layers.insert(new_index, layer)
+        self._invalidate_layer_order()
         self._trigger_render()
 
     def save_state(self) -> Any:
@@ -540,6 +612,10 @@ class LayerGroup(Layer, LayerParent):
                     stack.enter_context(signals_blocked(layer))
                 yield
         finally:
+            # Geometry change signals were blocked, so cached child bounds may be outdated:
+            for layer in all_layers:
+                if isinstance(layer, LayerGroup):
+                    layer._invalidate_geometry()
             updated_layer_list: set[Layer] = {self, *self.recursive_child_layers}
             for layer in all_layers:
                 old_parent = parent_states[layer]
@@ -594,6 +670,9 @@ class LayerGroup(Layer, LayerParent):
 
     def _layer_bounds_change_slot(self, layer: Layer, _=None) -> None:
         if layer in self._layers:
+            if self._child_index_valid:
+                self._child_index.set_bounds(layer, self._get_child_bounds(layer))
+            self._bounds_valid = False
             last_bounds = self._bounds
             bounds = self._get_local_bounds()  # Ensure size is correct
             if bounds != last_bounds:
@@ -602,8 +681,33 @@ class LayerGroup(Layer, LayerParent):
                         > self.content_change_timestamp:
                     self._trigger_render()
 
+    @property
+    def render_deferred(self) -> bool:
+        """Returns whether re-rendering after child layer changes is currently put off."""
+        return self._render_deferred
+
+    def set_render_deferred(self, deferred: bool) -> None:
+        """Sets whether re-rendering after child layer changes should be put off.
+
+        While rendering is deferred, the group keeps its previously rendered content and doesn't send content change
+        signals when child layers change. When deferral ends, the group re-renders immediately if any changes were
+        put off. This is meant for interactive changes that are previewed some other way, so that the group renders
+        once when the interaction ends instead of after every change.
+        """
+        if deferred == self._render_deferred:
+            return
+        self._render_deferred = deferred
+        if deferred and self._render_timer.isActive():
+            self._render_timer.stop()
+            self._render_pending = True
+        elif not deferred and self._render_pending:
+            self._render_pending = False
+            self._start_render()
+
     def _trigger_render(self) -> None:
-        if not self._render_timer.isActive():
+        if self._render_deferred:
+            self._render_pending = True
+        elif not self._render_timer.isActive():
             self._render_timer.start()
 
     def _start_render(self) -> None:
@@ -0,0 +1,118 @@
+"""Finds layers by their bounds without checking every layer.
+
+Layer groups use this to answer point and rectangle hit-tests over their child layers. Bounds are sorted into a uniform
+grid of square cells, so a query only checks the layers that overlap the cells it touches. Layers that would cover
+too many cells are kept in a separate list and checked on every query instead.
+"""
+from typing import Generic, TypeVar, Hashable, Iterator, Optional
+
+from PySide6.QtCore import QRect, QPoint
+
+CELL_SIZE = 256
+
+# Items spanning more cells than this are checked on every query, instead of being added to each cell:
+MAX_INDEXED_CELLS = 64
+
+ItemT = TypeVar('ItemT', bound=Hashable)
+
+
+class LayerSpatialIndex(Generic[ItemT]):
+    """Tracks item bounds in a uniform grid, finding items by point or by rectangle."""
+
+    def __init__(self, cell_size: int = CELL_SIZE) -> None:
+        """Initializes an empty index.
+
+        Parameters
+        ----------
+        cell_size: int, default=CELL_SIZE
+            Width and height of each grid cell, in pixels.
+        """
+        self._cell_size = cell_size
+        self._bounds: dict[ItemT, QRect] = {}
+        self._cells: dict[tuple[int, int], set[ItemT]] = {}
+        self._item_cells: dict[ItemT, list[tuple[int, int]]] = {}
+        self._large_items: set[ItemT] = set()
+
+    def __len__(self) -> int:
+        return len(self._bounds)
+
+    def __contains__(self, item: ItemT) -> bool:
+        return item in self._bounds
+
+    def __iter__(self) -> Iterator[ItemT]:
+        return iter(self._bounds)
+
+    def bounds(self, item: ItemT) -> Optional[QRect]:
+        """Returns the bounds saved for an item, or None if the item isn't in the index."""
+        bounds = self._bounds.get(item, None)
+        return None if bounds is None else QRect(bounds)
+
+    def set_bounds(self, item: ItemT, bounds: QRect) -> None:
+        """Adds an item to the index, or updates its bounds if it was already added. Items with empty bounds are
+        kept, but never returned by queries."""
+        last_bounds = self._bounds.get(item, None)
+        if last_bounds is not None:
+            if last_bounds == bounds:
+                return
+            self._remove_from_cells(item)
+        self._bounds[item] = QRect(bounds)
+        if bounds.isEmpty():
+            return
+        cells = list(self._cells_in_rect(bounds))
+        if len(cells) > MAX_INDEXED_CELLS:
+            self._large_items.add(item)
+            return
+        for cell in cells:
+            if cell not in self._cells:
+                self._cells[cell] = set()
+            self._cells[cell].add(item)
+        self._item_cells[item] = cells
+
+    def remove(self, item: ItemT) -> None:
+        """Removes an item from the index, if present."""
+        if item not in self._bounds:
+            return
+        self._remove_from_cells(item)
+        del self._bounds[item]
+
+    def clear(self) -> None:
+        """Removes all items from the index."""
+        self._bounds.clear()
+        self._cells.clear()
+        self._item_cells.clear()
+        self._large_items.clear()
+
+    def items_at(self, point: QPoint) -> set[ItemT]:
+        """Returns all items with bounds that contain a point."""
+        cell = (point.x() // self._cell_size, point.y() // self._cell_size)
+        candidates = self._cells.get(cell, set()) | self._large_items
+        return {item for item in candidates if self._bounds[item].contains(point)}
+
+    def items_intersecting(self, rect: QRect) -> set[ItemT]:
+        """Returns all items with bounds that intersect a rectangle."""
+        if rect.isEmpty():
+            return set()
+        cell_count = (rect.right() // self._cell_size - rect.left() // self._cell_size + 1) \
+            * (rect.bottom() // self._cell_size - rect.top() // self._cell_size + 1)
+        if cell_count > len(self._bounds):
+            # Checking every item is faster than checking every cell:
+            return {item for item, bounds in self._bounds.items() if bounds.intersects(rect)}
+        candidates = set(self._large_items)
+        for cell in self._cells_in_rect(rect):
+            cell_items = self._cells.get(cell, None)
+            if cell_items is not None:
+                candidates |= cell_items
+        return {item for item in candidates if self._bounds[item].intersects(rect)}
+
+    def _cells_in_rect(self, rect: QRect) -> Iterator[tuple[int, int]]:
+        for cell_y in range(rect.top() // self._cell_size, rect.bottom() // self._cell_size + 1):
+            for cell_x in range(rect.left() // self._cell_size, rect.right() // self._cell_size + 1):
+                yield cell_x, cell_y
+
+    def _remove_from_cells(self, item: ItemT) -> None:
+        self._large_items.discard(item)
+        for cell in self._item_cells.pop(item, []):
+            cell_items = self._cells[cell]
+            cell_items.discard(item)
+            if len(cell_items) == 0:
+                del self._cells[cell]
@@ -12,6 +12,7 @@ from PySide6.QtWidgets import QApplication
 from src.config.application_config import AppConfig
 from src.config.cache import Cache
 from src.image.layers.image_layer import ImageLayer
+from src.util.tracing import traced, CATEGORY_IMAGE
 from src.util.visual.image_utils import (image_content_bounds, NpAnyArray, image_data_as_numpy_8bit,
                                          image_is_fully_transparent)
 from src.util.visual.pil_image_utils import qimage_to_pil_image
@@ -183,6 +184,7 @@ class SelectionLayer(ImageLayer):
         """Gets the generation area mask content as a PIL image mask"""
         return qimage_to_pil_image(self.mask_image)
 
+    @traced(category=CATEGORY_IMAGE)
     def _handle_content_change(self, image: QImage, last_image: QImage,
                                change_bounds: Optional[QRect] = None) -> None:
         """When the image updates, ensure that it meets requirements, and recalculate bounds.
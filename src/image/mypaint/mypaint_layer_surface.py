@@ -2,8 +2,7 @@
 import logging
 import math
 from ctypes import sizeof, pointer, byref, c_float, c_double, c_int, c_void_p
-from time import time
-from typing import Any, Optional
+from typing import Any, Optional, Sequence
 
 from PySide6.QtCore import QObject, QSize, QRect, QTimer
 from PySide6.QtGui import QColor, QImage
@@ -20,6 +19,9 @@ from src.util.visual.image_utils import numpy_bounds_index, image_data_as_numpy_
 logger = logging.getLogger(__name__)
 TILE_UPDATE_TIMER_MS = 100
 
+# Time between inputs passed to libmypaint when the actual time isn't known, in seconds:
+DEFAULT_DTIME = 0.1
+
 
 class MyPaintLayerSurface(QObject):
     """A LibMyPaint surface that connects directly to an ImageLayer."""
@@ -56,7 +58,6 @@ class MyPaintLayerSurface(QObject):
         self._roi = pointer(self._rectangle_buf)
         self._rectangle_buf.rectangles = self._rectangles
         self._rectangle_buf.num_rectangles = RECTANGLE_BUF_SIZE
-        self._dtime_start = time()
 
         # Initialize surface data, starting with empty functions:
         def empty_update_function(_unused, _unused2) -> None:
@@ -209,17 +210,22 @@ class MyPaintLayerSurface(QObject):
             return
         libmypaint.mypaint_brush_reset(self.brush.brush_ptr)
         libmypaint.mypaint_brush_new_stroke(self.brush.brush_ptr)
-        self._dtime_start = time()
 
     def stroke_to(self, x: float, y: float, pressure: float, x_tilt: float, y_tilt: float):
         """Continue a brush stroke, providing tablet inputs."""
+        self.stroke_to_points([(x, y, pressure, x_tilt, y_tilt, DEFAULT_DTIME)])
+
+    def stroke_to_points(self, points: Sequence[tuple[float, float, float, float, float, float]]) -> None:
+        """Continue a brush stroke through several (x, y, pressure, x_tilt, y_tilt, dtime) inputs, processing all of
+           them within a single atomic surface operation. dtime is the time in seconds since the previous input."""
         if not self._should_allow_stroke():
             return
-        dtime = 0.1  # time() - self._dtime_start
         libmypaint.mypaint_surface_begin_atomic(byref(self._surface_data))
-        libmypaint.mypaint_brush_stroke_to(self.brush.brush_ptr, byref(self._surface_data),
-                                           c_float(x), c_float(y), c_float(pressure), c_float(x_tilt), c_float(y_tilt),
-                                           c_double(dtime), c_float(1.0), c_float(0.0), c_float(0.0), c_int(1))
+        for x, y, pressure, x_tilt, y_tilt, dtime in points:
+            libmypaint.mypaint_brush_stroke_to(self.brush.brush_ptr, byref(self._surface_data),
+                                               c_float(x), c_float(y), c_float(pressure), c_float(x_tilt),
+                                               c_float(y_tilt), c_double(dtime), c_float(1.0), c_float(0.0),
+                                               c_float(0.0), c_int(1))
         libmypaint.mypaint_surface_end_atomic(byref(self._surface_data), self._roi)
 
     def end_stroke(self) -> None:
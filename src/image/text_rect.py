@@ -69,7 +69,7 @@ class TextRect:
     def __eq__(self, other: object) -> bool:
         if not isinstance(other, TextRect):
             return False
-        return (self._text == other._text and self._font.isCopyOf(other._font)
+        return (self._text == other._text and self._font == other._font
                 and self._text_color == other._text_color and self._background_color == other._background_color
                 and self._size == other._size and self._text_alignment == other._text_alignment
                 and self._fill_background == other._fill_background
@@ -201,8 +201,8 @@ class TextRect:
         elif self._scale_mode == SCALE_MODE_TEXT_TO_BOUNDS:
             if len(self._text) == 0:
                 return
-            max_pt_size = max_font_size(self._text, self._font, self._size, True)
-            if max_pt_size > 0:
+            max_pt_size = max_font_size(self._text, self._font, self._size, multiline=True)
+            if max_pt_size > 0 and max_pt_size != self._font.pointSize():
                 self._font.setPointSize(max_pt_size)
 
     def render(self, painter: QPainter) -> None:
@@ -4,15 +4,16 @@ import logging
 import math
 from typing import Optional
 
-from PySide6.QtCore import Qt, QPoint, QLineF, QPointF, QEvent, QRect
-from PySide6.QtGui import QCursor, QTabletEvent, QMouseEvent, QColor, QIcon, QWheelEvent, QPointingDevice
+from PySide6.QtCore import Qt, QPoint, QLineF, QPointF, QEvent, QRect, QTimer
+from PySide6.QtGui import QCursor, QTabletEvent, QMouseEvent, QColor, QIcon, QWheelEvent, QPointingDevice, \
+    QInputEvent
 from PySide6.QtWidgets import QApplication
 
 from src.config.application_config import AppConfig
 from src.config.cache import Cache
 from src.config.key_config import KeyConfig
 from src.hotkey_filter import HotkeyFilter
-from src.image.brush.layer_brush import LayerBrush
+from src.image.brush.layer_brush import LayerBrush, StrokePoint
 from src.image.layers.image_layer import ImageLayer
 from src.image.layers.image_stack import ImageStack
 from src.image.layers.layer import Layer
@@ -20,6 +21,7 @@ from src.tools.base_tool import BaseTool
 from src.ui.graphics_items.temp_dashed_line_item import TempDashedLineItem
 from src.ui.image_viewer import ImageViewer
 from src.ui.panel.tool_control_panels.brush_tool_panel import BrushToolPanel
+from src.undo_stack import UndoStack
 from src.util.shared_constants import PROJECT_DIR
 from src.util.visual.geometry_utils import closest_point_keeping_angle, closest_point_at_angle_option
 from src.util.visual.text_drawing_utils import left_button_hint_text, right_button_hint_text
@@ -44,6 +46,10 @@ MIN_CURSOR_SIZE = 20
 MIN_SMALL_CURSOR_SIZE = 15
 MIN_LINE_PRESSURE = 0.5
 
+# Tablets can send input events much faster than the screen refreshes. While tablet input is active, stroke inputs are
+# collected and drawn together once per interval, so brush costs scale with frame rate instead of input event rate:
+INPUT_BATCH_INTERVAL_MS = 8
+
 logger = logging.getLogger(__name__)
 
 
@@ -60,6 +66,7 @@ class BrushTool(BaseTool):
         super().__init__(activation_config_key, label_text, tooltip_text, icon)
         self._layer: Optional[ImageLayer] = None
         self._drawing = False
+        self._stroke_transaction_open = False
         self._cached_size: Optional[int] = None
         self._tablet_pressure: Optional[float] = None
         self._last_pressure: Optional[float] = None
@@ -73,8 +80,13 @@ class BrushTool(BaseTool):
             self._pressure_curve = new_curve
         AppConfig().connect(self, AppConfig.TABLET_PRESSURE_CURVE, _update_pressure_curve)
 
-        self._last_pos: Optional[QPoint] = None
+        self._last_pos: Optional[QPointF] = None
         self._fixed_angle: Optional[int] = None
+        self._pending_points: list[StrokePoint] = []
+        self._input_batch_timer = QTimer(self)
+        self._input_batch_timer.setSingleShot(True)
+        self._input_batch_timer.setInterval(INPUT_BATCH_INTERVAL_MS)
+        self._input_batch_timer.timeout.connect(self._flush_stroke_points)
         scene = image_viewer.scene()
         assert scene is not None
         self._preview_line = TempDashedLineItem(scene)
@@ -254,56 +266,107 @@ class BrushTool(BaseTool):
             if self._cached_size:
                 self.brush_size = self._cached_size
                 self._cached_size = None
-            self._brush.end_stroke()
+            self._end_stroke()
             self._tablet_input = None
             self._tablet_pressure = None
             self._tablet_x_tilt = None
             self._tablet_y_tilt = None
         self._brush.connect_to_layer(None)
 
+    def _start_stroke(self) -> None:
+        """Starts a brush stroke, collecting all of its layer changes into a single undo transaction."""
+        if UndoStack().active_transaction is None:
+            UndoStack().begin_transaction('BrushTool.stroke')
+            self._stroke_transaction_open = True
+        self._brush.start_stroke()
+
+    def _end_stroke(self) -> None:
+        """Finishes a brush stroke, committing its undo transaction."""
+        self._flush_stroke_points()
+        self._brush.end_stroke()
+        if self._stroke_transaction_open:
+            self._stroke_transaction_open = False
+            UndoStack().end_transaction()
+
+    def _precise_image_coordinates(self, event: Optional[QMouseEvent | QTabletEvent],
+                                   image_coordinates: QPoint) -> QPointF:
+        """Returns an input event's image coordinates with sub-pixel precision, or the rounded image coordinates if
+           the event doesn't provide a precise position."""
+        if not isinstance(event, (QMouseEvent, QTabletEvent)):
+            return QPointF(image_coordinates)
+        inverse_transform, invertible = self._image_viewer.viewportTransform().inverted()
+        if not invertible:
+            return QPointF(image_coordinates)
+        return inverse_transform.map(event.position())
+
     # Event handlers:
-    def _stroke_to(self, image_coordinates: QPoint) -> None:
-        """Draws coordinates with the brush, including tablet data if available."""
+    def _stroke_to(self, image_coordinates: QPoint | QPointF, timestamp_ms: int = 0, defer: bool = False) -> None:
+        """Draws coordinates with the brush, including tablet data if available.
+
+        Parameters
+        ----------
+        image_coordinates: QPoint | QPointF
+            Input position in image coordinates.
+        timestamp_ms: int, default=0
+            Input event timestamp.
+        defer: bool, default=False
+            If True and tablet input is active, drawing may be delayed until the next input batch, so that all tablet
+            inputs received within a frame are drawn together.
+        """
         if datetime.datetime.now().timestamp() > self._tablet_event_timestamp + 0.5:  # discard outdated tablet events
             self._tablet_input = None
             self._tablet_pressure = None
             self._tablet_x_tilt = None
             self._tablet_y_tilt = None
+        image_coordinates = QPointF(image_coordinates)
         if self._layer is not None:
             image_coordinates = self._layer.map_from_image(image_coordinates)
         if not self._image_stack.has_image:
             return
-        if self._tablet_input == QPointingDevice.PointerType.Eraser:
-            self._brush.eraser = True
 
         if KeyConfig.modifier_held(KeyConfig.FIXED_ANGLE_MODIFIER) and self._last_pos is not None \
                 and self._last_pos != image_coordinates:
-            last_pos = QPointF(self._last_pos)
-            current_pos = QPointF(image_coordinates)
             if self._fixed_angle is None:
-                closest_point_f, fixed_angle = closest_point_at_angle_option(last_pos, current_pos,
-                                                                             list(range(0, 360, 45)))
+                closest_point, fixed_angle = closest_point_at_angle_option(self._last_pos, image_coordinates,
+                                                                           list(range(0, 360, 45)))
                 self._fixed_angle = round(fixed_angle)
-                closest_point = closest_point_f.toPoint()
             else:
-                closest_point = closest_point_keeping_angle(last_pos, current_pos, self._fixed_angle).toPoint()
+                closest_point = closest_point_keeping_angle(self._last_pos, image_coordinates, self._fixed_angle)
             image_coordinates = closest_point
         if KeyConfig.modifier_held(KeyConfig.LINE_MODIFIER) and self._last_pos is not None:
             pressure = self._last_pressure if self._tablet_pressure is None else self._tablet_pressure
             if pressure is not None:
                 pressure = max(pressure, MIN_LINE_PRESSURE)
-            self._brush.stroke_to(self._last_pos.x(), self._last_pos.y(), pressure, self._tablet_x_tilt,
-                                  self._tablet_y_tilt)
-            self._brush.stroke_to(image_coordinates.x(), image_coordinates.y(), pressure,
-                                  self._tablet_x_tilt, self._tablet_y_tilt)
+            self._flush_stroke_points()
+            self._pending_points.append(StrokePoint(self._last_pos.x(), self._last_pos.y(), pressure,
+                                                    self._tablet_x_tilt, self._tablet_y_tilt, timestamp_ms))
+            self._pending_points.append(StrokePoint(image_coordinates.x(), image_coordinates.y(), pressure,
+                                                    self._tablet_x_tilt, self._tablet_y_tilt, timestamp_ms))
+            self._flush_stroke_points()
             self._preview_line.setVisible(False)  # Hide it until it can update with new last_pos value
         else:
-            self._brush.stroke_to(image_coordinates.x(), image_coordinates.y(), self._tablet_pressure,
-                                  self._tablet_x_tilt, self._tablet_y_tilt)
+            self._pending_points.append(StrokePoint(image_coordinates.x(), image_coordinates.y(),
+                                                    self._tablet_pressure, self._tablet_x_tilt, self._tablet_y_tilt,
+                                                    timestamp_ms))
+            if defer and self._tablet_input is not None:
+                if not self._input_batch_timer.isActive():
+                    self._input_batch_timer.start()
+            else:
+                self._flush_stroke_points()
+        self._last_pos = image_coordinates
 
+    def _flush_stroke_points(self) -> None:
+        """Draws all stroke inputs that are waiting for the next input batch."""
+        self._input_batch_timer.stop()
+        if len(self._pending_points) == 0:
+            return
+        points = self._pending_points
+        self._pending_points = []
+        if self._tablet_input == QPointingDevice.PointerType.Eraser:
+            self._brush.eraser = True
+        self._brush.stroke_points(points)
         if self._tablet_input == QPointingDevice.PointerType.Eraser:
             self._brush.eraser = False
-        self._last_pos = image_coordinates
 
     def mouse_click(self, event: Optional[QMouseEvent], image_coordinates: QPoint) -> bool:
         """Starts drawing when the mouse is clicked in the scene."""
@@ -313,13 +376,14 @@ class BrushTool(BaseTool):
                 or not self.validate_layer(self._layer, image_stack=self._image_stack):
             return False
         if self._drawing:
-            self._brush.end_stroke()
+            self._end_stroke()
         self._drawing = True
         self._fixed_angle = None
         self._last_pressure = None
+        image_position = self._precise_image_coordinates(event, image_coordinates)
         if KeyConfig.modifier_held(KeyConfig.FIXED_ANGLE_MODIFIER) and not \
                 KeyConfig.modifier_held(KeyConfig.LINE_MODIFIER):
-            self._last_pos = image_coordinates  # Update so previous clicks don't constrain the angle
+            self._last_pos = image_position  # Update so previous clicks don't constrain the angle
         if self._cached_size is not None and event.buttons() == Qt.MouseButton.LeftButton:
             self.brush_size = self._cached_size
             self._cached_size = None
@@ -327,8 +391,8 @@ class BrushTool(BaseTool):
             if self._cached_size is None:
                 self._cached_size = self._brush.brush_size
             self.brush_size = 1
-        self._brush.start_stroke()
-        self._stroke_to(image_coordinates)
+        self._start_stroke()
+        self._stroke_to(image_position, _event_timestamp(event))
         return True
 
     def mouse_move(self, event: Optional[QMouseEvent], image_coordinates: QPoint) -> bool:
@@ -339,15 +403,15 @@ class BrushTool(BaseTool):
 
         if KeyConfig.modifier_held(KeyConfig.LINE_MODIFIER) and self._last_pos is not None:
             self._preview_line.setVisible(True)
-            line_end = QPointF(image_coordinates)
+            line_end = self._precise_image_coordinates(event, image_coordinates)
             if KeyConfig.modifier_held(KeyConfig.FIXED_ANGLE_MODIFIER):
 
-                line_end, angle = closest_point_at_angle_option(QPointF(self._last_pos), line_end,
-                                                                list(range(0, 360, 45)))
-            self._preview_line.set_line(QLineF(QPointF(self._last_pos), line_end))
+                line_end, angle = closest_point_at_angle_option(self._last_pos, line_end, list(range(0, 360, 45)))
+            self._preview_line.set_line(QLineF(self._last_pos, line_end))
         if (event.buttons() == Qt.MouseButton.LeftButton or event.buttons() == Qt.MouseButton.RightButton
                 and self._drawing):
-            self._stroke_to(image_coordinates)
+            self._stroke_to(self._precise_image_coordinates(event, image_coordinates), _event_timestamp(event),
+                            defer=True)
             return True
         return False
 
@@ -357,7 +421,7 @@ class BrushTool(BaseTool):
             return False
         if self._drawing:
             self._drawing = False
-            self._brush.end_stroke()
+            self._end_stroke()
             if self._cached_size:
                 self.brush_size = self._cached_size
                 self._cached_size = None
@@ -463,7 +527,12 @@ class BrushTool(BaseTool):
         if modifiers == line_modifier and self._last_pos is not None:
             cursor_pos = self._image_viewer.mapFromGlobal(QCursor.pos())
             if QRect(QPoint(), self._image_viewer.size()).contains(cursor_pos):
-                self._preview_line.set_line(QLineF(QPointF(self._last_pos), QPointF(cursor_pos)))
+                self._preview_line.set_line(QLineF(self._last_pos, QPointF(cursor_pos)))
                 self._preview_line.setVisible(True)
         else:
             self._preview_line.setVisible(False)
+
+
+def _event_timestamp(event: Optional[QMouseEvent | QTabletEvent]) -> int:
+    """Returns an input event's timestamp in milliseconds, or zero if it isn't a real input event."""
+    return event.timestamp() if isinstance(event, QInputEvent) else 0
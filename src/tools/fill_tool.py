@@ -14,7 +14,7 @@ from src.tools.base_tool import BaseTool
 from src.ui.input_fields.fill_style_combo_box import FillStyleComboBox
 from src.ui.panel.tool_control_panels.fill_tool_panel import FillToolPanel
 from src.util.shared_constants import PROJECT_DIR, COLOR_PICK_HINT
-from src.util.visual.image_utils import flood_fill, create_transparent_image
+from src.util.visual.image_utils import flood_fill_cropped, create_transparent_image
 from src.util.visual.text_drawing_utils import left_button_hint_text
 
 # The `QCoreApplication.translate` context for strings in this file
@@ -97,8 +97,9 @@ class FillTool(BaseTool):
             else:
                 fill_image = layer.image
                 layer_image = fill_image
-            mask = flood_fill(fill_image, layer_point, self._color, self._threshold, False)
-            assert mask is not None
+            mask, mask_offset = flood_fill_cropped(fill_image, layer_point, self._color, self._threshold)
+            if mask.isNull():
+                return True
             fill_pattern = Cache().get(Cache.FILL_TOOL_BRUSH_PATTERN)
             fill_brush = QBrush()
             try:
@@ -111,13 +112,15 @@ class FillTool(BaseTool):
                 mask_painter.setCompositionMode(QPainter.CompositionMode.CompositionMode_DestinationIn)
                 if selection_only:
                     selection_mask = self._image_stack.get_layer_selection_mask(layer)
-                    mask_painter.drawImage(0, 0, selection_mask)
+                    mask_painter.drawImage(-mask_offset, selection_mask)
                 if fill_brush.style() != Qt.BrushStyle.SolidPattern:
                     fill_brush.setColor(self._color)
+                    # Keep the pattern aligned with the layer, not the cropped mask:
+                    mask_painter.setBrushOrigin(-mask_offset)
                     mask_painter.fillRect(QRect(QPoint(), mask.size()), fill_brush)
                 mask_painter.end()
             painter = QPainter(layer_image)
-            painter.drawImage(QRect(QPoint(), layer.size), mask)
+            painter.drawImage(QRect(mask_offset, mask.size()), mask)
 
             painter.end()
             layer.image = layer_image
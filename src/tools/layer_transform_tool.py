@@ -1,7 +1,7 @@
 """An image editing tool that moves the selected editing region."""
 from typing import Optional, Callable
 
-from PySide6.QtCore import Qt, QRect, QRectF, QSize, QPoint
+from PySide6.QtCore import Qt, QRect, QRectF, QSize, QPoint, QTimer
 from PySide6.QtGui import QCursor, QIcon, QTransform, QMouseEvent
 from PySide6.QtWidgets import QWidget, QSpinBox, QDoubleSpinBox, QApplication
 
@@ -37,6 +37,10 @@ TRANSFORM_CONTROL_HINT = _tr('{left_mouse_icon}: select layer<br/>{left_mouse_ic
 
 ICON_PATH_TRANSFORM_TOOL = f'{PROJECT_DIR}/resources/icons/tools/layer_transform_icon.svg'
 
+# Transformations are previewed with cached pixmaps while they change, and the full image is rendered again once no
+# changes have been made for this long:
+TRANSFORM_SETTLE_DELAY_MS = 250
+
 
 class LayerTransformTool(BaseTool):
     """Applies transformations to the active layer."""
@@ -45,8 +49,13 @@ class LayerTransformTool(BaseTool):
         super().__init__(KeyConfig.TRANSFORM_TOOL_KEY, TRANSFORM_LABEL, TRANSFORM_TOOLTIP,
                          QIcon(ICON_PATH_TRANSFORM_TOOL))
         self._layer: Optional[TransformLayer] = None
+        self._source_layer: Optional[Layer] = None  # Either self._layer or the group wrapped by a TransformGroup
         self._image_stack = image_stack
         self._image_viewer = image_viewer
+        self._settle_timer = QTimer()
+        self._settle_timer.setSingleShot(True)
+        self._settle_timer.setInterval(TRANSFORM_SETTLE_DELAY_MS)
+        self._settle_timer.timeout.connect(self._end_transform_preview)
         self._initial_transform = QTransform()
         self._transform_outline = TransformOutline(QRectF())
         self._transform_outline.pos_changed.connect(self._pos_change_slot)
@@ -161,6 +170,7 @@ class LayerTransformTool(BaseTool):
 
     def set_layer(self, layer: Optional[Layer]) -> None:
         """Connects to a new image layer, or disconnects if the layer parameter is None."""
+        self._end_transform_preview()
         last_layer = self._layer
         if last_layer is not None:
             last_layer.transform_changed.disconnect(self._layer_transform_change_slot)
@@ -168,6 +178,7 @@ class LayerTransformTool(BaseTool):
             last_layer.lock_changed.disconnect(self._layer_lock_change_slot)
             if isinstance(last_layer, TransformGroup):
                 last_layer.bounds_changed.disconnect(self._update_transform_group_bounds)
+        self._source_layer = layer
         if layer is None or isinstance(layer, TransformLayer):
             self._layer = layer
         else:
@@ -273,12 +284,24 @@ class LayerTransformTool(BaseTool):
         layer = self._layer
         if layer is None or layer.locked or layer.parent_locked:
             return
+        self._start_transform_preview()
         try:
             layer.transform = transform
         except RuntimeError:  # undo stack conflict: just don't register this one in the undo history
             layer.set_transform(transform)
         self._control_panel.set_preview_transform(layer.transform)
 
+    def _start_transform_preview(self) -> None:
+        """Shows fast transformation previews until the layer transformation stops changing."""
+        if not self._image_viewer.transform_preview_active and self._source_layer is not None:
+            self._image_viewer.start_transform_preview(self._source_layer)
+        self._settle_timer.start()
+
+    def _end_transform_preview(self) -> None:
+        """Renders the transformed image at full quality once transformations stop changing."""
+        self._settle_timer.stop()
+        self._image_viewer.end_transform_preview()
+
     @staticmethod
     def _update_control(field: QSpinBox | QDoubleSpinBox, value: float, change_handler: Callable[..., None]):
         field.valueChanged.disconnect(change_handler)
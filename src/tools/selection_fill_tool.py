@@ -13,7 +13,7 @@ from src.image.layers.transform_layer import TransformLayer
 from src.tools.base_tool import BaseTool
 from src.ui.panel.tool_control_panels.fill_selection_panel import FillSelectionPanel
 from src.util.shared_constants import PROJECT_DIR
-from src.util.visual.image_utils import flood_fill, color_fill
+from src.util.visual.image_utils import flood_fill_cropped, color_fill_cropped
 from src.util.visual.text_drawing_utils import left_button_hint_text, right_button_hint_text
 
 # The `QCoreApplication.translate` context for strings in this file
@@ -106,16 +106,17 @@ class SelectionFillTool(BaseTool):
             if not QRect(QPoint(), image.size()).contains(sample_point):
                 return True
             if Cache().get(Cache.COLOR_SELECT_MODE):
-                mask = color_fill(image, image.pixelColor(image_coordinates), threshold)
+                mask, mask_offset = color_fill_cropped(image, image.pixelColor(image_coordinates), threshold)
             else:
-                mask = flood_fill(image, sample_point, self._color, threshold, False)
+                mask, mask_offset = flood_fill_cropped(image, sample_point, self._color, threshold)
+            if mask.isNull():
+                return True
             selection_image = self._image_stack.selection_layer.image
-            assert mask is not None
             painter = QPainter(selection_image)
             if clear_mode:
                 painter.setCompositionMode(QPainter.CompositionMode.CompositionMode_DestinationOut)
             painter.setTransform(paint_transform)
-            painter.drawImage(QRect(QPoint(), mask.size()), mask)
+            painter.drawImage(QRect(mask_offset, mask.size()), mask)
             painter.end()
             self._image_stack.selection_layer.image = selection_image
             return True
@@ -4,12 +4,13 @@ Provides an interface for choosing between AI-generated changes to selected imag
 import math
 import sys
 import time
+from itertools import count
 from typing import Callable, Optional, cast
 
 from PIL import Image
 from PySide6.QtCore import Qt, QRect, QSize, QSizeF, QRectF, QEvent, Signal, QPointF, QObject, QPoint
 from PySide6.QtGui import QImage, QResizeEvent, QPixmap, QPainter, QWheelEvent, QMouseEvent, \
-    QPainterPath, QKeyEvent, QPolygonF, QSinglePointEvent, QAction
+    QPainterPath, QKeyEvent, QPolygonF, QSinglePointEvent, QAction, QPixmapCache
 from PySide6.QtWidgets import QApplication, QMenu
 from PySide6.QtWidgets import QWidget, QGraphicsPixmapItem, QVBoxLayout, QLabel, \
     QStyleOptionGraphicsItem, QHBoxLayout, QPushButton, QStyle
@@ -27,9 +28,12 @@ from src.ui.input_fields.check_box import CheckBox
 from src.ui.modal.modal_utils import open_image_file, SAVE_IMAGE_MODE, show_warning_dialog
 from src.ui.widget.image_graphics_view import ImageGraphicsView
 from src.util.application_state import AppStateTracker, APP_STATE_LOADING, APP_STATE_EDITING
+from src.util.async_task import AsyncTask
 from src.util.math_utils import clamp
 from src.util.shared_constants import TIMELAPSE_MODE_FLAG, EDIT_MODE_INPAINT
+from src.util.task_scheduler import PRIORITY_BACKGROUND
 from src.util.validation import assert_valid_index
+from src.util.visual.compressed_image_cache import CompressedImageCache
 from src.util.visual.geometry_utils import get_scaled_placement
 from src.util.visual.image_format_utils import save_image
 from src.util.visual.image_utils import get_standard_qt_icon, get_transparency_tile_pixmap
@@ -77,6 +81,7 @@ SELECTION_TITLE = _tr('Select from generated image options.')
 VIEW_MARGIN = 6
 IMAGE_MARGIN_FRACTION = 1 / 6
 SCROLL_DEBOUNCE_MS = 100
+MIN_PROXY_SCALE = 1 / 16
 
 # TODO: Using <pre> tags to force spacing is not ideal, figure out why Qt rich text table spacing properties don't work
 DEFAULT_CONTROL_HINT = _tr("""
@@ -142,6 +147,9 @@ class GeneratedImageSelector(QWidget):
         self._options: list[_ImageOption] = []
         self._outlines: list[Outline] = []
         self._selections: list[PolygonOutline] = []
+        self._selection_polygons: list[QPolygonF] = []
+        self._image_cache = CompressedImageCache()
+        self._proxy_scale = 1.0
         self._loading_image = QImage()
         self._zoomed_in = False
         self._zoom_to_changes = AppConfig().get(AppConfig.SELECTION_SCREEN_ZOOMS_TO_CHANGED)
@@ -265,8 +273,12 @@ class GeneratedImageSelector(QWidget):
                 scene_item = scene_item_list.pop()
                 if hasattr(scene_item, 'animated'):
                     scene_item.animated = False
+                if isinstance(scene_item, _ImageOption):
+                    scene_item.discard()
                 if scene_item in scene.items():
                     scene.removeItem(scene_item)
+        self._image_cache.clear()
+        self._selection_polygons = []
 
         # Configure checkboxes and change bounds:
         if cache.get(Cache.EDIT_MODE) == MODE_INPAINT:
@@ -285,14 +297,13 @@ class GeneratedImageSelector(QWidget):
             self._change_bounds = None
 
         # Add initial images, placeholders for expected images:
+        if cache.get(Cache.EDIT_MODE) == MODE_INPAINT:
+            selection_crop = QPolygonF(QRectF(self._image_stack.generation_area))
+            origin = self._image_stack.generation_area.topLeft()
+            self._selection_polygons = [QPolygonF(poly.intersected(selection_crop).translated(-origin.x(), -origin.y()))
+                                        for poly in self._image_stack.selection_layer.outline]
         original_image = self._image_stack.qimage_generation_area_content()
-        original_option = _ImageOption(original_image, ORIGINAL_CONTENT_LABEL)
-        scene.addItem(original_option)
-        self._options.append(original_option)
-        self._outlines.append(Outline(scene, self._view))
-        self._outlines[0].outlined_region = self._options[0].bounds
-        if Cache().get(Cache.EDIT_MODE) == MODE_INPAINT:
-            self._add_option_selection_outline(0)
+        self._append_option(original_image, ORIGINAL_CONTENT_LABEL, None)
 
         self._loading_image = QImage(original_image.size(), QImage.Format.Format_ARGB32_Premultiplied)
         self._loading_image.fill(Qt.GlobalColor.black)
@@ -305,7 +316,7 @@ class GeneratedImageSelector(QWidget):
 
         expected_count = cache.get(Cache.BATCH_SIZE) * cache.get(Cache.BATCH_COUNT)
         for i in range(expected_count):
-            self.add_image_option(self._loading_image, i)
+            self._append_option(self._loading_image, LABEL_TEXT_IMAGE_OPTION.format(index=i + 1), None)
 
         if self._zoomed_in and TIMELAPSE_MODE_FLAG not in sys.argv:
             self.toggle_zoom()
@@ -320,36 +331,43 @@ class GeneratedImageSelector(QWidget):
         if len(self._selections) != idx:
             raise RuntimeError(f'Generating selection outline {idx}, unexpected outline count {len(self._selections)}'
                                f' found.')
-        selection_crop = QPolygonF(QRectF(self._image_stack.generation_area))
-        origin = self._image_stack.generation_area.topLeft()
-        selection_polys = (poly.intersected(selection_crop).translated(-origin.x(), -origin.y())
-                           for poly in self._image_stack.selection_layer.outline)
-        polys = [QPolygonF(poly) for poly in selection_polys]
-        outline = PolygonOutline(self._view, polys)
+        outline = PolygonOutline(self._view, self._selection_polygons)
         outline.animated = AppConfig().get(AppConfig.ANIMATE_OUTLINES)
         outline.setScale(self._image_stack.width / self._image_stack.generation_area.width())
         outline.setVisible(AppConfig().get(AppConfig.SHOW_SELECTIONS_IN_GENERATION_OPTIONS))
         self._selections.append(outline)
 
+    def _append_option(self, image: QImage, label_text: str, image_cache: Optional[CompressedImageCache]) -> None:
+        """Adds a new option to the scene without rearranging existing options."""
+        option = _ImageOption(image, label_text, image_cache, self._proxy_scale)
+        scene = self._view.scene()
+        assert scene is not None, 'Scene should have been created automatically and never cleared'
+        scene.addItem(option)
+        self._options.append(option)
+        self._outlines.append(Outline(scene, self._view))
+        self._outlines[-1].outlined_region = option.bounds
+        # Add selections if inpainting:
+        if Cache().get(Cache.EDIT_MODE) == MODE_INPAINT:
+            self._add_option_selection_outline(len(self._options) - 1)
+
     def add_image_option(self, image: QImage, idx: int) -> None:
-        """Add an image to the list of generated image options."""
+        """Add an image to the list of generated image options.
+
+        Options only keep a scaled-down preview in memory when not zoomed in. Full images are compressed in the
+        background, and decompressed when needed."""
         if not 0 <= idx < len(self._options):
             raise IndexError(f'invalid index {idx}, max is {len(self._options)}')
         idx += 1  # Original image gets index zero
+        image_cache = None if image is self._loading_image else self._image_cache
         if idx == len(self._options):
-            self._options.append(_ImageOption(image, LABEL_TEXT_IMAGE_OPTION.format(index=idx)))
-            scene = self._view.scene()
-            assert scene is not None, 'Scene should have been created automatically and never cleared'
-            scene.addItem(self._options[-1])
-            self._outlines.append(Outline(scene, self._view))
-            # Add selections if inpainting:
-            if Cache().get(Cache.EDIT_MODE) == MODE_INPAINT:
-                self._add_option_selection_outline(idx)
-        else:
-            self._options[idx].image = image
-        if 0 <= idx < len(self._outlines):
-            self._outlines[idx].outlined_region = self._options[idx].bounds
-        self._apply_ideal_image_arrangement()
+            self._append_option(image, LABEL_TEXT_IMAGE_OPTION.format(index=idx), image_cache)
+            self._apply_ideal_image_arrangement()
+            return
+        option = self._options[idx]
+        last_size = option.size
+        option.set_image(image, image_cache)
+        if option.size != last_size:
+            self._apply_ideal_image_arrangement()
 
     def toggle_zoom(self, zoom_index: Optional[int] = None) -> None:
         """Toggle between zooming in on one option and showing all of them."""
@@ -368,6 +386,7 @@ class GeneratedImageSelector(QWidget):
                 option.setOpacity(1.0)
             self._status_label.setText(self._get_control_hint())
             self._page_top_label.setText(SELECTION_TITLE)
+            self._update_option_resolution()
         self.resizeEvent(None)
 
     def zoom_to_changes(self, should_zoom: bool) -> None:
@@ -565,6 +584,7 @@ class GeneratedImageSelector(QWidget):
         self._view.offset_changed.connect(self._offset_change_slot)
         for i, option in enumerate(self._options):
             option.setOpacity(1.0 if not self._zoomed_in or i == self._zoom_index else 0.5)
+        self._update_option_resolution()
         if option_index is not None:
             self._page_top_label.setText(self._options[option_index].text)
         self._status_label.setText(self._get_control_hint())
@@ -635,6 +655,19 @@ class GeneratedImageSelector(QWidget):
                 scale = self._options[idx].bounds.width() / self._image_stack.generation_area.width()
                 selection.setScale(scale)
                 selection.move_to(QPointF(x / selection.scale(), y / selection.scale()))
+        self._update_option_resolution()
+
+    def _update_option_resolution(self) -> None:
+        """Show the zoomed-in option at full resolution, and all other options as previews scaled to fit the view."""
+        displayed_size = self._view.displayed_content_size
+        content_size = self._view.content_size
+        if displayed_size is None or content_size is None or content_size.isEmpty():
+            return
+        view_scale = displayed_size.width() / content_size.width() * self._view.devicePixelRatioF()
+        # Round preview scale up to the nearest power of two, so small size changes don't recreate every preview:
+        self._proxy_scale = min(1.0, 2 ** math.ceil(math.log2(max(view_scale, MIN_PROXY_SCALE))))
+        for i, option in enumerate(self._options):
+            option.set_proxy_scale(None if self._zoomed_in and i == self._zoom_index else self._proxy_scale)
 
     def _get_control_hint(self) -> str:
         config = KeyConfig()
@@ -665,15 +698,32 @@ class GeneratedImageSelector(QWidget):
 
 
 class _ImageOption(QGraphicsPixmapItem):
-    """Displays a generated image option in the view, labeled with a title."""
+    """Displays a generated image option in the view, labeled with a title.
+
+    The displayed pixmap may be a scaled-down preview of the option image. If an image cache is provided, the option
+    image is compressed in the background, and only kept in memory while displayed at full resolution.
+    """
+
+    _ids = count()
 
-    def __init__(self, image: QImage, label_text: str) -> None:
+    def __init__(self, image: QImage, label_text: str, image_cache: Optional[CompressedImageCache] = None,
+                 proxy_scale: Optional[float] = None) -> None:
         super().__init__()
-        self._full_image = image
-        self._scaled_image = image
+        self._option_id = next(_ImageOption._ids)
+        self._image_version = 0
         self._label_text = label_text
+        self._image_cache: Optional[CompressedImageCache] = None
+        self._source_image: Optional[QImage] = None
+        self._compress_task: Optional[AsyncTask] = None
+        self._size = QSize()
+        self._edit_size = QSize()
+        self._generation_size = QSize()
+        self._show_full_resolution = False
+        self._proxy_scale = proxy_scale
+        self._label_font_size: Optional[tuple[QSize, int, int]] = None
         self._transparency_pixmap = get_transparency_tile_pixmap(image.size())
-        self.image = image
+        self.setTransformationMode(Qt.TransformationMode.SmoothTransformation)
+        self.set_image(image, image_cache)
 
     @property
     def text(self) -> str:
@@ -682,32 +732,115 @@ class _ImageOption(QGraphicsPixmapItem):
 
     @property
     def image(self) -> QImage:
-        """Access the generated image option."""
-        return self._scaled_image
+        """Access the generated image option, scaled to the edit size."""
+        source_image = self._load_source_image()
+        self._release_source_image()
+        if source_image.size() == self._edit_size:
+            return source_image
+        return pil_image_scaling(source_image, self._edit_size)
 
-    @image.setter
-    def image(self, new_image: QImage) -> None:
+    @property
+    def full_image(self) -> QImage:
+        """Return the largest available version of this option's image."""
+        source_image = self._load_source_image()
+        self._release_source_image()
+        if source_image.size() == self._edit_size:
+            return pil_image_scaling(source_image, self._generation_size)
+        return source_image
+
+    def set_image(self, new_image: QImage, image_cache: Optional[CompressedImageCache] = None) -> None:
+        """Replaces the option image. If an image cache is provided, the image is compressed and stored there in the
+           background."""
         cache = Cache()
-        config = AppConfig()
-        full_size = cache.get(Cache.GENERATION_SIZE)
-        final_size = cache.get(Cache.EDIT_SIZE)
-        if new_image.size() != full_size:
-            self._full_image = new_image
-            self._scaled_image = pil_image_scaling(new_image, final_size)
-        if new_image.size() == final_size:
-            self._full_image = pil_image_scaling(new_image, full_size)
-            self._scaled_image = new_image
+        self._edit_size = cache.get(Cache.EDIT_SIZE)
+        self._generation_size = cache.get(Cache.GENERATION_SIZE)
+        self._show_full_resolution = AppConfig().get(AppConfig.SHOW_OPTIONS_FULL_RESOLUTION)
+        self.discard()
+        self._image_version += 1
+        self._image_cache = image_cache
+        self._source_image = new_image
+        if not self._show_full_resolution:
+            size = self._edit_size
+        elif new_image.size() == self._edit_size:
+            size = self._generation_size
         else:
-            self._full_image = new_image
-            self._scaled_image = pil_image_scaling(new_image, final_size)
-        self.setPixmap(QPixmap.fromImage(self._full_image if config.get(AppConfig.SHOW_OPTIONS_FULL_RESOLUTION)
-                                         else self._scaled_image))
-        self.update()
+            size = new_image.size()
+        if size != self._size:
+            self.prepareGeometryChange()
+            self._size = QSize(size)
+        if image_cache is not None:
+            self._compress_source_image(image_cache, new_image)
+        self._update_pixmap()
+
+    def set_proxy_scale(self, proxy_scale: Optional[float]) -> None:
+        """Sets the scale of the displayed preview relative to the option size, or None to show the full image."""
+        if proxy_scale == self._proxy_scale and not self.pixmap().isNull():
+            return
+        self._proxy_scale = proxy_scale
+        self._update_pixmap()
+
+    def discard(self) -> None:
+        """Cancels background compression, and removes the option image from the image cache."""
+        if self._compress_task is not None:
+            self._compress_task.cancel()
+            self._compress_task = None
+        if self._image_cache is not None:
+            self._image_cache.remove(self._cache_key)
 
     @property
-    def full_image(self) -> QImage:
-        """Return the largest available version of this option's image."""
-        return self._full_image
+    def _cache_key(self) -> tuple[int, int]:
+        return self._option_id, self._image_version
+
+    def _compress_source_image(self, image_cache: CompressedImageCache, image: QImage) -> None:
+        cache_key = self._cache_key
+
+        def _compress() -> None:
+            if task.cancelled:
+                return
+            image_cache.put(cache_key, image)
+            if task.cancelled:  # Image was replaced or discarded during compression
+                image_cache.remove(cache_key)
+
+        def _release_compressed() -> None:
+            if task is self._compress_task:
+                self._compress_task = None
+                self._release_source_image()
+
+        task = AsyncTask(_compress, priority=PRIORITY_BACKGROUND)
+        task.finish_signal.connect(_release_compressed)
+        self._compress_task = task
+        task.start()
+
+    def _load_source_image(self) -> QImage:
+        if self._source_image is None:
+            assert self._image_cache is not None
+            self._source_image = self._image_cache.get(self._cache_key)
+            assert self._source_image is not None, f'{self._label_text} image missing from cache'
+        return self._source_image
+
+    def _release_source_image(self) -> None:
+        """Drops the uncompressed image if it isn't displayed at full resolution and a compressed copy exists."""
+        if self._proxy_scale is not None and self._image_cache is not None and self._compress_task is None \
+                and self._cache_key in self._image_cache:
+            self._source_image = None
+
+    def _update_pixmap(self) -> None:
+        source_image = self._load_source_image()
+        if self._proxy_scale is None:
+            pixmap = QPixmap.fromImage(self.full_image if self._show_full_resolution else self.image)
+        else:
+            proxy_size = QSize(max(1, round(self._size.width() * self._proxy_scale)),
+                               max(1, round(self._size.height() * self._proxy_scale)))
+            # Placeholder options all share one image, so their previews only need to be created once:
+            pixmap_key = f'_ImageOption:{source_image.cacheKey()}:{proxy_size.width()}x{proxy_size.height()}'
+            pixmap = QPixmapCache.find(pixmap_key)
+            if pixmap is None:
+                pixmap = QPixmap.fromImage(source_image.scaled(proxy_size, Qt.AspectRatioMode.IgnoreAspectRatio,
+                                                               Qt.TransformationMode.SmoothTransformation))
+                QPixmapCache.insert(pixmap_key, pixmap)
+        self.setPixmap(pixmap)
+        self._release_source_image()
+        self.update()
 
     @property
     def bounds(self) -> QRect:
@@ -716,24 +849,22 @@ class _ImageOption(QGraphicsPixmapItem):
 
     @property
     def size(self) -> QSize:
-        """Accesses the image size."""
-        return self.pixmap().size()
-
-    @size.setter
-    def size(self, new_size) -> None:
-        if new_size != self.size:
-            self.setPixmap(QPixmap.fromImage(pil_image_scaling(self.image, new_size)))
-            self.update()
+        """Accesses the displayed option size within the scene, which may not match the preview pixmap size."""
+        return QSize(self._size)
 
     @property
     def width(self) -> int:
         """Returns the image width."""
-        return self.size.width()
+        return self._size.width()
 
     @property
     def height(self) -> int:
         """Returns the image height."""
-        return self.size.height()
+        return self._size.height()
+
+    def boundingRect(self) -> QRectF:
+        """Use the option size as bounds, regardless of preview pixmap size."""
+        return QRectF(0.0, 0.0, self.width, self.height)
 
     def paint(self,
               painter: Optional[QPainter],
@@ -751,14 +882,18 @@ class _ImageOption(QGraphicsPixmapItem):
         painter.fillPath(text_background, Qt.GlobalColor.black)
         painter.setPen(Qt.GlobalColor.white)
         font = painter.font()
-        font_size = int(clamp(font.pointSize(), 1, max_font_size(self._label_text, font, text_bounds.size())))
-        font.setPointSize(font_size)
+        if self._label_font_size is None or self._label_font_size[:2] != (text_bounds.size(), font.pointSize()):
+            font_size = int(clamp(font.pointSize(), 1, max_font_size(self._label_text, font, text_bounds.size())))
+            self._label_font_size = (text_bounds.size(), font.pointSize(), font_size)
+        font.setPointSize(self._label_font_size[2])
         painter.setFont(font)
         painter.drawText(text_bounds, Qt.AlignmentFlag.AlignCenter, self._label_text)
         if self.opacity() == 1.0:
             painter.drawTiledPixmap(QRect(0, 0, self.width, self.height), self._transparency_pixmap)
+        painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform, True)
+        pixmap = self.pixmap()
+        painter.drawPixmap(self.boundingRect(), pixmap, QRectF(pixmap.rect()))
         painter.restore()
-        super().paint(painter, option, widget)
 
 
 class _SelectionView(ImageGraphicsView):
@@ -4,7 +4,7 @@ Interact with edited image layers through the Qt6 2D graphics engine.
 from typing import Optional
 
 from PySide6.QtCore import Qt, QRect, QRectF, QSize
-from PySide6.QtGui import QPainter, QColor, QTransform
+from PySide6.QtGui import QPainter, QColor, QTransform, QImage, QPixmap
 from PySide6.QtWidgets import QWidget, QSizePolicy
 
 from src.config.application_config import AppConfig
@@ -12,10 +12,12 @@ from src.config.cache import Cache
 from src.hotkey_filter import HotkeyFilter
 from src.image.layers.image_stack import ImageStack
 from src.image.layers.layer import Layer
+from src.image.layers.layer_group import LayerGroup
 from src.image.layers.transform_layer import TransformLayer
 from src.ui.graphics_items.border import Border
 from src.ui.graphics_items.layer_graphics_item import LayerGraphicsItem
 from src.ui.graphics_items.outline import Outline
+from src.ui.graphics_items.pixmap_item import PixmapItem
 from src.ui.graphics_items.polygon_outline import PolygonOutline
 from src.ui.widget.image_graphics_view import ImageGraphicsView
 from src.util.visual.image_utils import get_transparency_tile_pixmap
@@ -24,6 +26,21 @@ GENERATION_AREA_BORDER_OPACITY = 0.6
 IMAGE_BORDER_OPACITY = 0.2
 GENERATION_AREA_BORDER_COLOR = Qt.GlobalColor.black
 
+# Layers with more pixels than this are drawn from a downscaled copy during transformation previews:
+PREVIEW_PROXY_MIN_PIXELS = 2048 * 2048
+PREVIEW_PROXY_MAX_DIMENSION = 1024
+
+
+def _visible_in_image(layer: Layer) -> bool:
+    """Returns whether a layer and all of its parents are visible."""
+    parent: Optional[Layer] = layer
+    while parent is not None:
+        if not parent.visible:
+            return False
+        layer_parent = parent.layer_parent
+        parent = layer_parent if isinstance(layer_parent, Layer) else None
+    return True
+
 
 class ImageViewer(ImageGraphicsView):
     """Shows the image being edited, and allows the user to select sections."""
@@ -43,6 +60,10 @@ class ImageViewer(ImageGraphicsView):
         self.setSizePolicy(QSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding))
         self._follow_generation_area = False
         self._hidden: set[int] = set()
+        self._preview_layers: list[TransformLayer] = []
+        self._preview_items: dict[int, tuple[PixmapItem, float]] = {}
+        self._preview_background_items: list[PixmapItem] = []
+        self._deferred_groups: list[LayerGroup] = []
         self._selection_poly_outline = PolygonOutline(self)
         self._selection_poly_outline.animated = config.get(AppConfig.ANIMATE_OUTLINES)
 
@@ -101,6 +122,117 @@ class ImageViewer(ImageGraphicsView):
         if visible and self._follow_generation_area:
             self.follow_generation_area = True
 
+    @property
+    def transform_preview_active(self) -> bool:
+        """Returns whether layer transformations are currently being previewed."""
+        return len(self._deferred_groups) > 0
+
+    def start_transform_preview(self, layer: Layer) -> None:
+        """Shows fast previews of layer transformations until end_transform_preview is called.
+
+        Normally, every layer transformation re-renders the entire image. While a preview is active, the rest of the
+        image is rendered once into a pixmap below the transformed layers and a pixmap above them, and the transformed
+        layers are drawn in between with their transformations applied directly to cached pixmaps. Very large layers
+        are drawn from downscaled copies. Layer groups put off rendering until the preview ends.
+
+        Previews are approximate: parent group opacity, isolation, and composition modes are not applied to the
+        transformed layers until the preview ends.
+
+        Parameters
+        ----------
+        layer: Layer
+            The transformed layer. If this is a layer group, all layers in the group are previewed.
+        """
+        self.end_transform_preview()
+        layer_stack = self._image_stack.layer_stack
+        if not layer_stack.contains_recursive(layer):
+            return
+        if isinstance(layer, LayerGroup):
+            previewed: list[Layer] = [child for child in layer.recursive_child_layers
+                                      if isinstance(child, TransformLayer)]
+        else:
+            previewed = [layer]
+        z_values = [layer.z_value, *(child.z_value for child in previewed)]
+        min_z = min(z_values)
+        max_z = max(z_values)
+
+        def _exclude_previewed(rendered_layer: Layer, image: QImage) -> QImage:
+            if rendered_layer.z_value <= max_z:
+                image.fill(Qt.GlobalColor.transparent)
+            return image
+
+        scene = self.scene()
+        assert scene is not None
+        stack_item = self._layer_items[layer_stack.id]
+        bounds = layer_stack.bounds
+        background_images = [layer_stack.render_to_new_image(z_max=min_z - 1)]
+        if any(child.visible and child.z_value > max_z for child in layer_stack.recursive_child_layers
+               if isinstance(child, TransformLayer)):
+            background_images.append(layer_stack.render_to_new_image(image_adjuster=_exclude_previewed))
+        for i, image in enumerate(background_images):
+            background_item = PixmapItem(QPixmap.fromImage(image))
+            background_item.setTransform(QTransform.fromTranslate(bounds.x(), bounds.y()))
+            background_item.setOpacity(stack_item.opacity())
+            background_item.composition_mode = stack_item.composition_mode
+            background_item.setZValue(stack_item.zValue() + i * 0.5)
+            scene.addItem(background_item)
+            self._preview_background_items.append(background_item)
+
+        previewed_z_offset = 0.5 / (len(previewed) + 1)
+        for i, child in enumerate(sorted(previewed, key=lambda previewed_layer: previewed_layer.z_value)):
+            assert isinstance(child, TransformLayer)
+            if not _visible_in_image(child):
+                continue
+            pixmap = child.pixmap
+            proxy_scale = 1.0
+            if pixmap.width() * pixmap.height() > PREVIEW_PROXY_MIN_PIXELS:
+                pixmap = pixmap.scaled(PREVIEW_PROXY_MAX_DIMENSION, PREVIEW_PROXY_MAX_DIMENSION,
+                                       Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
+                proxy_scale = pixmap.width() / child.size.width()
+            layer_item = PixmapItem(pixmap)
+            layer_item.setTransformationMode(Qt.TransformationMode.FastTransformation)
+            layer_item.setOpacity(child.opacity)
+            layer_item.composition_mode = child.composition_mode
+            layer_item.setZValue(stack_item.zValue() + (i + 1) * previewed_z_offset)
+            scene.addItem(layer_item)
+            self._preview_items[child.id] = (layer_item, proxy_scale)
+            self._preview_layers.append(child)
+            child.transform_changed.connect(self._transform_preview_change_slot)
+            self._transform_preview_change_slot(child, child.transform)
+
+        self._deferred_groups = [layer_stack, *(child for child in layer_stack.recursive_child_layers
+                                                if isinstance(child, LayerGroup))]
+        for group in self._deferred_groups:
+            group.set_render_deferred(True)
+        stack_item.hidden = True
+
+    def end_transform_preview(self) -> None:
+        """Stops previewing layer transformations, rendering the image once if any changes were made."""
+        if not self.transform_preview_active:
+            return
+        for layer in self._preview_layers:
+            layer.transform_changed.disconnect(self._transform_preview_change_slot)
+        # Release groups children first, so that each group renders once after all of its children are updated.
+        for group in reversed(self._deferred_groups):
+            group.set_render_deferred(False)
+        self._layer_items[self._image_stack.layer_stack.id].hidden = False
+        scene = self.scene()
+        assert scene is not None
+        for item in [*self._preview_background_items, *(item for item, _ in self._preview_items.values())]:
+            scene.removeItem(item)
+        self._preview_layers.clear()
+        self._preview_items.clear()
+        self._preview_background_items.clear()
+        self._deferred_groups.clear()
+
+    def _transform_preview_change_slot(self, layer: Layer, transform: QTransform) -> None:
+        if layer.id not in self._preview_items:
+            return
+        item, proxy_scale = self._preview_items[layer.id]
+        if proxy_scale != 1.0:
+            transform = QTransform.fromScale(1 / proxy_scale, 1 / proxy_scale) * transform
+        item.setTransform(transform)
+
     def zoom_to_generation_area(self) -> None:
         """Adjust viewport scale and offset to center the selected editing area in the view. Does nothing if the
            image generation area is hidden."""
@@ -2,13 +2,15 @@
 from typing import Callable, Optional, TypeAlias, Any
 
 from PySide6.QtCore import QSize, Signal
-from PySide6.QtGui import QImage, QIcon, Qt
+from PySide6.QtGui import QImage, QIcon, Qt, QCloseEvent
 from PySide6.QtWidgets import QDialog, QFormLayout, QLabel, QWidget, QHBoxLayout, QPushButton, QApplication
 
 from src.ui.input_fields.check_box import CheckBox
 from src.ui.widget.image_widget import ImageWidget
+from src.util.async_task import AsyncTask
 from src.util.parameter import Parameter, DynamicFieldWidget
 from src.util.shared_constants import APP_ICON_PATH
+from src.util.task_scheduler import PRIORITY_INTERACTIVE
 
 # The `QCoreApplication.translate` context for strings in this file
 TR_ID = 'ui.modal.image_filter_modal'
@@ -24,9 +26,33 @@ ACTIVE_ONLY_LABEL = _tr('Change active layer only')
 CANCEL_BUTTON_TEXT = _tr('Cancel')
 APPLY_BUTTON_TEXT = _tr('Apply')
 MIN_PREVIEW_SIZE = 450
+PREVIEW_TASK_KEY = 'ImageFilterModal.preview'
+
+
+class FilterPreview:
+    """A filter preview, generated in steps so that only image filtering runs outside the UI thread. Layer content is
+    copied on the UI thread when the preview is created, filtered on a worker thread, and then drawn into the final
+    preview image back on the UI thread."""
+
+    def filter_layer_images(self) -> None:
+        """Applies the filter to the copied layer images. Called from a worker thread."""
+        raise NotImplementedError()
+
+    def render(self) -> QImage:
+        """Draws the preview image using the filtered layer images. Called on the UI thread."""
+        raise NotImplementedError()
+
 
 # parameters: filter_param_values: list
 FilterFunction: TypeAlias = Callable[[list[Any]], Optional[QImage]]
+PreviewFunction: TypeAlias = Callable[[list[Any]], FilterPreview]
+
+
+class _PreviewTask(AsyncTask):
+    preview_ready = Signal()
+
+    def signals(self) -> list[Signal]:
+        return [self.preview_ready]
 
 
 class ImageFilterModal(QDialog):
@@ -39,7 +65,7 @@ class ImageFilterModal(QDialog):
                  title: str,
                  description: str,
                  parameters: list[Parameter],
-                 generate_preview: FilterFunction,
+                 generate_preview: PreviewFunction,
                  apply_filter: FilterFunction,
                  filter_selection_only_default: bool = True,
                  filter_active_layer_only_default: bool = True) -> None:
@@ -52,6 +78,7 @@ class ImageFilterModal(QDialog):
         self._param_inputs: list[DynamicFieldWidget] = []
         self._generate_preview = generate_preview
         self._apply_filter = apply_filter
+        self._preview_task: Optional[_PreviewTask] = None
 
         self.setWindowTitle(title)
         label = QLabel(description)
@@ -92,9 +119,31 @@ class ImageFilterModal(QDialog):
         self._layout.addRow(self._button_row)
         self._update_preview()
 
+    def closeEvent(self, event: Optional[QCloseEvent]) -> None:
+        """Cancel any pending preview when the window closes."""
+        if self._preview_task is not None:
+            self._preview_task.cancel()
+            self._preview_task = None
+        super().closeEvent(event)
+
     def _update_preview(self, _=None) -> None:
+        """Filters the preview in the background. Earlier preview requests that haven't finished are replaced."""
         param_values = [widget.value() for widget in self._param_inputs]
-        self._preview.image = self._generate_preview(param_values)
+        preview = self._generate_preview(param_values)
+
+        def _generate(preview_ready: Signal) -> None:
+            preview.filter_layer_images()
+            if not task.cancelled:
+                preview_ready.emit()
+
+        def _show_preview() -> None:
+            if task is self._preview_task:
+                self._preview.image = preview.render()
+
+        task = _PreviewTask(_generate, priority=PRIORITY_INTERACTIVE, key=(PREVIEW_TASK_KEY, id(self)))
+        task.preview_ready.connect(_show_preview)
+        self._preview_task = task
+        task.start()
 
     def _apply_change(self) -> None:
         param_values = [widget.value() for widget in self._param_inputs]
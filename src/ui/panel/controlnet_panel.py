@@ -68,6 +68,9 @@ DEFAULT_CONTROL_TYPE = 'All'
 CACHE_SAVE_TIMER_INTERVAL = 100
 PREVIEW_IMAGE_SIZE = 300
 
+# When a preview is visible, wait this long after preprocessor parameters stop changing before refreshing it:
+PREVIEW_REFRESH_DELAY_MS = 400
+
 # If a preprocessor name ends with "Preprocessor", we can just remove that part of the name for conciseness.
 PREPROCESSOR_SUFFIX = 'Preprocessor'
 
@@ -75,7 +78,7 @@ PREPROCESSOR_SUFFIX = 'Preprocessor'
 class TabbedControlNetPanel(QTabWidget):
     """Tabbed ControlNet panel with three ControlNet units."""
 
-    request_preview = Signal(ControlNetPreprocessor, str)
+    request_preview = Signal(ControlNetPreprocessor, str, bool)
 
     def __init__(self,
                  preprocessors: list[ControlNetPreprocessor],
@@ -120,7 +123,7 @@ class TabbedControlNetPanel(QTabWidget):
 class ControlNetPanel(BorderedWidget):
     """ControlnetPanel provides controls for the Stable Diffusion ControlNet extension."""
 
-    request_preview = Signal(ControlNetPreprocessor, str)
+    request_preview = Signal(ControlNetPreprocessor, str, bool)
 
     def __init__(self,
                  cache_key: str,
@@ -163,6 +166,12 @@ class ControlNetPanel(BorderedWidget):
         self._cache_timer.setInterval(CACHE_SAVE_TIMER_INTERVAL)
         self._cache_timer.timeout.connect(self._save_data_to_cache)
 
+        # Preview refresh timer:
+        self._preview_timer = QTimer()
+        self._preview_timer.setSingleShot(True)
+        self._preview_timer.setInterval(PREVIEW_REFRESH_DELAY_MS)
+        self._preview_timer.timeout.connect(lambda: self._request_preview(True))
+
         # Labels:
         self._control_image_label = QLabel(CONTROL_IMAGE_LABEL)
         self._module_label = QLabel(MODULE_BOX_TITLE)
@@ -216,9 +225,7 @@ class ControlNetPanel(BorderedWidget):
         self._preview_image_widget = ImageWidget(QImage())
         self._preview_image_widget.setMaximumSize(QSize(PREVIEW_IMAGE_SIZE, PREVIEW_IMAGE_SIZE))
 
-        def _request_preview() -> None:
-            self.request_preview.emit(self._control_unit.preprocessor, self._control_unit.image_string)
-        self._preview_button.clicked.connect(_request_preview)
+        self._preview_button.clicked.connect(lambda: self._request_preview(False))
         self._preview_button.setEnabled(self._control_unit.preprocessor.name != PREPROCESSOR_NONE)
 
         def open_control_image_file() -> None:
@@ -440,6 +447,19 @@ class ControlNetPanel(BorderedWidget):
         self._preview_image_widget.setHidden(self._preview_image_widget.image is None
                                              or self._preview_image_widget.image.isNull())
 
+    def _request_preview(self, automatic: bool) -> None:
+        self._preview_timer.stop()
+        self.request_preview.emit(self._control_unit.preprocessor, self._control_unit.image_string, automatic)
+
+    def _schedule_preview_refresh(self) -> None:
+        """Restarts the preview refresh timer if a preview is showing, so that it refreshes once changes stop."""
+        if self._preview_image_widget.image is not None and not self._preview_image_widget.image.isNull():
+            self._preview_timer.start()
+
+    def _handle_parameter_change(self) -> None:
+        self._schedule_cache_update()
+        self._schedule_preview_refresh()
+
     def _schedule_cache_update(self) -> None:
         if not self._cache_timer.isActive():
             self._cache_timer.start()
@@ -522,6 +542,7 @@ class ControlNetPanel(BorderedWidget):
         assert isinstance(preprocessor, ControlNetPreprocessor)
         self._resolution_label = None
         self._resolution_slider = None
+        self._preview_timer.stop()
         self.set_preprocessor_preview(None)
         for label, parameter_widget in zip(self._dynamic_control_labels, self._dynamic_controls):
             self._layout.removeWidget(label)
@@ -537,7 +558,7 @@ class ControlNetPanel(BorderedWidget):
         if preprocessor.name.lower() != PREPROCESSOR_NONE.lower():
             for parameter in preprocessor.parameters:
                 parameter_widget, label = parameter.get_input_widget(True)
-                parameter_widget.valueChanged.connect(lambda _: self._schedule_cache_update())
+                parameter_widget.valueChanged.connect(lambda _: self._handle_parameter_change())
                 if self._px_perfect_checkbox is not None \
                         and parameter.key == webui_constants.PREPROCESSOR_RES_PARAM_KEY:
                     assert isinstance(parameter_widget, IntSliderSpinbox)
@@ -2,7 +2,7 @@
 
 from typing import Optional, cast, Callable
 
-from PySide6.QtCore import QSize, Qt, QRect, QPoint, QMimeData, Signal
+from PySide6.QtCore import QSize, Qt, QRect, QPoint, QMimeData, Signal, QTimer
 from PySide6.QtGui import (QPixmap, QImage, QPainter, QTransform, QResizeEvent, QPaintEvent, QColor, QMouseEvent, QDrag,
                            QAction, QPainterPath, QPen, QIcon)
 from PySide6.QtWidgets import QWidget, QHBoxLayout, QLabel, QSizePolicy, QMenu, QApplication
@@ -22,10 +22,12 @@ from src.ui.panel.layer_ui.layer_alpha_lock_button import LayerAlphaLockButton
 from src.ui.panel.layer_ui.layer_isolate_button import LayerIsolateButton
 from src.ui.panel.layer_ui.layer_lock_button import LayerLockButton
 from src.ui.panel.layer_ui.layer_visibility_button import LayerVisibilityButton
+from src.util.async_task import AsyncTask
 from src.util.shared_constants import ICON_SIZE, PROJECT_DIR
+from src.util.task_scheduler import PRIORITY_BACKGROUND
 from src.util.visual.display_size import get_window_size
-from src.util.visual.geometry_utils import get_scaled_placement
-from src.util.visual.image_utils import get_transparency_tile_pixmap, crop_to_content
+from src.util.visual.geometry_utils import get_scaled_placement, map_rect_precise
+from src.util.visual.image_utils import get_transparency_tile_pixmap, crop_to_content, create_transparent_image
 from src.util.visual.text_drawing_utils import find_text_size
 
 # The QCoreApplication.translate context for strings in this file
@@ -40,6 +42,11 @@ def _tr(*args):
 PREVIEW_SIZE = QSize(80, 80)
 SMALL_PREVIEW_SIZE = QSize(50, 50)
 LAYER_PADDING = 4
+
+# Transformed layer previews are first drawn from a downscaled copy of the layer, then redrawn at full quality in the
+# background once the layer stops changing:
+PROXY_MAX_DIMENSION = 256
+FULL_PREVIEW_DELAY_MS = 250
 MAX_WIDTH = PREVIEW_SIZE.width() + ICON_SIZE + LAYER_PADDING * 2 + 400
 MENU_OPTION_MOVE_UP = _tr('Move up')
 MENU_OPTION_MOVE_DOWN = _tr('Move down')
@@ -68,6 +75,20 @@ IMAGE_PATH_BASIC_FRAME = f'{PROJECT_DIR}/resources/icons/layer/img_frame.svg'
 IMAGE_PATH_TEXT_FRAME = f'{PROJECT_DIR}/resources/icons/layer/txt_frame.svg'
 
 
+def _transformed_preview_image(image: QImage, transform: QTransform) -> QImage:
+    """Returns a copy of an image with a transformation applied, cropped to the transformed image bounds."""
+    bounds = map_rect_precise(image.rect(), transform).toAlignedRect()
+    transformed = create_transparent_image(bounds.size())
+    if bounds.isEmpty():
+        return transformed
+    painter = QPainter(transformed)
+    painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
+    painter.setTransform(transform * QTransform.fromTranslate(-bounds.x(), -bounds.y()))
+    painter.drawImage(QPoint(), image)
+    painter.end()
+    return transformed
+
+
 def _preview_size() -> QSize:
     window_size = get_window_size()
     min_dim = min(window_size.width(), window_size.height())
@@ -94,6 +115,14 @@ class LayerWidget(BorderedWidget):
         self._layout.addSpacing(_preview_size().width())
         self._layer_image = QImage()
         self._preview_pixmap = QPixmap()
+        self._proxy_image = QImage()
+        self._proxy_source_key: Optional[int] = None
+        self._proxy_transform: Optional[QTransform] = None
+        self._preview_task: Optional[AsyncTask] = None
+        self._full_preview_timer = QTimer(self)
+        self._full_preview_timer.setSingleShot(True)
+        self._full_preview_timer.setInterval(FULL_PREVIEW_DELAY_MS)
+        self._full_preview_timer.timeout.connect(self._render_full_preview)
         self._clicking = False
         self._click_pos = QPoint()
         if isinstance(layer, LayerGroup):
@@ -188,12 +217,66 @@ class LayerWidget(BorderedWidget):
     # noinspection PyUnusedLocal
     def _layer_content_change_slot(self, *args) -> None:
         if isinstance(self._layer, TransformLayer):
-            layer_image, _ = self._layer.transformed_image()
+            self._update_transformed_preview()
+            return
+        self._layer_image = crop_to_content(self._layer.image)
+        self._update_pixmap()
+
+    def _update_transformed_preview(self) -> None:
+        """Redraws the preview from a downscaled copy of the layer, so that changing layer transformations never needs
+           to transform the full layer image. If the copy is smaller than the layer, a full-quality preview is drawn
+           in the background once changes stop."""
+        assert isinstance(self._layer, TransformLayer)
+        source_image = self._layer.get_qimage()
+        transform = self._layer.transform
+        if source_image.cacheKey() == self._proxy_source_key and transform == self._proxy_transform:
+            return  # Transformations also send content change signals, there's no need to redraw twice.
+        if self._preview_task is not None:
+            self._preview_task.cancel()
+            self._preview_task = None
+        if source_image.cacheKey() != self._proxy_source_key:
+            if source_image.width() > PROXY_MAX_DIMENSION or source_image.height() > PROXY_MAX_DIMENSION:
+                self._proxy_image = source_image.scaled(PROXY_MAX_DIMENSION, PROXY_MAX_DIMENSION,
+                                                        Qt.AspectRatioMode.KeepAspectRatio,
+                                                        Qt.TransformationMode.SmoothTransformation)
+            else:
+                self._proxy_image = source_image.copy()
+            self._proxy_source_key = source_image.cacheKey()
+        self._proxy_transform = transform
+        if self._proxy_image.isNull() or self._proxy_image.size() == source_image.size():
+            self._full_preview_timer.stop()
+            self._layer_image = crop_to_content(_transformed_preview_image(self._proxy_image, transform))
         else:
-            layer_image = self._layer.image
-        self._layer_image = crop_to_content(layer_image)
+            scale = self._proxy_image.width() / source_image.width()
+            proxy_transform = QTransform.fromScale(1 / scale, 1 / scale) * transform
+            proxy_transform *= QTransform.fromScale(scale, scale)
+            self._layer_image = crop_to_content(_transformed_preview_image(self._proxy_image, proxy_transform))
+            self._full_preview_timer.start()
         self._update_pixmap()
 
+    def _render_full_preview(self) -> None:
+        """Draws the full-quality transformed preview in the background."""
+        assert isinstance(self._layer, TransformLayer)
+        layer_image = self._layer.image
+        transform = self._layer.transform
+        rendered: list[QImage] = []
+
+        def _render() -> None:
+            if task.cancelled:
+                return
+            rendered.append(crop_to_content(_transformed_preview_image(layer_image, transform)))
+
+        def _apply_rendered() -> None:
+            if task is self._preview_task and len(rendered) > 0:
+                self._preview_task = None
+                self._layer_image = rendered[0]
+                self._update_pixmap()
+
+        task = AsyncTask(_render, priority=PRIORITY_BACKGROUND)
+        task.finish_signal.connect(_apply_rendered)
+        self._preview_task = task
+        task.start()
+
     def _layer_name_change_slot(self, _, name: str) -> None:
         self._label.set_text(name)
 
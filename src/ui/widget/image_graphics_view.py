@@ -4,18 +4,22 @@ from typing import Optional, cast
 
 from PySide6.QtCore import Qt, QObject, QPoint, QPointF, QRect, QRectF, QSize, QMarginsF, Signal, QEvent
 from PySide6.QtGui import (QPixmap, QImage, QPainter, QPen, QTransform, QResizeEvent, QMouseEvent, QCursor, QWheelEvent,
-                           QEnterEvent, QSurfaceFormat)
+                           QEnterEvent, QSurfaceFormat, QColor)
 from PySide6.QtOpenGLWidgets import QOpenGLWidget
 from PySide6.QtWidgets import QWidget, QGraphicsView, QGraphicsScene, QGraphicsPixmapItem, QSizePolicy
 
 from src.config.application_config import AppConfig
 from src.config.key_config import KeyConfig
 from src.hotkey_filter import HotkeyFilter
+from src.util.tracing import Tracer
 from src.util.visual.contrast_color import contrast_color
 from src.util.visual.geometry_utils import get_scaled_placement
 
 CURSOR_ITEM_Z_LEVEL = 9999
 BASE_ZOOM_OFFSET = 0.05
+FRAME_TIMING_MAX_LINES = 8
+FRAME_TIMING_PADDING = 4
+FRAME_TIMING_BACKGROUND = QColor(0, 0, 0, 160)
 
 
 class ImageGraphicsView(QGraphicsView):
@@ -67,6 +71,13 @@ class ImageGraphicsView(QGraphicsView):
         _update_render_mode(AppConfig().get(AppConfig.OPENGL_ACCELERATION))
         AppConfig().connect(self, AppConfig.OPENGL_ACCELERATION, _update_render_mode)
 
+        self._show_frame_timing = AppConfig().get(AppConfig.SHOW_FRAME_TIMING)
+
+        def _update_frame_timing(show_frame_timing: bool) -> None:
+            self._show_frame_timing = show_frame_timing
+            self.viewport().update()
+        AppConfig().connect(self, AppConfig.SHOW_FRAME_TIMING, _update_frame_timing)
+
         self.setScene(self._scene)
         self.installEventFilter(self)
 
@@ -327,15 +338,37 @@ class ImageGraphicsView(QGraphicsView):
         painter.drawRect(border_rect)
 
     def drawForeground(self, painter: Optional[QPainter], unused_rect: QRectF) -> None:
-        """Draws cursor pixmap over the scene if one is installed."""
-        if painter is None or self._cursor_pixmap is None or self._last_cursor_pos is None:
+        """Draws cursor pixmap over the scene if one is installed, and the frame timing overlay if enabled."""
+        if painter is None:
             return
-        center_point = self.mapToScene(self._last_cursor_pos)
-        scale = self.scene_scale
-        pixmap_rect = QRectF(0.0, 0.0, self._cursor_pixmap.width() / scale,
-                             self._cursor_pixmap.height() / scale).toRect()
-        pixmap_rect.moveCenter(center_point.toPoint())
-        painter.drawPixmap(pixmap_rect, self._cursor_pixmap)
+        if self._cursor_pixmap is not None and self._last_cursor_pos is not None:
+            center_point = self.mapToScene(self._last_cursor_pos)
+            scale = self.scene_scale
+            pixmap_rect = QRectF(0.0, 0.0, self._cursor_pixmap.width() / scale,
+                                 self._cursor_pixmap.height() / scale).toRect()
+            pixmap_rect.moveCenter(center_point.toPoint())
+            painter.drawPixmap(pixmap_rect, self._cursor_pixmap)
+        if self._show_frame_timing:
+            self._draw_frame_timing(painter)
+
+    def _draw_frame_timing(self, painter: QPainter) -> None:
+        """Draws the time since the last frame and the slowest traced operations in the top-left corner."""
+        frame_timing = Tracer().end_frame(id(self))
+        lines = [f'frame: {frame_timing.interval_ms:.1f} ms']
+        for name, count, total_ms in frame_timing.span_totals[:FRAME_TIMING_MAX_LINES]:
+            lines.append(f'{name}: {total_ms:.2f} ms' + ('' if count == 1 else f' ({count}x)'))
+        painter.save()
+        painter.resetTransform()
+        metrics = painter.fontMetrics()
+        text_width = max(metrics.horizontalAdvance(line) for line in lines)
+        overlay_rect = QRect(FRAME_TIMING_PADDING, FRAME_TIMING_PADDING, text_width + FRAME_TIMING_PADDING * 2,
+                             metrics.height() * len(lines) + FRAME_TIMING_PADDING * 2)
+        painter.fillRect(overlay_rect, FRAME_TIMING_BACKGROUND)
+        painter.setPen(Qt.GlobalColor.white)
+        for i, line in enumerate(lines):
+            painter.drawText(overlay_rect.x() + FRAME_TIMING_PADDING,
+                             overlay_rect.y() + FRAME_TIMING_PADDING + metrics.ascent() + metrics.height() * i, line)
+        painter.restore()
 
     def _update_scale_and_transform(self):
         if self.content_size is None:
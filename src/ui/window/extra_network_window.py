@@ -37,8 +37,21 @@ LORA_KEY_METADATA = 'metadata'
 PREVIEW_SIZE = 150
 
 
+def scale_thumbnail(thumbnail: QImage) -> QImage:
+    """Scales a thumbnail down to fit within the preview size, if it's too large."""
+    if thumbnail.width() > PREVIEW_SIZE or thumbnail.height() > PREVIEW_SIZE:
+        if thumbnail.width() > thumbnail.height():
+            return thumbnail.scaledToWidth(PREVIEW_SIZE, Qt.TransformationMode.SmoothTransformation)
+        return thumbnail.scaledToHeight(PREVIEW_SIZE, Qt.TransformationMode.SmoothTransformation)
+    return thumbnail
+
+
 class ExtraNetworkWindow(QDialog):
-    """View available extra networks/models."""
+    """View available extra networks/models.
+
+    The window can be opened before thumbnails finish loading. Missing thumbnails are shown as placeholders until they
+    are provided through ExtraNetworkWindow.set_thumbnail.
+    """
 
     def __init__(self, loras: list[dict[str, str]], images: dict[str, Optional[QImage]]) -> None:
         super().__init__()
@@ -48,6 +61,7 @@ class ExtraNetworkWindow(QDialog):
         self._layout = QVBoxLayout(self)
         self._loras: list[dict[str, str]] = []
         self._list_items: list[_LoraItem] = []
+        self._items_by_name: dict[str, _LoraItem] = {}
         self._image_placeholder: Optional[QImage] = None
 
         for lora in loras:
@@ -62,15 +76,13 @@ class ExtraNetworkWindow(QDialog):
         list_layout = QVBoxLayout(self._lora_list)
         for lora in self._loras:
             lora_name = lora[LORA_KEY_NAME]
-            if lora_name in images:
-                thumbnail = images[lora_name]
-            else:
-                thumbnail = self._missing_image_placeholder()
-            if thumbnail is None:
+            thumbnail = images.get(lora_name, None)
+            if thumbnail is None or thumbnail.isNull():
                 thumbnail = self._missing_image_placeholder()
             list_item = _LoraItem(lora, thumbnail)
             list_item.selected.connect(self._update_selections)
             self._list_items.append(list_item)
+            self._items_by_name[lora_name] = list_item
             list_layout.addWidget(list_item)
 
         button_layout = QHBoxLayout()
@@ -85,6 +97,15 @@ class ExtraNetworkWindow(QDialog):
         close_button.clicked.connect(self.close)
         button_layout.addWidget(close_button, stretch=1)
 
+    def set_thumbnail(self, lora_name: str, thumbnail: Optional[QImage]) -> None:
+        """Replaces a LoRA model's thumbnail. If the thumbnail is None or null, the placeholder is shown instead."""
+        list_item = self._items_by_name.get(lora_name, None)
+        if list_item is None:
+            return
+        if thumbnail is None or thumbnail.isNull():
+            thumbnail = self._missing_image_placeholder()
+        list_item.set_thumbnail(thumbnail)
+
     def _update_selections(self, selected_lora: BorderedWidget) -> None:
         for lora_item in self._list_items:
             if lora_item.is_selected and lora_item != selected_lora:
@@ -151,14 +172,9 @@ class _LoraItem(BorderedWidget):
         self._layout.setSpacing(2)
         self._layout.setContentsMargins(2, 2, 2, 2)
         self._layout.setAlignment(Qt.AlignmentFlag.AlignLeft)
-        if thumbnail.width() > PREVIEW_SIZE or thumbnail.height() > PREVIEW_SIZE:
-            if thumbnail.width() > thumbnail.height():
-                thumbnail = thumbnail.scaledToWidth(PREVIEW_SIZE)
-            else:
-                thumbnail = thumbnail.scaledToHeight(PREVIEW_SIZE)
+        thumbnail = scale_thumbnail(thumbnail)
         self._image_widget = ImageWidget(thumbnail)
-        self._image_widget.setMinimumSize(thumbnail.width(), thumbnail.height())
-        self._image_widget.setMaximumSize(thumbnail.width(), thumbnail.height())
+        self._image_widget.setFixedSize(thumbnail.size())
         self._layout.addWidget(self._image_widget, stretch=0)
         self._layout.addStretch(1)
         label = QLabel(lora[LORA_KEY_NAME])
@@ -169,6 +185,12 @@ class _LoraItem(BorderedWidget):
         """Returns the Lora model data associated with this item."""
         return self._lora
 
+    def set_thumbnail(self, thumbnail: QImage) -> None:
+        """Replaces the displayed thumbnail."""
+        thumbnail = scale_thumbnail(thumbnail)
+        self._image_widget.image = thumbnail
+        self._image_widget.setFixedSize(thumbnail.size())
+
     def mousePressEvent(self, event: Optional[QMouseEvent]) -> None:
         """Select this item when left-clicked."""
         assert event is not None
@@ -1,18 +1,46 @@
 """Global stack for tracking undo/redo state."""
+import dataclasses
 import logging
 from contextlib import contextmanager
 import datetime
+from dataclasses import dataclass
 from threading import Lock
-from typing import Callable, Optional, Any, Generator
+from typing import Callable, Optional, Any, Generator, TypeVar
 
 from PySide6.QtCore import QObject, Signal
 
 from src.config.application_config import AppConfig
 from src.util.singleton import Singleton
+from src.util.tracing import traced, CATEGORY_UNDO
 
 logger = logging.getLogger(__name__)
 MAX_UNDO = 50
 
+_ChangeT = TypeVar('_ChangeT', bound='TransactionChange')
+
+
+@dataclass
+class UndoStats:
+    """Counts undo history changes, for profiling how well edits are combined.
+
+    UndoStats.commits:
+        Number of actions passed to commit_action.
+    UndoStats.merged_commits:
+        Number of committed actions combined into an existing group instead of adding a new undo entry.
+    UndoStats.transactions:
+        Number of transactions that added an undo entry.
+    UndoStats.transaction_changes:
+        Number of changes absorbed into transactions instead of being committed separately.
+    UndoStats.snapshot_tiles, UndoStats.snapshot_bytes:
+        Number and total size of image tiles copied to record transaction changes.
+    """
+    commits: int = 0
+    merged_commits: int = 0
+    transactions: int = 0
+    transaction_changes: int = 0
+    snapshot_tiles: int = 0
+    snapshot_bytes: int = 0
+
 
 class _UndoAction:
     def __init__(self, undo_action: Callable[[], None],
@@ -56,6 +84,76 @@ class _UndoGroup:
         return len(self._undo_actions)
 
 
+class TransactionChange:
+    """Accumulates related changes within an undo transaction, so they can be committed as a single action."""
+
+    def finish(self) -> Optional[tuple[Callable[[], None], Callable[[], None]]]:
+        """Returns (undo_action, redo_action) functions that reverse or re-apply all accumulated changes, or None if
+           nothing changed. Called once, when the transaction ends or when other actions need to be committed after
+           the accumulated changes."""
+        raise NotImplementedError()
+
+
+class UndoTransaction:
+    """Collects all changes made during a single gesture, to be committed to the undo stack as one entry."""
+
+    def __init__(self, action_type: str) -> None:
+        self.type = action_type
+        self.change_count = 0
+        self.snapshot_tiles = 0
+        self.snapshot_bytes = 0
+        self._group = _UndoGroup(action_type)
+        self._changes: dict[Any, TransactionChange] = {}
+
+    def change(self, key: Any, create_change: Callable[[], _ChangeT]) -> _ChangeT:
+        """Returns the accumulated change object with the given key, creating it if it doesn't exist yet.
+
+        Parameters
+        ----------
+        key: Any
+            Hashable key identifying what's being changed, e.g. the edited layer.
+        create_change: Callable[[], TransactionChange]
+            Function used to create a new change object if no change with the given key exists.
+        """
+        if key not in self._changes:
+            self._changes[key] = create_change()
+        return self._changes[key]  # type: ignore
+
+    def record_change(self) -> None:
+        """Counts a change that was absorbed into the transaction."""
+        self.change_count += 1
+
+    def record_snapshot(self, tile_count: int, byte_count: int) -> None:
+        """Counts image data copied to record transaction changes."""
+        self.snapshot_tiles += tile_count
+        self.snapshot_bytes += byte_count
+
+    def finish_changes(self) -> None:
+        """Adds all accumulated changes to the transaction's action group. Changes made after this will start new
+           change objects."""
+        for change in self._changes.values():
+            actions = change.finish()
+            if actions is not None:
+                undo_action, redo_action = actions
+                self._group.add_to_group(undo_action, redo_action, self.type)
+        self._changes.clear()
+
+    def add_action(self, undo_action: Callable[[], None], redo_action: Callable[[], None], action_type: str) -> None:
+        """Adds an action to the transaction's group, after all previously accumulated changes."""
+        self.finish_changes()
+        self._group.add_to_group(undo_action, redo_action, action_type)
+
+    def take_actions(self) -> Optional[_UndoGroup]:
+        """Finishes all accumulated changes and removes them from the transaction, returning them as a group, or
+           returns None if nothing changed."""
+        self.finish_changes()
+        if self._group.count() == 0:
+            return None
+        group = self._group
+        self._group = _UndoGroup(self.type)
+        return group
+
+
 class UndoStack(metaclass=Singleton):
     """Manages the application's shared undo history."""
 
@@ -64,6 +162,8 @@ class UndoStack(metaclass=Singleton):
         self._redo_stack: list[_UndoAction | _UndoGroup] = []
         self._access_lock = Lock()
         self._open_group: Optional[_UndoGroup] = None
+        self._transaction: Optional[UndoTransaction] = None
+        self._stats = UndoStats()
         self._in_progress_change = 'none'
         self._undo_in_progress = False
 
@@ -87,6 +187,20 @@ class UndoStack(metaclass=Singleton):
         """Returns the signal emitted whenever redo action count changes."""
         return self._signal_manager.redo_count_changed
 
+    @property
+    def active_transaction(self) -> Optional[UndoTransaction]:
+        """Returns the open undo transaction, if any."""
+        return self._transaction
+
+    @property
+    def stats(self) -> UndoStats:
+        """Returns a copy of the undo history statistics collected since the last reset_stats call."""
+        return dataclasses.replace(self._stats)
+
+    def reset_stats(self) -> None:
+        """Clears all undo history statistics."""
+        self._stats = UndoStats()
+
     def undo_count(self) -> int:
         """Returns the number of saved actions in the undo stack."""
         return len(self._undo_stack)
@@ -95,6 +209,7 @@ class UndoStack(metaclass=Singleton):
         """Returns the number of saved actions in the redo stack."""
         return len(self._redo_stack)
 
+    @traced(category=CATEGORY_UNDO)
     def commit_action(self, action: Callable[[], None], undo_action: Callable[[], None], action_type: str,
                       action_data: Optional[dict[str, Any]] = None, skip_initial_call=False) -> bool:
         """Performs an action, then commits it to the undo stack.
@@ -126,18 +241,24 @@ class UndoStack(metaclass=Singleton):
             raise RuntimeError(f'Concurrent undo history changes detected! Attempted: {action_type}, '
                                f'in-progress: {self._in_progress_change}')
         with self._access_lock:
-            logger.info(f'ADD ACTION:{action_type}, UNDO_COUNT={len(self._undo_stack)},'
-                        f' REDO_COUNT={len(self._redo_stack)}')
+            logger.debug(f'ADD ACTION:{action_type}, UNDO_COUNT={len(self._undo_stack)},'
+                         f' REDO_COUNT={len(self._redo_stack)}')
             self._in_progress_change = action_type
+            self._stats.commits += 1
             if not skip_initial_call:
                 action()
-            if self._open_group is not None:
+            if self._transaction is not None:
+                self._transaction.add_action(undo_action, action, action_type)
+                self._stats.merged_commits += 1
+            elif self._open_group is not None:
                 self._open_group.add_to_group(undo_action, action, action_type)
+                self._stats.merged_commits += 1
             else:
                 undo_entry = _UndoAction(undo_action, action, action_type, action_data)
                 prev_action = None if len(self._undo_stack) == 0 else self._undo_stack[-1]
                 if prev_action is not None and undo_entry.timestamp - prev_action.timestamp \
                         < AppConfig().get(AppConfig.UNDO_MERGE_INTERVAL):
+                    self._stats.merged_commits += 1
                     if isinstance(prev_action, _UndoGroup):
                         prev_action.add_to_group(undo_action, action, action_type)
                     else:
@@ -170,9 +291,10 @@ class UndoStack(metaclass=Singleton):
             raise RuntimeError(f'Concurrent undo history changes detected! Attempted: {action_type}, '
                                f'in-progress: {self._in_progress_change}')
         with self._access_lock:
-            if self._open_group is not None:
+            if self._open_group is not None or self._transaction is not None:
+                open_type = self._open_group.type if self._open_group is not None else self._transaction.type
                 raise RuntimeError(f'Tried to create {action_type} combined action group, but '
-                                   f'{self._open_group.type} group is still open')
+                                   f'{open_type} group is still open')
             self._open_group = _UndoGroup(action_type)
         assert not self._access_lock.locked()
         yield
@@ -185,15 +307,63 @@ class UndoStack(metaclass=Singleton):
                 self._add_to_stack(self._open_group, self._undo_stack)
             self._open_group = None
 
+    def begin_transaction(self, action_type: str) -> None:
+        """Starts collecting changes for a single gesture, such as a brush stroke.
+
+        While the transaction is open, sources of frequent changes (e.g. ImageLayer.borrow_image) record their
+        changes in the transaction instead of committing them individually, and actions passed to commit_action are
+        added to the transaction's group. All changes are committed as a single undo entry by end_transaction.
+        """
+        if self._access_lock.locked():
+            raise RuntimeError(f'Concurrent undo history changes detected! Attempted: {action_type}, '
+                               f'in-progress: {self._in_progress_change}')
+        with self._access_lock:
+            if self._open_group is not None or self._transaction is not None:
+                open_type = self._open_group.type if self._open_group is not None else self._transaction.type
+                raise RuntimeError(f'Tried to start {action_type} undo transaction, but {open_type} group is still '
+                                   'open')
+            self._transaction = UndoTransaction(action_type)
+
+    def end_transaction(self) -> None:
+        """Commits all changes collected since begin_transaction as a single undo entry."""
+        if self._access_lock.locked():
+            raise RuntimeError('Concurrent undo history changes detected! Attempted: end_transaction, '
+                               f'in-progress: {self._in_progress_change}')
+        with self._access_lock:
+            if self._transaction is None:
+                raise RuntimeError('Tried to end an undo transaction, but no transaction is open')
+            self._commit_transaction_group()
+            transaction = self._transaction
+            self._transaction = None
+            self._stats.transaction_changes += transaction.change_count
+            self._stats.snapshot_tiles += transaction.snapshot_tiles
+            self._stats.snapshot_bytes += transaction.snapshot_bytes
+            logger.debug(f'END TRANSACTION:{transaction.type}, CHANGES={transaction.change_count}, '
+                         f'SNAPSHOT_TILES={transaction.snapshot_tiles}, SNAPSHOT_BYTES={transaction.snapshot_bytes}')
+
+    @contextmanager
+    def transaction(self, action_type: str) -> Generator[UndoTransaction, None, None]:
+        """Collects changes as a single undo entry until the context is exited. See begin_transaction."""
+        self.begin_transaction(action_type)
+        assert self._transaction is not None
+        try:
+            yield self._transaction
+        finally:
+            self.end_transaction()
+
     def undo(self) -> None:
         """Reverses the most recent action taken."""
         with self._access_lock:
             self._undo_in_progress = True
+            if self._transaction is not None:
+                # Undo shouldn't skip over changes from the gesture in progress:
+                self._commit_transaction_group()
             if len(self._undo_stack) == 0:
+                self._undo_in_progress = False
                 return
             last_action_object = self._undo_stack.pop()
-            logger.info(f'UNDO ACTION:{last_action_object.type}, UNDO_COUNT={len(self._undo_stack)},'
-                        f' REDO_COUNT={len(self._redo_stack)}')
+            logger.debug(f'UNDO ACTION:{last_action_object.type}, UNDO_COUNT={len(self._undo_stack)},'
+                         f' REDO_COUNT={len(self._redo_stack)}')
             last_action_object.undo()
             self.undo_count_changed.emit(len(self._undo_stack))
             self._add_to_stack(last_action_object, self._redo_stack)
@@ -202,11 +372,13 @@ class UndoStack(metaclass=Singleton):
     def redo(self) -> None:
         """Re-applies the last undone action as long as no new actions were registered after the last undo."""
         with self._access_lock:
+            if self._transaction is not None:
+                self._commit_transaction_group()
             if len(self._redo_stack) == 0:
                 return
             last_action_object = self._redo_stack.pop()
-            logger.info(f'REDO ACTION:{last_action_object.type}, UNDO_COUNT={len(self._undo_stack)},'
-                        f' REDO_COUNT={len(self._redo_stack)}')
+            logger.debug(f'REDO ACTION:{last_action_object.type}, UNDO_COUNT={len(self._undo_stack)},'
+                         f' REDO_COUNT={len(self._redo_stack)}')
             last_action_object.redo()
             self.redo_count_changed.emit(len(self._redo_stack))
             self._add_to_stack(last_action_object, self._undo_stack)
@@ -215,6 +387,8 @@ class UndoStack(metaclass=Singleton):
         """Clears the entire undo/redo history."""
         with self._access_lock:
             assert self._open_group is None
+            if self._transaction is not None:
+                self._transaction = UndoTransaction(self._transaction.type)
             undo_count = self.undo_count()
             redo_count = self.redo_count()
             self._undo_stack.clear()
@@ -224,6 +398,20 @@ class UndoStack(metaclass=Singleton):
             if redo_count != 0:
                 self.redo_count_changed.emit(0)
 
+    @traced(category=CATEGORY_UNDO)
+    def _commit_transaction_group(self) -> None:
+        """Adds all changes collected by the open transaction to the undo stack, leaving the transaction open for any
+           further changes. Must be called while holding the access lock."""
+        assert self._transaction is not None
+        group = self._transaction.take_actions()
+        if group is None:
+            return
+        self._add_to_stack(group, self._undo_stack)
+        self._stats.transactions += 1
+        if len(self._redo_stack) > 0:
+            self._redo_stack.clear()
+            self.redo_count_changed.emit(0)
+
     def _add_to_stack(self, stack_item: _UndoAction | _UndoGroup, stack: list[_UndoAction | _UndoGroup]) -> None:
         if stack == self._undo_stack:
             stack_signal = self.undo_count_changed
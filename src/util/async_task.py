@@ -1,40 +1,60 @@
 """Perform an async task in another thread."""
-from typing import Callable, TypeAlias
+from typing import Callable, TypeAlias, Hashable, Optional
 
-from PySide6.QtCore import QObject, Signal, QRunnable, QThreadPool
+from PySide6.QtCore import QObject, Signal
 
 from src.util.application_state import AppStateTracker, APP_STATE_LOADING
+from src.util.task_scheduler import TaskScheduler, CancellationToken, ScheduledTask, PRIORITY_NORMAL
 
 ThreadAction: TypeAlias = Callable[..., None]
 
 
 class AsyncTask(QObject):
-    """Run an async task in another thread."""
+    """Run an async task in another thread.
+
+    Tasks run through the TaskScheduler. If a task is cancelled, or replaced by a newer task with the same key,
+    finish_signal is not emitted. Actions that take a long time should check AsyncTask.cancelled and return early.
+    """
     finish_signal = Signal()
 
-    def __init__(self, action: ThreadAction, set_loading_state: bool = False) -> None:
+    def __init__(self, action: ThreadAction, set_loading_state: bool = False, priority: int = PRIORITY_NORMAL,
+                 key: Optional[Hashable] = None) -> None:
         super().__init__()
         self._action = action
-        if QThreadPool.globalInstance().maxThreadCount() < 3:
-            QThreadPool.globalInstance().setMaxThreadCount(3)
+        self._priority = priority
+        self._key = key
+        self._cancellation_token = CancellationToken()
+        self._scheduled_task: Optional[ScheduledTask] = None
         if set_loading_state:
             AppStateTracker.set_app_state(APP_STATE_LOADING)
 
+    @property
+    def cancellation_token(self) -> CancellationToken:
+        """Returns the token used to cancel this task."""
+        return self._cancellation_token
+
+    @property
+    def cancelled(self) -> bool:
+        """Returns whether this task was cancelled or replaced."""
+        return self._cancellation_token.cancelled
+
     def signals(self) -> list[Signal]:
         """Return a list of Qt signals that will be passed to the worker."""
         return []
 
     def start(self):
         """Start the thread, caching the AsyncTask to prevent deletion."""
-        task = self
+        self._scheduled_task = TaskScheduler().submit(self.run, self._priority, self._key, self._cancellation_token)
 
-        class _TaskRunner(QRunnable):
-            def run(self):
-                """Start the AsyncTask within the global thread pool."""
-                task.run()
-        QThreadPool.globalInstance().start(_TaskRunner())
+    def cancel(self) -> None:
+        """Cancel the task, removing it from the queue if it hasn't started yet."""
+        if self._scheduled_task is None:
+            self._cancellation_token.cancel()
+        else:
+            TaskScheduler().cancel(self._scheduled_task)
 
     def run(self) -> None:
         """Run the action, passing in available signals and sending a finish signal on exit."""
         self._action(*self.signals())
-        self.finish_signal.emit()
+        if not self._cancellation_token.cancelled:
+            self.finish_signal.emit()
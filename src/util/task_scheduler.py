@@ -0,0 +1,190 @@
+"""
+Runs background tasks in a shared thread pool, ordered by priority.
+
+Tasks are started in three priority lanes. Interactive tasks (previews the user is actively waiting on) run in their
+own small thread pool, so they are never queued behind long-running work. Normal and background tasks share the main
+pool, whose size is set by AppConfig.BACKGROUND_TASK_THREADS, and wait in its queue, highest priority first.
+
+Cancellation is cooperative. Cancelling a task that hasn't started removes it from the queue, but tasks that are
+already running need to check their CancellationToken and return early. Tasks submitted with a key replace any
+earlier task with the same key, so rapidly repeated requests (e.g. preview updates while a slider moves) only run the
+most recent request.
+"""
+import logging
+from threading import Lock
+from typing import Callable, Hashable, Optional
+
+from PySide6.QtCore import QRunnable, QThreadPool, QDeadlineTimer
+
+from src.config.application_config import AppConfig
+from src.util.singleton import Singleton
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_BACKGROUND = 0
+PRIORITY_NORMAL = 1
+PRIORITY_INTERACTIVE = 2
+
+INTERACTIVE_THREAD_COUNT = 2
+
+
+class TaskCancelledError(Exception):
+    """Raised within a scheduled task to stop it early after it was cancelled."""
+
+
+class CancellationToken:
+    """Tracks whether a scheduled task was cancelled. Long-running tasks should check it periodically."""
+
+    def __init__(self) -> None:
+        self._cancelled = False
+
+    @property
+    def cancelled(self) -> bool:
+        """Returns whether the associated task was cancelled."""
+        return self._cancelled
+
+    def cancel(self) -> None:
+        """Marks the associated task as cancelled."""
+        self._cancelled = True
+
+    def raise_if_cancelled(self) -> None:
+        """Raises TaskCancelledError if the associated task was cancelled. The scheduler handles this exception, so
+           tasks can call this anywhere to stop early."""
+        if self._cancelled:
+            raise TaskCancelledError()
+
+
+class ScheduledTask(QRunnable):
+    """A task submitted to the TaskScheduler."""
+
+    def __init__(self, scheduler: 'TaskScheduler', action: Callable[[], None], priority: int,
+                 key: Optional[Hashable], token: CancellationToken) -> None:
+        super().__init__()
+        self.setAutoDelete(False)
+        self._scheduler = scheduler
+        self._action = action
+        self._priority = priority
+        self._key = key
+        self._token = token
+
+    @property
+    def priority(self) -> int:
+        """Returns the task's priority lane."""
+        return self._priority
+
+    @property
+    def key(self) -> Optional[Hashable]:
+        """Returns the key used to replace superseded tasks, or None if the task is never replaced."""
+        return self._key
+
+    @property
+    def cancellation_token(self) -> CancellationToken:
+        """Returns the token used to cancel this task."""
+        return self._token
+
+    def run(self) -> None:
+        """Runs the task action within the thread pool, unless it was cancelled first."""
+        try:
+            if not self._token.cancelled:
+                self._action()
+        except TaskCancelledError:
+            logger.debug(f'Scheduled task {self._key} cancelled')
+        finally:
+            self._scheduler.task_finished(self)
+
+
+class TaskScheduler(metaclass=Singleton):
+    """Runs background tasks in a shared thread pool, ordered by priority."""
+
+    def __init__(self) -> None:
+        self._pool = QThreadPool()
+        self._interactive_pool = QThreadPool()
+        self._interactive_pool.setMaxThreadCount(INTERACTIVE_THREAD_COUNT)
+        self._lock = Lock()
+        self._tasks: set[ScheduledTask] = set()
+        self._keyed_tasks: dict[Hashable, ScheduledTask] = {}
+        config = AppConfig()
+        self.set_worker_count(config.get(AppConfig.BACKGROUND_TASK_THREADS))
+        config.connect(self, AppConfig.BACKGROUND_TASK_THREADS, self.set_worker_count)
+
+    @property
+    def worker_count(self) -> int:
+        """Returns the maximum number of threads used for normal and background tasks."""
+        return self._pool.maxThreadCount()
+
+    def set_worker_count(self, worker_count: int) -> None:
+        """Sets the maximum number of threads used for normal and background tasks."""
+        self._pool.setMaxThreadCount(max(1, worker_count))
+
+    @property
+    def task_count(self) -> int:
+        """Returns the number of tasks that are either queued or running."""
+        with self._lock:
+            return len(self._tasks)
+
+    def submit(self, action: Callable[[], None], priority: int = PRIORITY_NORMAL, key: Optional[Hashable] = None,
+               token: Optional[CancellationToken] = None) -> ScheduledTask:
+        """
+        Schedules a task to run in the thread pool.
+
+        Parameters
+        ----------
+        action: Callable
+            Function to run within the thread pool.
+        priority: int, default=PRIORITY_NORMAL
+            PRIORITY_INTERACTIVE, PRIORITY_NORMAL, or PRIORITY_BACKGROUND.
+        key: Hashable, optional
+            If not None, any earlier task submitted with the same key is cancelled.
+        token: CancellationToken, optional
+            Token used to cancel the task. If None, a new token is created.
+        Returns
+        -------
+        ScheduledTask
+            The scheduled task, which may be passed to TaskScheduler.cancel.
+        """
+        task = ScheduledTask(self, action, priority, key, CancellationToken() if token is None else token)
+        with self._lock:
+            if key is not None:
+                superseded = self._keyed_tasks.get(key, None)
+                if superseded is not None:
+                    self._cancel(superseded)
+                self._keyed_tasks[key] = task
+            self._tasks.add(task)
+        self._task_pool(task).start(task, priority)
+        return task
+
+    def cancel(self, task: ScheduledTask) -> None:
+        """Cancels a task. Queued tasks are discarded, running tasks need to check their CancellationToken."""
+        with self._lock:
+            self._cancel(task)
+
+    def cancel_all(self) -> None:
+        """Cancels all queued and running tasks."""
+        with self._lock:
+            for task in list(self._tasks):
+                self._cancel(task)
+
+    def wait_for_done(self, timeout_ms: int = -1) -> bool:
+        """Blocks until all tasks finish, returning False if the timeout expired first."""
+        if timeout_ms < 0:
+            return self._pool.waitForDone() and self._interactive_pool.waitForDone()
+        deadline = QDeadlineTimer(timeout_ms)
+        return self._pool.waitForDone(deadline) and self._interactive_pool.waitForDone(deadline)
+
+    def task_finished(self, task: ScheduledTask) -> None:
+        """Releases a finished task. Called automatically by ScheduledTask.run."""
+        with self._lock:
+            self._release(task)
+
+    def _cancel(self, task: ScheduledTask) -> None:
+        task.cancellation_token.cancel()
+        if self._task_pool(task).tryTake(task):
+            self._release(task)
+
+    def _task_pool(self, task: ScheduledTask) -> QThreadPool:
+        return self._interactive_pool if task.priority >= PRIORITY_INTERACTIVE else self._pool
+
+    def _release(self, task: ScheduledTask) -> None:
+        self._tasks.discard(task)
+        if task.key is not None and self._keyed_tasks.get(task.key, None) is task:
+            del self._keyed_tasks[task.key]
@@ -0,0 +1,231 @@
+"""
+Lightweight timing spans for finding slow operations while the application is running.
+
+Tracing is disabled by default. While it is disabled, trace_span returns a shared no-op context manager, so instrumented
+code only pays for a single flag check.  Enabled spans are stored in a fixed-size ring buffer, where they can be saved
+in the Chrome trace event format (viewable at https://ui.perfetto.dev or chrome://tracing) or summarized once per
+rendered frame.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from functools import wraps
+from typing import Any, Callable, Hashable, Optional, TypeVar, cast
+
+from src.util.singleton import Singleton
+
+DEFAULT_CAPACITY = 100000
+
+CATEGORY_RENDER = 'render'
+CATEGORY_INPUT = 'input'
+CATEGORY_IMAGE = 'image'
+CATEGORY_NETWORK = 'network'
+CATEGORY_UNDO = 'undo'
+
+FnT = TypeVar('FnT', bound=Callable[..., Any])
+
+
+@dataclass
+class TraceSpan:
+    """A single timed operation.
+
+    TraceSpan.start_ns, TraceSpan.end_ns:
+        Start and end times, as returned by time.perf_counter_ns().
+    TraceSpan.thread_id:
+        threading.get_ident() value for the thread where the span was recorded.
+    """
+    name: str
+    category: str
+    start_ns: int
+    end_ns: int
+    thread_id: int
+    args: Optional[dict[str, Any]] = None
+
+    @property
+    def duration_ms(self) -> float:
+        """Returns the span duration in milliseconds."""
+        return (self.end_ns - self.start_ns) / 1_000_000
+
+
+@dataclass
+class FrameTiming:
+    """Spans that finished between two rendered frames.
+
+    FrameTiming.span_totals:
+        (span name, span count, total milliseconds) tuples, sorted by total time, longest first.
+    """
+    interval_ms: float
+    span_totals: list[tuple[str, int, float]]
+
+
+class _NullSpan:
+    """Context manager used in place of spans while tracing is disabled."""
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *unused_exc_info) -> None:
+        return None
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _ActiveSpan:
+    """Context manager that records a span when it exits."""
+
+    __slots__ = ('_tracer', '_name', '_category', '_args', '_start_ns')
+
+    def __init__(self, tracer: 'Tracer', name: str, category: str, args: Optional[dict[str, Any]]) -> None:
+        self._tracer = tracer
+        self._name = name
+        self._category = category
+        self._args = args
+        self._start_ns = 0
+
+    def __enter__(self) -> None:
+        self._start_ns = time.perf_counter_ns()
+
+    def __exit__(self, *unused_exc_info) -> None:
+        self._tracer.record(self._name, self._category, self._start_ns, time.perf_counter_ns(), self._args)
+
+
+class Tracer(metaclass=Singleton):
+    """Records timing spans in a ring buffer while enabled."""
+
+    def __init__(self) -> None:
+        self._enabled = False
+        self._lock = threading.Lock()
+        self._spans: deque[TraceSpan] = deque(maxlen=DEFAULT_CAPACITY)
+        self._last_frame_ns: dict[Hashable, int] = {}
+
+    @property
+    def enabled(self) -> bool:
+        """Returns whether spans are currently being recorded."""
+        return self._enabled
+
+    def set_enabled(self, enabled: bool) -> None:
+        """Starts or stops recording spans. Previously recorded spans are kept."""
+        self._enabled = enabled
+
+    @property
+    def capacity(self) -> int:
+        """Returns the maximum number of spans stored before the oldest spans are discarded."""
+        maxlen = self._spans.maxlen
+        assert maxlen is not None
+        return maxlen
+
+    def set_capacity(self, capacity: int) -> None:
+        """Changes the ring buffer size, keeping the most recent spans that still fit."""
+        if capacity < 1:
+            raise ValueError(f'Invalid trace capacity {capacity}')
+        with self._lock:
+            self._spans = deque(self._spans, maxlen=capacity)
+
+    def span(self, name: str, category: str = '', args: Optional[dict[str, Any]] = None) -> _NullSpan | _ActiveSpan:
+        """Returns a context manager that records a span covering its block, if tracing is enabled."""
+        if not self._enabled:
+            return _NULL_SPAN
+        return _ActiveSpan(self, name, category, args)
+
+    def record(self, name: str, category: str, start_ns: int, end_ns: int,
+               args: Optional[dict[str, Any]] = None) -> None:
+        """Adds a completed span, using times returned by time.perf_counter_ns()."""
+        if not self._enabled:
+            return
+        span = TraceSpan(name, category, start_ns, end_ns, threading.get_ident(), args)
+        with self._lock:
+            self._spans.append(span)
+
+    def spans(self) -> list[TraceSpan]:
+        """Returns all stored spans, in the order they finished."""
+        with self._lock:
+            return list(self._spans)
+
+    def clear(self) -> None:
+        """Discards all stored spans."""
+        with self._lock:
+            self._spans.clear()
+            self._last_frame_ns.clear()
+
+    def end_frame(self, frame_source: Hashable = None) -> FrameTiming:
+        """Marks the end of a rendered frame, returning timing for spans that finished since the previous frame.
+           Frames are tracked separately for each frame_source value, so multiple views can report frame timing."""
+        frame_ns = time.perf_counter_ns()
+        totals: dict[str, tuple[int, float]] = {}
+        with self._lock:
+            last_frame_ns = self._last_frame_ns.get(frame_source, None)
+            self._last_frame_ns[frame_source] = frame_ns
+            if last_frame_ns is not None:
+                for span in reversed(self._spans):
+                    if span.end_ns < last_frame_ns:
+                        break
+                    count, total = totals.get(span.name, (0, 0.0))
+                    totals[span.name] = (count + 1, total + span.duration_ms)
+        interval_ms = 0.0 if last_frame_ns is None else (frame_ns - last_frame_ns) / 1_000_000
+        span_totals = sorted(((name, count, total) for name, (count, total) in totals.items()),
+                             key=lambda span_total: span_total[2], reverse=True)
+        return FrameTiming(interval_ms, span_totals)
+
+    def chrome_trace(self) -> dict[str, Any]:
+        """Returns all stored spans in the Chrome trace event format."""
+        pid = os.getpid()
+        thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+        events: list[dict[str, Any]] = []
+        thread_ids: set[int] = set()
+        for span in self.spans():
+            event: dict[str, Any] = {
+                'name': span.name,
+                'cat': span.category,
+                'ph': 'X',
+                'ts': span.start_ns / 1000,
+                'dur': (span.end_ns - span.start_ns) / 1000,
+                'pid': pid,
+                'tid': span.thread_id
+            }
+            if span.args is not None:
+                event['args'] = span.args
+            events.append(event)
+            thread_ids.add(span.thread_id)
+        for thread_id in thread_ids:
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': thread_id,
+                           'args': {'name': thread_names.get(thread_id, str(thread_id))}})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def save_chrome_trace(self, file_path: str) -> int:
+        """Saves all stored spans to a Chrome trace JSON file, returning the number of spans saved."""
+        trace = self.chrome_trace()
+        with open(file_path, 'w', encoding='utf-8') as file:
+            json.dump(trace, file, default=str)
+        return sum(1 for event in trace['traceEvents'] if event['ph'] == 'X')
+
+
+_tracer = Tracer()
+
+
+def trace_span(name: str, category: str = '', args: Optional[dict[str, Any]] = None) -> _NullSpan | _ActiveSpan:
+    """Returns a context manager that records a span covering its block, if tracing is enabled."""
+    return _tracer.span(name, category, args)
+
+
+def traced(name: Optional[str] = None, category: str = '') -> Callable[[FnT], FnT]:
+    """Decorator that records a span each time the decorated function runs while tracing is enabled. If no name is
+       provided, the function's qualified name is used."""
+
+    def _decorator(fn: FnT) -> FnT:
+        span_name = fn.__qualname__ if name is None else name
+
+        @wraps(fn)
+        def _wrapper(*args, **kwargs):
+            if not _tracer.enabled:
+                return fn(*args, **kwargs)
+            start_ns = time.perf_counter_ns()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _tracer.record(span_name, category, start_ns, time.perf_counter_ns())
+        return cast(FnT, _wrapper)
+    return _decorator
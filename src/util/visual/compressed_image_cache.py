@@ -0,0 +1,129 @@
+"""Stores QImages in compressed form, spilling to temporary files once a memory limit is reached."""
+import logging
+import os
+import tempfile
+from threading import Lock
+from typing import Hashable, Optional
+
+from PySide6.QtCore import QBuffer, QByteArray, QIODevice
+from PySide6.QtGui import QImage
+
+logger = logging.getLogger(__name__)
+
+COMPRESSION_FORMAT = 'PNG'
+# Qt maps PNG quality to zlib compression levels, higher quality values compress faster but less effectively:
+COMPRESSION_QUALITY = 80
+DEFAULT_MEMORY_LIMIT_BYTES = 256 * 1024 * 1024
+
+# PNG only stores straight alpha, so premultiplied images are explicitly converted before encoding. Every premultiplied
+# value converts to a straight alpha value that converts back to it exactly, so no precision is lost:
+ENCODING_FORMATS = {
+    QImage.Format.Format_ARGB32_Premultiplied: QImage.Format.Format_ARGB32,
+    QImage.Format.Format_RGBA8888_Premultiplied: QImage.Format.Format_RGBA8888,
+    QImage.Format.Format_RGBA64_Premultiplied: QImage.Format.Format_RGBA64
+}
+
+
+class CompressedImageCache:
+    """Stores QImages in compressed form, spilling to temporary files once a memory limit is reached.
+
+    Images are stored losslessly, and returned in their original format. All methods are thread-safe, so images can be compressed in background threads.
+    """
+
+    def __init__(self, memory_limit_bytes: int = DEFAULT_MEMORY_LIMIT_BYTES) -> None:
+        self._memory_limit_bytes = memory_limit_bytes
+        self._lock = Lock()
+        self._in_memory: dict[Hashable, tuple[bytes, QImage.Format]] = {}
+        self._on_disk: dict[Hashable, tuple[str, QImage.Format]] = {}
+        self._memory_bytes = 0
+        self._temp_dir: Optional[tempfile.TemporaryDirectory] = None
+        self._file_count = 0
+
+    @property
+    def memory_bytes(self) -> int:
+        """Returns the number of bytes used by compressed images held in memory."""
+        with self._lock:
+            return self._memory_bytes
+
+    @property
+    def disk_count(self) -> int:
+        """Returns the number of images stored in temporary files."""
+        with self._lock:
+            return len(self._on_disk)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._in_memory) + len(self._on_disk)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._in_memory or key in self._on_disk
+
+    def put(self, key: Hashable, image: QImage) -> None:
+        """Compresses and stores an image, replacing any image previously stored with the same key."""
+        image_bytes = QByteArray()
+        buffer = QBuffer(image_bytes)
+        buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+        encoded_image = image
+        if image.format() in ENCODING_FORMATS:
+            encoded_image = image.convertToFormat(ENCODING_FORMATS[image.format()])
+        if not encoded_image.save(buffer, COMPRESSION_FORMAT, COMPRESSION_QUALITY):
+            raise IOError(f'Failed to compress {image.width()}x{image.height()} image')
+        buffer.close()
+        data = image_bytes.data()
+        with self._lock:
+            self._remove(key)
+            if self._memory_bytes + len(data) <= self._memory_limit_bytes:
+                self._in_memory[key] = (data, image.format())
+                self._memory_bytes += len(data)
+                return
+            if self._temp_dir is None:
+                self._temp_dir = tempfile.TemporaryDirectory()
+            file_path = os.path.join(self._temp_dir.name, f'{self._file_count}.png')
+            self._file_count += 1
+            with open(file_path, 'wb') as file:
+                file.write(data)
+            self._on_disk[key] = (file_path, image.format())
+
+    def get(self, key: Hashable) -> Optional[QImage]:
+        """Returns a decompressed copy of a stored image, or None if no image is stored with the given key."""
+        with self._lock:
+            if key in self._in_memory:
+                data, image_format = self._in_memory[key]
+            elif key in self._on_disk:
+                file_path, image_format = self._on_disk[key]
+                with open(file_path, 'rb') as file:
+                    data = file.read()
+            else:
+                return None
+        image = QImage.fromData(data, COMPRESSION_FORMAT)
+        if image.isNull():
+            logger.error(f'Failed to decompress cached image {key}')
+            return None
+        if image.format() != image_format:
+            image = image.convertToFormat(image_format)
+        return image
+
+    def remove(self, key: Hashable) -> None:
+        """Removes an image from the cache, if present."""
+        with self._lock:
+            self._remove(key)
+
+    def clear(self) -> None:
+        """Removes all images, deleting any temporary files."""
+        with self._lock:
+            self._in_memory.clear()
+            self._on_disk.clear()
+            self._memory_bytes = 0
+            if self._temp_dir is not None:
+                self._temp_dir.cleanup()
+                self._temp_dir = None
+
+    def _remove(self, key: Hashable) -> None:
+        if key in self._in_memory:
+            data, _ = self._in_memory.pop(key)
+            self._memory_bytes -= len(data)
+        elif key in self._on_disk:
+            file_path, _ = self._on_disk.pop(key)
+            if os.path.exists(file_path):
+                os.remove(file_path)
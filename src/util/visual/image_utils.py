@@ -12,7 +12,7 @@ import cv2
 import numpy as np
 from PIL import Image
 from PySide6.QtCore import QBuffer, QRect, QSize, Qt, QPoint, QFile, QIODevice, QByteArray
-from PySide6.QtGui import QImage, QIcon, QPixmap, QPainter, QColor
+from PySide6.QtGui import QImage, QIcon, QPixmap, QPainter, QColor, QBrush
 from PySide6.QtWidgets import QStyle, QWidget, QApplication
 from numpy import ndarray, dtype
 
@@ -70,9 +70,20 @@ def qimage_from_base64(image_str: str) -> QImage:
     if image_str.startswith(BASE_64_PREFIX):
         image_str = image_str[len(BASE_64_PREFIX):]
     image_data = QByteArray.fromBase64(image_str.encode())
-    image = QImage.fromData(image_data, 'PNG')  # type: ignore
+    try:
+        return qimage_from_bytes(image_data.data(), 'PNG')
+    except ValueError as err:
+        raise ValueError('Invalid base64 image string') from err
+
+
+def qimage_from_bytes(image_data: bytes, image_format: Optional[str] = None) -> QImage:
+    """Returns a QImage from encoded image file data, optionally specifying the expected format."""
+    if image_format is None:
+        image = QImage.fromData(image_data)
+    else:
+        image = QImage.fromData(image_data, image_format.upper())  # type: ignore
     if image.isNull():
-        raise ValueError('Invalid base64 image string')
+        raise ValueError('Invalid image data')
     if image.hasAlphaChannel():
         image = image.convertToFormat(QImage.Format.Format_ARGB32_Premultiplied)
     else:
@@ -216,6 +227,145 @@ def get_transparency_tile_pixmap(size: Optional[QSize] = None) -> QPixmap:
     return transparency_pixmap
 
 
+def get_transparency_tile_brush() -> QBrush:
+    """Returns a brush that paints the tiling pattern used to represent transparency. The brush is backed by a QImage
+    instead of a QPixmap, so it can be created and used outside the UI thread."""
+    tile_dim = TRANSPARENCY_PATTERN_TILE_DIM
+    tile_image = QImage(QSize(tile_dim * 2, tile_dim * 2), QImage.Format.Format_ARGB32_Premultiplied)
+    tile_image.fill(Qt.GlobalColor.lightGray)
+    painter = QPainter(tile_image)
+    painter.fillRect(tile_dim, 0, tile_dim, tile_dim, Qt.GlobalColor.darkGray)
+    painter.fillRect(0, tile_dim, tile_dim, tile_dim, Qt.GlobalColor.darkGray)
+    painter.end()
+    return QBrush(tile_image)
+
+
+FLOOD_FILL_INITIAL_ROI_SIZE = 256
+
+
+def _unmultiplied_region(image: QImage, bounds: QRect) -> tuple[NpAnyArray, QImage]:
+    """Returns non-premultiplied ARGB32 data for a region within an image, without converting the entire image.
+
+    The QImage that owns the returned array data is also returned, and must be kept in scope for as long as the array
+    is in use.
+    """
+    if image.format() == QImage.Format.Format_ARGB32:
+        image_ptr = image.constBits()
+        assert image_ptr is not None
+        np_image = np.ndarray(shape=(image.height(), image.width(), 4), dtype=np.uint8, buffer=image_ptr)
+        return numpy_bounds_index(np_image, bounds), image
+    region = image.copy(bounds)
+    region.convertTo(QImage.Format.Format_ARGB32)
+    return image_data_as_numpy_8bit(region), region
+
+
+def _color_range(color: NpAnyArray, threshold: float) -> tuple[NpAnyArray, NpAnyArray]:
+    """Returns inclusive lower and upper color bounds for a threshold comparison, clamped to the 8-bit range."""
+    int_threshold = int(max(0.0, threshold))
+    int_color = color.astype(np.int16)
+    lower = np.clip(int_color - int_threshold, 0, 255).astype(np.uint8)
+    upper = np.clip(int_color + int_threshold, 0, 255).astype(np.uint8)
+    return lower, upper
+
+
+def flood_fill_region(image: QImage, pos: QPoint, threshold: float) -> tuple[NpUInt8Array, QPoint]:
+    """Finds all pixels of similar color directly connected to a point in an image.
+
+    Only the region surrounding the seed point is examined. The search area starts small, and only expands in
+    directions where the filled region reaches the edge of the searched area, so the cost of the fill is proportional
+    to the size of the filled region rather than the size of the image.
+
+    Parameters
+    ----------
+        image: QImage
+            Source image, in format Format_ARGB32_Premultiplied or Format_ARGB32.
+        pos: QPoint
+            Seed point for the fill operation.
+        threshold: float
+            Maximum color difference to ignore when determining which pixels to fill.  Color channels (including
+            alpha) are compared individually in non-premultiplied color values.
+    Returns
+    -------
+        mask: NpUInt8Array
+            Boolean mask array covering the bounds of the filled region, with filled pixels set to 1.
+        offset: QPoint
+            Position of the mask's top-left corner within the source image.
+    """
+    image_bounds = QRect(QPoint(), image.size())
+    if not image_bounds.contains(pos):
+        return np.zeros((0, 0), dtype=np.uint8), QPoint()
+    np_seed, _seed_image = _unmultiplied_region(image, QRect(pos, QSize(1, 1)))
+    seed_color = np_seed[0, 0, :].copy()
+    lower, upper = _color_range(seed_color, threshold)
+    roi_size = QSize(FLOOD_FILL_INITIAL_ROI_SIZE, FLOOD_FILL_INITIAL_ROI_SIZE)
+    roi = QRect(pos - QPoint(roi_size.width() // 2, roi_size.height() // 2), roi_size).intersected(image_bounds)
+    flags = 4 | cv2.FLOODFILL_MASK_ONLY | (1 << 8)
+    while True:
+        np_region, _region_image = _unmultiplied_region(image, roi)
+        in_range = cv2.inRange(np_region, lower, upper)
+        mask = np.zeros((roi.height() + 2, roi.width() + 2), dtype=np.uint8)
+        seed = (pos.x() - roi.x(), pos.y() - roi.y())
+        _, _, _, (fill_x, fill_y, fill_width, fill_height) = cv2.floodFill(in_range, mask, seed, 0, 0, 0, flags)
+        filled = QRect(fill_x + roi.x(), fill_y + roi.y(), fill_width, fill_height)
+
+        # If the filled region touches any edge of the search area that isn't also an image edge, the region may
+        # continue past it. Expand the search area in those directions and try again:
+        expanded = QRect(roi)
+        if filled.left() == roi.left() and roi.left() > image_bounds.left():
+            expanded.setLeft(max(image_bounds.left(), roi.left() - roi.width()))
+        if filled.top() == roi.top() and roi.top() > image_bounds.top():
+            expanded.setTop(max(image_bounds.top(), roi.top() - roi.height()))
+        if filled.right() == roi.right() and roi.right() < image_bounds.right():
+            expanded.setRight(min(image_bounds.right(), roi.right() + roi.width()))
+        if filled.bottom() == roi.bottom() and roi.bottom() < image_bounds.bottom():
+            expanded.setBottom(min(image_bounds.bottom(), roi.bottom() + roi.height()))
+        if expanded == roi:
+            break
+        roi = expanded
+    cropped_mask = mask[fill_y + 1:fill_y + fill_height + 1, fill_x + 1:fill_x + fill_width + 1]
+    return cropped_mask, filled.topLeft()
+
+
+def _mask_to_image(mask: NpUInt8Array, color: QColor) -> QImage:
+    """Creates a mask image from a mask array, with masked pixels set to a color and others left transparent."""
+    mask_image = QImage(mask.shape[1], mask.shape[0], QImage.Format.Format_ARGB32)
+    if mask.size > 0:
+        _write_mask_color(image_data_as_numpy_8bit(mask_image), mask, color)
+    return mask_image
+
+
+def _write_mask_color(np_image: NpAnyArray, mask: NpUInt8Array, color: QColor) -> None:
+    """Sets every pixel in an ARGB32 image array to either a color or full transparency, depending on mask values."""
+    argb_color = np.uint32(color.rgba())
+    np.multiply(mask > 0, argb_color, out=np_image.view(np.uint32)[:, :, 0], casting='unsafe')
+
+
+def flood_fill_cropped(image: QImage, pos: QPoint, color: QColor, threshold: float) -> tuple[QImage, QPoint]:
+    """Returns a mask image marking all areas of similar color directly connected to a point in an image, cropped to
+       the bounds of the filled area.
+
+    Parameters
+    ----------
+        image: QImage
+            Source image, in format Format_ARGB32_Premultiplied.
+        pos: QPoint
+            Seed point for the fill operation.
+        color: QColor
+            Color used to draw filled pixels in the mask image.
+        threshold: float
+            Maximum color difference to ignore when determining which pixels to fill.
+    Returns
+    -------
+        mask: QImage
+            Mask image covering the bounds of the filled area, in format Format_ARGB32. Filled pixels
+            will be set to the color parameter, while unfilled pixels will be fully transparent.
+        offset: QPoint
+            Position of the mask image within the source image.
+    """
+    mask, offset = flood_fill_region(image, pos, threshold)
+    return _mask_to_image(mask, color), offset
+
+
 def flood_fill(image: QImage, pos: QPoint, color: QColor, threshold: float, in_place: bool = False) -> Optional[QImage]:
     """Returns a mask image marking all areas of similar color directly connected to a point in an image.
 
@@ -238,86 +388,65 @@ def flood_fill(image: QImage, pos: QPoint, color: QColor, threshold: float, in_p
              size as the source image. filled pixels will be set to the color parameter, while unfilled pixels will be
              fully transparent.
      """
-    un_multiplied_image = image.convertToFormat(QImage.Format.Format_ARGB32)
-    np_image = image_data_as_numpy_8bit(un_multiplied_image)
-    seed_color = np.array(np_image[pos.y(), pos.x(), :], dtype=np_image.dtype)
-
-    h, w = np_image.shape[:2]
-    mask = np.zeros((h + 2, w + 2), dtype=np.uint8)
-
-    # Create a 4-channel difference image for comparison
-    diff_image = np.zeros_like(np_image)
-    for i in range(4):  # Include alpha channel
-        diff_image[:, :, i] = np.abs(np_image[:, :, i] - seed_color[i])
-
-    # Maximum difference across all channels
-    max_diff = np.max(diff_image, axis=2)
-
-    # Create initial mask of pixels within threshold
-    within_threshold = max_diff <= threshold
-
-    # Perform flood fill to find connected components
-    seed_mask = mask.copy()
-    flags = 4  # 4-connected
-    cv2.floodFill(
-        within_threshold.astype(np.uint8),
-        seed_mask,
-        (pos.x(), pos.y()),
-        1,
-        loDiff=0,
-        upDiff=0,
-        flags=flags
-    )
-
-    # Extract the filled region (removing the border)
-    filled_mask = seed_mask[1:-1, 1:-1] == 1
-
-    if not in_place:
-        # Create new mask image
-        result = QImage(w, h, QImage.Format.Format_ARGB32)
-        result.fill(Qt.GlobalColor.transparent)
-        mask_data = image_data_as_numpy_8bit(result)
-
-        # Set color for filled pixels
-        mask_data[filled_mask] = [
-            color.blue(),  # Note: QImage stores in BGRA format
-            color.green(),
-            color.red(),
-            color.alpha()
-        ]
-
-        return result
-    else:
-        # Modify original image directly
-        np_image[filled_mask] = [
-            color.blue(),
-            color.green(),
-            color.red(),
-            color.alpha()
-        ]
+    mask, offset = flood_fill_region(image, pos, threshold)
+    if in_place:
+        if mask.size > 0:
+            bounds = QRect(offset, QSize(mask.shape[1], mask.shape[0]))
+            np_image = numpy_bounds_index(image_data_as_numpy_8bit(image), bounds)
+            if image.format() == QImage.Format.Format_ARGB32_Premultiplied:
+                alpha = color.alphaF()
+                np_image[mask > 0] = [round(color.blue() * alpha), round(color.green() * alpha),
+                                      round(color.red() * alpha), color.alpha()]
+            else:
+                np_image[mask > 0] = [color.blue(), color.green(), color.red(), color.alpha()]
         return None
+    result = QImage(image.size(), QImage.Format.Format_ARGB32)
+    result.fill(Qt.GlobalColor.transparent)
+    if mask.size > 0:
+        bounds = QRect(offset, QSize(mask.shape[1], mask.shape[0]))
+        _write_mask_color(numpy_bounds_index(image_data_as_numpy_8bit(result), bounds), mask, color)
+    return result
 
 
-def color_fill(image: QImage, color: QColor, threshold: float) -> QImage:
-    """Return an image mask marking all pixels where the color value matches a given color within a threshold range."""
-    un_multiplied_image = image.convertToFormat(QImage.Format.Format_ARGB32)
-    np_image = image_data_as_numpy_8bit(un_multiplied_image)
-    color = [color.blue(), color.green(), color.red(), color.alpha()]
-    np_color = np.array(color, dtype=np_image.dtype)
+def color_fill_cropped(image: QImage, color: QColor, threshold: float) -> tuple[QImage, QPoint]:
+    """Returns an image mask marking all pixels where the color value matches a given color within a threshold range,
+       cropped to the bounds of the matching pixels.
 
-    # Create a 4-channel difference image for comparison
-    diff_image = np.zeros_like(np_image)
-    for i in range(4):  # Include alpha channel
-        diff_image[:, :, i] = np.abs(np_image[:, :, i] - np_color[i])
+    Parameters
+    ----------
+        image: QImage
+            Source image, in format Format_ARGB32_Premultiplied or Format_ARGB32.
+        color: QColor
+            Color to match. Filled pixels in the mask image will be set to opaque black.
+        threshold: float
+            Maximum color difference to ignore when determining which pixels to fill.
+    Returns
+    -------
+        mask: QImage
+            Mask image covering the bounds of the matched pixels, in format Format_ARGB32.
+        offset: QPoint
+            Position of the mask image within the source image.
+    """
+    if image.isNull():
+        return QImage(), QPoint()
+    np_image, _unmultiplied_image = _unmultiplied_region(image, QRect(QPoint(), image.size()))
+    np_color = np.array([color.blue(), color.green(), color.red(), color.alpha()], dtype=np.uint8)
+    lower, upper = _color_range(np_color, threshold)
+    in_range = cv2.inRange(np_image, lower, upper)
+    x, y, width, height = cv2.boundingRect(in_range)
+    mask = in_range[y:y + height, x:x + width]
+    return _mask_to_image(mask, QColor(Qt.GlobalColor.black)), QPoint(x, y)
 
-    # Maximum difference across all channels
-    max_diff = np.max(diff_image, axis=2)
 
-    # Create and return mask of pixels within threshold
-    within_threshold = max_diff <= threshold
+def color_fill(image: QImage, color: QColor, threshold: float) -> QImage:
+    """Return an image mask marking all pixels where the color value matches a given color within a threshold range."""
+    mask, offset = color_fill_cropped(image, color, threshold)
     mask_image = create_transparent_image(image.size())
-    np_mask_image = image_data_as_numpy_8bit(mask_image)
-    np_mask_image[within_threshold, 3] = 255
+    if not mask.isNull() and not mask.size().isEmpty():
+        painter = QPainter(mask_image)
+        painter.setCompositionMode(QPainter.CompositionMode.CompositionMode_Source)
+        painter.drawImage(offset, mask)
+        painter.end()
     return mask_image
 
 
@@ -1,4 +1,5 @@
 """Various utility functions for drawing and placing text."""
+from collections import OrderedDict
 from typing import Optional, cast
 
 from PySide6.QtCore import QRect, QMargins, QSize, QPoint, Qt
@@ -19,17 +20,30 @@ ICON_V_SCROLL = f'{PROJECT_DIR}/resources/input_hints/v_scroll.svg'
 ICON_H_SCROLL = f'{PROJECT_DIR}/resources/input_hints/horiz_scroll.svg'
 MAX_FONT_PT = 240
 
+# Measured line sizes, keyed by (QFont.key(), line text, exact), in least-recently-used order:
+LINE_SIZE_CACHE_MAX = 4096
+_line_size_cache: OrderedDict[tuple[str, str, bool], QSize] = OrderedDict()
+
 
 def _find_line_size(font: QFont, text: str, exact=False) -> QSize:
+    cache_key = (font.key(), text, exact)
+    cached_size = _line_size_cache.get(cache_key, None)
+    if cached_size is not None:
+        _line_size_cache.move_to_end(cache_key)
+        return QSize(cached_size)
     if exact:
         path = QPainterPath()
         path.addText(QPoint(), font, text)
-        return path.boundingRect().size().toSize()
-    metric = QFontMetrics(font)
-    line_size = metric.boundingRect(text).size()
-    max_height = metric.ascent() + metric.descent()
-    line_size.setHeight(max(line_size.height(), max_height) + 2)
-    line_size.setWidth(line_size.width() + 2)
+        line_size = path.boundingRect().size().toSize()
+    else:
+        metric = QFontMetrics(font)
+        line_size = metric.boundingRect(text).size()
+        max_height = metric.ascent() + metric.descent()
+        line_size.setHeight(max(line_size.height(), max_height) + 2)
+        line_size.setWidth(line_size.width() + 2)
+    _line_size_cache[cache_key] = QSize(line_size)
+    if len(_line_size_cache) > LINE_SIZE_CACHE_MAX:
+        _line_size_cache.popitem(last=False)
     return line_size
 
 
@@ -55,18 +69,31 @@ def find_text_size(text: str, font: Optional[QFont] = None, multiline=True, exac
     return size
 
 
-def max_font_size(text: str, font: QFont, bounds: QSize, exact=False) -> int:
+def max_font_size(text: str, font: QFont, bounds: QSize, multiline=False) -> int:
     """Returns the largest font size that will fit within the given bounds."""
     if len(text) == 0:
         return MAX_FONT_PT
-    max_pt = 0
-    test_size = QSize(0, 0)
     test_font = QFont(font)
-    while max_pt < MAX_FONT_PT and test_size.width() < bounds.width() and test_size.height() < bounds.height():
-        max_pt += 1
-        test_font.setPointSize(max_pt)
-        test_size = find_text_size(text, test_font, exact)
-    max_pt -= 1
+
+    def _fits(pt_size: int) -> bool:
+        test_font.setPointSize(pt_size)
+        test_size = find_text_size(text, test_font, multiline)
+        return test_size.width() < bounds.width() and test_size.height() < bounds.height()
+
+    # Find the smallest size that doesn't fit, first by doubling the size until it no longer fits, then through binary
+    # search over the remaining range. Sizes at or above MAX_FONT_PT are treated as not fitting.
+    fitting_pt = 0
+    too_large_pt = 1
+    while too_large_pt < MAX_FONT_PT and _fits(too_large_pt):
+        fitting_pt = too_large_pt
+        too_large_pt = min(too_large_pt * 2, MAX_FONT_PT)
+    while too_large_pt - fitting_pt > 1:
+        mid_pt = (fitting_pt + too_large_pt) // 2
+        if _fits(mid_pt):
+            fitting_pt = mid_pt
+        else:
+            too_large_pt = mid_pt
+    max_pt = too_large_pt - 1
     logger.debug(f'"{text}" fits in {bounds} at size {max_pt}')
     return max_pt
 
@@ -0,0 +1,276 @@
+"""Scales images tile by tile, so that memory use doesn't grow with the size of the scaled image.
+
+Scaling an entire image at once needs several full-size intermediate copies, which gets expensive for very large
+images. Instead, scaled tiles are written directly into a single destination image as soon as they're ready.
+
+Local PIL scaling splits the destination into fixed-size tiles. Each tile resamples a source region slightly larger
+than the area it covers, using PIL's resize box parameter, so tiles match a full-image resize without any visible seams.
+These tiles are processed in parallel.
+
+Scaling functions that can't be given exact source regions, like upscaling models on an image generation server, are
+instead given overlapping chunks of the source image. Overlapping areas are blended together with a linear ramp.
+"""
+import math
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Callable, Optional
+
+import numpy as np
+from PIL import Image
+from PySide6.QtCore import QSize, QRect
+from PySide6.QtGui import QImage
+
+from src.config.application_config import AppConfig
+from src.util.shared_constants import PIL_SCALING_MODES
+from src.util.task_scheduler import CancellationToken
+from src.util.visual.geometry_utils import is_smaller_size
+from src.util.visual.image_utils import image_data_as_numpy_8bit, image_data_as_numpy_8bit_readonly
+from src.util.visual.pil_image_utils import pil_image_to_qimage, pil_image_scaling
+
+TILE_SIZE = 512
+CHUNK_SIZE = 1024
+CHUNK_OVERLAP = 64
+
+# Limits how many finished tiles can wait to be written into the destination image:
+MAX_PENDING_TILES_PER_WORKER = 2
+
+# Distance from each destination pixel center to the furthest source pixel used, in source pixels, when not
+# downscaling. When downscaling, this increases in proportion to the scale factor.
+FILTER_SUPPORT = {
+    Image.Resampling.NEAREST: 1.0,
+    Image.Resampling.BOX: 0.5,
+    Image.Resampling.BILINEAR: 1.0,
+    Image.Resampling.HAMMING: 1.0,
+    Image.Resampling.BICUBIC: 2.0,
+    Image.Resampling.LANCZOS: 3.0
+}
+
+
+def tiled_image_scaling(image: QImage, size: QSize, mode: Optional[Image.Resampling] = None,
+                        tile_size: int = TILE_SIZE, worker_count: Optional[int] = None,
+                        token: Optional[CancellationToken] = None) -> QImage:
+    """Resize an image using a PIL scaling algorithm, one tile at a time.
+
+    The result matches pil_image_scaling, but only a few tiles of the source and destination are converted to PIL
+    images at any one time. The only differences are where a destination pixel center falls exactly on a boundary
+    between source pixels: floating point rounding may then make nearest-neighbor style modes pick the other pixel.
+
+    Parameters
+    ----------
+    image: QImage
+        Source image to scale.
+    size: QSize
+        Final image size.
+    mode: Image.Resampling, optional
+        PIL scaling mode to use. If None, the appropriate scaling mode defined in AppConfig will be used.
+    tile_size: int, default=TILE_SIZE
+        Maximum width and height of each destination tile.
+    worker_count: int, optional
+        Maximum number of tiles to scale in parallel. If None, AppConfig.BACKGROUND_TASK_THREADS is used.
+    token: CancellationToken, optional
+        If provided, scaling stops early with TaskCancelledError once the token is cancelled.
+    Returns
+    -------
+    QImage
+        The scaled image, in Format_ARGB32_Premultiplied.
+    """
+    if size.width() <= 0 or size.height() <= 0:
+        raise ValueError(f'size must be greater than zero, got {size.width()}x{size.height()}')
+    if image.format() != QImage.Format.Format_ARGB32_Premultiplied:
+        image = image.convertToFormat(QImage.Format.Format_ARGB32_Premultiplied)
+    if image.size() == size:
+        return image
+    if mode is None:
+        if is_smaller_size(image.size(), size):
+            mode = PIL_SCALING_MODES[AppConfig().get(AppConfig.PIL_UPSCALE_MODE)]
+        else:
+            mode = PIL_SCALING_MODES[AppConfig().get(AppConfig.PIL_DOWNSCALE_MODE)]
+    assert mode is not None
+    x_scale = size.width() / image.width()
+    y_scale = size.height() / image.height()
+    support = FILTER_SUPPORT.get(mode, 3.0)
+    x_margin = math.ceil(support * max(1.0, 1.0 / x_scale)) + 1
+    y_margin = math.ceil(support * max(1.0, 1.0 / y_scale)) + 1
+
+    def _scale_tile(bounds: QRect) -> QImage:
+        source_left = bounds.x() / x_scale
+        source_top = bounds.y() / y_scale
+        source_right = (bounds.x() + bounds.width()) / x_scale
+        source_bottom = (bounds.y() + bounds.height()) / y_scale
+        crop_left = max(0, math.floor(source_left) - x_margin)
+        crop_top = max(0, math.floor(source_top) - y_margin)
+        crop_right = min(image.width(), math.ceil(source_right) + x_margin)
+        crop_bottom = min(image.height(), math.ceil(source_bottom) + y_margin)
+        source_tile = _qimage_region_to_pil(image, QRect(crop_left, crop_top, crop_right - crop_left,
+                                                         crop_bottom - crop_top))
+        box = (source_left - crop_left, source_top - crop_top, source_right - crop_left, source_bottom - crop_top)
+        return pil_image_to_qimage(source_tile.resize((bounds.width(), bounds.height()), mode, box))
+
+    destination = QImage(size, QImage.Format.Format_ARGB32_Premultiplied)
+    np_destination = image_data_as_numpy_8bit(destination)
+
+    def _write_tile(bounds: QRect, tile: QImage) -> None:
+        np_destination[bounds.y():bounds.y() + bounds.height(), bounds.x():bounds.x() + bounds.width()] \
+            = image_data_as_numpy_8bit_readonly(tile)
+
+    if worker_count is None:
+        worker_count = AppConfig().get(AppConfig.BACKGROUND_TASK_THREADS)
+    _process_tiles(_grid(size, tile_size), _scale_tile, _write_tile, max(1, worker_count), token)
+    return destination
+
+
+def chunked_image_scaling(image: QImage, size: QSize, scale_chunk: Callable[[QImage, QSize], QImage],
+                          chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP,
+                          progress_callback: Optional[Callable[[int, int], None]] = None,
+                          token: Optional[CancellationToken] = None) -> QImage:
+    """Scale an image in overlapping chunks, using an external scaling function.
+
+    Chunks are processed one at a time in row order, so the scaling function can safely use shared resources like a
+    webservice connection.
+
+    Parameters
+    ----------
+    image: QImage
+        Source image to scale.
+    size: QSize
+        Final image size.
+    scale_chunk: Callable[[QImage, QSize], QImage]
+        Function that scales a single chunk of the source image to the requested size. Results with the wrong size are
+        resized with pil_image_scaling.
+    chunk_size: int, default=CHUNK_SIZE
+        Maximum width and height of each source image chunk. Images that fit in a single chunk are passed to
+        scale_chunk unchanged.
+    overlap: int, default=CHUNK_OVERLAP
+        Number of source pixels shared between adjacent chunks.
+    progress_callback: Callable[[int, int], None], optional
+        Called with the chunk index and chunk count before each chunk is scaled.
+    token: CancellationToken, optional
+        If provided, scaling stops early with TaskCancelledError once the token is cancelled.
+    Returns
+    -------
+    QImage
+        The scaled image, in Format_ARGB32_Premultiplied.
+    """
+    if size.width() <= 0 or size.height() <= 0:
+        raise ValueError(f'size must be greater than zero, got {size.width()}x{size.height()}')
+    if not 0 <= overlap < chunk_size:
+        raise ValueError(f'overlap must be at least zero and less than chunk_size {chunk_size}, got {overlap}')
+
+    def _scale(source: QImage, scaled_size: QSize) -> QImage:
+        scaled = scale_chunk(source, scaled_size)
+        if scaled.size() != scaled_size:
+            scaled = pil_image_scaling(scaled, scaled_size)
+        if scaled.format() != QImage.Format.Format_ARGB32_Premultiplied:
+            scaled = scaled.convertToFormat(QImage.Format.Format_ARGB32_Premultiplied)
+        return scaled
+
+    if image.width() <= chunk_size and image.height() <= chunk_size:
+        if progress_callback is not None:
+            progress_callback(0, 1)
+        return _scale(image, size)
+
+    x_scale = size.width() / image.width()
+    y_scale = size.height() / image.height()
+    column_starts = _chunk_starts(image.width(), chunk_size, overlap)
+    row_starts = _chunk_starts(image.height(), chunk_size, overlap)
+    chunk_count = len(column_starts) * len(row_starts)
+    destination = QImage(size, QImage.Format.Format_ARGB32_Premultiplied)
+    np_destination = image_data_as_numpy_8bit(destination)
+    chunk_index = 0
+    prev_bottom = 0
+    for row_start in row_starts:
+        row_end = min(image.height(), row_start + chunk_size)
+        top, bottom = round(row_start * y_scale), round(row_end * y_scale)
+        prev_right = 0
+        for column_start in column_starts:
+            if token is not None:
+                token.raise_if_cancelled()
+            if progress_callback is not None:
+                progress_callback(chunk_index, chunk_count)
+            column_end = min(image.width(), column_start + chunk_size)
+            left, right = round(column_start * x_scale), round(column_end * x_scale)
+            source_chunk = image.copy(QRect(column_start, row_start, column_end - column_start, row_end - row_start))
+            scaled_chunk = _scale(source_chunk, QSize(right - left, bottom - top))
+            _blend_chunk(np_destination[top:bottom, left:right], image_data_as_numpy_8bit_readonly(scaled_chunk),
+                         max(0, prev_right - left), max(0, prev_bottom - top))
+            prev_right = right
+            chunk_index += 1
+        prev_bottom = bottom
+    return destination
+
+
+def _qimage_region_to_pil(image: QImage, bounds: QRect) -> Image.Image:
+    """Copies part of a QImage into a new RGBA PIL image, without the intermediate PNG encoding used by ImageQt."""
+    region = image.copy(bounds).convertToFormat(QImage.Format.Format_RGBA8888)
+    return Image.frombytes('RGBA', (region.width(), region.height()), bytes(region.constBits()), 'raw', 'RGBA',
+                           region.bytesPerLine())
+
+
+def _grid(size: QSize, tile_size: int) -> list[QRect]:
+    """Splits an area into tiles, in row order."""
+    return [QRect(x, y, min(tile_size, size.width() - x), min(tile_size, size.height() - y))
+            for y in range(0, size.height(), tile_size) for x in range(0, size.width(), tile_size)]
+
+
+def _chunk_starts(length: int, chunk_size: int, overlap: int) -> list[int]:
+    """Returns evenly spaced chunk starting offsets, with the last chunk aligned to the end of the image."""
+    if length <= chunk_size:
+        return [0]
+    starts = list(range(0, length - chunk_size, chunk_size - overlap))
+    starts.append(length - chunk_size)
+    return starts
+
+
+def _process_tiles(tiles: list[QRect], scale_tile: Callable[[QRect], QImage],
+                   write_tile: Callable[[QRect, QImage], None], worker_count: int,
+                   token: Optional[CancellationToken]) -> None:
+    """Scales tiles in a thread pool, writing them in order from the calling thread. Only a limited number of scaled
+       tiles are kept waiting to be written, so memory use stays bounded."""
+    max_pending = worker_count * MAX_PENDING_TILES_PER_WORKER
+    executor = ThreadPoolExecutor(max_workers=worker_count)
+    pending: deque[tuple[QRect, Future]] = deque()
+    try:
+        for bounds in tiles:
+            if token is not None:
+                token.raise_if_cancelled()
+            pending.append((bounds, executor.submit(scale_tile, bounds)))
+            if len(pending) >= max_pending:
+                finished_bounds, future = pending.popleft()
+                write_tile(finished_bounds, future.result())
+        while len(pending) > 0:
+            if token is not None:
+                token.raise_if_cancelled()
+            finished_bounds, future = pending.popleft()
+            write_tile(finished_bounds, future.result())
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _ramp(length: int, ramp_length: int) -> np.ndarray:
+    """Returns blending weights that increase linearly over ramp_length, then stay at 1.0."""
+    weights = np.ones(length, dtype=np.float32)
+    if ramp_length > 0:
+        weights[:ramp_length] = (np.arange(ramp_length, dtype=np.float32) + 0.5) / ramp_length
+    return weights
+
+
+def _blend_chunk(np_destination: np.ndarray, np_chunk: np.ndarray, left_overlap: int, top_overlap: int) -> None:
+    """Writes a scaled chunk into the destination, blending it with content already written above and to the left."""
+    np_destination[top_overlap:, left_overlap:] = np_chunk[top_overlap:, left_overlap:]
+    if left_overlap == 0 and top_overlap == 0:
+        return
+    height, width = np_chunk.shape[:2]
+    x_weights = _ramp(width, left_overlap)
+    y_weights = _ramp(height, top_overlap)
+
+    def _blend(rows: slice, columns: slice, weights: np.ndarray) -> None:
+        weights = weights[:, :, np.newaxis]
+        blended = np_destination[rows, columns] * (1.0 - weights) + np_chunk[rows, columns] * weights
+        np_destination[rows, columns] = np.clip(blended + 0.5, 0, 255).astype(np.uint8)
+
+    if top_overlap > 0:
+        _blend(slice(0, top_overlap), slice(0, width),
+               np.minimum(y_weights[:top_overlap, np.newaxis], x_weights[np.newaxis, :]))
+    if left_overlap > 0:
+        _blend(slice(top_overlap, height), slice(0, left_overlap),
+               np.broadcast_to(x_weights[np.newaxis, :left_overlap], (height - top_overlap, left_overlap)))
@@ -0,0 +1,66 @@
+"""Tests persistent backend metadata caching."""
+import os
+import tempfile
+import unittest
+
+from src.api.backend_metadata_cache import BackendMetadataCache
+
+SERVER_URL = 'http://localhost:7860'
+ENDPOINT = '/sdapi/v1/samplers'
+
+
+def _create_cache(json_path: str | None) -> BackendMetadataCache:
+    """Creates a new cache instance, bypassing the singleton instance used by the application."""
+    return type.__call__(BackendMetadataCache, json_path)
+
+
+class BackendMetadataCacheTest(unittest.TestCase):
+    """Tests persistent backend metadata caching."""
+
+    def setUp(self) -> None:
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self.json_path = os.path.join(self._temp_dir.name, 'metadata_cache.json')
+
+    def tearDown(self) -> None:
+        self._temp_dir.cleanup()
+
+    def test_change_detection(self) -> None:
+        """set should report whether response bodies changed."""
+        cache = _create_cache(None)
+        self.assertIsNone(cache.get(SERVER_URL, '1.0', ENDPOINT))
+        self.assertTrue(cache.set(SERVER_URL, '1.0', ENDPOINT, '["a"]', 'etag-a'))
+        self.assertFalse(cache.set(SERVER_URL, '1.0', ENDPOINT, '["a"]', 'etag-b'))
+        response = cache.get(SERVER_URL, '1.0', ENDPOINT)
+        assert response is not None
+        self.assertEqual(response['body'], '["a"]')
+        self.assertEqual(response['etag'], 'etag-b')
+        self.assertTrue(cache.set(SERVER_URL, '1.0', ENDPOINT, '["a", "b"]'))
+
+    def test_server_version(self) -> None:
+        """Responses should only be returned for matching server versions, and version changes should clear them."""
+        cache = _create_cache(None)
+        cache.set(SERVER_URL, '1.0', ENDPOINT, '["a"]')
+        cache.set(SERVER_URL, '1.0', '/sdapi/v1/loras', '[]')
+        self.assertIsNone(cache.get(SERVER_URL, '2.0', ENDPOINT))
+        self.assertIsNone(cache.get('http://localhost:8188', '1.0', ENDPOINT))
+        self.assertTrue(cache.set(SERVER_URL, '2.0', ENDPOINT, '["a"]'))
+        self.assertIsNone(cache.get(SERVER_URL, '1.0', ENDPOINT))
+        self.assertIsNone(cache.get(SERVER_URL, '2.0', '/sdapi/v1/loras'))
+
+    def test_persistence(self) -> None:
+        """Saved responses should be available to new cache instances."""
+        cache = _create_cache(self.json_path)
+        cache.set(SERVER_URL, None, ENDPOINT, '["a"]', 'etag-a')
+        cache.save()
+        loaded_cache = _create_cache(self.json_path)
+        self.assertEqual(loaded_cache.get(SERVER_URL, None, ENDPOINT), cache.get(SERVER_URL, None, ENDPOINT))
+
+    def test_invalid_file(self) -> None:
+        """Unreadable cache files should be ignored."""
+        with open(self.json_path, 'w', encoding='utf-8') as file:
+            file.write('{not valid json')
+        cache = _create_cache(self.json_path)
+        self.assertIsNone(cache.get(SERVER_URL, None, ENDPOINT))
+        cache.set(SERVER_URL, None, ENDPOINT, '["a"]')
+        cache.save()
+        self.assertIsNotNone(_create_cache(self.json_path).get(SERVER_URL, None, ENDPOINT))
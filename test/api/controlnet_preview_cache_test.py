@@ -0,0 +1,76 @@
+"""Tests ControlNet preprocessor preview caching."""
+import sys
+import unittest
+
+from PySide6.QtCore import Qt, QSize
+from PySide6.QtGui import QImage
+from PySide6.QtWidgets import QApplication
+
+from src.api.controlnet.control_parameter import ControlParameter
+from src.api.controlnet.controlnet_preprocessor import ControlNetPreprocessor
+from src.api.controlnet.controlnet_preview_cache import ControlNetPreviewCache, preview_key, preview_resolution, \
+    scale_preview_input, DEFAULT_PREVIEW_RESOLUTION
+from src.api.webui.controlnet_webui_constants import PREPROCESSOR_RES_PARAM_KEY
+from src.util.parameter import TYPE_INT, TYPE_FLOAT
+
+app = QApplication.instance() or QApplication(sys.argv)
+
+
+def _create_preprocessor(resolution: int = 512, threshold: float = 0.5) -> ControlNetPreprocessor:
+    return ControlNetPreprocessor('canny', 'Canny', [
+        ControlParameter(PREPROCESSOR_RES_PARAM_KEY, 'Resolution', TYPE_INT, resolution, minimum=64, maximum=2048),
+        ControlParameter('threshold_a', 'Threshold', TYPE_FLOAT, threshold, minimum=0.0, maximum=1.0)
+    ])
+
+
+def _create_image(color: Qt.GlobalColor, size: QSize = QSize(1024, 768)) -> QImage:
+    image = QImage(size, QImage.Format.Format_ARGB32_Premultiplied)
+    image.fill(color)
+    return image
+
+
+class ControlNetPreviewCacheTest(unittest.TestCase):
+    """Tests ControlNet preprocessor preview caching."""
+
+    def test_preview_key(self) -> None:
+        """Keys should only match if the image, preprocessor, parameters, and resolution all match."""
+        image = _create_image(Qt.GlobalColor.red)
+        key = preview_key(_create_preprocessor(), image, None)
+        self.assertEqual(key, preview_key(_create_preprocessor(), image.copy(), None))
+        self.assertEqual(key, preview_key(_create_preprocessor(), image.convertToFormat(QImage.Format.Format_RGB32),
+                                          None))
+        self.assertNotEqual(key, preview_key(_create_preprocessor(), _create_image(Qt.GlobalColor.blue), None))
+        self.assertNotEqual(key, preview_key(_create_preprocessor(), image, _create_image(Qt.GlobalColor.white)))
+        self.assertNotEqual(key, preview_key(_create_preprocessor(resolution=256), image, None))
+        self.assertNotEqual(key, preview_key(_create_preprocessor(threshold=0.25), image, None))
+        other_preprocessor = ControlNetPreprocessor('lineart', 'Lineart', _create_preprocessor().parameters)
+        self.assertNotEqual(key, preview_key(other_preprocessor, image, None))
+
+    def test_preview_resolution(self) -> None:
+        """Preview resolution should come from the resolution parameter if the preprocessor has one."""
+        self.assertEqual(256, preview_resolution(_create_preprocessor(resolution=256)))
+        self.assertEqual(DEFAULT_PREVIEW_RESOLUTION, preview_resolution(ControlNetPreprocessor('none', 'None', [])))
+
+    def test_scale_preview_input(self) -> None:
+        """Images should be scaled down to the preview resolution, but never scaled up."""
+        image = _create_image(Qt.GlobalColor.red)
+        scaled = scale_preview_input(image, 384)
+        self.assertEqual(QSize(512, 384), scaled.size())
+        self.assertEqual(image.pixelColor(0, 0), scaled.pixelColor(10, 10))
+        self.assertIs(image, scale_preview_input(image, 1024))
+
+    def test_least_recently_used_discarded(self) -> None:
+        """Once the cache is full, the least recently used preview should be discarded."""
+        cache = type.__call__(ControlNetPreviewCache, 2)
+        keys = [preview_key(_create_preprocessor(resolution=res), _create_image(Qt.GlobalColor.red, QSize(8, 8)),
+                            None) for res in (64, 128, 256)]
+        preview = _create_image(Qt.GlobalColor.black, QSize(8, 8))
+        cache.set(keys[0], preview)
+        cache.set(keys[1], preview)
+        self.assertIs(preview, cache.get(keys[0]))
+        cache.set(keys[2], preview)
+        self.assertIsNone(cache.get(keys[1]))
+        self.assertIs(preview, cache.get(keys[0]))
+        self.assertIs(preview, cache.get(keys[2]))
+        cache.clear()
+        self.assertIsNone(cache.get(keys[0]))
@@ -0,0 +1,71 @@
+"""Tests persistent thumbnail caching."""
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+from PySide6.QtCore import Qt
+from PySide6.QtGui import QImage
+from PySide6.QtWidgets import QApplication
+
+from src.api.thumbnail_cache import ThumbnailCache, thumbnail_key, MISSING_THUMBNAIL_EXTENSION, \
+    MISSING_THUMBNAIL_RETRY_SECONDS
+
+SERVER_URL = 'http://localhost:7860'
+LORA_NAME = 'test_lora'
+app = QApplication.instance() or QApplication(sys.argv)
+
+
+def _create_cache(cache_dir: str | None) -> ThumbnailCache:
+    """Creates a new cache instance, bypassing the singleton instance used by the application."""
+    return type.__call__(ThumbnailCache, cache_dir)
+
+
+class ThumbnailCacheTest(unittest.TestCase):
+    """Tests persistent thumbnail caching."""
+
+    def setUp(self) -> None:
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self._temp_dir.name, 'thumbnails')
+        self.thumbnail = QImage(150, 100, QImage.Format.Format_ARGB32_Premultiplied)
+        self.thumbnail.fill(Qt.GlobalColor.red)
+
+    def tearDown(self) -> None:
+        self._temp_dir.cleanup()
+
+    def test_persistence(self) -> None:
+        """Thumbnails should be readable from a new cache instance, but only with matching keys."""
+        _create_cache(self.cache_dir).set(SERVER_URL, LORA_NAME, 'v1', self.thumbnail)
+        cache = _create_cache(self.cache_dir)
+        thumbnail = cache.get(SERVER_URL, LORA_NAME, 'v1')
+        assert thumbnail is not None
+        self.assertEqual(self.thumbnail.size(), thumbnail.size())
+        self.assertEqual(self.thumbnail.pixelColor(5, 5), thumbnail.pixelColor(5, 5))
+        self.assertIsNone(cache.get(SERVER_URL, LORA_NAME, 'v2'))
+        self.assertIsNone(cache.get('http://localhost:8188', LORA_NAME, 'v1'))
+        self.assertIsNone(cache.get(SERVER_URL, 'other_lora', 'v1'))
+        cache.clear()
+        self.assertIsNone(cache.get(SERVER_URL, LORA_NAME, 'v1'))
+        self.assertEqual([], os.listdir(self.cache_dir))
+
+    def test_missing_thumbnails(self) -> None:
+        """Missing thumbnails should be cached as null images until the retry delay passes."""
+        for cache in (_create_cache(None), _create_cache(self.cache_dir)):
+            cache.set(SERVER_URL, LORA_NAME, 'v1', None)
+            thumbnail = cache.get(SERVER_URL, LORA_NAME, 'v1')
+            assert thumbnail is not None
+            self.assertTrue(thumbnail.isNull())
+            cache.set(SERVER_URL, LORA_NAME, 'v1', self.thumbnail)
+            thumbnail = cache.get(SERVER_URL, LORA_NAME, 'v1')
+            assert thumbnail is not None
+            self.assertFalse(thumbnail.isNull())
+
+        cache = _create_cache(self.cache_dir)
+        cache.set(SERVER_URL, 'missing_lora', 'v1', QImage())
+        missing_path = os.path.join(self.cache_dir,
+                                    thumbnail_key(SERVER_URL, 'missing_lora', 'v1') + MISSING_THUMBNAIL_EXTENSION)
+        self.assertTrue(os.path.isfile(missing_path))
+        expired_time = time.time() - MISSING_THUMBNAIL_RETRY_SECONDS - 1
+        os.utime(missing_path, (expired_time, expired_time))
+        self.assertIsNone(cache.get(SERVER_URL, 'missing_lora', 'v1'))
@@ -0,0 +1,185 @@
+"""Tests pooled, concurrent, and cached webservice requests."""
+import asyncio
+import hashlib
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from src.api.backend_metadata_cache import BackendMetadataCache
+from src.api.webservice import WebService
+
+REQUEST_DELAY_SECONDS = 0.2
+REQUEST_COUNT = 4
+METADATA_ENDPOINT = '/metadata'
+
+
+class _TestRequestHandler(BaseHTTPRequestHandler):
+    """Responds to requests after a short delay, requiring auth if the server's auth flag is set."""
+
+    def do_GET(self) -> None:  # pylint: disable=invalid-name
+        """Handles GET requests."""
+        time.sleep(REQUEST_DELAY_SECONDS)
+        server = self.server
+        assert isinstance(server, _TestServer)
+        if server.require_auth and self.headers.get('Authorization', None) is None:
+            self.send_response(401)
+            self.end_headers()
+            return
+        if self.path == METADATA_ENDPOINT:
+            body = server.metadata_body.encode('utf-8')
+            etag = f'"{hashlib.md5(body).hexdigest()}"'
+            if self.headers.get('If-None-Match', None) == etag:
+                server.not_modified_count += 1
+                self.send_response(304)
+                self.end_headers()
+                return
+            server.metadata_request_count += 1
+            self.send_response(200)
+            self.send_header('ETag', etag)
+        else:
+            body = self.path.encode('utf-8')
+            self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self) -> None:  # pylint: disable=invalid-name
+        """Handles POST requests."""
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args) -> None:
+        """Suppresses request logging."""
+
+
+class _TestServer(ThreadingHTTPServer):
+    """Test server, tracking metadata request counts."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.require_auth = False
+        self.metadata_body = '["a"]'
+        self.metadata_request_count = 0
+        self.not_modified_count = 0
+
+
+class _TestWebService(WebService):
+    def __init__(self, url: str, metadata_cache: Optional[BackendMetadataCache] = None) -> None:
+        super().__init__(url, pool_size=REQUEST_COUNT, metadata_cache=metadata_cache,
+                         cached_endpoints=[METADATA_ENDPOINT])
+        self.auth_request_threads: list[threading.Thread] = []
+
+    def _handle_auth_error(self) -> None:
+        self.auth_request_threads.append(threading.current_thread())
+        self.set_auth(('user', 'password'))
+
+
+class WebServiceTest(unittest.TestCase):
+    """Tests pooled and concurrent webservice requests."""
+
+    def setUp(self) -> None:
+        self.server = _TestServer(('127.0.0.1', 0), _TestRequestHandler)
+        self.server_thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.server_thread.start()
+        self.webservice = _TestWebService(f'http://127.0.0.1:{self.server.server_address[1]}')
+
+    def tearDown(self) -> None:
+        self.webservice.disconnect()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _endpoint_getter(self, endpoint: str):
+        return lambda: self.webservice.get(endpoint).text
+
+    def test_run_concurrently(self) -> None:
+        """Requests run concurrently should overlap, and results should be returned under the expected keys."""
+        endpoints = [f'/endpoint{i}' for i in range(REQUEST_COUNT)]
+        start_time = time.time()
+        results = self.webservice.run_concurrently({endpoint: self._endpoint_getter(endpoint)
+                                                    for endpoint in endpoints})
+        elapsed = time.time() - start_time
+        self.assertEqual(results, {endpoint: endpoint for endpoint in endpoints})
+        self.assertLess(elapsed, REQUEST_DELAY_SECONDS * REQUEST_COUNT * 0.75)
+
+    def test_run_concurrently_exceptions(self) -> None:
+        """Exceptions should be re-raised after all requests finish, unless return_exceptions is set."""
+        completed: list[str] = []
+
+        def _fail() -> str:
+            raise RuntimeError('request failed')
+
+        def _succeed() -> str:
+            result = self.webservice.get('/success').text
+            completed.append(result)
+            return result
+
+        with self.assertRaises(RuntimeError):
+            self.webservice.run_concurrently({'fail': _fail, 'success': _succeed})
+        self.assertEqual(completed, ['/success'])
+        results = self.webservice.run_concurrently({'fail': _fail, 'success': _succeed}, return_exceptions=True)
+        self.assertIsInstance(results['fail'], RuntimeError)
+        self.assertEqual(results['success'], '/success')
+
+    def test_concurrent_auth(self) -> None:
+        """Authentication should be requested once on the calling thread, with failed requests retried afterward."""
+        self.server.require_auth = True
+        endpoints = [f'/endpoint{i}' for i in range(REQUEST_COUNT)]
+        results = self.webservice.run_concurrently({endpoint: self._endpoint_getter(endpoint)
+                                                    for endpoint in endpoints})
+        self.assertEqual(results, {endpoint: endpoint for endpoint in endpoints})
+        self.assertEqual(self.webservice.auth_request_threads, [threading.current_thread()])
+
+    def test_async_get(self) -> None:
+        """Async requests should be usable directly from coroutines."""
+        async def _get_all() -> list[str]:
+            responses = await asyncio.gather(*(self.webservice.async_get(f'/async{i}') for i in range(REQUEST_COUNT)))
+            return [response.text for response in responses]
+        self.assertEqual(asyncio.run(_get_all()), [f'/async{i}' for i in range(REQUEST_COUNT)])
+
+    def test_endpoint_timeout(self) -> None:
+        """Endpoint timeouts should apply when requests don't provide their own timeout."""
+        self.webservice.set_endpoint_timeout('/slow', REQUEST_DELAY_SECONDS / 4)
+        with self.assertRaises(RuntimeError):
+            self.webservice.get('/slow')
+        self.assertEqual(self.webservice.get('/slow', timeout=REQUEST_DELAY_SECONDS * 10).text, '/slow')
+        self.webservice.set_endpoint_timeout('/slow', None)
+        self.assertEqual(self.webservice.get('/slow').text, '/slow')
+
+    def test_metadata_cache(self) -> None:
+        """Saved metadata should be returned immediately in new sessions, and checked for changes in the background."""
+        metadata_cache: BackendMetadataCache = type.__call__(BackendMetadataCache, None)
+        cached_webservice = _TestWebService(self.webservice.server_url, metadata_cache)
+        self.assertEqual(cached_webservice.get(METADATA_ENDPOINT).json(), ['a'])
+        self.assertEqual(self.server.metadata_request_count, 1)
+
+        # Recently checked responses are reused until a POST request is sent:
+        self.assertEqual(cached_webservice.get(METADATA_ENDPOINT).json(), ['a'])
+        self.assertEqual(self.server.metadata_request_count, 1)
+        cached_webservice.post('/update', None)
+        self.assertEqual(cached_webservice.get(METADATA_ENDPOINT).json(), ['a'])
+        self.assertEqual(self.server.metadata_request_count, 1)
+        self.assertEqual(self.server.not_modified_count, 1)
+        cached_webservice.disconnect()
+
+        # A new session starts with the saved response, and reports changes found in the background:
+        self.server.metadata_body = '["a", "b"]'
+        changed_endpoints: list[str] = []
+        change_event = threading.Event()
+
+        def _on_change(endpoint: str) -> None:
+            changed_endpoints.append(endpoint)
+            change_event.set()
+
+        next_session = _TestWebService(self.webservice.server_url, metadata_cache)
+        next_session.set_metadata_change_listener(_on_change)
+        start_time = time.time()
+        self.assertEqual(next_session.get(METADATA_ENDPOINT).json(), ['a'])
+        self.assertLess(time.time() - start_time, REQUEST_DELAY_SECONDS)
+        self.assertTrue(change_event.wait(REQUEST_DELAY_SECONDS * 10))
+        self.assertEqual(changed_endpoints, [METADATA_ENDPOINT])
+        self.assertEqual(next_session.get(METADATA_ENDPOINT).json(), ['a', 'b'])
+        self.assertEqual(self.server.metadata_request_count, 2)
+        next_session.disconnect()
@@ -0,0 +1,120 @@
+"""Tests shared WebUI progress monitoring."""
+import sys
+import time
+import unittest
+from typing import Optional
+from unittest.mock import MagicMock, patch
+
+from PySide6.QtCore import QSize, Qt
+from PySide6.QtGui import QImage
+from PySide6.QtWidgets import QApplication
+
+from src.api.webui.progress_monitor import WebUIProgressMonitor, next_poll_interval, split_preview_grid, \
+    MIN_POLL_INTERVAL_SECONDS, MAX_POLL_INTERVAL_SECONDS, IDLE_POLL_INTERVAL_SECONDS
+from src.util.visual.image_utils import image_to_base64
+
+app = QApplication.instance() or QApplication(sys.argv)
+
+POLL_TIMEOUT_SECONDS = 5.0
+
+
+def _progress(progress: float, eta: float, step: int = 0, steps: int = 0, job_no: int = 0, job_count: int = 1,
+              current_image: Optional[str] = None) -> dict:
+    return {
+        'progress': progress,
+        'eta_relative': eta,
+        'state': {
+            'skipped': False,
+            'interrupted': False,
+            'stopping_generation': False,
+            'job': '',
+            'job_count': job_count,
+            'job_timestamp': '',
+            'job_no': job_no,
+            'sampling_step': step,
+            'sampling_steps': steps
+        },
+        'current_image': current_image,
+        'textinfo': None
+    }
+
+
+def _mock_webservice(url: str) -> MagicMock:
+    webservice = MagicMock()
+    webservice.server_url = url
+    return webservice
+
+
+class ProgressMonitorTest(unittest.TestCase):
+    """Tests shared WebUI progress monitoring."""
+
+    def test_poll_interval(self) -> None:
+        """Polling should happen about once per step, within configured limits."""
+        self.assertEqual(next_poll_interval(None), IDLE_POLL_INTERVAL_SECONDS)
+        self.assertEqual(next_poll_interval(_progress(0.0, 0.0)), IDLE_POLL_INTERVAL_SECONDS)
+        self.assertAlmostEqual(next_poll_interval(_progress(0.5, 10.0, 10, 20)), 1.0)
+        self.assertAlmostEqual(next_poll_interval(_progress(0.25, 15.0, 10, 20, 0, 2)), 0.5)
+        self.assertEqual(next_poll_interval(_progress(0.5, 100.0, 19, 20)), MAX_POLL_INTERVAL_SECONDS)
+        self.assertEqual(next_poll_interval(_progress(0.5, 0.1, 10, 20)), MIN_POLL_INTERVAL_SECONDS)
+        self.assertGreater(next_poll_interval(_progress(0.5, 10.0, 10, 20), 3), MIN_POLL_INTERVAL_SECONDS)
+
+    def test_split_preview_grid(self) -> None:
+        """Batch previews should be split into individual images only when they match the expected grid layout."""
+        image_size = QSize(512, 256)
+        grid = QImage(QSize(256, 128), QImage.Format.Format_ARGB32_Premultiplied)
+        grid.fill(Qt.GlobalColor.red)
+        previews = split_preview_grid(grid, 4, image_size)
+        self.assertEqual(len(previews), 4)
+        self.assertTrue(all(preview.size() == QSize(128, 64) for preview in previews))
+        self.assertEqual(len(split_preview_grid(grid, 1, image_size)), 1)
+        mismatched_preview = QImage(QSize(64, 64), QImage.Format.Format_ARGB32_Premultiplied)
+        previews = split_preview_grid(mismatched_preview, 4, image_size)
+        self.assertEqual(len(previews), 1)
+        self.assertEqual(previews[0].size(), mismatched_preview.size())
+
+    def test_shared_monitor(self) -> None:
+        """Monitors should be shared between webservices using the same server."""
+        first = WebUIProgressMonitor.for_webservice(_mock_webservice('http://shared-test-server'))
+        second_webservice = _mock_webservice('http://shared-test-server')
+        second = WebUIProgressMonitor.for_webservice(second_webservice)
+        other = WebUIProgressMonitor.for_webservice(_mock_webservice('http://other-test-server'))
+        self.assertIs(first, second)
+        self.assertIs(first.webservice, second_webservice)
+        self.assertIsNot(first, other)
+
+    @patch('src.api.webui.progress_monitor.next_poll_interval', return_value=0.01)
+    def test_listener_updates(self, _) -> None:
+        """Listeners should share one polling loop, and previews should only be decoded when they change."""
+        preview = QImage(QSize(8, 8), QImage.Format.Format_ARGB32_Premultiplied)
+        preview.fill(Qt.GlobalColor.blue)
+        preview_str = image_to_base64(preview)
+        webservice = _mock_webservice('http://listener-test-server')
+        webservice.progress_check.return_value = _progress(0.5, 10.0, 10, 20, current_image=preview_str)
+        monitor = WebUIProgressMonitor.for_webservice(webservice)
+
+        preview_updates: list[Optional[QImage]] = []
+        status_updates: list[Optional[QImage]] = []
+
+        def _preview_listener(_status, preview_image: Optional[QImage]) -> None:
+            preview_updates.append(preview_image)
+
+        def _status_listener(_status, preview_image: Optional[QImage]) -> None:
+            status_updates.append(preview_image)
+
+        monitor.add_listener(_preview_listener, True)
+        monitor.add_listener(_status_listener)
+        self.assertEqual(monitor.listener_count, 2)
+        start_time = time.time()
+        while len(status_updates) < 3 and time.time() < start_time + POLL_TIMEOUT_SECONDS:
+            time.sleep(0.01)
+        monitor.remove_listener(_preview_listener)
+        monitor.remove_listener(_status_listener)
+        while monitor.is_polling and time.time() < start_time + POLL_TIMEOUT_SECONDS:
+            time.sleep(0.01)
+        self.assertFalse(monitor.is_polling)
+        self.assertGreaterEqual(len(status_updates), 3)
+        self.assertTrue(all(update is None for update in status_updates))
+        decoded_previews = [update for update in preview_updates if update is not None]
+        self.assertEqual(len(decoded_previews), 1)
+        self.assertEqual(decoded_previews[0].size(), preview.size())
+        webservice.progress_check.assert_called_with(skip_current_image=False)
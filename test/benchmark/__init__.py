@@ -0,0 +1 @@
+"""Performance benchmarks, excluded from the default test run."""
@@ -0,0 +1,68 @@
+"""Benchmarks Config.set throughput with varying numbers of connected callbacks.
+
+Not collected by default. Run with `python -m pytest test/benchmark/config_benchmark.py -s`.
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+from PySide6.QtWidgets import QApplication
+
+from src.config.config import Config
+
+app = QApplication.instance() or QApplication(sys.argv)
+
+LISTENER_COUNTS = (0, 10, 100)
+SET_COUNT = 10000
+
+# JSON writes are coalesced and run in the background, so saving changes shouldn't noticeably slow down rapid changes:
+MAX_SAVE_OVERHEAD_RATIO = 3.0
+
+DEFINITIONS = {
+    'value': {'label': 'value', 'category': 'Test', 'description': '', 'type': 'int', 'default': 0, 'saved': True}
+}
+
+
+class _BenchmarkConfig:
+    """Child class used to hold generated key properties."""
+
+
+class ConfigBenchmark(unittest.TestCase):
+    """Benchmarks Config.set throughput with varying numbers of connected callbacks."""
+
+    def setUp(self) -> None:
+        self._dir = tempfile.TemporaryDirectory()
+        definition_path = os.path.join(self._dir.name, 'benchmark_definitions.json')
+        with open(definition_path, 'w', encoding='utf-8') as file:
+            json.dump(DEFINITIONS, file)
+        self.config = Config(definition_path, os.path.join(self._dir.name, 'benchmark.json'), _BenchmarkConfig)
+
+    def tearDown(self) -> None:
+        self.config.save()
+        self._dir.cleanup()
+
+    def _time_sets(self, save_change: bool) -> float:
+        """Returns the average time of a single Config.set call, in seconds."""
+        start = time.perf_counter()
+        for i in range(SET_COUNT):
+            self.config.set('value', i + 1 if i % 2 == 0 else -i, save_change=save_change)
+        return (time.perf_counter() - start) / SET_COUNT
+
+    def test_set_throughput(self) -> None:
+        """Measure set throughput with and without saving, for several listener counts."""
+        listener_keys: list[tuple[ConfigBenchmark, int]] = []
+        for listener_count in LISTENER_COUNTS:
+            for listener_key in listener_keys:
+                self.config.disconnect_all(listener_key)
+            listener_keys = [(self, i) for i in range(listener_count)]
+            for listener_key in listener_keys:
+                self.config.connect(listener_key, 'value', lambda value: None)
+            self.assertEqual(listener_count, len(self.config._connected['value']))
+            unsaved_time = self._time_sets(False)
+            saved_time = self._time_sets(True)
+            print(f'\nConfig.set with {listener_count} listeners: {unsaved_time * 1e6:.2f}µs unsaved,'
+                  f' {saved_time * 1e6:.2f}µs saved ({1 / saved_time:.0f} sets/second)')
+            self.assertLess(saved_time, unsaved_time * MAX_SAVE_OVERHEAD_RATIO)
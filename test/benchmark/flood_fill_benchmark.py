@@ -0,0 +1,62 @@
+"""Benchmarks flood fill and color select performance on large images.
+
+Not collected by default. Run with `python -m pytest test/benchmark/flood_fill_benchmark.py -s`.
+"""
+import sys
+import time
+import unittest
+
+from PySide6.QtCore import QPoint, QRect, QSize, Qt
+from PySide6.QtGui import QImage, QColor, QPainter
+from PySide6.QtWidgets import QApplication
+
+from src.util.visual.image_utils import flood_fill_cropped, flood_fill, color_fill_cropped
+
+app = QApplication.instance() or QApplication(sys.argv)
+
+IMAGE_SIZE_8K = QSize(7680, 4320)
+SMALL_FILL_BOUNDS = QRect(1000, 1000, 64, 64)
+REPEAT_COUNT = 3
+
+# Small fills should only need to examine the area around the seed point, so they should never take anywhere near as
+# long as filling the entire image.
+MAX_SMALL_FILL_RATIO = 0.1
+
+
+def _time_operation(operation) -> float:
+    """Returns the best time out of several runs of an operation, in seconds."""
+    best = None
+    for _ in range(REPEAT_COUNT):
+        start = time.perf_counter()
+        operation()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    assert best is not None
+    return best
+
+
+class FloodFillBenchmark(unittest.TestCase):
+    """Benchmarks flood fill and color select performance on large images."""
+
+    def setUp(self) -> None:
+        self.image = QImage(IMAGE_SIZE_8K, QImage.Format.Format_ARGB32_Premultiplied)
+        self.image.fill(Qt.GlobalColor.white)
+        painter = QPainter(self.image)
+        painter.setPen(Qt.GlobalColor.black)
+        painter.drawRect(SMALL_FILL_BOUNDS)
+        painter.end()
+        self.color = QColor(Qt.GlobalColor.red)
+
+    def test_small_and_large_fills(self) -> None:
+        """Compare fill time for a small enclosed region and a region covering nearly the whole image."""
+        small_seed = SMALL_FILL_BOUNDS.center()
+        large_seed = QPoint(IMAGE_SIZE_8K.width() // 2, IMAGE_SIZE_8K.height() // 2)
+        small_time = _time_operation(lambda: flood_fill_cropped(self.image, small_seed, self.color, 0.0))
+        large_time = _time_operation(lambda: flood_fill_cropped(self.image, large_seed, self.color, 0.0))
+        small_full_time = _time_operation(lambda: flood_fill(self.image, small_seed, self.color, 0.0))
+        color_select_time = _time_operation(lambda: color_fill_cropped(self.image, self.color, 0.0))
+        print(f'\n8K flood fill, small region (cropped): {small_time * 1000:.2f}ms'
+              f'\n8K flood fill, small region (full-size mask): {small_full_time * 1000:.2f}ms'
+              f'\n8K flood fill, large region (cropped): {large_time * 1000:.2f}ms'
+              f'\n8K color select: {color_select_time * 1000:.2f}ms')
+        self.assertLess(small_time, large_time * MAX_SMALL_FILL_RATIO)
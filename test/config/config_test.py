@@ -0,0 +1,90 @@
+"""Tests config value change callbacks and JSON persistence."""
+import json
+import os
+import sys
+import tempfile
+import time
+import unittest
+from typing import Any
+
+from PySide6.QtWidgets import QApplication
+
+from src.config.config import Config, SAVE_DELAY_SECONDS
+
+app = QApplication.instance() or QApplication(sys.argv)
+
+DEFINITIONS = {
+    'int_value': {'label': 'int', 'category': 'Test', 'description': '', 'type': 'int', 'default': 0, 'saved': True},
+    'dict_value': {'label': 'dict', 'category': 'Test', 'description': '', 'type': 'dict', 'default': {},
+                   'saved': True}
+}
+
+
+class _TestConfig:
+    """Child class used to hold generated key properties."""
+
+
+class ConfigTest(unittest.TestCase):
+    """Tests config value change callbacks and JSON persistence."""
+
+    def setUp(self) -> None:
+        self._dir = tempfile.TemporaryDirectory()
+        definition_path = os.path.join(self._dir.name, 'test_definitions.json')
+        with open(definition_path, 'w', encoding='utf-8') as file:
+            json.dump(DEFINITIONS, file)
+        self.json_path = os.path.join(self._dir.name, 'test_config.json')
+        self.config = Config(definition_path, self.json_path, _TestConfig)
+
+    def tearDown(self) -> None:
+        self.config.save()
+        self._dir.cleanup()
+
+    def _read_saved(self) -> dict[str, Any]:
+        with open(self.json_path, encoding='utf-8') as file:
+            return json.load(file)
+
+    def test_callback_arity(self) -> None:
+        """Callbacks should receive as many of (value, inner_key) as they accept."""
+        calls: list[tuple] = []
+        self.config.connect('none', 'int_value', lambda: calls.append(()))
+        self.config.connect('value', 'int_value', lambda value: calls.append((value,)))
+        self.config.connect('both', 'int_value', lambda value, inner_key: calls.append((value, inner_key)))
+        self.config.set('int_value', 5)
+        self.assertEqual(calls, [(), (5,), (5, None)])
+        self.config.set('int_value', 5)
+        self.assertEqual(len(calls), 3)
+        with self.assertRaises(RuntimeError):
+            self.config.connect('invalid', 'int_value', lambda a, b, c: None)
+
+    def test_inner_key_callbacks(self) -> None:
+        """Inner key connections should only run when their inner key changes."""
+        calls: list[Any] = []
+        self.config.connect(self, 'dict_value', calls.append, inner_key='a')
+        self.config.set('dict_value', 1, inner_key='b')
+        self.config.set('dict_value', 2, inner_key='a')
+        self.assertEqual(calls, [2])
+
+    def test_nested_change_stops_propagation(self) -> None:
+        """If a callback changes the value again, remaining callbacks should only receive the newer value."""
+        calls: list[int] = []
+
+        def _clamp(value: int) -> None:
+            if value > 10:
+                self.config.set('int_value', 10)
+
+        self.config.connect('clamp', 'int_value', _clamp)
+        self.config.connect('record', 'int_value', calls.append)
+        self.config.set('int_value', 20)
+        self.assertEqual(calls, [10])
+        self.assertEqual(self.config.get('int_value'), 10)
+
+    def test_coalesced_background_save(self) -> None:
+        """Rapid changes should be written together in the background, without leaving temporary files behind."""
+        for i in range(100):
+            self.config.set('int_value', i)
+        time.sleep(SAVE_DELAY_SECONDS * 5)
+        self.assertEqual(self._read_saved()['int_value'], 99)
+        self.assertFalse(os.path.exists(f'{self.json_path}.tmp'))
+        self.config.set('int_value', 3, save_change=False)
+        self.config.save()
+        self.assertEqual(self._read_saved()['int_value'], 3)
@@ -0,0 +1,155 @@
+"""Tests headless batch processing."""
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from PySide6.QtCore import QSize, QRect
+from PySide6.QtGui import QImage
+from PySide6.QtWidgets import QApplication
+
+from src.config.application_config import AppConfig
+from src.config.cache import Cache
+from src.config.key_config import KeyConfig
+from src.controller.batch_processor import load_batch_job, run_batch, run_batch_job, BatchJob, REPORT_FILE_NAME
+from src.image.layers.image_stack import ImageStack
+from src.image.open_raster import read_ora_image
+from src.undo_stack import UndoStack
+
+INIT_IMAGE = 'test/resources/test_images/source.png'
+app = QApplication.instance() or QApplication(sys.argv)
+
+
+class BatchProcessorTest(unittest.TestCase):
+    """Tests headless batch processing."""
+
+    def setUp(self) -> None:
+        while os.path.basename(os.getcwd()) not in ('IntraPaint', ''):
+            os.chdir('..')
+        assert os.path.basename(os.getcwd()) == 'IntraPaint'
+        AppConfig('test/resources/app_config_test.json')
+        KeyConfig('test/resources/key_config_test.json')
+        Cache('test/resources/cache_test.json')
+        AppConfig()._reset()
+        KeyConfig()._reset()
+        Cache()._reset()
+        UndoStack().clear()
+        self._dir = tempfile.TemporaryDirectory()
+        self.input_paths = []
+        for name in ('first', 'second', 'third'):
+            input_path = os.path.join(self._dir.name, 'inputs', f'{name}.png')
+            os.makedirs(os.path.dirname(input_path), exist_ok=True)
+            shutil.copy(INIT_IMAGE, input_path)
+            self.input_paths.append(input_path)
+        self.output_dir = os.path.join(self._dir.name, 'outputs')
+
+    def tearDown(self) -> None:
+        self._dir.cleanup()
+
+    def _write_job(self, job_data: dict) -> str:
+        job_path = os.path.join(self._dir.name, 'job.json')
+        with open(job_path, 'w', encoding='utf-8') as file:
+            json.dump(job_data, file)
+        return job_path
+
+    def test_load_job(self) -> None:
+        """Input patterns should be expanded and paths resolved relative to the job file."""
+        job = load_batch_job(self._write_job({
+            'inputs': ['inputs/*.png', 'inputs/first.png'],
+            'output_dir': 'outputs',
+            'workers': 2,
+            'operations': [{'type': 'select', 'mask': 'mask.png'}]
+        }))
+        self.assertEqual(sorted(self.input_paths), job.inputs)
+        self.assertEqual(self.output_dir, job.output_dir)
+        self.assertEqual(2, job.workers)
+        self.assertEqual(os.path.join(self._dir.name, 'mask.png'), job.operations[0]['mask'])
+        with self.assertRaises(ValueError):
+            load_batch_job(self._write_job({'inputs': ['missing/*.png']}))
+
+    def test_process_documents(self) -> None:
+        """Operations should run in order on every document, exporting the results."""
+        job = BatchJob(self.input_paths, self.output_dir, [
+            {'type': 'scale', 'width': 300, 'height': 200, 'mode': 'bilinear'},
+            {'type': 'select', 'x': 10, 'y': 20, 'width': 100, 'height': 50},
+            {'type': 'filter', 'filter': 'posterize', 'parameters': [1]},
+            {'type': 'crop_to_selection'},
+            {'type': 'export', 'format': 'png'},
+            {'type': 'export', 'format': 'ora', 'suffix': '_layers'}
+        ])
+        report = run_batch(job)
+        self.assertEqual(0, report.failure_count)
+        self.assertEqual(1, report.workers)
+        for input_path, result in zip(self.input_paths, report.results):
+            self.assertEqual(input_path, result.input_path)
+            self.assertEqual(['load', 'scale', 'select', 'filter', 'crop_to_selection', 'export', 'export'],
+                             [operation_type for operation_type, _ in result.operation_times])
+            self.assertEqual(2, len(result.output_paths))
+            image = QImage(result.output_paths[0])
+            self.assertEqual(QSize(100, 50), image.size())
+            for x in range(0, 100, 10):
+                for y in range(0, 50, 10):
+                    color = image.pixelColor(x, y)
+                    # Posterizing with one bit only keeps each channel's highest bit:
+                    self.assertTrue(all(channel in (0, 128) for channel in (color.red(), color.green(),
+                                                                             color.blue())))
+            image_stack = ImageStack(QSize(8, 8), QSize(8, 8), QSize(8, 8), QSize(999, 999))
+            read_ora_image(image_stack, result.output_paths[1])
+            self.assertEqual(QSize(100, 50), image_stack.size)
+        self.assertEqual(6, report.operation_totals()['export'][0])
+
+    def test_selection_filter(self) -> None:
+        """Filters should only change selected content when a selection exists."""
+        job = BatchJob(self.input_paths[:1], self.output_dir, [
+            {'type': 'select', 'x': 0, 'y': 0, 'width': 100, 'height': 100},
+            {'type': 'filter', 'filter': 'brightness_contrast', 'parameters': [0.0]},
+            {'type': 'export'}
+        ])
+        report = run_batch(job)
+        self.assertEqual(0, report.failure_count)
+        source = QImage(INIT_IMAGE).convertToFormat(QImage.Format.Format_ARGB32_Premultiplied)
+        output = QImage(report.results[0].output_paths[0]).convertToFormat(source.format())
+        self.assertNotEqual(source.copy(QRect(0, 0, 100, 100)), output.copy(QRect(0, 0, 100, 100)))
+        self.assertEqual(source.copy(QRect(100, 100, 200, 200)), output.copy(QRect(100, 100, 200, 200)))
+
+    def test_failed_document(self) -> None:
+        """Errors should be reported per document without stopping the job."""
+        job_path = self._write_job({
+            'inputs': ['inputs/*.png'],
+            'output_dir': 'outputs',
+            'workers': 1,
+            'operations': [
+                {'type': 'crop_to_selection'},
+                {'type': 'export'}
+            ]
+        })
+        self.assertEqual(1, run_batch_job(job_path))
+        with open(os.path.join(self.output_dir, REPORT_FILE_NAME), encoding='utf-8') as file:
+            report_data = json.load(file)
+        self.assertEqual(3, report_data['documents'])
+        self.assertEqual(3, report_data['failed'])
+        for result in report_data['results']:
+            self.assertTrue(result['error'].startswith('crop_to_selection'))
+            self.assertEqual([], result['outputs'])
+
+    def test_parallel_workers(self) -> None:
+        """Worker processes should produce the same results as processing documents in-process."""
+        job = BatchJob(self.input_paths, self.output_dir, [
+            {'type': 'resize_canvas', 'width': 500, 'height': 300, 'x_offset': -50, 'y_offset': -50},
+            {'type': 'export', 'suffix': '_parallel'}
+        ], workers=2)
+        report = run_batch(job)
+        self.assertEqual(0, report.failure_count)
+        self.assertEqual(2, report.workers)
+        self.assertEqual(self.input_paths, [result.input_path for result in report.results])
+        job.workers = 1
+        for operation in job.operations:
+            if operation['type'] == 'export':
+                operation['suffix'] = '_serial'
+        serial_report = run_batch(job)
+        for parallel_result, serial_result in zip(report.results, serial_report.results):
+            parallel_image = QImage(parallel_result.output_paths[0])
+            self.assertEqual(QSize(500, 300), parallel_image.size())
+            self.assertEqual(QImage(serial_result.output_paths[0]), parallel_image)
@@ -0,0 +1,168 @@
+"""Tests Stable Diffusion generator API data loading and caching."""
+import os
+import sys
+import threading
+import unittest
+from argparse import Namespace
+from typing import Any, Optional
+from unittest.mock import patch, MagicMock
+
+import requests
+from PySide6.QtCore import QSize, Qt
+from PySide6.QtGui import QImage
+from PySide6.QtWidgets import QApplication
+
+from src.api.controlnet.control_parameter import ControlParameter
+from src.api.controlnet.controlnet_constants import ControlTypeDef, CONTROLNET_MODEL_NONE
+from src.api.controlnet.controlnet_preprocessor import ControlNetPreprocessor
+from src.api.thumbnail_cache import ThumbnailCache
+from src.config.application_config import AppConfig
+from src.config.cache import Cache
+from src.config.key_config import KeyConfig
+from src.controller.image_generation.sd_generator import API_DATA_OPTION_LISTS, API_DATA_GENERATOR, \
+    API_DATA_CONTROLNET
+from src.controller.image_generation.sd_webui_generator import SDWebUIGenerator
+from src.image.layers.image_stack import ImageStack
+from src.ui.panel.controlnet_panel import DEFAULT_CONTROL_TYPE
+from src.util.parameter import TYPE_INT
+from src.util.task_scheduler import TaskScheduler
+
+app = QApplication.instance() or QApplication(sys.argv)
+
+IMAGE_SIZE = QSize(256, 256)
+
+
+def _controlnet_data(preprocessor_name: str) -> dict[str, Any]:
+    types: dict[str, ControlTypeDef] = {
+        DEFAULT_CONTROL_TYPE: {
+            'module_list': [preprocessor_name],
+            'model_list': [CONTROLNET_MODEL_NONE],
+            'default_option': preprocessor_name,
+            'default_model': CONTROLNET_MODEL_NONE
+        }
+    }
+    preprocessor = ControlNetPreprocessor(preprocessor_name, preprocessor_name, [
+        ControlParameter('processor_res', 'Resolution', TYPE_INT, 512, minimum=64, maximum=2048)
+    ])
+    return {'models': [CONTROLNET_MODEL_NONE], 'preprocessors': [preprocessor], 'types': types}
+
+
+class SDGeneratorTest(unittest.TestCase):
+    """Tests Stable Diffusion generator API data loading and caching."""
+
+    def setUp(self) -> None:
+        while os.path.basename(os.getcwd()) not in ('IntraPaint', ''):
+            os.chdir('..')
+        assert os.path.basename(os.getcwd()) == 'IntraPaint'
+        AppConfig('test/resources/app_config_test.json')._reset()
+        KeyConfig('test/resources/key_config_test.json')._reset()
+        Cache('test/resources/cache_test.json')._reset()
+        self.generator = SDWebUIGenerator(None, ImageStack(IMAGE_SIZE, IMAGE_SIZE, IMAGE_SIZE, IMAGE_SIZE),
+                                          Namespace(server_url='http://localhost:7860'))
+
+    def test_refresh_runs_in_background(self) -> None:
+        """API requests should run off the UI thread, and results should be applied back on the UI thread."""
+        load_threads: list[threading.Thread] = []
+        applied_data: list[tuple[threading.Thread, dict[str, Any]]] = []
+        api_data = {API_DATA_OPTION_LISTS: {}, API_DATA_GENERATOR: {}, API_DATA_CONTROLNET: None}
+        webservice = object()
+
+        def _load(_webservice: Any) -> dict[str, Any]:
+            load_threads.append(threading.current_thread())
+            return api_data
+
+        def _apply(data: dict[str, Any]) -> None:
+            applied_data.append((threading.current_thread(), data))
+
+        self.generator._connected = True
+        with patch.object(self.generator, 'get_webservice', return_value=webservice), \
+                patch.object(self.generator, '_load_api_data', side_effect=_load), \
+                patch.object(self.generator, '_apply_api_data', side_effect=_apply):
+            self.generator._refresh_api_data()
+            self.assertEqual([], applied_data)
+            self.assertTrue(TaskScheduler().wait_for_done(5000))
+            QApplication.processEvents()
+        self.assertEqual(1, len(load_threads))
+        self.assertIsNot(threading.main_thread(), load_threads[0])
+        self.assertEqual([(threading.main_thread(), api_data)], applied_data)
+
+    def test_refresh_request_errors_logged(self) -> None:
+        """Failed API requests while refreshing should be logged, without applying any data."""
+        applied_data: list[dict[str, Any]] = []
+        self.generator._connected = True
+        with patch.object(self.generator, 'get_webservice', return_value=object()), \
+                patch.object(self.generator, '_load_api_data',
+                             side_effect=requests.exceptions.ConnectionError('connection refused')), \
+                patch.object(self.generator, '_apply_api_data', side_effect=applied_data.append), \
+                self.assertLogs('src.controller.image_generation.sd_generator', level='ERROR') as logs:
+            self.generator._refresh_api_data()
+            self.assertTrue(TaskScheduler().wait_for_done(5000))
+            QApplication.processEvents()
+        self.assertEqual([], applied_data)
+        self.assertEqual(1, len(logs.records))
+        self.assertIn('connection refused', logs.records[0].getMessage())
+
+    def test_controlnet_tab_rebuilt(self) -> None:
+        """Refreshed ControlNet data should replace the panel in the existing ControlNet tab."""
+        first_data = _controlnet_data('canny')
+        self.generator._build_controlnet_tab(first_data['models'], first_data['preprocessors'], first_data['types'])
+        tab = self.generator._controlnet_tab
+        first_panel = self.generator._controlnet_panel
+        assert tab is not None and first_panel is not None
+
+        second_data = _controlnet_data('depth')
+        self.generator._build_controlnet_tab(second_data['models'], second_data['preprocessors'],
+                                             second_data['types'])
+        self.assertIs(tab, self.generator._controlnet_tab)
+        self.assertIsNot(first_panel, self.generator._controlnet_panel)
+        self.assertIs(self.generator._controlnet_panel, tab.content_widget)
+
+    def test_failed_thumbnail_requests_not_cached(self) -> None:
+        """LoRA models should only be cached as missing thumbnails if the server reports that no thumbnail exists."""
+        thumbnail_cache = type.__call__(ThumbnailCache, None)
+        lora_info = {'name': 'test_lora', 'path': 'models/Lora/test_lora.safetensors'}
+        thumbnail = QImage(300, 200, QImage.Format.Format_ARGB32_Premultiplied)
+        thumbnail.fill(Qt.GlobalColor.red)
+        with patch('src.controller.image_generation.sd_generator.ThumbnailCache', return_value=thumbnail_cache), \
+                patch.object(self.generator, 'load_lora_thumbnail') as load_lora_thumbnail:
+            load_lora_thumbnail.return_value = None
+            self.assertIsNone(self.generator.load_cached_lora_thumbnail(lora_info))
+            load_lora_thumbnail.return_value = QImage()
+            for _ in range(2):
+                missing_thumbnail = self.generator.load_cached_lora_thumbnail(lora_info)
+                assert missing_thumbnail is not None
+                self.assertTrue(missing_thumbnail.isNull())
+            self.assertEqual(2, load_lora_thumbnail.call_count)
+
+            lora_info['path'] = 'models/Lora/test_lora_v2.safetensors'
+            load_lora_thumbnail.return_value = thumbnail
+            cached_thumbnail = self.generator.load_cached_lora_thumbnail(lora_info)
+            assert cached_thumbnail is not None
+            self.assertEqual(cached_thumbnail, self.generator.load_cached_lora_thumbnail(lora_info))
+            self.assertEqual(3, load_lora_thumbnail.call_count)
+
+    def test_failed_thumbnails_retried(self) -> None:
+        """LoRA thumbnails that failed to load should be loaded again the next time the LoRA window opens."""
+        Cache().set(Cache.LORA_MODELS, [{'name': 'missing', 'path': 'missing.safetensors'},
+                                        {'name': 'failed', 'path': 'failed.safetensors'}])
+        thumbnails = {'missing': QImage(), 'failed': None}
+        loaded: list[str] = []
+
+        def _load_thumbnail(lora_info: dict[str, str]) -> Optional[QImage]:
+            loaded.append(lora_info['name'])
+            return thumbnails[lora_info['name']]
+
+        def _open_window() -> None:
+            self.assertTrue(TaskScheduler().wait_for_done(5000))
+            QApplication.processEvents()
+
+        lora_window = MagicMock()
+        lora_window.exec.side_effect = _open_window
+        with patch('src.controller.image_generation.sd_generator.ExtraNetworkWindow', return_value=lora_window), \
+                patch.object(self.generator, 'load_cached_lora_thumbnail', side_effect=_load_thumbnail):
+            self.generator.show_lora_window()
+            self.assertEqual({'missing', 'failed'}, set(loaded))
+            self.assertEqual({'missing': None}, self.generator._lora_images)
+            lora_window.set_thumbnail.assert_any_call('failed', None)
+            self.generator.show_lora_window()
+        self.assertEqual(['failed'], loaded[2:])
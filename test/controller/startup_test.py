@@ -0,0 +1,100 @@
+"""Tests that IntraPaint startup only loads what it needs, within a fixed time budget."""
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+from src.controller.image_generation.generator_registry import GENERATOR_DESCRIPTORS, GENERATION_MODE_NONE, \
+    GENERATION_MODE_TEST
+
+# Generous enough for slow CI machines, but loading every generator and all of their dependencies used to take most
+# of this on its own. Set STARTUP_TIME_BUDGET_ENV_VAR to use a different budget on unusually slow or fast machines:
+STARTUP_TIME_BUDGET_ENV_VAR = 'INTRAPAINT_STARTUP_TIME_BUDGET'
+DEFAULT_STARTUP_TIME_BUDGET_S = 8.0
+STARTUP_TIMEOUT_S = 120
+
+# Modules that should never be needed unless an image generator that uses them is selected:
+DEFERRED_MODULES = ('requests', 'torch', 'src.api.a1111_webservice', 'src.api.comfyui_webservice')
+
+# Runs in a separate process, so that modules already imported by other tests don't hide slow imports:
+STARTUP_SCRIPT = """
+import json
+import sys
+import time
+
+start = time.perf_counter()
+from PySide6.QtWidgets import QApplication
+app = QApplication.instance() or QApplication(sys.argv)
+from src.config.application_config import AppConfig
+from src.config.cache import Cache
+from src.config.key_config import KeyConfig
+from src.controller.app_controller import AppController
+from src.util.arg_parser import build_arg_parser
+import_end = time.perf_counter()
+
+AppConfig('test/resources/app_config_test.json')._reset()
+KeyConfig('test/resources/key_config_test.json')._reset()
+Cache('test/resources/cache_test.json')._reset()
+args = build_arg_parser(include_edit_params=False).parse_args(['--window_size', '800x600'])
+args.mode = sys.argv[1]
+args.server_url = ''
+args.fast_ngrok_connection = False
+controller = AppController(args)
+init_end = time.perf_counter()
+print(json.dumps({
+    'import_time': import_end - start,
+    'init_time': init_end - import_end,
+    'generator': type(controller._generator).__name__,
+    'modules': list(sys.modules)
+}))
+"""
+
+
+def _measure_startup(mode: str) -> dict:
+    """Constructs a headless AppController in a new process, returning timing and loaded module data."""
+    env = {**os.environ, 'QT_QPA_PLATFORM': 'offscreen', 'PYTHONPATH': os.getcwd()}
+    result = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT, mode], capture_output=True, text=True, env=env,
+                            timeout=STARTUP_TIMEOUT_S, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def _startup_time_budget() -> float:
+    """Returns the maximum allowed startup time in seconds."""
+    return float(os.environ.get(STARTUP_TIME_BUDGET_ENV_VAR, DEFAULT_STARTUP_TIME_BUDGET_S))
+
+
+class StartupTest(unittest.TestCase):
+    """Tests that IntraPaint startup only loads what it needs, within a fixed time budget."""
+
+    def setUp(self) -> None:
+        while os.path.basename(os.getcwd()) not in ('IntraPaint', ''):
+            os.chdir('..')
+        assert os.path.basename(os.getcwd()) == 'IntraPaint'
+
+    def test_startup_without_generator(self) -> None:
+        """Starting without an image generator should stay within the time budget, without importing any generator
+           modules."""
+        startup_data = _measure_startup(GENERATION_MODE_NONE)
+        self.assertEqual('NullGenerator', startup_data['generator'])
+        startup_time = startup_data['import_time'] + startup_data['init_time']
+        self.assertLess(startup_time, _startup_time_budget(),
+                        f'Startup took {startup_time:.2f}s: import {startup_data["import_time"]:.2f}s, '
+                        f'init {startup_data["init_time"]:.2f}s')
+        loaded_modules = set(startup_data['modules'])
+        for mode, descriptor in GENERATOR_DESCRIPTORS.items():
+            if mode != GENERATION_MODE_NONE:
+                self.assertNotIn(descriptor.module_name, loaded_modules)
+        for module_name in DEFERRED_MODULES:
+            self.assertNotIn(module_name, loaded_modules)
+
+    def test_startup_loads_selected_generator(self) -> None:
+        """Only the selected generator should be imported."""
+        startup_data = _measure_startup(GENERATION_MODE_TEST)
+        self.assertEqual('TestGenerator', startup_data['generator'])
+        loaded_modules = set(startup_data['modules'])
+        for mode, descriptor in GENERATOR_DESCRIPTORS.items():
+            if mode in (GENERATION_MODE_NONE, GENERATION_MODE_TEST):
+                self.assertIn(descriptor.module_name, loaded_modules)
+            else:
+                self.assertNotIn(descriptor.module_name, loaded_modules)
@@ -0,0 +1,114 @@
+"""Tests GLID-3-XL batched sampling with a tiny randomly initialized model on the CPU."""
+import importlib.util
+import unittest
+from typing import Any
+from unittest.mock import patch
+
+ML_MODULES_AVAILABLE = all(importlib.util.find_spec(module) is not None for module in ('torch', 'clip'))
+
+CONTEXT_DIM = 32
+CONTEXT_LENGTH = 4
+LATENT_CHANNELS = 4
+WIDTH = 64
+HEIGHT = 64
+PROMPTS = ['a red barn', 'a stormy sea']
+NEGATIVES = ['', 'blurry']
+GUIDANCE_SCALES = [5.0, 2.5]
+
+# Randomly initialized model small enough to sample quickly on the CPU:
+TINY_MODEL_PARAMS = {
+    'attention_resolutions': '32,16',
+    'channel_mult': '1,2',
+    'class_cond': False,
+    'context_dim': CONTEXT_DIM,
+    'diffusion_steps': 1000,
+    'rescale_timesteps': True,
+    'timestep_respacing': '5',
+    'image_size': 32,
+    'learn_sigma': False,
+    'noise_schedule': 'linear',
+    'num_channels': 32,
+    'num_heads': 1,
+    'num_res_blocks': 1,
+    'resblock_updown': False,
+    'use_fp16': False,
+    'use_scale_shift_norm': False,
+    'clip_embed_dim': None,
+    'image_condition': False,
+    'super_res_condition': False
+}
+
+
+class _MockBert:
+    """Encodes each text as a fixed random context, in place of the BERT text encoder."""
+
+    def __init__(self, torch_module: Any) -> None:
+        self._torch = torch_module
+        self._generator = torch_module.Generator().manual_seed(0)
+        self._embeddings: dict[str, Any] = {}
+
+    def encode(self, texts: list[str]) -> Any:
+        """Returns a (len(texts), CONTEXT_LENGTH, CONTEXT_DIM) context tensor."""
+        for text in texts:
+            if text not in self._embeddings:
+                self._embeddings[text] = self._torch.randn(1, CONTEXT_LENGTH, CONTEXT_DIM, generator=self._generator)
+        return self._torch.cat([self._embeddings[text] for text in texts], dim=0)
+
+
+@unittest.skipUnless(ML_MODULES_AVAILABLE, 'GLID-3-XL dependencies are not installed')
+class CreateSampleFunctionTest(unittest.TestCase):
+    """Tests GLID-3-XL batched sampling with a tiny randomly initialized model on the CPU."""
+
+    def setUp(self) -> None:
+        # pylint: disable=import-outside-toplevel
+        import torch
+        from src.glid_3_xl.guided_diffusion.script_util import create_model_and_diffusion, \
+            model_and_diffusion_defaults
+        self.torch = torch
+        torch.manual_seed(0)
+        model_config = model_and_diffusion_defaults()
+        model_config.update(TINY_MODEL_PARAMS)
+        self.model, self.diffusion = create_model_and_diffusion(**model_config)
+        self.model.eval()
+        self.bert = _MockBert(torch)
+        # Initial noise for each batch item, used for both the batched and the individual samples:
+        self.item_noise = torch.randn(len(PROMPTS), LATENT_CHANNELS, HEIGHT // 8, WIDTH // 8)
+
+    def _sample(self, batch_indices: list[int]) -> Any:
+        """Runs the sampling loop for a set of batch items, returning the final output."""
+        # pylint: disable=import-outside-toplevel
+        from src.glid_3_xl.create_sample_function import create_sample_function
+        batch_size = len(batch_indices)
+        sample_fn, _ = create_sample_function('cpu', self.model, TINY_MODEL_PARAMS, self.bert, None, None, None,
+                                              self.diffusion, None,
+                                              prompt=[PROMPTS[i] for i in batch_indices],
+                                              negative=[NEGATIVES[i] for i in batch_indices],
+                                              guidance_scale=[GUIDANCE_SCALES[i] for i in batch_indices],
+                                              batch_size=batch_size, width=WIDTH, height=HEIGHT)
+        # Conditional and unconditional halves start from the same noise:
+        noise = self.item_noise[batch_indices]
+        noise = self.torch.cat([noise, noise], dim=0)
+        sample = None
+        with patch.object(self.torch, 'randn', return_value=noise):
+            for sample in sample_fn(None):
+                pass
+        assert sample is not None
+        return sample
+
+    def test_batched_shapes(self) -> None:
+        """Merged batches should produce one conditional and one unconditional latent for each batch item."""
+        sample = self._sample(list(range(len(PROMPTS))))
+        expected_shape = (len(PROMPTS) * 2, LATENT_CHANNELS, HEIGHT // 8, WIDTH // 8)
+        self.assertEqual(expected_shape, tuple(sample['sample'].shape))
+        self.assertEqual(expected_shape, tuple(sample['pred_xstart'].shape))
+        self.assertFalse(self.torch.isnan(sample['sample']).any())
+
+    def test_batched_matches_individual(self) -> None:
+        """Each item in a merged batch should match the same item sampled on its own."""
+        batch_size = len(PROMPTS)
+        batched = self._sample(list(range(batch_size)))['sample'][:batch_size]
+        for i in range(batch_size):
+            individual = self._sample([i])['sample'][:1]
+            self.assertTrue(self.torch.allclose(batched[i:i + 1], individual, atol=1e-4),
+                            f'batch item {i} does not match individual sample')
+        self.assertFalse(self.torch.allclose(batched[0], batched[1], atol=1e-4))
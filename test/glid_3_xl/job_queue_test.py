@@ -0,0 +1,171 @@
+"""Tests GLID-3-XL server job queueing and batch merging."""
+import threading
+import unittest
+
+from src.glid_3_xl.job_queue import SampleJobQueue, JobPass, JobStatus, SampleJob
+
+TIMEOUT_SECONDS = 5.0
+
+
+class SampleJobQueueTest(unittest.TestCase):
+    """Tests GLID-3-XL server job queueing and batch merging."""
+
+    def setUp(self) -> None:
+        self.batches: list[list[tuple[str, int, int]]] = []
+        self.batch_sizes: list[int] = []
+        self.batch_started = threading.Event()
+        self.release_batch = threading.Event()
+        self.release_batch.set()
+        self.failure: Exception | None = None
+        self.queue = SampleJobQueue(self._run_batch, max_batch_size=4)
+
+    def tearDown(self) -> None:
+        self.release_batch.set()
+        self.queue.stop()
+
+    def _run_batch(self, job_passes: list[JobPass], batch_size: int) -> None:
+        self.batches.append([(job_pass.job.job_id, job_pass.pass_index, job_pass.first_index)
+                             for job_pass in job_passes])
+        self.batch_sizes.append(batch_size)
+        self.batch_started.set()
+        self.assertTrue(self.release_batch.wait(TIMEOUT_SECONDS))
+        self.queue.check_cancelled(job_passes)
+        if self.failure is not None:
+            raise self.failure
+        for job_pass in job_passes:
+            for item_index in range(job_pass.job.batch_size):
+                image_str = f'{job_pass.job.job_id}:{job_pass.sample_name(item_index)}'
+                self.queue.save_sample(job_pass, item_index, image_str)
+
+    def _add_job(self, batch_size: int = 1, num_batches: int = 1, width: int = 256, skip_steps: int = 0,
+                 cutn: int = 16) -> SampleJob:
+        return self.queue.add_job({}, batch_size, num_batches, width, 256, skip_steps, cutn)
+
+    def _wait_for_jobs(self, *jobs: SampleJob) -> None:
+        for job in jobs:
+            for _ in range(int(TIMEOUT_SECONDS * 100)):
+                if job.is_done:
+                    break
+                threading.Event().wait(0.01)
+            self.assertTrue(job.is_done)
+
+    def test_merge_compatible_jobs(self) -> None:
+        """Compatible job passes should be merged into batches, up to the maximum batch size."""
+        first = self._add_job(batch_size=2)
+        other_size = self._add_job(width=512)
+        second = self._add_job(num_batches=3)
+        other_steps = self._add_job(skip_steps=10)
+        self.queue.start()
+        self._wait_for_jobs(first, other_size, second, other_steps)
+        self.assertEqual(self.batches, [
+            [(first.job_id, 0, 0), (second.job_id, 0, 2), (second.job_id, 1, 3)],
+            [(other_size.job_id, 0, 0)],
+            [(second.job_id, 2, 0)],
+            [(other_steps.job_id, 0, 0)]
+        ])
+        self.assertEqual(self.batch_sizes, [4, 1, 1, 1])
+        self.assertEqual(set(first.samples.keys()), {'00000', '00001'})
+        self.assertEqual(set(second.samples.keys()), {'00000', '00001', '00002'})
+        self.assertEqual(second.samples['00002']['image'], f'{second.job_id}:00002')
+        for job in (first, other_size, second, other_steps):
+            self.assertEqual(job.status, JobStatus.FINISHED)
+            assert job.started_at is not None and job.finished_at is not None
+            self.assertTrue(job.created_at <= job.started_at <= job.finished_at)
+            self.assertEqual(job.elapsed_time, job.finished_at - job.created_at)
+
+    def test_different_cutn_not_merged(self) -> None:
+        """Jobs with different CLIP guidance cutout counts should run in separate batches."""
+        first = self._add_job()
+        other_cutn = self._add_job(cutn=32)
+        second = self._add_job()
+        self.queue.start()
+        self._wait_for_jobs(first, other_cutn, second)
+        self.assertEqual(self.batches, [
+            [(first.job_id, 0, 0), (second.job_id, 0, 1)],
+            [(other_cutn.job_id, 0, 0)]
+        ])
+        self.assertEqual(self.batch_sizes, [2, 1])
+
+    def test_large_batches_not_merged(self) -> None:
+        """Passes larger than the maximum batch size should still run, without being merged."""
+        large = self._add_job(batch_size=6)
+        small = self._add_job()
+        self.queue.start()
+        self._wait_for_jobs(large, small)
+        self.assertEqual(self.batch_sizes, [6, 1])
+
+    def test_queue_position_and_cancellation(self) -> None:
+        """Queued jobs should report their position, and cancelled jobs should not generate samples."""
+        self.release_batch.clear()
+        active = self._add_job(width=512)
+        self.queue.start()
+        self.assertTrue(self.batch_started.wait(TIMEOUT_SECONDS))
+        queued = self._add_job()
+        cancelled = self._add_job(width=128)
+        self.assertEqual(self.queue.queue_position(active.job_id), 0)
+        self.assertEqual(self.queue.queue_position(queued.job_id), 1)
+        self.assertEqual(self.queue.queue_position(cancelled.job_id), 2)
+        self.assertTrue(self.queue.cancel_job(cancelled.job_id))
+        self.assertFalse(self.queue.cancel_job(cancelled.job_id))
+        self.assertIsNone(self.queue.queue_position(cancelled.job_id))
+        self.assertEqual(self.queue.updated_samples(queued, {})['queue_position'], 1)
+        self.release_batch.set()
+        self._wait_for_jobs(active, queued)
+        self.assertEqual(len(self.batches), 2)
+        self.assertEqual(cancelled.status, JobStatus.CANCELLED)
+        self.assertEqual(len(cancelled.samples), 0)
+
+    def test_cancel_active_batch(self) -> None:
+        """Cancelling every job in an active batch should stop the batch without saving samples."""
+        self.release_batch.clear()
+        job = self._add_job(num_batches=2, width=1024)
+        self.queue.start()
+        self.assertTrue(self.batch_started.wait(TIMEOUT_SECONDS))
+        self.assertTrue(self.queue.cancel_job(job.job_id))
+        self.release_batch.set()
+        next_job = self._add_job()
+        self._wait_for_jobs(next_job)
+        self.assertEqual(job.status, JobStatus.CANCELLED)
+        self.assertEqual(len(job.samples), 0)
+        self.assertEqual(len(self.batches), 2)
+
+    def test_updated_samples(self) -> None:
+        """Sample responses should only include new or updated samples, and the most recent job is the default."""
+        job = self._add_job(batch_size=2)
+        self.queue.start()
+        self._wait_for_jobs(job)
+        self.assertIs(self.queue.get_job(), job)
+        response = self.queue.updated_samples(job, {})
+        self.assertEqual(set(response['samples'].keys()), {'00000', '00001'})
+        self.assertFalse(response['in_progress'])
+        self.assertIsNone(response['queue_position'])
+        known = {'00000': response['samples']['00000']['timestamp']}
+        self.assertEqual(set(self.queue.updated_samples(job, known)['samples'].keys()), {'00001'})
+        encoded = self.queue.updated_samples(job, known, lambda sample: sample['image'].upper())
+        self.assertEqual(encoded['samples']['00001']['image'], f'{job.job_id}:00001'.upper())
+        self.assertEqual(job.samples['00001']['image'], f'{job.job_id}:00001')
+
+    def test_wait_for_update(self) -> None:
+        """Waiting threads should wake when samples are saved or job status changes, and time out otherwise."""
+        self.release_batch.clear()
+        update_count = self.queue.update_count
+        self.assertEqual(self.queue.wait_for_update(update_count, 0.01), update_count)
+        job = self._add_job()
+        self.queue.start()
+        update_count = self.queue.wait_for_update(update_count, TIMEOUT_SECONDS)
+        self.assertEqual(job.status, JobStatus.ACTIVE)
+        self.release_batch.set()
+        self.assertNotEqual(self.queue.wait_for_update(update_count, TIMEOUT_SECONDS), update_count)
+        self._wait_for_jobs(job)
+        self.assertEqual(len(job.samples), 1)
+
+    def test_failed_batch(self) -> None:
+        """Errors during generation should mark all jobs in the batch as failed."""
+        self.failure = RuntimeError('out of memory')
+        first = self._add_job()
+        second = self._add_job()
+        self.queue.start()
+        self._wait_for_jobs(first, second)
+        for job in (first, second):
+            self.assertEqual(job.status, JobStatus.FAILED)
+            self.assertIn('out of memory', self.queue.updated_samples(job, {})['error'])
@@ -0,0 +1,49 @@
+"""Tests caching GLID-3-XL latent image encodings."""
+import unittest
+
+from PIL import Image
+
+from src.glid_3_xl.latent_cache import LatentCache, image_digest
+
+
+class _MockAutoencoder:
+    """Encodes images as their sizes, counting encode calls."""
+
+    def __init__(self) -> None:
+        self.encode_count = 0
+
+    def encode(self, image: Image.Image) -> tuple[int, int]:
+        """Counts and encodes an image."""
+        self.encode_count += 1
+        return image.size
+
+
+class LatentCacheTest(unittest.TestCase):
+    """Tests caching GLID-3-XL latent image encodings."""
+
+    def setUp(self) -> None:
+        # Bypass the singleton so each test gets an empty cache:
+        self.cache = type.__call__(LatentCache, 2)
+
+    def test_image_digest(self) -> None:
+        """Digests should match only for images with the same mode, size, and content."""
+        image = Image.new('RGB', (16, 8), (10, 20, 30))
+        self.assertEqual(image_digest(image), image_digest(image.copy()))
+        changed = image.copy()
+        changed.putpixel((3, 3), (0, 0, 0))
+        self.assertNotEqual(image_digest(image), image_digest(changed))
+        self.assertNotEqual(image_digest(image), image_digest(image.resize((8, 16))))
+        self.assertNotEqual(image_digest(image), image_digest(image.convert('RGBA')))
+
+    def test_identical_images_encoded_once(self) -> None:
+        """Images with identical content should only be encoded once, until discarded from the cache."""
+        model = _MockAutoencoder()
+        first = Image.new('RGB', (16, 8))
+        self.assertEqual(self.cache.encode(model, first, model.encode), (16, 8))
+        self.assertEqual(self.cache.encode(model, first.copy(), model.encode), (16, 8))
+        self.assertEqual(model.encode_count, 1)
+        self.cache.encode(model, Image.new('RGB', (8, 8)), model.encode)
+        self.cache.encode(model, Image.new('RGB', (4, 4)), model.encode)
+        self.assertEqual(len(self.cache), 2)
+        self.cache.encode(model, first, model.encode)
+        self.assertEqual(model.encode_count, 4)
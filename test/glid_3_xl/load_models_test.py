@@ -0,0 +1,35 @@
+"""Tests checking GLID-3-XL model paths before loading."""
+import importlib.util
+import os
+import tempfile
+import unittest
+
+ML_MODULES_AVAILABLE = all(importlib.util.find_spec(module) is not None for module in ('torch', 'clip'))
+
+
+@unittest.skipUnless(ML_MODULES_AVAILABLE, 'GLID-3-XL dependencies are not installed')
+class LoadModelsTest(unittest.TestCase):
+    """Tests checking GLID-3-XL model paths before loading."""
+
+    def setUp(self) -> None:
+        self._dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self._dir.cleanup()
+
+    def _create_file(self, name: str) -> str:
+        path = os.path.join(self._dir.name, name)
+        with open(path, 'wb'):
+            pass
+        return path
+
+    def test_safetensors_vae_rejected(self) -> None:
+        """A .safetensors VAE path should be rejected with a clear error, instead of failing later while loading."""
+        # pylint: disable=import-outside-toplevel
+        from src.glid_3_xl.load_models import GlidModelLoader
+        model_path = self._create_file('inpaint.pt')
+        bert_path = self._create_file('bert.pt')
+        with self.assertRaisesRegex(RuntimeError, 'safetensors'):
+            GlidModelLoader('cpu', model_path=model_path, bert_path=bert_path,
+                            kl_path=self._create_file('kl-f8.safetensors'))
+        GlidModelLoader('cpu', model_path=model_path, bert_path=bert_path, kl_path=self._create_file('kl-f8.pt'))
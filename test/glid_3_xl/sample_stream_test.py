@@ -0,0 +1,42 @@
+"""Tests encoding and decoding streamed GLID-3-XL samples."""
+import base64
+import io
+import unittest
+
+from PIL import Image
+
+from src.glid_3_xl.sample_stream import FrameReader, encode_frame, encode_sample, stream_format, FORMAT_PNG, \
+    FORMAT_BASE64, FRAME_TYPE_SAMPLE, FRAME_TYPE_STATUS
+
+
+class SampleStreamTest(unittest.TestCase):
+    """Tests encoding and decoding streamed GLID-3-XL samples."""
+
+    def test_frames_split_across_chunks(self) -> None:
+        """Frames should be decoded correctly regardless of how the stream is split into chunks."""
+        frames = [({'type': FRAME_TYPE_SAMPLE, 'name': '00000'}, bytes(range(256)) * 4),
+                  ({'type': FRAME_TYPE_STATUS, 'in_progress': False}, b'')]
+        data = b''.join(encode_frame(header, payload) for header, payload in frames)
+        for chunk_size in (1, 7, 300, len(data)):
+            reader = FrameReader()
+            decoded = []
+            for i in range(0, len(data), chunk_size):
+                decoded += reader.feed(data[i:i + chunk_size])
+            self.assertEqual(len(decoded), 2)
+            for (header, payload), (expected_header, expected_payload) in zip(decoded, frames):
+                self.assertEqual(header, {**expected_header, 'size': len(expected_payload)})
+                self.assertEqual(payload, expected_payload)
+
+    def test_encode_sample(self) -> None:
+        """Encoded samples should be cached, and base64 data should match the PNG data."""
+        sample = {'image': Image.new('RGB', (8, 8), (255, 0, 0)), 'timestamp': 0.0}
+        png_bytes = encode_sample(sample, FORMAT_PNG)
+        self.assertIs(encode_sample(sample, FORMAT_PNG), png_bytes)
+        assert isinstance(png_bytes, bytes)
+        self.assertEqual(Image.open(io.BytesIO(png_bytes)).getpixel((0, 0)), (255, 0, 0))
+        self.assertEqual(base64.b64decode(encode_sample(sample, FORMAT_BASE64)), png_bytes)
+
+    def test_stream_format(self) -> None:
+        """Unknown formats should fall back to PNG."""
+        self.assertEqual(stream_format(None), FORMAT_PNG)
+        self.assertEqual(stream_format('bmp'), FORMAT_PNG)
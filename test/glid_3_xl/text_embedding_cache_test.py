@@ -0,0 +1,80 @@
+"""Tests caching GLID-3-XL text embeddings."""
+import gc
+import unittest
+
+import numpy as np
+
+from src.glid_3_xl.text_embedding_cache import TextEmbeddingCache
+
+
+class _MockEncoder:
+    """Encodes texts as uppercase strings, recording every batch it receives."""
+
+    def __init__(self) -> None:
+        self.batches: list[list[str]] = []
+
+    def encode(self, texts: list[str]) -> list[str]:
+        """Records and encodes a batch of texts."""
+        self.batches.append(list(texts))
+        return [text.upper() for text in texts]
+
+
+class TextEmbeddingCacheTest(unittest.TestCase):
+    """Tests caching GLID-3-XL text embeddings."""
+
+    def setUp(self) -> None:
+        # Bypass the singleton so each test gets an empty cache:
+        self.cache = type.__call__(TextEmbeddingCache, 3)
+
+    def test_unique_texts_encoded_once(self) -> None:
+        """Each unique text should be encoded once, with duplicates sharing the same embedding."""
+        encoder = _MockEncoder()
+        embeddings = self.cache.encode('bert', encoder, ['a', 'b', 'a', ''], encoder.encode)
+        self.assertEqual(embeddings, [['A'], ['B'], ['A'], ['']])
+        self.assertIs(embeddings[0], embeddings[2])
+        self.assertEqual(encoder.batches, [['a', 'b', '']])
+        self.assertEqual(self.cache.encode('bert', encoder, ['b', 'c'], encoder.encode), [['B'], ['C']])
+        self.assertEqual(encoder.batches[1:], [['c']])
+
+    def test_embeddings_copied_from_batch(self) -> None:
+        """Cached embeddings should not be views into the batched encoder output."""
+        batches: list[np.ndarray] = []
+
+        def _encode(texts: list[str]) -> np.ndarray:
+            batches.append(np.arange(len(texts) * 4, dtype=np.float32).reshape((len(texts), 4)))
+            return batches[-1]
+
+        embeddings = self.cache.encode('bert', self, ['a', 'b'], _encode)
+        self.assertEqual((1, 4), embeddings[1].shape)
+        np.testing.assert_array_equal(batches[0][1:2], embeddings[1])
+        for embedding in embeddings:
+            self.assertFalse(np.shares_memory(batches[0], embedding))
+
+    def test_keys_include_encoder_and_model(self) -> None:
+        """Embeddings should not be shared between encoder names or model objects."""
+        first = _MockEncoder()
+        second = _MockEncoder()
+        self.cache.encode('bert', first, ['a'], first.encode)
+        self.cache.encode('clip', first, ['a'], first.encode)
+        self.cache.encode('bert', second, ['a'], second.encode)
+        self.assertEqual(first.batches, [['a'], ['a']])
+        self.assertEqual(second.batches, [['a']])
+
+    def test_least_recently_used_discarded(self) -> None:
+        """The least recently used embeddings should be discarded once the cache is full."""
+        encoder = _MockEncoder()
+        self.cache.encode('bert', encoder, ['a', 'b', 'c'], encoder.encode)
+        self.cache.encode('bert', encoder, ['a'], encoder.encode)
+        self.cache.encode('bert', encoder, ['d'], encoder.encode)
+        self.assertEqual(len(self.cache), 3)
+        self.cache.encode('bert', encoder, ['a', 'b'], encoder.encode)
+        self.assertEqual(encoder.batches[-1], ['b'])
+
+    def test_discard_when_model_deleted(self) -> None:
+        """Embeddings should be discarded when their model is garbage collected."""
+        encoder = _MockEncoder()
+        self.cache.encode('bert', encoder, ['a', 'b'], encoder.encode)
+        self.assertEqual(len(self.cache), 2)
+        del encoder
+        gc.collect()
+        self.assertEqual(len(self.cache), 0)
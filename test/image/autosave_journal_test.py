@@ -0,0 +1,193 @@
+"""Tests background autosave journaling and journal recovery."""
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from PySide6.QtCore import QSize, QRect, Qt
+from PySide6.QtGui import QImage, QPainter, QTransform
+from PySide6.QtWidgets import QApplication
+
+from src.config.application_config import AppConfig
+from src.config.cache import Cache
+from src.config.key_config import KeyConfig
+from src.image.autosave_journal import AutosaveJournal, read_journal, read_records, recover_journal, \
+    journal_exists, RECORD_TYPE_TILE, RECORD_TYPE_STRUCTURE
+from src.image.layers.image_layer import ImageLayer
+from src.image.layers.image_stack import ImageStack
+from src.image.layers.layer_group import LayerGroup
+from src.undo_stack import UndoStack
+
+IMG_SIZE = QSize(512, 512)
+GEN_AREA_SIZE = QSize(300, 300)
+MIN_GEN_AREA = QSize(8, 8)
+MAX_GEN_AREA = QSize(999, 999)
+INIT_IMAGE = 'test/resources/test_images/source.png'
+app = QApplication.instance() or QApplication(sys.argv)
+
+
+class AutosaveJournalTest(unittest.TestCase):
+    """Tests background autosave journaling and journal recovery."""
+
+    def setUp(self) -> None:
+        while os.path.basename(os.getcwd()) not in ('IntraPaint', ''):
+            os.chdir('..')
+        assert os.path.basename(os.getcwd()) == 'IntraPaint'
+        AppConfig('test/resources/app_config_test.json')
+        KeyConfig('test/resources/key_config_test.json')
+        Cache('test/resources/cache_test.json')
+        AppConfig()._reset()
+        KeyConfig()._reset()
+        Cache()._reset()
+        UndoStack().clear()
+        self._dir = tempfile.TemporaryDirectory()
+        self.journal_path = os.path.join(self._dir.name, 'journal')
+        self.image_stack = ImageStack(IMG_SIZE, GEN_AREA_SIZE, MIN_GEN_AREA, MAX_GEN_AREA)
+        init_image = QImage(INIT_IMAGE).scaled(IMG_SIZE).convertToFormat(QImage.Format.Format_ARGB32_Premultiplied)
+        self.image_stack.load_image(init_image)
+        self.journal = AutosaveJournal(self.image_stack, self.journal_path)
+
+    def tearDown(self) -> None:
+        self.journal.stop()
+        self._dir.cleanup()
+
+    def _tile_record_count(self) -> int:
+        return sum(1 for header, _ in read_records(self.journal_path) if header['type'] == RECORD_TYPE_TILE)
+
+    def test_recover_layers(self) -> None:
+        """Recovered layer structure and image content should match the journaled image stack."""
+        group = self.image_stack.create_layer_group('group')
+        layer = self.image_stack.create_layer('drawn', layer_parent=group)
+        layer.set_opacity(0.5)
+        layer.set_transform(QTransform.fromTranslate(10, 20))
+        with layer.borrow_image(QRect(0, 0, 100, 100)) as image:
+            painter = QPainter(image)
+            painter.fillRect(QRect(0, 0, 100, 100), Qt.GlobalColor.red)
+            painter.end()
+        expected_images = [image_layer.image for image_layer in self.image_stack.image_layers]
+
+        self.journal.start()
+        self.assertTrue(self.journal.flush(5.0))
+        journal_data = read_journal(self.journal_path)
+        assert journal_data is not None
+        layer_stack, size, active_layer = journal_data
+        self.assertEqual(IMG_SIZE, size)
+        self.assertIsNotNone(active_layer)
+        restored_layers = [child for child in layer_stack.recursive_child_layers if isinstance(child, ImageLayer)]
+        self.assertEqual(expected_images, [restored.image for restored in restored_layers])
+        restored_group = layer_stack.child_layers[0]
+        self.assertIsInstance(restored_group, LayerGroup)
+        assert isinstance(restored_group, LayerGroup)
+        restored_layer = restored_group.child_layers[0]
+        assert isinstance(restored_layer, ImageLayer)
+        self.assertEqual('drawn', restored_layer.name)
+        self.assertEqual(0.5, restored_layer.opacity)
+        self.assertEqual(QTransform.fromTranslate(10, 20), restored_layer.transform)
+
+        other_stack = ImageStack(IMG_SIZE, GEN_AREA_SIZE, MIN_GEN_AREA, MAX_GEN_AREA)
+        self.assertTrue(recover_journal(other_stack, self.journal_path))
+        self.assertEqual(self.image_stack.qimage(), other_stack.qimage())
+
+    def test_incremental_tiles(self) -> None:
+        """Only tiles that changed since the last check should be written to the journal."""
+        self.journal.start()
+        self.assertTrue(self.journal.flush(5.0))
+        initial_count = self._tile_record_count()
+        self.assertEqual(4, initial_count)
+
+        self.assertTrue(self.journal.flush(5.0))
+        self.assertEqual(initial_count, self._tile_record_count())
+
+        layer = self.image_stack.image_layers[0]
+        with layer.borrow_image(QRect(300, 300, 10, 10)) as image:
+            painter = QPainter(image)
+            painter.fillRect(QRect(300, 300, 10, 10), Qt.GlobalColor.blue)
+            painter.end()
+        self.assertTrue(self.journal.flush(5.0))
+        self.assertEqual(initial_count + 1, self._tile_record_count())
+        journal_data = read_journal(self.journal_path)
+        assert journal_data is not None
+        restored_layer = journal_data[0].child_layers[0]
+        assert isinstance(restored_layer, ImageLayer)
+        self.assertEqual(layer.image, restored_layer.image)
+
+    def test_compaction(self) -> None:
+        """Compacting the journal should keep only the latest tiles."""
+        layer = self.image_stack.image_layers[0]
+        with patch('src.image.autosave_journal.MIN_COMPACT_SIZE', 0):
+            self.journal.start()
+            for i in range(4):
+                with layer.borrow_image() as image:
+                    image.fill(Qt.GlobalColor.red if i % 2 == 0 else Qt.GlobalColor.green)
+                self.assertTrue(self.journal.flush(5.0))
+        self.assertLessEqual(self._tile_record_count(), 8)
+        journal_data = read_journal(self.journal_path)
+        assert journal_data is not None
+        restored_layer = journal_data[0].child_layers[0]
+        assert isinstance(restored_layer, ImageLayer)
+        self.assertEqual(layer.image, restored_layer.image)
+
+    def test_failed_compaction_removes_temp_file(self) -> None:
+        """The temporary compacted journal should be removed if compaction fails."""
+        layer = self.image_stack.image_layers[0]
+        with patch('src.image.autosave_journal.MIN_COMPACT_SIZE', 0), \
+                patch('src.image.autosave_journal.os.replace', side_effect=OSError('replace failed')):
+            self.journal.start()
+            with layer.borrow_image() as image:
+                image.fill(Qt.GlobalColor.red)
+            self.assertTrue(self.journal.flush(5.0))
+        self.assertFalse(os.path.exists(f'{self.journal_path}.tmp'))
+        self.assertIsNotNone(read_journal(self.journal_path))
+
+    def test_idle_checks_skip_layer_images(self) -> None:
+        """Checking an unchanged image stack shouldn't read layer images, but structure changes should be written."""
+        self.journal.start()
+        self.assertTrue(self.journal.flush(5.0))
+        with patch.object(ImageLayer, 'get_qimage', autospec=True, side_effect=ImageLayer.get_qimage) as get_qimage:
+            self.journal.check_for_changes()
+            self.journal.check_for_changes()
+            self.assertEqual(0, get_qimage.call_count)
+            self.image_stack.image_layers[0].name = 'renamed'
+            self.assertTrue(self.journal.flush(5.0))
+            self.assertGreater(get_qimage.call_count, 0)
+        structures = [header for header, _ in read_records(self.journal_path)
+                      if header['type'] == RECORD_TYPE_STRUCTURE]
+        self.assertEqual('renamed', structures[-1]['root']['children'][0]['name'])
+
+    def test_interrupted_write(self) -> None:
+        """An incomplete final record should be ignored when reading the journal."""
+        self.journal.start()
+        self.assertTrue(self.journal.flush(5.0))
+        self.journal.stop(delete_journal=False)
+        with open(self.journal_path, 'ab') as file:
+            file.write(b'\x00\x00\x01\x00{"type": "tile"')
+        self.assertEqual(4, self._tile_record_count())
+        self.assertIsNotNone(read_journal(self.journal_path))
+
+    def test_stop_deletes_journal(self) -> None:
+        """Stopping normally should delete the journal."""
+        self.journal.start()
+        self.assertTrue(self.journal.flush(5.0))
+        self.assertTrue(journal_exists(self.journal_path))
+        self.journal.stop()
+        self.assertFalse(journal_exists(self.journal_path))
+
+    def test_second_instance_skips_journal(self) -> None:
+        """A second instance using the same journal path should neither replace nor delete the active journal."""
+        self.journal.start()
+        self.assertTrue(self.journal.flush(5.0))
+        journal_size = os.path.getsize(self.journal_path)
+        second_journal = AutosaveJournal(ImageStack(IMG_SIZE, GEN_AREA_SIZE, MIN_GEN_AREA, MAX_GEN_AREA),
+                                         self.journal_path)
+        self.assertFalse(second_journal.acquire_lock())
+        second_journal.start()
+        self.assertTrue(second_journal.flush(5.0))
+        second_journal.stop()
+        self.assertEqual(journal_size, os.path.getsize(self.journal_path))
+        self.assertIsNotNone(read_journal(self.journal_path))
+
+        self.journal.stop()
+        self.assertFalse(journal_exists(self.journal_path))
+        self.assertTrue(second_journal.acquire_lock())
+        second_journal.stop()
@@ -0,0 +1,120 @@
+"""Tests smudge brush dab placement, mask caching, and blending."""
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+from PySide6.QtCore import QRect, Qt
+from PySide6.QtGui import QImage, QColor, QPainter
+from PySide6.QtWidgets import QApplication
+
+from src.config.application_config import AppConfig
+from src.config.cache import Cache
+from src.config.key_config import KeyConfig
+from src.image.brush.smudge_brush import SmudgeBrush, DAB_SPACING_FRACTION, _dab_mask
+from src.image.layers.image_layer import ImageLayer
+from src.undo_stack import UndoStack
+from src.util.visual.image_utils import image_data_as_numpy_8bit
+
+app = QApplication.instance() or QApplication(sys.argv)
+BRUSH_SIZE = 40
+
+
+class SmudgeBrushTest(unittest.TestCase):
+    """Tests smudge brush dab placement, mask caching, and blending."""
+
+    def setUp(self) -> None:
+        while os.path.basename(os.getcwd()) not in ('IntraPaint', ''):
+            os.chdir('..')
+        assert os.path.basename(os.getcwd()) == 'IntraPaint'
+        AppConfig('test/resources/app_config_test.json')._reset()
+        KeyConfig('test/resources/key_config_test.json')._reset()
+        Cache('test/resources/cache_test.json')._reset()
+        UndoStack().clear()
+        image = QImage(256, 256, QImage.Format.Format_ARGB32_Premultiplied)
+        image.fill(Qt.GlobalColor.white)
+        painter = QPainter(image)
+        painter.fillRect(QRect(0, 0, 128, 256), QColor(Qt.GlobalColor.red))
+        painter.end()
+        self.layer = ImageLayer(image, 'smudge test')
+        self.brush = SmudgeBrush(self.layer)
+        self.brush.brush_size = BRUSH_SIZE
+        _dab_mask.cache_clear()
+
+    def tearDown(self) -> None:
+        UndoStack().clear()
+
+    def test_dab_spacing(self) -> None:
+        """Dabs should be spaced by a fraction of the brush size, regardless of input event spacing."""
+        self.brush.start_stroke()
+        self.brush.stroke_to(100, 100, None, None, None)
+        for x in range(101, 141):
+            self.brush.stroke_to(x, 100.5, None, None, None)
+        spacing = BRUSH_SIZE * DAB_SPACING_FRACTION
+        self.assertEqual(1 + int(40 / spacing), len(self.brush._input_buffer))
+        self.brush.end_stroke()
+        self.assertEqual(0, len(self.brush._input_buffer))
+
+    def test_mask_cache(self) -> None:
+        """Dabs with the same size, opacity, and hardness should share one mask."""
+        self.brush.start_stroke()
+        for x in range(100, 160, 2):
+            self.brush.stroke_to(x, 100, None, None, None)
+        self.brush.end_stroke()
+        cache_info = _dab_mask.cache_info()
+        self.assertEqual(1, cache_info.misses)
+        self.assertGreater(cache_info.hits, 0)
+        mask = _dab_mask(BRUSH_SIZE, 1.0, 1.0, True)
+        self.assertEqual((BRUSH_SIZE, BRUSH_SIZE, 1), mask.shape)
+        self.assertAlmostEqual(1.0, float(mask[BRUSH_SIZE // 2, BRUSH_SIZE // 2, 0]))
+        self.assertEqual(0.0, float(mask[0, 0, 0]))
+
+    def test_smudge_moves_color(self) -> None:
+        """Smudging from red into white should drag red into the white area, without touching distant pixels."""
+        self.brush.start_stroke()
+        for x in range(110, 170, 3):
+            self.brush.stroke_to(x, 128, None, None, None)
+        self.brush.end_stroke()
+        image = self.layer.image
+        smudged = image.pixelColor(140, 128)
+        self.assertEqual(255, smudged.red())
+        self.assertLess(smudged.green(), 255)
+        self.assertEqual(QColor(Qt.GlobalColor.white), image.pixelColor(140, 20))
+        self.assertEqual(QColor(Qt.GlobalColor.red), image.pixelColor(20, 128))
+
+    def test_input_mask(self) -> None:
+        """Smudging should not change areas outside the input mask."""
+        mask = QImage(256, 256, QImage.Format.Format_ARGB32_Premultiplied)
+        mask.fill(Qt.GlobalColor.transparent)
+        painter = QPainter(mask)
+        painter.fillRect(QRect(0, 0, 256, 128), QColor(Qt.GlobalColor.black))
+        painter.end()
+        self.brush.set_input_mask(mask)
+        self.brush.start_stroke()
+        for x in range(110, 170, 3):
+            self.brush.stroke_to(x, 128, None, None, None)
+        self.brush.end_stroke()
+        image = self.layer.image
+        self.assertLess(image.pixelColor(140, 120).green(), 255)
+        self.assertEqual(QColor(Qt.GlobalColor.white), image.pixelColor(140, 135))
+
+    def test_pressure_change_bounds(self) -> None:
+        """Change bounds should cover larger samples drawn after tablet pressure reduces the brush size."""
+        initial_image = self.layer.image
+        np_initial_image = image_data_as_numpy_8bit(initial_image).copy()
+        with patch.object(self.layer, 'borrow_image', wraps=self.layer.borrow_image) as borrow_image:
+            self.brush.start_stroke()
+            self.brush.stroke_to(148, 128, 1.0, None, None)
+            self.brush._draw_buffered_events()
+            for x in range(147, 136, -1):
+                self.brush.stroke_to(x, 128, 0.1, None, None)
+            self.brush.end_stroke()
+        image = self.layer.image
+        changed = np.any(image_data_as_numpy_8bit(image) != np_initial_image, axis=2)
+        self.assertTrue(changed.any())
+        in_change_bounds = np.zeros(changed.shape, dtype=bool)
+        for call in borrow_image.call_args_list:
+            bounds = call.args[0]
+            in_change_bounds[bounds.y():bounds.y() + bounds.height(), bounds.x():bounds.x() + bounds.width()] = True
+        self.assertFalse(np.any(changed & ~in_change_bounds))
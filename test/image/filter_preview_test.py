@@ -0,0 +1,54 @@
+"""Tests generating image filter previews outside the UI thread."""
+import os
+import sys
+import threading
+import unittest
+
+from PySide6.QtCore import QSize, QPoint
+from PySide6.QtGui import QImage, QColor
+from PySide6.QtWidgets import QApplication
+
+from src.config.application_config import AppConfig
+from src.config.cache import Cache
+from src.config.key_config import KeyConfig
+from src.image.filter.posterize import PosterizeFilter
+from src.image.layers.image_stack import ImageStack
+from src.undo_stack import UndoStack
+
+IMG_SIZE = QSize(64, 64)
+LAYER_COLOR = QColor(120, 60, 200)
+app = QApplication.instance() or QApplication(sys.argv)
+
+
+class FilterPreviewTest(unittest.TestCase):
+    """Tests generating image filter previews outside the UI thread."""
+
+    def setUp(self) -> None:
+        while os.path.basename(os.getcwd()) not in ('IntraPaint', ''):
+            os.chdir('..')
+        assert os.path.basename(os.getcwd()) == 'IntraPaint'
+        AppConfig('test/resources/app_config_test.json')._reset()
+        KeyConfig('test/resources/key_config_test.json')._reset()
+        Cache('test/resources/cache_test.json')._reset()
+        UndoStack().clear()
+        self.image_stack = ImageStack(IMG_SIZE, IMG_SIZE, IMG_SIZE, IMG_SIZE)
+        image = QImage(IMG_SIZE, QImage.Format.Format_ARGB32_Premultiplied)
+        image.fill(LAYER_COLOR)
+        self.layer = self.image_stack.create_layer(None, image)
+        self.image_filter = PosterizeFilter(self.image_stack)
+        self.image_filter.selection_only = False
+
+    def test_preview_filtered_on_worker_thread(self) -> None:
+        """Copied layer images should be filtered on a worker thread without changing the image stack."""
+        preview = self.image_filter.get_filter_preview([1])
+        worker = threading.Thread(target=preview.filter_layer_images)
+        worker.start()
+        worker.join()
+        preview_image = preview.render()
+
+        expected_color = PosterizeFilter.posterize(self.layer.image, 1).pixelColor(QPoint(0, 0))
+        self.assertEqual(IMG_SIZE, preview_image.size())
+        self.assertEqual(expected_color, preview_image.pixelColor(QPoint(32, 32)))
+        self.assertNotEqual(LAYER_COLOR, expected_color)
+        self.assertEqual(LAYER_COLOR, self.layer.image.pixelColor(QPoint(32, 32)))
+        self.assertEqual(preview_image, self.image_filter.get_preview_image([1]))
@@ -12,7 +12,7 @@ from src.config.application_config import AppConfig
 from src.config.cache import Cache
 from src.config.key_config import KeyConfig
 from src.image.composite_mode import CompositeMode
-from src.image.layers.image_layer import ImageLayer
+from src.image.layers.image_layer import ImageLayer, UNDO_TILE_SIZE
 from src.undo_stack import UndoStack
 from src.util.visual.geometry_utils import map_rect_precise
 from src.util.visual.image_utils import image_is_fully_transparent, create_transparent_image
@@ -131,6 +131,38 @@ class ImageLayerTest(unittest.TestCase):
         self.assertNotEqual(final_image, init_image)
         self.assertEqual(expected_image, final_image)
 
+    def test_borrow_image_transaction(self) -> None:
+        """Test that borrow_image changes within an undo transaction are committed as one entry, copying each changed
+           tile once."""
+        initial_image = QImage(INIT_IMAGE).convertToFormat(QImage.Format.Format_ARGB32_Premultiplied) \
+            .copy(QRect(QPoint(), IMG_SIZE))
+        self.image_layer.set_image(initial_image)
+        UndoStack().reset_stats()
+        change_rects = [QRect(10, 10, 20, 20), QRect(20, 20, 20, 20), QRect(300, 300, 50, 50)]
+        with UndoStack().transaction('test'):
+            for change_rect in change_rects:
+                with self.image_layer.borrow_image(change_rect) as edited_image:
+                    painter = QPainter(edited_image)
+                    painter.fillRect(change_rect, Qt.GlobalColor.red)
+                    painter.end()
+            self.assertEqual(0, UndoStack().undo_count())
+        self.assertEqual(1, UndoStack().undo_count())
+        stats = UndoStack().stats
+        self.assertEqual(1, stats.transactions)
+        self.assertEqual(len(change_rects), stats.transaction_changes)
+        self.assertEqual(0, stats.commits)
+        self.assertEqual(2, stats.snapshot_tiles)
+        self.assertEqual(2 * UNDO_TILE_SIZE * UNDO_TILE_SIZE * 4, stats.snapshot_bytes)
+
+        changed_image = self.image_layer.image
+        self.assertNotEqual(changed_image, initial_image)
+        UndoStack().undo()
+        self.assertEqual(initial_image, self.image_layer.image)
+        UndoStack().redo()
+        self.assertEqual(changed_image, self.image_layer.image)
+        UndoStack().undo()
+        self.assertEqual(initial_image, self.image_layer.image)
+
     # Render testing, no base image:
 
     def test_basic_render(self) -> None:
@@ -0,0 +1,146 @@
+"""Tests cached child layer lists, bounds, and hit-tests in nested layer groups."""
+import os
+import random
+import sys
+import unittest
+
+from PySide6.QtCore import QSize, QRect, QPoint
+from PySide6.QtGui import QTransform
+from PySide6.QtWidgets import QApplication
+
+from src.config.application_config import AppConfig
+from src.config.cache import Cache
+from src.config.key_config import KeyConfig
+from src.image.layers.image_layer import ImageLayer
+from src.image.layers.layer import Layer
+from src.image.layers.layer_group import LayerGroup
+from src.image.layers.layer_spatial_index import LayerSpatialIndex, MAX_INDEXED_CELLS
+from src.undo_stack import UndoStack
+
+app = QApplication.instance() or QApplication(sys.argv)
+
+GROUP_COUNT = 10
+LAYERS_PER_GROUP = 30
+CANVAS_SIZE = 4000
+
+
+def _brute_force_child_layers(group: LayerGroup) -> list[Layer]:
+    layers: list[Layer] = []
+    for child in group.child_layers:
+        layers.append(child)
+        if isinstance(child, LayerGroup):
+            layers += _brute_force_child_layers(child)
+    return layers
+
+
+def _brute_force_bounds(group: LayerGroup) -> QRect:
+    bounds = QRect()
+    for layer in _brute_force_child_layers(group):
+        if isinstance(layer, ImageLayer):
+            bounds = bounds.united(layer.transformed_bounds)
+    return bounds
+
+
+def _brute_force_hits(group: LayerGroup, rect: QRect) -> list[Layer]:
+    return [layer for layer in _brute_force_child_layers(group)
+            if isinstance(layer, ImageLayer) and layer.transformed_bounds.intersects(rect)]
+
+
+class LayerGroupTest(unittest.TestCase):
+    """Tests cached child layer lists, bounds, and hit-tests in nested layer groups."""
+
+    def setUp(self) -> None:
+        while os.path.basename(os.getcwd()) not in ('IntraPaint', ''):
+            os.chdir('..')
+        assert os.path.basename(os.getcwd()) == 'IntraPaint'
+        AppConfig('test/resources/app_config_test.json')._reset()
+        KeyConfig('test/resources/key_config_test.json')._reset()
+        Cache('test/resources/cache_test.json')._reset()
+        UndoStack().clear()
+        self.rng = random.Random(0)
+        self.root = LayerGroup('root')
+        self.groups: list[LayerGroup] = []
+        self.layers: list[ImageLayer] = []
+        for group_idx in range(GROUP_COUNT):
+            group = LayerGroup(f'group {group_idx}')
+            self.root.insert_layer(group, self.root.count)
+            self.groups.append(group)
+            for layer_idx in range(LAYERS_PER_GROUP):
+                layer = ImageLayer(QSize(self.rng.randint(10, 300), self.rng.randint(10, 300)),
+                                   f'layer {group_idx}-{layer_idx}')
+                layer.set_transform(self._random_transform())
+                group.insert_layer(layer, self.rng.randint(0, group.count))
+                self.layers.append(layer)
+        # Add one nested group, and one very large layer:
+        nested_group = LayerGroup('nested')
+        self.groups[0].insert_layer(nested_group, 0)
+        large_layer = ImageLayer(QSize(CANVAS_SIZE, CANVAS_SIZE), 'large')
+        nested_group.insert_layer(large_layer, 0)
+        self.layers.append(large_layer)
+
+    def _random_transform(self) -> QTransform:
+        transform = QTransform.fromTranslate(self.rng.randint(-100, CANVAS_SIZE), self.rng.randint(-100, CANVAS_SIZE))
+        if self.rng.random() > 0.5:
+            transform = QTransform().rotate(self.rng.randint(0, 359)) * transform
+        return transform
+
+    def _assert_caches_match(self) -> None:
+        self.assertEqual(_brute_force_child_layers(self.root), self.root.recursive_child_layers)
+        for group in (self.root, *self.groups):
+            self.assertEqual(_brute_force_bounds(group), group.bounds)
+        for _ in range(50):
+            point = QPoint(self.rng.randint(-200, CANVAS_SIZE + 200), self.rng.randint(-200, CANVAS_SIZE + 200))
+            self.assertEqual(_brute_force_hits(self.root, QRect(point, QSize(1, 1))), self.root.layers_at_point(point))
+            rect = QRect(point, QSize(self.rng.randint(1, 1000), self.rng.randint(1, 1000)))
+            self.assertEqual(_brute_force_hits(self.root, rect), self.root.layers_in_bounds(rect))
+
+    def test_initial_caches(self) -> None:
+        """Cached layer lists, bounds, and hit-tests should match full layer tree checks."""
+        self._assert_caches_match()
+
+    def test_transform_changes(self) -> None:
+        """Caches should update when nested layers are transformed."""
+        for layer in self.rng.sample(self.layers, 40):
+            layer.set_transform(self._random_transform())
+        self._assert_caches_match()
+
+    def test_delayed_signal_changes(self) -> None:
+        """Caches should update after transformations applied while signals are delayed."""
+        with self.root.all_signals_delayed():
+            for layer in self.rng.sample(self.layers, 40):
+                layer.set_transform(self._random_transform())
+        self._assert_caches_match()
+
+    def test_layer_tree_changes(self) -> None:
+        """Caches should update when layers are inserted, removed, or moved within nested groups."""
+        self.root.recursive_child_layers  # Make sure the flattened list is cached before changes.
+        for layer in self.rng.sample(self.layers, 20):
+            parent = layer.layer_parent
+            assert isinstance(parent, LayerGroup)
+            parent.remove_layer(layer)
+            self.rng.choice(self.groups).insert_layer(layer, 0)
+        for group in self.groups:
+            group.move_layer(group.get_layer_by_index(0), group.count - 1)
+        self.root.move_layer(self.groups[3], 0)
+        self._assert_caches_match()
+        self.groups[5].remove_layer(self.groups[5].get_layer_by_index(0))
+        self.root.remove_layer(self.groups[2])
+        self.groups.pop(2)
+        self._assert_caches_match()
+
+    def test_spatial_index(self) -> None:
+        """Index queries should only return items with intersecting bounds, including very large items."""
+        index: LayerSpatialIndex[str] = LayerSpatialIndex(cell_size=10)
+        index.set_bounds('small', QRect(5, 5, 10, 10))
+        index.set_bounds('large', QRect(-1000, -1000, 1008, 1008))
+        self.assertLess(MAX_INDEXED_CELLS, (1008 // 10) ** 2)
+        index.set_bounds('empty', QRect(5, 5, 0, 0))
+        self.assertEqual({'small', 'large'}, index.items_at(QPoint(5, 5)))
+        self.assertEqual({'large'}, index.items_at(QPoint(4, 4)))
+        self.assertEqual({'small'}, index.items_intersecting(QRect(12, 12, 100, 100)))
+        index.set_bounds('small', QRect(100, 100, 5, 5))
+        self.assertEqual(set(), index.items_at(QPoint(5, 5)) - {'large'})
+        self.assertEqual({'small'}, index.items_at(QPoint(102, 102)))
+        index.remove('small')
+        self.assertEqual(set(), index.items_at(QPoint(102, 102)))
+        self.assertEqual(2, len(index))
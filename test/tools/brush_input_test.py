@@ -0,0 +1,139 @@
+"""Tests sub-pixel brush input and tablet input batching."""
+import datetime
+import os
+import sys
+import time
+import unittest
+from typing import Sequence
+from unittest.mock import patch
+
+from PySide6.QtCore import QSize, QPointF, Qt, QEvent
+from PySide6.QtGui import QIcon, QMouseEvent, QPointingDevice
+from PySide6.QtWidgets import QApplication
+
+from src.config.application_config import AppConfig
+from src.config.cache import Cache
+from src.config.key_config import KeyConfig
+from src.image.brush.layer_brush import LayerBrush, StrokePoint
+from src.image.brush.mypaint_layer_brush import MyPaintLayerBrush
+from src.image.layers.image_stack import ImageStack
+from src.image.mypaint.mypaint_layer_surface import DEFAULT_DTIME
+from src.tools.brush_tool import BrushTool, INPUT_BATCH_INTERVAL_MS
+from src.ui.image_viewer import ImageViewer
+from src.undo_stack import UndoStack
+
+IMAGE_SIZE = QSize(256, 256)
+app = QApplication.instance() or QApplication(sys.argv)
+
+
+class _RecordingBrush(LayerBrush):
+    """Records each batch of inputs instead of drawing."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.batches: list[list[StrokePoint]] = []
+
+    def _draw_points(self, points: Sequence[StrokePoint]) -> None:
+        self.batches.append(list(points))
+
+
+def _mouse_event(event_type: QEvent.Type, pos: QPointF) -> QMouseEvent:
+    buttons = Qt.MouseButton.NoButton if event_type == QEvent.Type.MouseButtonRelease else Qt.MouseButton.LeftButton
+    return QMouseEvent(event_type, pos, pos, Qt.MouseButton.LeftButton, buttons, Qt.KeyboardModifier.NoModifier)
+
+
+class BrushInputTest(unittest.TestCase):
+    """Tests sub-pixel brush input and tablet input batching."""
+
+    def setUp(self) -> None:
+        while os.path.basename(os.getcwd()) not in ('IntraPaint', ''):
+            os.chdir('..')
+        assert os.path.basename(os.getcwd()) == 'IntraPaint'
+        AppConfig('test/resources/app_config_test.json')._reset()
+        KeyConfig('test/resources/key_config_test.json')._reset()
+        Cache('test/resources/cache_test.json')._reset()
+        UndoStack().clear()
+        self.image_stack = ImageStack(IMAGE_SIZE, IMAGE_SIZE, IMAGE_SIZE, IMAGE_SIZE)
+        self.image_stack.active_layer = self.image_stack.create_layer()
+        self.image_viewer = ImageViewer(None, self.image_stack)
+        self.brush = _RecordingBrush()
+        self.tool = BrushTool(KeyConfig.BRUSH_TOOL_KEY, 'test', 'test', QIcon(), self.image_stack, self.image_viewer,
+                              self.brush)
+        self.tool.is_active = True
+
+    def tearDown(self) -> None:
+        self.tool.is_active = False
+        UndoStack().clear()
+
+    def _image_pos(self, widget_pos: QPointF) -> QPointF:
+        inverse_transform, _ = self.image_viewer.viewportTransform().inverted()
+        return inverse_transform.map(widget_pos)
+
+    def test_sub_pixel_positions(self) -> None:
+        """Mouse inputs should be passed to the brush without rounding."""
+        press_pos = QPointF(100.25, 80.75)
+        move_pos = QPointF(103.5, 81.125)
+        self.tool.mouse_click(_mouse_event(QEvent.Type.MouseButtonPress, press_pos),
+                              self._image_pos(press_pos).toPoint())
+        self.tool.mouse_move(_mouse_event(QEvent.Type.MouseMove, move_pos), self._image_pos(move_pos).toPoint())
+        self.assertEqual(2, len(self.brush.batches))
+        for batch, pos in zip(self.brush.batches, (press_pos, move_pos)):
+            self.assertEqual(1, len(batch))
+            expected = self._image_pos(pos)
+            self.assertAlmostEqual(expected.x(), batch[0].x)
+            self.assertAlmostEqual(expected.y(), batch[0].y)
+        self.tool.mouse_release(_mouse_event(QEvent.Type.MouseButtonRelease, move_pos),
+                                self._image_pos(move_pos).toPoint())
+
+    def test_tablet_input_batching(self) -> None:
+        """Tablet inputs should be drawn together once per batch interval, keeping per-input pressure."""
+        self.tool._tablet_input = QPointingDevice.PointerType.Pen
+        self.tool._tablet_pressure = 0.5
+        self.tool._tablet_event_timestamp = datetime.datetime.now().timestamp()
+        start = QPointF(50.0, 50.0)
+        self.tool.mouse_click(_mouse_event(QEvent.Type.MouseButtonPress, start), self._image_pos(start).toPoint())
+        self.assertEqual(1, len(self.brush.batches))
+        for i in range(5):
+            self.tool._tablet_pressure = 0.5 + i * 0.1
+            pos = QPointF(50.5 + i, 50.0)
+            self.tool.mouse_move(_mouse_event(QEvent.Type.MouseMove, pos), self._image_pos(pos).toPoint())
+        self.assertEqual(1, len(self.brush.batches))
+        time.sleep(INPUT_BATCH_INTERVAL_MS * 2 / 1000)
+        QApplication.processEvents()
+        self.assertEqual(2, len(self.brush.batches))
+        self.assertEqual([0.5, 0.6, 0.7, 0.8, 0.9], [round(point.pressure, 3) for point in self.brush.batches[1]])
+
+        # Releasing should draw remaining inputs immediately:
+        end = QPointF(60.0, 50.0)
+        self.tool.mouse_move(_mouse_event(QEvent.Type.MouseMove, end), self._image_pos(end).toPoint())
+        self.tool.mouse_release(_mouse_event(QEvent.Type.MouseButtonRelease, end), self._image_pos(end).toPoint())
+        self.assertEqual(3, len(self.brush.batches))
+        self.assertFalse(self.brush.drawing)
+
+    def test_mouse_input_not_batched(self) -> None:
+        """Mouse inputs should be drawn as soon as they arrive."""
+        start = QPointF(20.0, 20.0)
+        self.tool.mouse_click(_mouse_event(QEvent.Type.MouseButtonPress, start), self._image_pos(start).toPoint())
+        for i in range(3):
+            pos = QPointF(21.0 + i, 20.0)
+            self.tool.mouse_move(_mouse_event(QEvent.Type.MouseMove, pos), self._image_pos(pos).toPoint())
+        self.assertEqual(4, len(self.brush.batches))
+        self.tool.mouse_release(_mouse_event(QEvent.Type.MouseButtonRelease, start), self._image_pos(start).toPoint())
+
+    def test_mypaint_input_timing(self) -> None:
+        """MyPaint inputs should use the time between input timestamps, or the default time step if it's unknown."""
+        brush = MyPaintLayerBrush()
+        brush.connect_to_layer(self.image_stack.active_layer)
+        with patch.object(brush._mp_surface, 'stroke_to_points') as stroke_to_points:
+            brush.stroke_points([StrokePoint(10.0, 10.0, timestamp_ms=1000),
+                                 StrokePoint(12.0, 10.0, 0.5, timestamp_ms=1016),
+                                 StrokePoint(14.0, 10.0, timestamp_ms=1016),
+                                 StrokePoint(16.0, 10.0)])
+            brush.stroke_points([StrokePoint(18.0, 10.0, timestamp_ms=1040)])
+            brush.end_stroke()
+            brush.stroke_points([StrokePoint(20.0, 10.0, timestamp_ms=2000)])
+        inputs = [surface_input for call in stroke_to_points.call_args_list for surface_input in call.args[0]]
+        self.assertEqual((10.0, 10.0, 1.0, 0.0, 0.0, DEFAULT_DTIME), inputs[0])
+        self.assertEqual((12.0, 10.0, 0.5, 0.0, 0.0), inputs[1][:5])
+        self.assertEqual([DEFAULT_DTIME, 0.016, DEFAULT_DTIME, DEFAULT_DTIME, 0.024, DEFAULT_DTIME],
+                         [round(surface_input[5], 3) for surface_input in inputs])
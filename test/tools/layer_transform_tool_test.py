@@ -0,0 +1,108 @@
+"""Tests fast previews shown while transforming layers."""
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+from PySide6.QtCore import QSize, QRect, QRectF
+from PySide6.QtGui import QTransform, QColor, QPainter
+from PySide6.QtTest import QTest
+from PySide6.QtWidgets import QApplication
+
+from src.config.application_config import AppConfig
+from src.config.cache import Cache
+from src.config.key_config import KeyConfig
+from src.image.layers.image_layer import ImageLayer
+from src.image.layers.image_stack import ImageStack
+from src.tools.layer_transform_tool import LayerTransformTool
+from src.image.layers.layer_group import RENDER_DELAY_MS
+from src.ui.image_viewer import ImageViewer, PREVIEW_PROXY_MAX_DIMENSION
+from src.ui.panel.layer_ui.layer_widget import LayerWidget, PROXY_MAX_DIMENSION as WIDGET_PROXY_MAX_DIMENSION
+from src.undo_stack import UndoStack
+from src.util.task_scheduler import TaskScheduler
+from src.util.visual.geometry_utils import map_rect_precise
+
+IMAGE_SIZE = QSize(2100, 2100)
+CONTENT_BOUNDS = QRect(100, 200, 1000, 500)
+app = QApplication.instance() or QApplication(sys.argv)
+
+
+class LayerTransformToolTest(unittest.TestCase):
+    """Tests fast previews shown while transforming layers."""
+
+    def setUp(self) -> None:
+        while os.path.basename(os.getcwd()) not in ('IntraPaint', ''):
+            os.chdir('..')
+        assert os.path.basename(os.getcwd()) == 'IntraPaint'
+        AppConfig('test/resources/app_config_test.json')._reset()
+        KeyConfig('test/resources/key_config_test.json')._reset()
+        Cache('test/resources/cache_test.json')._reset()
+        UndoStack().clear()
+        self.image_stack = ImageStack(IMAGE_SIZE, IMAGE_SIZE, IMAGE_SIZE, IMAGE_SIZE)
+        self.image_viewer = ImageViewer(None, self.image_stack)
+        self.layer = self.image_stack.create_layer()
+        image = self.layer.image
+        image.fill(QColor(0, 0, 0, 0))
+        painter = QPainter(image)
+        painter.fillRect(CONTENT_BOUNDS, QColor(255, 0, 0))
+        painter.end()
+        self.layer.image = image
+        self.image_stack.active_layer = self.layer
+        self.tool = LayerTransformTool(self.image_stack, self.image_viewer)
+        self.tool.is_active = True
+
+    def tearDown(self) -> None:
+        self.tool.is_active = False
+        self.assertTrue(TaskScheduler().wait_for_done(5000))
+
+    def test_transform_preview(self) -> None:
+        """Transformations should be previewed without re-rendering the image until changes stop."""
+        layer_stack = self.image_stack.layer_stack
+        stack_item = self.image_viewer._layer_items[layer_stack.id]
+        render_key = layer_stack.get_qimage().cacheKey()
+        transform = QTransform()
+        for i in range(1, 5):
+            transform = QTransform.fromTranslate(20 * i, 30).rotate(10 * i).scale(0.5, 0.75)
+            self.tool._transform_change_slot(transform)
+            QTest.qWait(RENDER_DELAY_MS * 2)
+        self.assertEqual(transform, self.layer.transform)
+        self.assertTrue(self.image_viewer.transform_preview_active)
+        self.assertTrue(layer_stack.render_deferred)
+        self.assertFalse(stack_item.isVisible())
+        self.assertEqual(render_key, layer_stack.get_qimage().cacheKey())
+
+        preview_item, _ = self.image_viewer._preview_items[self.layer.id]
+        self.assertLessEqual(preview_item.pixmap().width(), PREVIEW_PROXY_MAX_DIMENSION)
+        preview_scene_bounds = map_rect_precise(QRectF(preview_item.pixmap().rect()), preview_item.transform())
+        layer_scene_bounds = map_rect_precise(QRectF(self.layer.bounds), transform)
+        for preview_value, layer_value in zip(preview_scene_bounds.getRect(), layer_scene_bounds.getRect()):
+            self.assertAlmostEqual(preview_value, layer_value, delta=1.0)
+
+        self.tool._settle_timer.timeout.emit()
+        self.assertFalse(self.image_viewer.transform_preview_active)
+        self.assertFalse(layer_stack.render_deferred)
+        self.assertTrue(stack_item.isVisible())
+        self.assertNotEqual(render_key, layer_stack.get_qimage().cacheKey())
+        self.assertEqual(0, len(self.image_viewer._preview_items))
+        content_center = transform.map(CONTENT_BOUNDS.center()) - layer_stack.bounds.topLeft()
+        self.assertEqual(QColor(255, 0, 0), layer_stack.get_qimage().pixelColor(content_center))
+
+    def test_layer_widget_proxy(self) -> None:
+        """Layer previews should not transform the full layer image until changes stop, then do so in the
+        background."""
+        widget = LayerWidget(self.layer, self.image_stack)
+        transform = QTransform.fromScale(2.0, 2.0)
+        with patch.object(ImageLayer, 'transformed_image') as transformed_image:
+            self.layer.transform = transform
+        transformed_image.assert_not_called()
+        self.assertLessEqual(widget._proxy_image.width(), WIDGET_PROXY_MAX_DIMENSION)
+        self.assertLess(widget._layer_image.width(), CONTENT_BOUNDS.width())
+        self.assertTrue(widget._full_preview_timer.isActive())
+
+        widget._full_preview_timer.timeout.emit()
+        self.assertTrue(TaskScheduler().wait_for_done(5000))
+        QApplication.processEvents()
+        self.assertIsNone(widget._preview_task)
+        expected_size = map_rect_precise(CONTENT_BOUNDS, transform).toAlignedRect().size()
+        self.assertLessEqual(abs(widget._layer_image.width() - expected_size.width()), 2)
+        self.assertLessEqual(abs(widget._layer_image.height() - expected_size.height()), 2)
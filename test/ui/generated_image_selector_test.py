@@ -0,0 +1,126 @@
+"""Tests generated image option previews, layout, and compressed image storage."""
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+from PySide6.QtCore import QSize, Qt
+from PySide6.QtGui import QImage, QColor
+from PySide6.QtWidgets import QApplication
+
+from src.config.application_config import AppConfig
+from src.config.cache import Cache
+from src.config.key_config import KeyConfig
+from src.image.layers.image_stack import ImageStack
+from src.ui.generated_image_selector import GeneratedImageSelector
+from src.util.task_scheduler import TaskScheduler
+from src.util.visual.image_utils import image_data_as_numpy_8bit
+from src.util.visual.compressed_image_cache import CompressedImageCache
+
+IMAGE_SIZE = QSize(512, 512)
+BATCH_SIZE = 16
+BATCH_COUNT = 2
+OPTION_COUNT = BATCH_SIZE * BATCH_COUNT
+app = QApplication.instance() or QApplication(sys.argv)
+
+
+class GeneratedImageSelectorTest(unittest.TestCase):
+    """Tests generated image option previews, layout, and compressed image storage."""
+
+    def setUp(self) -> None:
+        while os.path.basename(os.getcwd()) not in ('IntraPaint', ''):
+            os.chdir('..')
+        assert os.path.basename(os.getcwd()) == 'IntraPaint'
+        AppConfig('test/resources/app_config_test.json')._reset()
+        KeyConfig('test/resources/key_config_test.json')._reset()
+        Cache('test/resources/cache_test.json')._reset()
+        cache = Cache()
+        cache.set(Cache.BATCH_SIZE, BATCH_SIZE, save_change=False)
+        cache.set(Cache.BATCH_COUNT, BATCH_COUNT, save_change=False)
+        cache.set(Cache.EDIT_SIZE, IMAGE_SIZE, save_change=False)
+        cache.set(Cache.GENERATION_SIZE, IMAGE_SIZE, save_change=False)
+        self.image_stack = ImageStack(IMAGE_SIZE, IMAGE_SIZE, IMAGE_SIZE, IMAGE_SIZE)
+        self.selector = GeneratedImageSelector(self.image_stack, lambda: None)
+        self.selector.resize(800, 600)
+        self.selector.show()
+        self.images = []
+        for i in range(OPTION_COUNT):
+            image = QImage(IMAGE_SIZE, QImage.Format.Format_ARGB32_Premultiplied)
+            image.fill(QColor(i * 8, 255 - i * 8, 128))
+            self.images.append(image)
+
+    def tearDown(self) -> None:
+        self.assertTrue(TaskScheduler().wait_for_done(5000))
+        self.selector.close()
+
+    def _add_all_options(self) -> None:
+        for i, image in enumerate(self.images):
+            self.selector.add_image_option(image, i)
+        self.assertTrue(TaskScheduler().wait_for_done(5000))
+        QApplication.processEvents()
+
+    def test_layout_once_per_batch(self) -> None:
+        """Replacing placeholder images should not rearrange the options."""
+        with patch.object(GeneratedImageSelector, '_apply_ideal_image_arrangement') as arrangement:
+            self._add_all_options()
+        arrangement.assert_not_called()
+        options = self.selector._options
+        self.assertEqual(OPTION_COUNT + 1, len(options))
+        self.assertEqual(OPTION_COUNT + 1, len({(option.x(), option.y()) for option in options}))
+
+    def test_previews_and_compression(self) -> None:
+        """Options should show scaled previews, only keeping full images in memory for the zoomed-in option."""
+        self._add_all_options()
+        options = self.selector._options[1:]
+        for option, image in zip(options, self.images):
+            self.assertEqual(IMAGE_SIZE, option.size)
+            self.assertLess(option.pixmap().width(), IMAGE_SIZE.width())
+            self.assertIsNone(option._source_image)
+            self.assertEqual(image, option.image)
+            self.assertIsNone(option._source_image)
+
+        self.selector.toggle_zoom(3)
+        zoomed_option = self.selector._options[3]
+        self.assertEqual(IMAGE_SIZE, zoomed_option.pixmap().size())
+        self.assertIsNotNone(zoomed_option._source_image)
+        self.assertIsNone(self.selector._options[4]._source_image)
+        self.selector.toggle_zoom()
+        self.assertLess(zoomed_option.pixmap().width(), IMAGE_SIZE.width())
+        self.assertIsNone(zoomed_option._source_image)
+
+        self.selector.reset()
+        self.assertEqual(0, len(self.selector._image_cache))
+
+    def test_image_cache_spill(self) -> None:
+        """Images beyond the memory limit should be stored on disk."""
+        image_cache = CompressedImageCache(memory_limit_bytes=0)
+        image = self.images[0].copy()
+        image.setPixelColor(5, 5, Qt.GlobalColor.red)
+        image_cache.put('first', image)
+        image_cache.put('second', self.images[1])
+        self.assertEqual(0, image_cache.memory_bytes)
+        self.assertEqual(2, image_cache.disk_count)
+        self.assertEqual(image, image_cache.get('first'))
+        self.assertEqual(image.format(), image_cache.get('first').format())
+        image_cache.remove('first')
+        self.assertNotIn('first', image_cache)
+        self.assertIsNone(image_cache.get('first'))
+        image_cache.clear()
+        self.assertEqual(0, len(image_cache))
+
+    def test_image_cache_lossless(self) -> None:
+        """Translucent premultiplied pixels should be restored exactly."""
+        image_cache = CompressedImageCache()
+        image = QImage(IMAGE_SIZE, QImage.Format.Format_ARGB32_Premultiplied)
+        np_image = image_data_as_numpy_8bit(image)
+        rng = np.random.default_rng(0)
+        alpha = rng.integers(0, 256, (image.height(), image.width()))
+        for channel in range(3):
+            np_image[:, :, channel] = rng.integers(0, 256, (image.height(), image.width())) * alpha // 255
+        np_image[:, :, 3] = alpha
+        image_cache.put('translucent', image)
+        cached_image = image_cache.get('translucent')
+        assert cached_image is not None
+        self.assertEqual(image.format(), cached_image.format())
+        self.assertTrue(np.array_equal(np_image, image_data_as_numpy_8bit(cached_image)))
@@ -0,0 +1,79 @@
+"""Tests automatic ControlNet preprocessor preview refreshes."""
+import os
+import sys
+import unittest
+
+from PySide6.QtCore import Qt
+from PySide6.QtGui import QImage
+from PySide6.QtWidgets import QApplication
+
+from src.api.controlnet.control_parameter import ControlParameter
+from src.api.controlnet.controlnet_constants import ControlTypeDef, PREPROCESSOR_NONE, CONTROLNET_MODEL_NONE
+from src.api.controlnet.controlnet_preprocessor import ControlNetPreprocessor
+from src.api.webui.controlnet_webui_constants import PREPROCESSOR_RES_PARAM_KEY
+from src.config.application_config import AppConfig
+from src.config.cache import Cache
+from src.config.key_config import KeyConfig
+from src.ui.panel.controlnet_panel import ControlNetPanel, DEFAULT_CONTROL_TYPE
+from src.util.parameter import TYPE_INT
+
+app = QApplication.instance() or QApplication(sys.argv)
+
+PREPROCESSOR_NAME = 'canny'
+
+
+class ControlNetPanelTest(unittest.TestCase):
+    """Tests automatic ControlNet preprocessor preview refreshes."""
+
+    def setUp(self) -> None:
+        while os.path.basename(os.getcwd()) not in ('IntraPaint', ''):
+            os.chdir('..')
+        assert os.path.basename(os.getcwd()) == 'IntraPaint'
+        AppConfig('test/resources/app_config_test.json')._reset()
+        KeyConfig('test/resources/key_config_test.json')._reset()
+        Cache('test/resources/cache_test.json')._reset()
+        preprocessors = [
+            ControlNetPreprocessor(PREPROCESSOR_NAME, 'Canny', [
+                ControlParameter(PREPROCESSOR_RES_PARAM_KEY, 'Resolution', TYPE_INT, 512, minimum=64, maximum=2048)
+            ]),
+            ControlNetPreprocessor(PREPROCESSOR_NONE, PREPROCESSOR_NONE, [])
+        ]
+        control_types: dict[str, ControlTypeDef] = {
+            DEFAULT_CONTROL_TYPE: {
+                'module_list': [PREPROCESSOR_NAME, PREPROCESSOR_NONE],
+                'model_list': [CONTROLNET_MODEL_NONE],
+                'default_option': PREPROCESSOR_NAME,
+                'default_model': CONTROLNET_MODEL_NONE
+            }
+        }
+        self.panel = ControlNetPanel(Cache.CONTROLNET_ARGS_0_WEBUI, preprocessors, [CONTROLNET_MODEL_NONE],
+                                     control_types, True)
+        self.requests: list[tuple[ControlNetPreprocessor, str, bool]] = []
+        self.panel.request_preview.connect(lambda *args: self.requests.append(args))
+        self.resolution_slider = self.panel._resolution_slider
+        assert self.resolution_slider is not None
+
+    def test_no_refresh_without_preview(self) -> None:
+        """Parameter changes shouldn't request previews if no preview is showing."""
+        self.resolution_slider.setValue(256)
+        self.assertFalse(self.panel._preview_timer.isActive())
+
+    def test_refresh_when_changes_stop(self) -> None:
+        """Parameter changes should request a single automatic preview once they stop."""
+        preview = QImage(8, 8, QImage.Format.Format_ARGB32_Premultiplied)
+        preview.fill(Qt.GlobalColor.white)
+        self.panel.set_preprocessor_preview(preview)
+        for resolution in (256, 320, 384):
+            self.resolution_slider.setValue(resolution)
+        self.assertTrue(self.panel._preview_timer.isActive())
+        self.assertEqual([], self.requests)
+        self.panel._preview_timer.timeout.emit()
+        self.assertEqual(1, len(self.requests))
+        preprocessor, _, automatic = self.requests[0]
+        self.assertTrue(automatic)
+        self.assertEqual(PREPROCESSOR_NAME, preprocessor.name)
+        self.assertEqual(384, preprocessor.parameters[0].value)
+
+        self.panel._preview_button.clicked.emit()
+        self.assertEqual(2, len(self.requests))
+        self.assertFalse(self.requests[1][2])
@@ -0,0 +1,123 @@
+"""Tests undo stack transactions and statistics."""
+import os
+import sys
+import unittest
+from typing import Callable, Optional
+
+from PySide6.QtWidgets import QApplication
+
+from src.config.application_config import AppConfig
+from src.undo_stack import UndoStack, TransactionChange
+
+app = QApplication.instance() or QApplication(sys.argv)
+
+
+class _ListAppend(TransactionChange):
+    """Accumulates values appended to a list, undoing them all at once."""
+
+    def __init__(self, values: list[int]) -> None:
+        self._values = values
+        self._start = len(values)
+        self._added: list[int] = []
+
+    def append(self, value: int) -> None:
+        """Appends a value to the list."""
+        self._values.append(value)
+        self._added.append(value)
+
+    def finish(self) -> Optional[tuple[Callable[[], None], Callable[[], None]]]:
+        if len(self._added) == 0:
+            return None
+        start = self._start
+        added = list(self._added)
+
+        def _undo() -> None:
+            del self._values[start:start + len(added)]
+
+        def _redo() -> None:
+            self._values[start:start] = added
+
+        return _undo, _redo
+
+
+class UndoStackTest(unittest.TestCase):
+    """Tests undo stack transactions and statistics."""
+
+    def setUp(self) -> None:
+        while os.path.basename(os.getcwd()) not in ('IntraPaint', ''):
+            os.chdir('..')
+        assert os.path.basename(os.getcwd()) == 'IntraPaint'
+        AppConfig('test/resources/app_config_test.json')
+        AppConfig()._reset()
+        UndoStack().clear()
+        UndoStack().reset_stats()
+        self.values: list[int] = []
+
+    def _append(self, value: int) -> None:
+        transaction = UndoStack().active_transaction
+        assert transaction is not None
+        transaction.change('values', lambda: _ListAppend(self.values)).append(value)
+        transaction.record_change()
+
+    def test_transaction_single_entry(self) -> None:
+        """Changes within a transaction should be committed as a single undo entry."""
+        with UndoStack().transaction('test'):
+            for i in range(5):
+                self._append(i)
+            self.assertEqual(0, UndoStack().undo_count())
+        self.assertEqual(1, UndoStack().undo_count())
+        self.assertEqual(1, UndoStack().stats.transactions)
+        self.assertEqual(5, UndoStack().stats.transaction_changes)
+        UndoStack().undo()
+        self.assertEqual([], self.values)
+        UndoStack().redo()
+        self.assertEqual(list(range(5)), self.values)
+
+    def test_transaction_commit_order(self) -> None:
+        """Actions committed during a transaction should stay ordered relative to accumulated changes."""
+
+        def _append_ten() -> None:
+            self.values.append(10)
+
+        def _remove_ten() -> None:
+            self.values.remove(10)
+
+        with UndoStack().transaction('test'):
+            self._append(1)
+            UndoStack().commit_action(_append_ten, _remove_ten, 'test.append')
+            self._append(2)
+        self.assertEqual([1, 10, 2], self.values)
+        self.assertEqual(1, UndoStack().undo_count())
+        self.assertEqual(1, UndoStack().stats.merged_commits)
+        UndoStack().undo()
+        self.assertEqual([], self.values)
+        UndoStack().redo()
+        self.assertEqual([1, 10, 2], self.values)
+
+    def test_undo_during_transaction(self) -> None:
+        """Undoing within a transaction should undo changes made so far in the transaction."""
+        UndoStack().begin_transaction('test')
+        self._append(1)
+        UndoStack().undo()
+        self.assertEqual([], self.values)
+        self._append(2)
+        UndoStack().end_transaction()
+        self.assertEqual([2], self.values)
+        self.assertEqual(1, UndoStack().undo_count())
+        self.assertEqual(0, UndoStack().redo_count())
+
+    def test_empty_transaction(self) -> None:
+        """Transactions without changes should not add undo entries."""
+        with UndoStack().transaction('test'):
+            pass
+        self.assertEqual(0, UndoStack().undo_count())
+        self.assertEqual(0, UndoStack().stats.transactions)
+
+    def test_nested_transaction_error(self) -> None:
+        """Transactions can't be started while another transaction or action group is open."""
+        with UndoStack().transaction('test'):
+            with self.assertRaises(RuntimeError):
+                UndoStack().begin_transaction('nested')
+        with UndoStack().combining_actions('test'):
+            with self.assertRaises(RuntimeError):
+                UndoStack().begin_transaction('nested')
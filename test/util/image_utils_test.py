@@ -4,10 +4,12 @@ import sys
 import unittest
 
 from PIL import Image
-from PySide6.QtGui import QImage
+from PySide6.QtCore import QPoint, QRect, QSize, Qt
+from PySide6.QtGui import QImage, QColor, QPainter
 from PySide6.QtWidgets import QApplication
 
-from src.util.visual.image_utils import qimage_from_base64, BASE_64_PREFIX, image_to_base64
+from src.util.visual.image_utils import qimage_from_base64, BASE_64_PREFIX, image_to_base64, flood_fill, \
+    flood_fill_region, flood_fill_cropped, color_fill, color_fill_cropped, image_content_bounds
 from src.util.visual.pil_image_utils import pil_image_to_qimage, qimage_to_pil_image, pil_image_from_base64
 
 app = QApplication.instance() or QApplication(sys.argv)
@@ -83,3 +85,61 @@ class TestImageUtils(unittest.TestCase):
         str64 = image_to_base64(self.qimage_argb)
         img = qimage_from_base64(str64)
         self.assertEqual(img, self.qimage_argb)
+
+    def test_flood_fill_cropped_bounds(self) -> None:
+        """Test that flood fill results are cropped to the filled region, and match the full-size fill mask."""
+        image = QImage(QSize(1000, 800), QImage.Format.Format_ARGB32_Premultiplied)
+        image.fill(Qt.GlobalColor.white)
+        painter = QPainter(image)
+        painter.setPen(Qt.GlobalColor.black)
+        painter.drawRect(QRect(600, 500, 41, 21))
+        painter.end()
+        fill_color = QColor(Qt.GlobalColor.red)
+
+        mask, offset = flood_fill_region(image, QPoint(620, 510), 0.0)
+        self.assertEqual(offset, QPoint(601, 501))
+        self.assertEqual(mask.shape, (20, 40))
+        self.assertTrue(mask.all())
+
+        mask_image, offset = flood_fill_cropped(image, QPoint(620, 510), fill_color, 0.0)
+        self.assertEqual(mask_image.size(), QSize(40, 20))
+        full_mask = flood_fill(image, QPoint(620, 510), fill_color, 0.0)
+        assert full_mask is not None
+        self.assertEqual(image_content_bounds(full_mask.convertToFormat(QImage.Format.Format_ARGB32_Premultiplied)),
+                         QRect(offset, mask_image.size()))
+        self.assertEqual(full_mask.pixelColor(620, 510), fill_color)
+
+        # Filling outside the rectangle has to expand past the initial search region to cover the whole image:
+        mask, offset = flood_fill_region(image, QPoint(5, 5), 0.0)
+        self.assertEqual(offset, QPoint(0, 0))
+        self.assertEqual(mask.shape, (800, 1000))
+        self.assertEqual(int(mask.sum()), 1000 * 800 - 42 * 22)
+
+    def test_flood_fill_threshold_no_wraparound(self) -> None:
+        """Test that pixels darker than the seed color are compared correctly against the fill threshold."""
+        image = QImage(QSize(3, 1), QImage.Format.Format_ARGB32_Premultiplied)
+        image.setPixelColor(0, 0, QColor(0, 0, 0))
+        image.setPixelColor(1, 0, QColor(100, 100, 100))
+        image.setPixelColor(2, 0, QColor(200, 200, 200))
+        mask, offset = flood_fill_region(image, QPoint(1, 0), 100.0)
+        self.assertEqual(offset, QPoint(0, 0))
+        self.assertEqual(mask.tolist(), [[1, 1, 1]])
+        mask, offset = flood_fill_region(image, QPoint(1, 0), 99.0)
+        self.assertEqual(offset, QPoint(1, 0))
+        self.assertEqual(mask.tolist(), [[1]])
+
+    def test_color_fill_cropped(self) -> None:
+        """Test that color fill finds unconnected matching pixels, and crops to their bounds."""
+        image = QImage(QSize(200, 100), QImage.Format.Format_ARGB32_Premultiplied)
+        image.fill(Qt.GlobalColor.white)
+        image.setPixelColor(10, 20, QColor(Qt.GlobalColor.blue))
+        image.setPixelColor(150, 60, QColor(Qt.GlobalColor.blue))
+        mask, offset = color_fill_cropped(image, QColor(Qt.GlobalColor.blue), 0.0)
+        self.assertEqual(offset, QPoint(10, 20))
+        self.assertEqual(mask.size(), QSize(141, 41))
+        self.assertEqual(mask.pixelColor(0, 0).alpha(), 255)
+        self.assertEqual(mask.pixelColor(140, 40).alpha(), 255)
+        self.assertEqual(mask.pixelColor(1, 0).alpha(), 0)
+        full_mask = color_fill(image, QColor(Qt.GlobalColor.blue), 0.0)
+        self.assertEqual(full_mask.size(), image.size())
+        self.assertEqual(image_content_bounds(full_mask), QRect(offset, mask.size()))
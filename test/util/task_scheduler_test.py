@@ -0,0 +1,114 @@
+"""Tests prioritized, cancellable background task scheduling."""
+import os
+import sys
+import threading
+import unittest
+
+from PySide6.QtWidgets import QApplication
+
+from src.config.application_config import AppConfig
+from src.util.async_task import AsyncTask
+from src.util.task_scheduler import TaskScheduler, PRIORITY_BACKGROUND, PRIORITY_NORMAL, PRIORITY_INTERACTIVE
+
+TIMEOUT_SECONDS = 5.0
+app = QApplication.instance() or QApplication(sys.argv)
+
+
+class TaskSchedulerTest(unittest.TestCase):
+    """Tests prioritized, cancellable background task scheduling."""
+
+    def setUp(self) -> None:
+        while os.path.basename(os.getcwd()) not in ('IntraPaint', ''):
+            os.chdir('..')
+        assert os.path.basename(os.getcwd()) == 'IntraPaint'
+        AppConfig('test/resources/app_config_test.json')
+        AppConfig()._reset()
+        self.scheduler = TaskScheduler()
+        self.scheduler.set_worker_count(1)
+        self.release = threading.Event()
+        self.blocking_started = threading.Event()
+        self.finished: list[str] = []
+
+    def tearDown(self) -> None:
+        self.release.set()
+        self.scheduler.cancel_all()
+        self.assertTrue(self.scheduler.wait_for_done(int(TIMEOUT_SECONDS * 1000)))
+        self.scheduler.set_worker_count(AppConfig().get(AppConfig.BACKGROUND_TASK_THREADS))
+
+    def _block_worker(self) -> None:
+        """Occupies the only worker thread until self.release is set."""
+
+        def _block() -> None:
+            self.blocking_started.set()
+            self.release.wait(TIMEOUT_SECONDS)
+        self.scheduler.submit(_block, PRIORITY_NORMAL)
+        self.assertTrue(self.blocking_started.wait(TIMEOUT_SECONDS))
+
+    def _record(self, name: str):
+        return lambda: self.finished.append(name)
+
+    def test_priority_order(self) -> None:
+        """Queued tasks should run highest priority first, in submission order within each priority."""
+        self._block_worker()
+        self.scheduler.submit(self._record('background'), PRIORITY_BACKGROUND)
+        self.scheduler.submit(self._record('normal 1'), PRIORITY_NORMAL)
+        self.scheduler.submit(self._record('normal 2'), PRIORITY_NORMAL)
+        self.release.set()
+        self.assertTrue(self.scheduler.wait_for_done(int(TIMEOUT_SECONDS * 1000)))
+        self.assertEqual(['normal 1', 'normal 2', 'background'], self.finished)
+
+    def test_interactive_not_blocked(self) -> None:
+        """Interactive tasks should start even when every worker is busy."""
+        self._block_worker()
+        interactive_done = threading.Event()
+        self.scheduler.submit(interactive_done.set, PRIORITY_INTERACTIVE)
+        self.assertTrue(interactive_done.wait(TIMEOUT_SECONDS))
+        self.assertFalse(self.release.is_set())
+
+    def test_coalesce_by_key(self) -> None:
+        """Only the latest queued task with a given key should run."""
+        self._block_worker()
+        for i in range(3):
+            self.scheduler.submit(self._record(f'keyed {i}'), PRIORITY_NORMAL, key='preview')
+        self.scheduler.submit(self._record('unkeyed'), PRIORITY_NORMAL)
+        self.release.set()
+        self.assertTrue(self.scheduler.wait_for_done(int(TIMEOUT_SECONDS * 1000)))
+        self.assertEqual(['keyed 2', 'unkeyed'], self.finished)
+        self.assertEqual(0, self.scheduler.task_count)
+
+    def test_cancel_running_task(self) -> None:
+        """Running tasks should be able to stop early after cancellation."""
+        started = threading.Event()
+        iterations = []
+
+        def _long_task() -> None:
+            started.set()
+            while len(iterations) < 10000:
+                task.cancellation_token.raise_if_cancelled()
+                iterations.append(None)
+                self.release.wait(0.001)
+            self.finished.append('long task')
+
+        task = self.scheduler.submit(_long_task, PRIORITY_BACKGROUND)
+        self.assertTrue(started.wait(TIMEOUT_SECONDS))
+        self.scheduler.cancel(task)
+        self.assertTrue(self.scheduler.wait_for_done(int(TIMEOUT_SECONDS * 1000)))
+        self.assertEqual([], self.finished)
+        self.assertLess(len(iterations), 10000)
+
+    def test_async_task_replaced(self) -> None:
+        """Replaced AsyncTasks should not send finish signals."""
+        self._block_worker()
+        finish_signals = []
+        tasks = []
+        for i in range(2):
+            task = AsyncTask(self._record(f'task {i}'), key='async task')
+            task.finish_signal.connect(lambda i=i: finish_signals.append(i))
+            tasks.append(task)
+            task.start()
+        self.assertTrue(tasks[0].cancelled)
+        self.release.set()
+        self.assertTrue(self.scheduler.wait_for_done(int(TIMEOUT_SECONDS * 1000)))
+        QApplication.processEvents()
+        self.assertEqual(['task 1'], self.finished)
+        self.assertEqual([1], finish_signals)
@@ -0,0 +1,54 @@
+"""Test text measurement and placement utility functions."""
+import sys
+import unittest
+
+from PySide6.QtCore import QSize
+from PySide6.QtGui import QFont
+from PySide6.QtWidgets import QApplication
+
+from src.image.text_rect import TextRect
+from src.util.visual.text_drawing_utils import max_font_size, find_text_size, MAX_FONT_PT
+
+app = QApplication.instance() or QApplication(sys.argv)
+
+TEST_TEXT = ['a', 'IntraPaint', 'two\nlines', 'W' * 40]
+TEST_BOUNDS = [QSize(4, 4), QSize(30, 20), QSize(200, 40), QSize(120, 300), QSize(2000, 2000)]
+
+
+def _linear_max_font_size(text: str, font: QFont, bounds: QSize, multiline: bool) -> int:
+    """Find the largest font size that fits by checking every size in order."""
+    test_font = QFont(font)
+    for pt_size in range(1, MAX_FONT_PT):
+        test_font.setPointSize(pt_size)
+        size = find_text_size(text, test_font, multiline)
+        if size.width() >= bounds.width() or size.height() >= bounds.height():
+            return pt_size - 1
+    return MAX_FONT_PT - 1
+
+
+class TestTextDrawingUtils(unittest.TestCase):
+    """Test text measurement and placement utility functions."""
+
+    def test_max_font_size(self) -> None:
+        """Make sure max_font_size finds the same sizes as an exhaustive search."""
+        font = QApplication.font()
+        for text in TEST_TEXT:
+            for bounds in TEST_BOUNDS:
+                for multiline in (True, False):
+                    self.assertEqual(max_font_size(text, font, bounds, multiline),
+                                     _linear_max_font_size(text, font, bounds, multiline),
+                                     f'{text}, {bounds}, multiline={multiline}')
+        self.assertEqual(max_font_size('', font, QSize(10, 10)), MAX_FONT_PT)
+
+    def test_text_rect_unchanged_after_auto_scale(self) -> None:
+        """Re-applying the same auto-scaled parameters should not register as a change."""
+        text_rect = TextRect()
+        text_rect.size = QSize(300, 100)
+        text_rect.scale_text_to_bounds = True
+        text_rect.text = 'IntraPaint'
+        copy = TextRect(text_rect)
+        copy.text = 'IntraPaint'
+        copy.size = QSize(300, 100)
+        self.assertEqual(text_rect, copy)
+        copy.text = 'IntraPaint!'
+        self.assertNotEqual(text_rect, copy)
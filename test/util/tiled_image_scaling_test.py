@@ -0,0 +1,104 @@
+"""Tests tiled and chunked image scaling."""
+import os
+import sys
+import unittest
+
+import numpy as np
+from PIL import Image
+from PySide6.QtCore import QSize
+from PySide6.QtGui import QImage
+from PySide6.QtWidgets import QApplication
+
+from src.config.application_config import AppConfig
+from src.util.task_scheduler import CancellationToken, TaskCancelledError
+from src.util.visual.image_utils import image_data_as_numpy_8bit_readonly, numpy_8bit_to_qimage
+from src.util.visual.pil_image_utils import pil_image_scaling
+from src.util.visual.tiled_image_scaling import tiled_image_scaling, chunked_image_scaling
+
+app = QApplication.instance() or QApplication(sys.argv)
+
+SOURCE_SIZE = QSize(410, 300)
+SMOOTH_MODES = (Image.Resampling.BILINEAR, Image.Resampling.HAMMING, Image.Resampling.BICUBIC,
+                Image.Resampling.LANCZOS)
+SCALED_SIZES = (QSize(1000, 777), QSize(123, 91), QSize(820, 600))
+TILE_SIZE = 64
+
+
+def _pixel_difference(image1: QImage, image2: QImage) -> np.ndarray:
+    return np.abs(image_data_as_numpy_8bit_readonly(image1).astype(int)
+                  - image_data_as_numpy_8bit_readonly(image2).astype(int))
+
+
+class TiledImageScalingTest(unittest.TestCase):
+    """Tests tiled and chunked image scaling."""
+
+    def setUp(self) -> None:
+        while os.path.basename(os.getcwd()) not in ('IntraPaint', ''):
+            os.chdir('..')
+        assert os.path.basename(os.getcwd()) == 'IntraPaint'
+        AppConfig('test/resources/app_config_test.json')._reset()
+        rng = np.random.default_rng(1)
+        np_image = rng.integers(0, 256, (SOURCE_SIZE.height(), SOURCE_SIZE.width(), 4), dtype=np.uint8)
+        np_image[:, :, 3] = 255
+        self.image = numpy_8bit_to_qimage(np_image).copy()
+
+    def test_tiles_match_full_scaling(self) -> None:
+        """Tiled scaling should match scaling the whole image at once."""
+        for mode in SMOOTH_MODES:
+            for size in SCALED_SIZES:
+                expected = pil_image_scaling(self.image, size, mode)
+                tiled = tiled_image_scaling(self.image, size, mode, tile_size=TILE_SIZE, worker_count=4)
+                self.assertEqual(size, tiled.size())
+                self.assertEqual(QImage.Format.Format_ARGB32_Premultiplied, tiled.format())
+                self.assertLessEqual(_pixel_difference(expected, tiled).max(), 2, f'{mode.name}, {size}')
+
+    def test_integer_scale_nearest_exact(self) -> None:
+        """Nearest-neighbor tiles should exactly match full image scaling when pixel boundaries aren't ambiguous."""
+        size = SOURCE_SIZE * 2
+        expected = pil_image_scaling(self.image, size, Image.Resampling.NEAREST)
+        tiled = tiled_image_scaling(self.image, size, Image.Resampling.NEAREST, tile_size=TILE_SIZE)
+        self.assertEqual(0, _pixel_difference(expected, tiled).max())
+
+    def test_cancel(self) -> None:
+        """Cancelled scaling should stop with TaskCancelledError."""
+        token = CancellationToken()
+        token.cancel()
+        with self.assertRaises(TaskCancelledError):
+            tiled_image_scaling(self.image, SOURCE_SIZE * 2, tile_size=TILE_SIZE, token=token)
+
+    def test_chunked_scaling(self) -> None:
+        """Chunks should be limited to the chunk size, and blended together without visible seams."""
+        size = SOURCE_SIZE * 2
+        chunk_size = 128
+        chunk_sizes: list[QSize] = []
+        progress: list[tuple[int, int]] = []
+
+        def _scale_chunk(chunk: QImage, scaled_size: QSize) -> QImage:
+            chunk_sizes.append(chunk.size())
+            return pil_image_scaling(chunk, scaled_size, Image.Resampling.BILINEAR)
+
+        chunked = chunked_image_scaling(self.image, size, _scale_chunk, chunk_size=chunk_size, overlap=16,
+                                        progress_callback=lambda index, count: progress.append((index, count)))
+        self.assertEqual(size, chunked.size())
+        self.assertGreater(len(chunk_sizes), 1)
+        for scaled_chunk_size in chunk_sizes:
+            self.assertLessEqual(scaled_chunk_size.width(), chunk_size)
+            self.assertLessEqual(scaled_chunk_size.height(), chunk_size)
+        self.assertEqual([(i, len(chunk_sizes)) for i in range(len(chunk_sizes))], progress)
+        expected = pil_image_scaling(self.image, size, Image.Resampling.BILINEAR)
+        self.assertLess(_pixel_difference(expected, chunked).mean(), 1.0)
+
+    def test_single_chunk(self) -> None:
+        """Images that fit in one chunk should be scaled in a single request."""
+        chunk_count = 0
+
+        def _scale_chunk(chunk: QImage, scaled_size: QSize) -> QImage:
+            nonlocal chunk_count
+            chunk_count += 1
+            self.assertEqual(self.image, chunk)
+            # Return the wrong size, to make sure results are resized when needed:
+            return pil_image_scaling(chunk, scaled_size * 2)
+
+        chunked = chunked_image_scaling(self.image, SOURCE_SIZE * 2, _scale_chunk)
+        self.assertEqual(1, chunk_count)
+        self.assertEqual(SOURCE_SIZE * 2, chunked.size())
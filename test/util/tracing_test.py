@@ -0,0 +1,112 @@
+"""Tests performance tracing spans and trace export."""
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from src.util.tracing import Tracer, trace_span, traced, DEFAULT_CAPACITY, CATEGORY_RENDER
+
+
+@traced(category=CATEGORY_RENDER)
+def _traced_function(value: int) -> int:
+    return value * 2
+
+
+class TracingTest(unittest.TestCase):
+    """Tests performance tracing spans and trace export."""
+
+    def setUp(self) -> None:
+        self.tracer = Tracer()
+        self.tracer.set_capacity(DEFAULT_CAPACITY)
+        self.tracer.clear()
+        self.tracer.set_enabled(True)
+
+    def tearDown(self) -> None:
+        self.tracer.set_enabled(False)
+        self.tracer.set_capacity(DEFAULT_CAPACITY)
+        self.tracer.clear()
+
+    def test_disabled(self) -> None:
+        """Nothing should be recorded while tracing is disabled."""
+        self.tracer.set_enabled(False)
+        with trace_span('disabled'):
+            pass
+        self.assertEqual(4, _traced_function(2))
+        self.assertEqual([], self.tracer.spans())
+
+    def test_record_spans(self) -> None:
+        """Spans should be recorded with their name, category, args, and duration."""
+        with trace_span('outer', CATEGORY_RENDER, {'key': 'value'}):
+            with trace_span('inner'):
+                time.sleep(0.002)
+        spans = self.tracer.spans()
+        self.assertEqual(['inner', 'outer'], [span.name for span in spans])
+        inner, outer = spans
+        self.assertEqual(CATEGORY_RENDER, outer.category)
+        self.assertEqual({'key': 'value'}, outer.args)
+        self.assertGreaterEqual(inner.duration_ms, 2.0)
+        self.assertLessEqual(outer.start_ns, inner.start_ns)
+        self.assertGreaterEqual(outer.end_ns, inner.end_ns)
+
+    def test_traced_decorator(self) -> None:
+        """Decorated functions should record a span named after the function, even if they raise an exception."""
+
+        @traced('failing')
+        def _fail() -> None:
+            raise RuntimeError('expected')
+
+        self.assertEqual(6, _traced_function(3))
+        with self.assertRaises(RuntimeError):
+            _fail()
+        self.assertEqual(['_traced_function', 'failing'], [span.name for span in self.tracer.spans()])
+        self.assertEqual(CATEGORY_RENDER, self.tracer.spans()[0].category)
+
+    def test_capacity(self) -> None:
+        """Only the most recent spans should be kept once the buffer is full."""
+        self.tracer.set_capacity(5)
+        for i in range(8):
+            with trace_span(str(i)):
+                pass
+        self.assertEqual(['3', '4', '5', '6', '7'], [span.name for span in self.tracer.spans()])
+        self.tracer.set_capacity(2)
+        self.assertEqual(['6', '7'], [span.name for span in self.tracer.spans()])
+        with self.assertRaises(ValueError):
+            self.tracer.set_capacity(0)
+
+    def test_frame_timing(self) -> None:
+        """Frame timing should only include spans that finished since the previous frame from the same source."""
+        with trace_span('before first frame'):
+            pass
+        self.assertEqual([], self.tracer.end_frame('view').span_totals)
+        self.assertEqual([], self.tracer.end_frame('other view').span_totals)
+        for _ in range(3):
+            with trace_span('repeated'):
+                pass
+        with trace_span('slow'):
+            time.sleep(0.005)
+        frame_timing = self.tracer.end_frame('view')
+        self.assertGreater(frame_timing.interval_ms, 0.0)
+        self.assertEqual(['slow', 'repeated'], [name for name, _, _ in frame_timing.span_totals])
+        self.assertEqual(3, frame_timing.span_totals[1][1])
+        self.assertEqual(2, len(self.tracer.end_frame('other view').span_totals))
+        self.assertEqual([], self.tracer.end_frame('view').span_totals)
+
+    def test_chrome_trace(self) -> None:
+        """Saved traces should contain complete events with microsecond timing, plus thread names."""
+        with trace_span('request', 'network', {'endpoint': '/test'}):
+            time.sleep(0.001)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            trace_path = os.path.join(temp_dir, 'trace.json')
+            self.assertEqual(1, self.tracer.save_chrome_trace(trace_path))
+            with open(trace_path, encoding='utf-8') as file:
+                trace = json.load(file)
+        events = trace['traceEvents']
+        span_event = next(event for event in events if event['ph'] == 'X')
+        self.assertEqual('request', span_event['name'])
+        self.assertEqual('network', span_event['cat'])
+        self.assertEqual({'endpoint': '/test'}, span_event['args'])
+        self.assertGreaterEqual(span_event['dur'], 1000)
+        thread_event = next(event for event in events if event['ph'] == 'M')
+        self.assertEqual(span_event['tid'], thread_event['tid'])
+        self.assertEqual('MainThread', thread_event['args']['name'])